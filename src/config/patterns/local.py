@@ -3,7 +3,7 @@
 
 Он импортирует и объединяет настройки из различных модулей конфигурации, таких как базовые настройки,
 настройки приложений, аутентификации, CORS, базы данных, локализации, статических файлов, логирования,
-сервера, шаблонов и SMTP.
+сервера, шаблонов, SMTP и кэша.
 """
 
 from src.config.settings.base import *
@@ -19,4 +19,5 @@ from src.config.settings.templates import *
 from src.config.settings.smtp import *
 from src.config.settings.auto_api import *
 from src.config.settings.swagger import *
-from src.config.settings.celery import *
\ No newline at end of file
+from src.config.settings.celery import *
+from src.config.settings.cache import *
\ No newline at end of file
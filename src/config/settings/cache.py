@@ -0,0 +1,96 @@
+"""
+Файл содержащий конфигурацию кэша для Django-приложения.
+
+Алиас `default` - общий для всех процессов и воркеров кэш: его используют
+кэш ответов auto_api, пространства имен ключей и ограничение частоты
+запросов DRF, поэтому счетчики и записи согласованы между воркерами.
+
+Настройки (переменные окружения):
+    API_CACHE_BACKEND: Тип общего кэша: redis, file или locmem (по умолчанию)
+    API_CACHE_LOCATION: Адрес Redis или директория файлового кэша
+    API_CACHE_TIMEOUT: Время жизни записей по умолчанию, секунды
+    API_CACHE_KEY_PREFIX: Префикс ключей (разделяет приложения в одном Redis)
+    API_CACHE_L1: Включает алиас `tiered` - кэш в памяти процесса поверх `default`
+    API_CACHE_L1_TIMEOUT: Время жизни записей в памяти процесса, секунды
+    API_CACHE_L1_SYNC_INTERVAL: Период проверки инвалидаций от других процессов, секунды
+    API_QUERY_CACHE: Включает кэш результатов запросов исполнителей (параметр cache_ttl)
+    API_QUERY_CACHE_BACKEND: Алиас кэша для результатов запросов
+    API_QUERY_CACHE_MAX_ENTRY_SIZE: Максимальный размер одного результата, байты
+
+Пример для нескольких воркеров:
+    API_CACHE_BACKEND=redis
+    API_CACHE_LOCATION=redis://127.0.0.1:6379/1
+    API_CACHE_L1=true
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from src.config.env import env
+from src.config.settings.static import RESOURCES_DIR
+
+# Бэкенды общего кэша
+CACHE_BACKENDS = {
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
+CACHE_BACKEND = env.str('API_CACHE_BACKEND', default='locmem').lower()
+CACHE_TIMEOUT = env.int('API_CACHE_TIMEOUT', default=300)
+CACHE_KEY_PREFIX = env.str('API_CACHE_KEY_PREFIX', default='ergo_ms')
+
+QUERY_CACHE = env.bool('API_QUERY_CACHE', default=False)
+QUERY_CACHE_BACKEND = env.str('API_QUERY_CACHE_BACKEND', default='default')
+QUERY_CACHE_MAX_ENTRY_SIZE = env.int('API_QUERY_CACHE_MAX_ENTRY_SIZE', default=16 * 1024 * 1024)
+
+CACHE_L1 = env.bool('API_CACHE_L1', default=False)
+CACHE_L1_TIMEOUT = env.int('API_CACHE_L1_TIMEOUT', default=5)
+CACHE_L1_SYNC_INTERVAL = env.float('API_CACHE_L1_SYNC_INTERVAL', default=1.0)
+
+def get_cache_location(backend: str) -> str:
+    """
+    Возвращает расположение общего кэша для выбранного бэкенда.
+
+    Raises:
+        ImproperlyConfigured: Если выбран Redis, а пакет redis не установлен
+    """
+    if backend == 'redis':
+        try:
+            import redis  # noqa: F401
+        except ImportError:
+            raise ImproperlyConfigured(
+                "Для API_CACHE_BACKEND=redis необходимо установить пакет redis"
+            )
+        return env.str('API_CACHE_LOCATION', default='redis://127.0.0.1:6379/1')
+    if backend == 'file':
+        return env.str('API_CACHE_LOCATION', default=os.path.join(RESOURCES_DIR, 'cache'))
+    return env.str('API_CACHE_LOCATION', default='ergo_ms')
+
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"Неподдерживаемый тип кэша: {CACHE_BACKEND}. "
+        f"Поддерживаемые типы: {', '.join(CACHE_BACKENDS.keys())}"
+    )
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': get_cache_location(CACHE_BACKEND),
+        'TIMEOUT': CACHE_TIMEOUT,
+        'KEY_PREFIX': CACHE_KEY_PREFIX,
+    },
+}
+
+if CACHE_L1:
+    CACHES['tiered'] = {
+        'BACKEND': 'src.core.utils.cache.tiered.TieredCache',
+        'LOCATION': 'tiered',
+        'TIMEOUT': CACHE_TIMEOUT,
+        'OPTIONS': {
+            'L2': 'default',
+            'L1_TIMEOUT': CACHE_L1_TIMEOUT,
+            'SYNC_INTERVAL': CACHE_L1_SYNC_INTERVAL,
+        },
+    }
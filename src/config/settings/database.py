@@ -1,23 +1,70 @@
 """
 Файл содержащий конфигурацию баз данных для Django-приложения.
 Поддерживает множественные подключения к разным типам СУБД через YAML конфигурацию.
+
+Переиспользование подключений настраивается для каждой базы в databases.yaml:
+    databases:
+      default:
+        engine: postgresql
+        ...
+        conn_max_age: 60          # Постоянное подключение, секунды (null - без ограничения)
+        conn_health_checks: true  # Проверка постоянного подключения перед запросом
+        pool:                     # Пул подключений psycopg 3 (только PostgreSQL)
+          min_size: 2
+          max_size: 10
+          timeout: 10             # Ожидание свободного подключения, секунды
+          max_idle: 300           # Закрытие простаивающих подключений, секунды
+          max_lifetime: 3600      # Переоткрытие подключений, секунды
+          health_check: true      # Проверка подключения при выдаче из пула
+        sqlalchemy:               # Пул engine SQLAlchemy (SqlAlchemyManager)
+          pool_size: 5
+          max_overflow: 10
+          pool_timeout: 30
+      default_replica:
+        engine: postgresql
+        ...
+        role: replica             # primary (по умолчанию) или replica
+        replica_of: default       # Основная база реплики
+        weight: 1                 # Доля чтений реплики
+        max_lag: 10               # Отставание, после которого реплика исключается, секунды
+
+Если у базы default есть реплики, подключается PrimaryReplicaRouter: чтение
+ORM и QueryExecutor идет на реплики, запись - в основную базу (см.
+src/core/utils/database/routers.py).
+
+Под ASGI рекомендуется пул: постоянные подключения Django привязаны к потоку
+и не переиспользуются между асинхронными запросами. Пул и conn_max_age
+взаимоисключающие; если psycopg 3 и psycopg_pool не установлены, вместо
+пула используются постоянные подключения.
+
+Проверка подключения к базам (с переключением default на SQLite при ошибке)
+выполняется только при API_DB_PROBE=true: manage.py включает ее для команд
+запуска сервера, флаг --skip-db-probe ее отключает. Базы проверяются
+параллельно с таймаутом API_DB_PROBE_TIMEOUT, результат кэшируется
+на API_DB_PROBE_CACHE_TTL секунд. Процессы без проверки (команды manage.py,
+воркеры Celery) не подключаются к базам, но применяют свежий результат
+проверки из кэша, чтобы работать с той же базой default, что и сервер.
 """
 
-from typing import Dict
+import hashlib
+import hmac
+import importlib.util
+import json
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
 
-import psycopg2
 import yaml
 import logging
 import sqlite3
 import os
 
-import mysql.connector
-import pyodbc
-
 from django.core.exceptions import ImproperlyConfigured
 
 import logging.config
 
+from src.config.env import env
 from src.config.settings.logger import LOGGING
 from src.config.settings.static import RESOURCES_DIR
 from src.config.settings.base import SYSTEM_DIR
@@ -38,6 +85,182 @@ DB_ENGINES = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Проверка подключения к базам при чтении настроек. Включается для команд запуска
+# сервера в manage.py (отключается флагом --skip-db-probe), остальные процессы
+# (команды manage.py, воркеры Celery) ее не выполняют, а берут свежий результат из кэша
+DB_PROBE = env.bool('API_DB_PROBE', default=False)
+
+# Таймаут подключения к одной базе при проверке, секунды
+DB_PROBE_TIMEOUT = env.int('API_DB_PROBE_TIMEOUT', default=3)
+
+# Время, в течение которого результат проверки переиспользуется другими процессами, секунды
+DB_PROBE_CACHE_TTL = env.int('API_DB_PROBE_CACHE_TTL', default=300)
+
+DB_PROBE_CACHE_PATH = os.path.join(RESOURCES_DIR, '.db_probe.json')
+
+# Пул подключений engine SQLAlchemy (SqlAlchemyManager), общий для процесса;
+# секция sqlalchemy базы в YAML переопределяет эти значения
+SQLALCHEMY_POOL = {
+    'pool_size': env.int('API_SQLALCHEMY_POOL_SIZE', default=5),
+    'max_overflow': env.int('API_SQLALCHEMY_MAX_OVERFLOW', default=10),
+    'pool_timeout': env.int('API_SQLALCHEMY_POOL_TIMEOUT', default=30),
+    'pool_recycle': env.int('API_SQLALCHEMY_POOL_RECYCLE', default=3600),
+}
+
+# Пул асинхронных подключений psycopg 3 (AsyncQueryExecutor), свой для каждого
+# цикла событий процесса
+ASYNC_DB_POOL = {
+    'min_size': env.int('API_ASYNC_DB_POOL_MIN_SIZE', default=1),
+    'max_size': env.int('API_ASYNC_DB_POOL_MAX_SIZE', default=20),
+    'timeout': env.int('API_ASYNC_DB_POOL_TIMEOUT', default=30),
+}
+
+# Кэш подготовленных запросов (PREPARE на PostgreSQL, переиспользование text()
+# в SQLAlchemy): размер кэша на подключение и количество выполнений запроса в
+# подключении, после которого psycopg 3 подготавливает его на сервере. Кэш не
+# включается для баз с DISABLE_SERVER_SIDE_CURSORS (pgbouncer в режиме транзакций)
+STATEMENT_CACHE = env.bool('API_STATEMENT_CACHE', default=False)
+STATEMENT_CACHE_SIZE = env.int('API_STATEMENT_CACHE_SIZE', default=100)
+STATEMENT_PREPARE_THRESHOLD = env.int('API_STATEMENT_PREPARE_THRESHOLD', default=5)
+
+# Статистика выполнения запросов исполнителей (database-statement-stats/) и
+# количество запросов в ней
+STATEMENT_STATS = env.bool('API_STATEMENT_STATS', default=False)
+STATEMENT_STATS_SIZE = env.int('API_STATEMENT_STATS_SIZE', default=500)
+
+# SSH-туннели к базам (секция ssh в YAML) общие для процесса: интервал keepalive
+# SSH-сессии и время, через которое закрывается туннель без пользователей
+# (0 - туннель держится до завершения процесса), секунды
+SSH_TUNNEL_KEEPALIVE = env.int('API_SSH_TUNNEL_KEEPALIVE', default=30)
+SSH_TUNNEL_IDLE_TIMEOUT = env.int('API_SSH_TUNNEL_IDLE_TIMEOUT', default=0)
+
+# Реплики (role: replica в YAML): интервал проверки доступности и отставания
+# реплик и время, на которое чтение клиента закрепляется за основной базой
+# после записи, секунды
+REPLICA_CHECK_INTERVAL = env.int('API_REPLICA_CHECK_INTERVAL', default=5)
+REPLICA_PIN_SECONDS = env.int('API_REPLICA_PIN_SECONDS', default=5)
+
+# Параметры пула из YAML, передаваемые в psycopg_pool.ConnectionPool
+POOL_OPTIONS = ('min_size', 'max_size', 'timeout', 'max_idle', 'max_lifetime', 'max_waiting', 'num_workers')
+
+# Время жизни постоянного подключения, если пул недоступен
+DEFAULT_POOL_FALLBACK_CONN_MAX_AGE = 60
+
+def is_pool_available() -> bool:
+    """Установлены ли psycopg 3 и psycopg_pool, необходимые для пула подключений Django."""
+    return (importlib.util.find_spec('psycopg') is not None
+            and importlib.util.find_spec('psycopg_pool') is not None)
+
+def get_pool_options(pool_config: Any) -> Dict[str, Any]:
+    """
+    Преобразует секцию pool из YAML в параметры пула Django.
+
+    Args:
+        pool_config: Секция pool (true или словарь параметров)
+
+    Returns:
+        Параметры пула или True для пула с параметрами по умолчанию
+        (пустой словарь Django считает отключенным пулом)
+    """
+    if not isinstance(pool_config, dict):
+        return True
+    return {key: pool_config[key] for key in POOL_OPTIONS if key in pool_config} or True
+
+def apply_connection_settings(db_name: str, engine: str, db_config: Dict, db_settings: Dict) -> None:
+    """
+    Переносит настройки переиспользования подключений из YAML в настройки Django.
+
+    Args:
+        db_name: Имя базы данных
+        engine: Тип СУБД
+        db_config: Конфигурация базы из YAML
+        db_settings: Настройки базы для DATABASES (изменяются на месте)
+    """
+    conn_max_age = db_config.get('conn_max_age', 0)
+    pool_config = db_config.get('pool')
+
+    if pool_config:
+        if engine != 'postgresql':
+            logger.warning(f"Пул подключений для '{db_name}' игнорируется: поддерживается только PostgreSQL")
+        elif not is_pool_available():
+            conn_max_age = conn_max_age or DEFAULT_POOL_FALLBACK_CONN_MAX_AGE
+            logger.warning(
+                f"Пул подключений для '{db_name}' недоступен: не установлены psycopg 3 и psycopg_pool. "
+                f"Используются постоянные подключения (conn_max_age={conn_max_age})"
+            )
+        else:
+            db_settings.setdefault('OPTIONS', {})['pool'] = get_pool_options(pool_config)
+            # Пул Django несовместим с постоянными подключениями,
+            # а CONN_HEALTH_CHECKS включает проверку подключения при выдаче из пула
+            db_settings['CONN_MAX_AGE'] = 0
+            db_settings['CONN_HEALTH_CHECKS'] = bool(
+                pool_config.get('health_check', True) if isinstance(pool_config, dict) else True
+            )
+            return
+
+    db_settings['CONN_MAX_AGE'] = conn_max_age
+    db_settings['CONN_HEALTH_CHECKS'] = bool(db_config.get('conn_health_checks', bool(conn_max_age)))
+
+def apply_statement_cache(engine: str, db_settings: Dict) -> None:
+    """
+    Включает подготовку запросов на сервере для подключений Django (psycopg 3).
+
+    Django по умолчанию отключает ее (prepare_threshold=None) ради совместимости
+    с pgbouncer, поэтому она включается только настройкой STATEMENT_CACHE.
+
+    Args:
+        engine: Тип СУБД
+        db_settings: Настройки базы для DATABASES (изменяются на месте)
+    """
+    if (not STATEMENT_CACHE or engine != 'postgresql' or db_settings.get('DISABLE_SERVER_SIDE_CURSORS')
+            or importlib.util.find_spec('psycopg') is None):
+        return
+    db_settings.setdefault('OPTIONS', {}).setdefault('prepare_threshold', STATEMENT_PREPARE_THRESHOLD)
+
+def apply_replica_settings(db_name: str, db_config: Dict, db_settings: Dict) -> None:
+    """
+    Переносит роль реплики из YAML в настройки Django.
+
+    Args:
+        db_name: Имя базы данных
+        db_config: Конфигурация базы из YAML
+        db_settings: Настройки базы для DATABASES (изменяются на месте)
+
+    Raises:
+        ImproperlyConfigured: Если роль неизвестна
+    """
+    role = db_config.get('role', 'primary')
+    if role not in ('primary', 'replica'):
+        raise ImproperlyConfigured(f"Неизвестная роль базы '{db_name}': {role}. Доступные: primary, replica")
+    if role != 'replica':
+        return
+
+    replica_of = db_config.get('replica_of', 'default')
+    db_settings['REPLICA'] = {
+        'of': replica_of,
+        'weight': int(db_config.get('weight', 1)),
+        'max_lag': db_config.get('max_lag'),
+    }
+    # В тестах реплика - то же подключение, что и основная база
+    db_settings['TEST'] = {'MIRROR': replica_of}
+
+def validate_replicas(databases: Dict) -> None:
+    """
+    Проверяет, что основные базы реплик описаны и сами не являются репликами.
+
+    Raises:
+        ImproperlyConfigured: Если реплика ссылается на неизвестную базу или реплику
+    """
+    for db_name, db_settings in databases.items():
+        replica_config = db_settings.get('REPLICA')
+        if not replica_config:
+            continue
+        primary = databases.get(replica_config['of'])
+        if primary is None or primary.get('REPLICA'):
+            raise ImproperlyConfigured(
+                f"Реплика '{db_name}' ссылается на '{replica_config['of']}', которая не описана как основная база"
+            )
+
 def get_database_configs() -> Dict:
     """
     Получает конфигурации баз данных из YAML файла
@@ -116,8 +339,17 @@ def get_database_configs() -> Dict:
                     },
                 })
 
+        # Параметры пула engine SQLAlchemy для этой базы
+        if db_config.get('sqlalchemy'):
+            db_settings['SQLALCHEMY'] = dict(db_config['sqlalchemy'])
+
+        apply_connection_settings(db_name, engine, db_config, db_settings)
+        apply_statement_cache(engine, db_settings)
+        apply_replica_settings(db_name, db_config, db_settings)
+
         databases[db_name] = db_settings
-    
+
+    validate_replicas(databases)
     return databases
 
 # Получаем конфигурацию баз данных
@@ -130,68 +362,219 @@ except Exception as e:
         'default': {}
     }
 
-is_no_default_connection = True
+def get_probe_cache_key(db_config: Dict) -> str:
+    """
+    Ключ кэша проверки: HMAC-SHA256 параметров подключения с ключом API_SECRET_KEY.
 
-# Проверяем подключение к каждой базе данных
-for db_name, db_config in DATABASES.items():
-    engine = db_config.get('ENGINE', '')
-    
-    if not db_config:
-        logger.warning(f"Пропуск проверки подключения к '{db_name}': пустая конфигурация")
-        continue
+    Пароль входит в ключ, чтобы после его смены подключение проверялось заново,
+    но по ключу из файла его нельзя подобрать перебором без секретного ключа.
+    Если API_SECRET_KEY не задан, пароль в ключ не входит.
+    """
+    secret_key = env.str('API_SECRET_KEY', default='')
+    keys = ('ENGINE', 'HOST', 'PORT', 'NAME', 'USER') + (('PASSWORD',) if secret_key else ())
+    raw = '|'.join(str(db_config.get(key, '')) for key in keys)
+    return hmac.new(secret_key.encode('utf-8'), raw.encode('utf-8'), hashlib.sha256).hexdigest()
 
+def load_probe_cache(ttl: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Загружает непросроченные результаты предыдущих проверок подключения.
+
+    Args:
+        ttl: Время жизни результата, секунды
+    """
+    if ttl <= 0:
+        return {}
     try:
-        if engine == DB_ENGINES['postgresql']:
-            connection = psycopg2.connect(
-                dbname=db_config['NAME'],
-                user=db_config['USER'],
-                password=db_config['PASSWORD'],
-                host=db_config['HOST'],
-                port=db_config['PORT']
-            )
-            connection.close()
-        elif engine == DB_ENGINES['mysql']:
-            connection = mysql.connector.connect(
-                database=db_config['NAME'],
-                user=db_config['USER'],
-                password=db_config['PASSWORD'],
-                host=db_config['HOST'],
-                port=db_config['PORT']
-            )
-            connection.close()
-        elif engine == DB_ENGINES['sqlite']:
-            connection = sqlite3.connect(db_config['NAME'])
-            connection.close()
-        elif engine == DB_ENGINES['mssql']:
-            connection_string = (
-                f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-                f"SERVER={db_config['HOST']},{db_config['PORT']};"
-                f"DATABASE={db_config['NAME']};"
-                f"UID={db_config['USER']};"
-                f"PWD={db_config['PASSWORD']}"
-            )
-            connection = pyodbc.connect(connection_string)
-            connection.close()
-        logger.info(f"Успешное тестовое подключение к базе данных '{db_name}' (тип: {engine})")
-        if db_name == 'default':
-            is_no_default_connection = False
-    except Exception as e:
-        error_msg = f"Не удалось подключиться к базе данных '{db_name}' (тип: {engine}): {str(e)}"
-        logger.error(error_msg)
+        with open(DB_PROBE_CACHE_PATH, 'r', encoding='utf-8') as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    now = time.time()
+    return {
+        key: result for key, result in cache.items()
+        if isinstance(result, dict) and now - result.get('checked_at', 0) < ttl
+    }
+
+def save_probe_cache(cache: Dict[str, Dict[str, Any]]) -> None:
+    """Сохраняет результаты проверок (запись через временный файл, чтобы процессы не читали половину файла)."""
+    tmp_path = f'{DB_PROBE_CACHE_PATH}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(DB_PROBE_CACHE_PATH), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(cache, file)
+        os.replace(tmp_path, DB_PROBE_CACHE_PATH)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить результаты проверки подключений: {str(e)}")
+
+def probe_database(db_config: Dict, timeout: int) -> None:
+    """
+    Открывает и закрывает тестовое подключение к базе данных.
+
+    Драйверы импортируются здесь, чтобы не загружать их при каждом чтении настроек.
+
+    Args:
+        db_config: Настройки базы из DATABASES
+        timeout: Таймаут подключения, секунды
+
+    Raises:
+        Exception: Ошибка драйвера при подключении
+    """
+    engine = db_config.get('ENGINE', '')
 
-        if db_name == 'default':
-            DATABASES[db_name] = {
-                'ENGINE': 'django.db.backends.sqlite3',
-                'NAME': os.path.join(RESOURCES_DIR, 'db.sqlite3'),
+    if engine == DB_ENGINES['postgresql']:
+        import psycopg2
+
+        connection = psycopg2.connect(
+            dbname=db_config['NAME'],
+            user=db_config['USER'],
+            password=db_config['PASSWORD'],
+            host=db_config['HOST'],
+            port=db_config['PORT'],
+            connect_timeout=timeout,
+        )
+        connection.close()
+    elif engine == DB_ENGINES['mysql']:
+        import mysql.connector
+
+        connection = mysql.connector.connect(
+            database=db_config['NAME'],
+            user=db_config['USER'],
+            password=db_config['PASSWORD'],
+            host=db_config['HOST'],
+            port=db_config['PORT'],
+            connection_timeout=timeout,
+        )
+        connection.close()
+    elif engine == DB_ENGINES['sqlite']:
+        connection = sqlite3.connect(db_config['NAME'], timeout=timeout)
+        connection.close()
+    elif engine == DB_ENGINES['mssql']:
+        import pyodbc
+
+        connection_string = (
+            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+            f"SERVER={db_config['HOST']},{db_config['PORT']};"
+            f"DATABASE={db_config['NAME']};"
+            f"UID={db_config['USER']};"
+            f"PWD={db_config['PASSWORD']}"
+        )
+        connection = pyodbc.connect(connection_string, timeout=timeout)
+        connection.close()
+
+def probe_databases(databases: Dict, timeout: int, cache_ttl: int) -> Dict[str, Optional[str]]:
+    """
+    Параллельно проверяет подключение ко всем базам данных.
+
+    Результаты кэшируются в файле на cache_ttl секунд, поэтому процессы,
+    запускаемые друг за другом (сервер, автоперезагрузка, воркеры), не
+    повторяют проверку. Время проверки определяется самой медленной базой,
+    а не их суммой.
+
+    Args:
+        databases: Настройки баз данных
+        timeout: Таймаут подключения к одной базе, секунды
+        cache_ttl: Время жизни результатов проверки, секунды (0 - без кэша)
+
+    Returns:
+        Dict[str, Optional[str]]: Текст ошибки по имени базы (None - подключение успешно)
+    """
+    cache = load_probe_cache(cache_ttl)
+    results = {}
+    pending = {}
+
+    for db_name, db_config in databases.items():
+        if not db_config:
+            logger.warning(f"Пропуск проверки подключения к '{db_name}': пустая конфигурация")
+            continue
+
+        key = get_probe_cache_key(db_config)
+        if key in cache:
+            results[db_name] = cache[key].get('error')
+            logger.debug(f"Результат проверки подключения к '{db_name}' взят из кэша")
+        else:
+            pending[db_name] = key
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix='db-probe') as executor:
+            futures = {
+                db_name: executor.submit(probe_database, databases[db_name], timeout)
+                for db_name in pending
             }
-            logger.warning(f"База данных '{db_name}' переключена на SQLite для разработки")
+            for db_name, future in futures.items():
+                try:
+                    future.result()
+                    results[db_name] = None
+                except Exception as e:
+                    results[db_name] = str(e)
+                cache[pending[db_name]] = {'error': results[db_name], 'checked_at': time.time()}
+
+        if cache_ttl > 0:
+            save_probe_cache(cache)
 
-        # Не прерываем работу сервера при ошибке подключения
+    return results
+
+def get_cached_probe_results(databases: Dict, cache_ttl: int) -> Dict[str, Optional[str]]:
+    """
+    Свежие результаты проверки подключения из кэша, без подключения к базам.
+
+    Результат берется, только если он получен для тех же параметров
+    подключения, что и в настройках этого процесса.
+
+    Args:
+        databases: Настройки баз данных
+        cache_ttl: Время жизни результатов проверки, секунды
+
+    Returns:
+        Dict[str, Optional[str]]: Текст ошибки по имени базы (None - подключение успешно)
+    """
+    cache = load_probe_cache(cache_ttl)
+    results = {}
+    for db_name, db_config in databases.items():
+        result = cache.get(get_probe_cache_key(db_config)) if db_config else None
+        if result is not None:
+            results[db_name] = result.get('error')
+    return results
+
+if DB_PROBE:
+    probe_results = probe_databases(DATABASES, DB_PROBE_TIMEOUT, DB_PROBE_CACHE_TTL)
+else:
+    probe_results = get_cached_probe_results(DATABASES, DB_PROBE_CACHE_TTL)
+
+for db_name, error in probe_results.items():
+    engine = DATABASES[db_name].get('ENGINE', '')
+    if error is None:
+        if DB_PROBE:
+            logger.info(f"Успешное тестовое подключение к базе данных '{db_name}' (тип: {engine})")
         continue
 
-if is_no_default_connection and 'default' not in DATABASES:
+    if DB_PROBE:
+        logger.error(f"Не удалось подключиться к базе данных '{db_name}' (тип: {engine}): {error}")
+    else:
+        logger.warning(f"По результату недавней проверки база данных '{db_name}' (тип: {engine}) "
+                       f"недоступна: {error}")
+
+    if db_name == 'default':
+        DATABASES[db_name] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(RESOURCES_DIR, 'db.sqlite3'),
+        }
+        logger.warning(f"База данных '{db_name}' переключена на SQLite для разработки")
+
+        # Реплики недоступной основной базы не относятся к SQLite
+        for replica_settings in DATABASES.values():
+            if replica_settings.get('REPLICA', {}).get('of') == db_name:
+                replica_settings.pop('REPLICA')
+                replica_settings.pop('TEST', None)
+
+if 'default' not in DATABASES:
     DATABASES['default'] = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(RESOURCES_DIR, 'db.sqlite3'),
     }
-    logger.warning("Создано подключение к SQLite по умолчанию, так как нет рабочего подключения default")
\ No newline at end of file
+    logger.warning("Создано подключение к SQLite по умолчанию, так как нет рабочего подключения default")
+
+# Маршрутизация чтения на реплики базы default
+DATABASE_ROUTERS = []
+if any(db_settings.get('REPLICA', {}).get('of') == 'default' for db_settings in DATABASES.values()):
+    DATABASE_ROUTERS.append('src.core.utils.database.routers.PrimaryReplicaRouter')
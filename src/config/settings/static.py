@@ -5,6 +5,7 @@
 
 import os
 
+from src.config.env import env
 from src.config.settings.base import BASE_DIR
 
 # URL для доступа к статическим файлам.
@@ -19,6 +20,13 @@ MEDIA_URL = '/media/'
 # Корневая директория для медиа файлов.
 MEDIA_ROOT = 'media'
 
+# Передача отдачи скачиваемых файлов веб-серверу: пусто (отдает Django),
+# 'x-accel-redirect' (nginx) или 'x-sendfile' (Apache, lighttpd).
+FILE_DOWNLOAD_OFFLOAD = env.str('API_FILE_DOWNLOAD_OFFLOAD', default='') or None
+
+# Префикс internal-локации nginx, соответствующей MEDIA_ROOT, для X-Accel-Redirect.
+FILE_DOWNLOAD_ACCEL_PREFIX = env.str('API_FILE_DOWNLOAD_ACCEL_PREFIX', default='/protected/')
+
 # URL для доступа к логам.
 LOGS_URL = '/logs/'
 
@@ -8,10 +8,15 @@
     Определяет конфигурацию приложения utils, включая:
     - Тип поля первичного ключа по умолчанию
     - Имя приложения в системе
+    - Подключение обработчика сигнала, настраивающего кэш подготовленных запросов
 """
 
 from django.apps import AppConfig
 
 class UtilsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'src.core.utils'
\ No newline at end of file
+    name = 'src.core.utils'
+
+    def ready(self) -> None:
+        # Регистрирует обработчик connection_created до первого подключения
+        from src.core.utils.database import statements  # noqa: F401
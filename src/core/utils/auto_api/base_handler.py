@@ -1,96 +1,172 @@
+import inspect
+
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Type, Callable
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from src.core.utils.auto_api.params_plan import ParamsPlan
+
+class HandlerSpec:
+    """
+    Неизменяемые метаданные обработчика, общие для всех запросов маршрута.
+
+    Создается один раз при построении маршрута: список обязательных параметров,
+    значения по умолчанию и скомпилированный план проверки и приведения типов.
+    """
+
+    __slots__ = ('required_params', 'optional_params', 'plan')
+
+    required_params: Tuple[str, ...]
+    optional_params: Mapping[str, Any]
+    plan: ParamsPlan
+
+    def __init__(self, required_params: list, optional_params: Dict[str, Any],
+                 params_description: Dict[str, Any] = None):
+        """
+        Компиляция метаданных маршрута.
+
+        Args:
+            required_params: Список обязательных параметров
+            optional_params: Словарь опциональных параметров с их значениями по умолчанию
+            params_description: Описание параметров из YAML конфигурации (типы)
+        """
+        object.__setattr__(self, 'required_params', tuple(required_params))
+        object.__setattr__(self, 'optional_params', MappingProxyType(dict(optional_params)))
+        object.__setattr__(self, 'plan', ParamsPlan.compile(required_params, optional_params, params_description))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __repr__(self) -> str:
+        return (f"{self.__class__.__name__}(required_params={list(self.required_params)!r}, "
+                f"optional_params={dict(self.optional_params)!r})")
+
+class HandlerContext:
+    """Контекст одного запроса: подготовленные параметры обработчика."""
+
+    __slots__ = ('params',)
+
+    def __init__(self, params: Dict[str, Any]):
+        self.params = params
 
 class BaseHandler(ABC):
-    """Базовый класс для всех обработчиков."""
-    
-    # Словарь соответствия типов Python для конвертации
-    TYPE_CONVERTERS: Dict[Type, Callable] = {
-        int: int,
-        float: float,
-        bool: lambda x: str(x).lower() == 'true',
-        str: str
-    }
-    
-    def __init__(self, required_params: list = None, optional_params: Dict[str, Any] = None):
+    """
+    Базовый класс для всех обработчиков.
+
+    Экземпляр, созданный при построении маршрута, хранит только неизменяемую
+    спецификацию (HandlerSpec) и может безопасно обслуживать параллельные запросы.
+    На каждый вызов создается легковесный экземпляр того же класса, связанный
+    с собственным HandlerContext, поэтому `self.params` внутри `process()`
+    никогда не разделяется между запросами.
+
+    `process()` может быть объявлен как `async def`: в этом случае вызов
+    обработчика возвращает корутину, а фабрика view создает асинхронный view.
+    """
+
+    def __init__(self, required_params: list = None, optional_params: Dict[str, Any] = None,
+                 params_description: Dict[str, Any] = None):
         """
         Инициализация обработчика.
-        
+
         Args:
             required_params: Список обязательных параметров
             optional_params: Словарь опциональных параметров с их значениями по умолчанию
+            params_description: Описание параметров из YAML конфигурации (типы)
         """
-        self.required_params = required_params or []
-        self.optional_params = optional_params or {}
-        self.params: Dict[str, Any] = {}
-    
-    def validate_params(self, **kwargs) -> None:
+        self.spec = self.compile_spec(required_params or [], optional_params or {}, params_description or {})
+        self.context: Optional[HandlerContext] = None
+
+    @classmethod
+    def compile_spec(cls, required_params: list, optional_params: Dict[str, Any],
+                     params_description: Dict[str, Any] = None) -> HandlerSpec:
         """
-        Проверяет наличие всех обязательных параметров.
-        
-        Raises:
-            ValueError: Если отсутствуют обязательные параметры
+        Компилирует неизменяемые метаданные маршрута.
+
+        Args:
+            required_params: Список обязательных параметров
+            optional_params: Словарь опциональных параметров с их значениями по умолчанию
+            params_description: Описание параметров из YAML конфигурации (типы)
+
+        Returns:
+            HandlerSpec: Спецификация обработчика
         """
-        if missing_params := set(self.required_params) - set(kwargs):
-            raise ValueError(f"Missing required parameters: {', '.join(missing_params)}")
-    
-    def convert_param_type(self, param_name: str, param_value: Any) -> Any:
+        return HandlerSpec(required_params, optional_params, params_description)
+
+    @property
+    def is_async(self) -> bool:
+        """Объявлен ли `process()` как корутина."""
+        return inspect.iscoroutinefunction(self.process)
+
+    @property
+    def required_params(self) -> Tuple[str, ...]:
+        return self.spec.required_params
+
+    @property
+    def optional_params(self) -> Mapping[str, Any]:
+        return self.spec.optional_params
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Параметры текущего запроса."""
+        return self.context.params if self.context is not None else {}
+
+    def prepare_params(self, **kwargs) -> HandlerContext:
         """
-        Конвертирует значение параметра в правильный тип на основе optional_params.
-        
+        Подготавливает параметры по скомпилированному плану: проверяет обязательные,
+        добавляет значения по умолчанию и приводит типы за один проход.
+
         Args:
-            param_name: Имя параметра
-            param_value: Значение параметра
+            **kwargs: Входящие параметры
 
         Returns:
-            Сконвертированное значение параметра
+            HandlerContext: Контекст запроса с подготовленными параметрами
+
+        Raises:
+            ParamsValidationError: Если параметры не прошли проверку
         """
-        if param_name not in self.optional_params:
-            return param_value
-            
-        default_value = self.optional_params[param_name]
-        converter = self.TYPE_CONVERTERS.get(type(default_value))
-        
-        if not converter:
-            return param_value
-            
-        try:
-            return converter(param_value)
-        except (ValueError, TypeError):
-            return default_value
-    
-    def prepare_params(self, **kwargs) -> None:
+        return HandlerContext(self.spec.plan.apply(kwargs))
+
+    def bind(self, context: HandlerContext) -> 'BaseHandler':
         """
-        Подготавливает параметры, добавляя значения по умолчанию и конвертируя типы.
-        
+        Создает экземпляр обработчика для одного запроса.
+
+        Конструктор не вызывается (спецификация не компилируется заново):
+        новый экземпляр получает копию атрибутов обработчика маршрута, включая
+        заданные в `__init__` подкласса, и собственный контекст. Атрибуты из
+        `__init__` общие для всех запросов маршрута и должны только читаться;
+        состояние запроса хранится в локальных переменных `process()` или в
+        атрибутах, присвоенных внутри него.
+
         Args:
-            **kwargs: Входящие параметры
+            context: Контекст запроса
+
+        Returns:
+            BaseHandler: Экземпляр обработчика, связанный с контекстом
         """
-        self.params = {
-            key: self.convert_param_type(key, value)
-            for key, value in {**self.optional_params, **kwargs}.items()
-        }
-    
+        handler = self.__class__.__new__(self.__class__)
+        handler.__dict__.update(self.__dict__)
+        handler.context = context
+        return handler
+
     @abstractmethod
     def process(self) -> Dict[str, Any]:
         """
         Основная логика обработчика.
-        
+
         Returns:
             Dict[str, Any]: Результат обработки
         """
         pass
-    
+
     def __call__(self, **kwargs) -> Dict[str, Any]:
         """
         Точка входа в обработчик.
-        
+
         Args:
             **kwargs: Входящие параметры
 
         Returns:
-            Dict[str, Any]: Результат обработки
+            Dict[str, Any]: Результат обработки (корутина для асинхронного `process()`)
         """
-        self.validate_params(**kwargs)
-        self.prepare_params(**kwargs)
-        return self.process() 
\ No newline at end of file
+        context = self.prepare_params(**kwargs)
+        return self.bind(context).process()
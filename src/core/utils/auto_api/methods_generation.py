@@ -9,6 +9,8 @@ import logging
 
 from typing import Any, Dict, Tuple, Type, List
 
+from asgiref.sync import sync_to_async
+
 from django.urls import path
 from django.http import FileResponse
 from django.conf import settings
@@ -27,6 +29,11 @@ from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 from rest_framework.permissions import IsAuthenticated
 
 from src.core.utils.base.base_views import BaseAPIView
+from src.core.utils.auto_api.params_plan import ParamsValidationError
+from src.core.utils.auto_api.response_cache import ResponseCache
+from src.core.utils.database.export import StreamingExport
+from src.core.utils.files.download import FileDownload
+from src.core.utils.files.upload import StreamingUploadHandler
 
 logger = logging.getLogger('utils')
 
@@ -169,9 +176,19 @@ class SwaggerSchemaBuilder:
             )
         return parameters
 
-def create_handler_instance(handler_class, required_params, optional_params):
-    """Создает экземпляр обработчика с параметрами из конфига."""
-    return handler_class(required_params=required_params, optional_params=optional_params)
+def create_handler_instance(handler_class, required_params, optional_params, params_description=None):
+    """
+    Создает экземпляр обработчика маршрута с параметрами из конфига.
+
+    Экземпляр хранит только неизменяемую спецификацию и разделяется всеми
+    запросами маршрута; параметры каждого запроса живут в отдельном контексте.
+    План проверки и приведения типов параметров компилируется здесь один раз.
+    """
+    return handler_class(
+        required_params=required_params,
+        optional_params=optional_params,
+        params_description=params_description
+    )
 
 class BaseDynamicAPIView(BaseAPIView):
     """Базовый класс для динамических API views"""
@@ -180,6 +197,8 @@ class BaseDynamicAPIView(BaseAPIView):
     handler = None
     status_code = None
     permission_classes = None
+    response_cache = None
+    upload_handler_classes = ()
     
     def get_renderer_context(self):
         """Получение контекста для рендерера"""
@@ -221,32 +240,55 @@ class BaseDynamicAPIView(BaseAPIView):
                     code=getattr(permission, 'code', None)
                 )
 
+    def check_access(self, request):
+        """
+        Проверяет права доступа и ограничения частоты запросов.
+
+        Returns:
+            Dict: Информация о сработавших throttle-классах
+        """
+        self.check_permissions(request)
+
+        throttle_info = {}
+        # Проверяем throttling и сохраняем информацию о нем
+        for throttle in self.get_throttles():
+            if not throttle.allow_request(request, self):
+                self.throttled(request, throttle.wait())
+            # Сохраняем информацию о throttle после его инициализации
+            if hasattr(throttle, 'get_rate'):
+                throttle_info[throttle.__class__.__name__] = {
+                    'rate': throttle.get_rate(),
+                    'num_requests': getattr(throttle, 'num_requests', None),
+                    'duration': getattr(throttle, 'duration', None)
+                }
+        return throttle_info
+
+    def initialize_request(self, request, *args, **kwargs):
+        """Подключает обработчики загрузки файлов до чтения тела запроса"""
+        if self.upload_handler_classes:
+            request.upload_handlers = [handler_class(request) for handler_class in self.upload_handler_classes]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def finalize_dynamic_response(self, response):
+        """Устанавливает рендерер и контекст рендеринга для ответа"""
+        if isinstance(response, Response):
+            response.accepted_renderer = self.get_renderer()
+            response.accepted_media_type = response.accepted_renderer.media_type
+            response.renderer_context = self.get_renderer_context()
+        return response
+
     def dispatch(self, request, *args, **kwargs):
         """Обработка входящего запроса"""
         self.args = args
         self.kwargs = kwargs
         self.headers = self.default_response_headers
         
-        request = super().initialize_request(request, *args, **kwargs)
+        request = self.initialize_request(request, *args, **kwargs)
         self.request = request
         
-        # Инициализируем throttle_info до блока try
-        throttle_info = {}
         try:
             # Проверяем права доступа и throttling
-            self.check_permissions(request)
-            
-            # Проверяем throttling и сохраняем информацию о нем
-            for throttle in self.get_throttles():
-                if not throttle.allow_request(request, self):
-                    self.throttled(request, throttle.wait())
-                # Сохраняем информацию о throttle после его инициализации
-                if hasattr(throttle, 'get_rate'):
-                    throttle_info[throttle.__class__.__name__] = {
-                        'rate': throttle.get_rate(),
-                        'num_requests': getattr(throttle, 'num_requests', None),
-                        'duration': getattr(throttle, 'duration', None)
-                    }
+            self.check_access(request)
             
             if request.method == 'OPTIONS':
                 response = self.options(request, *args, **kwargs)
@@ -264,12 +306,7 @@ class BaseDynamicAPIView(BaseAPIView):
         except Exception as exc:
             response = self.handle_exception(exc)
 
-        if isinstance(response, Response):
-            response.accepted_renderer = self.get_renderer()
-            response.accepted_media_type = response.accepted_renderer.media_type
-            response.renderer_context = self.get_renderer_context()
-
-        return response
+        return self.finalize_dynamic_response(response)
 
     def options(self, request, *args, **kwargs):
         """Обработка OPTIONS запроса"""
@@ -302,9 +339,66 @@ class BaseDynamicAPIView(BaseAPIView):
             return self.delete
         return None
 
+class AsyncResponse(Response):
+    """
+    Ответ асинхронного view.
+
+    Django вызывает `render()` асинхронного ответа прямо в event loop,
+    без перехода в поток через sync_to_async.
+    """
+
+    async def render(self):
+        return super().render()
+
+class AsyncDynamicAPIView(BaseDynamicAPIView):
+    """
+    Базовый класс для динамических API views с асинхронными обработчиками.
+
+    Аутентификация, проверка прав и throttling выполняются одним переходом
+    в поток (они могут обращаться к БД и кэшу), обработчик и JSON-рендеринг
+    выполняются в event loop.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        """Асинхронная обработка входящего запроса"""
+        self.args = args
+        self.kwargs = kwargs
+        self.headers = self.default_response_headers
+
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+
+        try:
+            # Проверяем права доступа и throttling
+            await sync_to_async(self.check_access)(request)
+
+            if request.method == 'OPTIONS':
+                response = self.options(request, *args, **kwargs)
+            elif request.method != self.method:
+                response = Response({"error": "Method not allowed"}, status=405)
+            else:
+                handler = self.get_handler()
+                response = await handler(request, *args, **kwargs)
+
+        except PermissionDenied as e:
+            response = Response(
+                {"error": str(e) or "У вас нет прав для выполнения этого действия"}, 
+                status=403
+            )
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        response = self.finalize_dynamic_response(response)
+
+        # Браузерный и HTML рендереры могут обращаться к БД, поэтому рендерим их в потоке
+        if isinstance(response, AsyncResponse) and response.accepted_renderer.format != 'json':
+            await sync_to_async(Response.render)(response)
+
+        return response
+
 def create_dynamic_api_view(method, renderers, handler, status_code, 
                             swagger_description, swagger_params, swagger_responses,
-                            throttle_rates=None, tags=None):
+                            throttle_rates=None, tags=None, response_cache=None):
     """Фабрика для создания классов DynamicAPIView"""
     class_name = f'DynamicAPIView_{method}'
     
@@ -390,70 +484,125 @@ def create_dynamic_api_view(method, renderers, handler, status_code,
         'handler': staticmethod(handler),
         'default_status_code': status_code,
         'throttle_classes': throttle_classes,
+        'response_cache': response_cache,
     }
 
     # Добавляем поддержку загрузки файлов для POST запросов
     if (method in ["POST", "PUT", "PATCH"] and 
         any(p.name == IntegrationSettings.swagger_settings['FILE_PARAM_NAME'] for p in swagger_params)):
         class_attrs['parser_classes'] = (MultiPartParser, FormParser)
+        # Файл пишется на диск по мере получения, без промежуточной копии
+        class_attrs['upload_handler_classes'] = (StreamingUploadHandler,)
+
+    def collect_handler_kwargs(self, request, kwargs):
+        """Собирает параметры обработчика из запроса"""
+        if method in ["GET", "DELETE"]:
+            return {**request.query_params.dict(), **kwargs}
 
-    @swagger_auto_schema(
+        file_param_name = IntegrationSettings.swagger_settings['FILE_PARAM_NAME']
+        if request.FILES:
+            return {
+                'user': request.user,
+                file_param_name: request.FILES[file_param_name],
+                **kwargs
+            }
+        return {'user': request.user, **request.data, **kwargs}
+
+    def build_response(self, data, response_class=Response):
+        """Формирует ответ из результата обработчика"""
+        if method in ["GET", "DELETE"] and isinstance(data, FileResponse):
+            return data
+        if method in ["GET", "DELETE"] and isinstance(data, FileDownload):
+            # Range и условные заголовки учитываются по исходному запросу
+            try:
+                return data.response(self.request)
+            except (FileNotFoundError, IsADirectoryError):
+                raise NotFound(f'Файл {data.filename} не найден')
+        if method == "GET" and isinstance(data, StreamingExport):
+            # Строки сериализуются по мере чтения из базы, без рендерера DRF
+            return data.response(self.request)
+        return response_class(data, status=self.default_status_code)
+
+    def check_request(self, request):
+        """Проверяет запрос перед вызовом обработчика"""
+        # Проверяем аутентификацию перед выполнением запроса
+        if not request.user.is_authenticated and self.permission_classes == [IsAuthenticated]:
+            return Response(
+                {"detail": "Учетные данные не были предоставлены."}, 
+                status=401
+            )
+        if method not in ["GET", "DELETE", "POST", "PUT", "PATCH"]:
+            return Response({"error": "Неподдерживаемый метод"}, status=400)
+        return None
+
+    def error_response(exc):
+        """Преобразует исключение обработчика в ответ"""
+        if isinstance(exc, NotFound):
+            return Response({"error": str(exc)}, status=404)
+        if isinstance(exc, ParamsValidationError):
+            return Response({"error": "Ошибка в параметрах запроса", "fields": exc.errors}, status=400)
+        if isinstance(exc, ValidationError):
+            return Response({"error": str(exc)}, status=400)
+        if isinstance(exc, PermissionDenied):
+            return Response({"error": "У вас нет прав для выполнения этого действия"}, status=403)
+        return Response(
+            {"error": f"Внутренняя ошибка сервера: {str(exc)}"}, 
+            status=500
+        )
+
+    swagger_schema = swagger_auto_schema(
         operation_description=swagger_description,
         manual_parameters=swagger_params,
         responses=swagger_response_schemas,  # Используем преобразованные схемы
         tags=tags,  # Используем извлеченные теги
     )
-    def method_func(self, request, *args, **kwargs):
-        try:
-            # Проверяем аутентификацию перед выполнением запроса
-            if not request.user.is_authenticated and self.permission_classes == [IsAuthenticated]:
-                return Response(
-                    {"detail": "Учетные данные не были предоставлены."}, 
-                    status=401
-                )
-                
-            if method in ["GET", "DELETE"]:
-                query_params = request.query_params.dict()
-                response = self.handler(**query_params, **kwargs)
-                if isinstance(response, FileResponse):
+
+    if getattr(handler, 'is_async', False):
+        # Асинхронный обработчик выполняется прямо в event loop без перехода в поток
+        @swagger_schema
+        async def method_func(self, request, *args, **kwargs):
+            try:
+                if (response := check_request(self, request)) is not None:
                     return response
-                data = response
-            elif method in ["POST", "PUT", "PATCH"]:
-                if request.FILES:
-                    data = self.handler(
-                        user=request.user,
-                        **{IntegrationSettings.swagger_settings['FILE_PARAM_NAME']: 
-                           request.FILES[IntegrationSettings.swagger_settings['FILE_PARAM_NAME']]}, 
-                        **kwargs
+                handler_kwargs = collect_handler_kwargs(self, request, kwargs)
+                if self.response_cache is not None:
+                    # Ключ кэша строится по нормализованным параметрам, до вызова обработчика
+                    params = self.handler.prepare_params(**handler_kwargs).params
+                    return await self.response_cache.afetch(
+                        request, params, lambda: self.handler(**handler_kwargs),
+                        self.default_status_code, response_class=AsyncResponse
                     )
-                else:
-                    body_data = request.data
-                    data = self.handler(
-                        user=request.user,
-                        **body_data, 
-                        **kwargs
+                data = await self.handler(**handler_kwargs)
+                return build_response(self, data, response_class=AsyncResponse)
+            except Exception as e:
+                return error_response(e)
+
+        base_class = AsyncDynamicAPIView
+    else:
+        @swagger_schema
+        def method_func(self, request, *args, **kwargs):
+            try:
+                if (response := check_request(self, request)) is not None:
+                    return response
+                handler_kwargs = collect_handler_kwargs(self, request, kwargs)
+                if self.response_cache is not None:
+                    # Ключ кэша строится по нормализованным параметрам, до вызова обработчика
+                    params = self.handler.prepare_params(**handler_kwargs).params
+                    return self.response_cache.fetch(
+                        request, params, lambda: self.handler(**handler_kwargs),
+                        self.default_status_code
                     )
-            else:
-                return Response({"error": "Неподдерживаемый метод"}, status=400)
-            
-            return Response(data, status=self.default_status_code)
-            
-        except NotFound as e:
-            return Response({"error": str(e)}, status=404)
-        except ValidationError as e:
-            return Response({"error": str(e)}, status=400)
-        except PermissionDenied as e:
-            return Response({"error": "У вас нет прав для выполнения этого действия"}, status=403)
-        except Exception as e:
-            return Response(
-                {"error": f"Внутренняя ошибка сервера: {str(e)}"}, 
-                status=500
-            )
+                data = self.handler(**handler_kwargs)
+                return build_response(self, data)
+            except Exception as e:
+                return error_response(e)
+
+        base_class = BaseDynamicAPIView
 
     method_func.__name__ = method.lower()
     class_attrs[method.lower()] = method_func
 
-    return type(class_name, (BaseDynamicAPIView,), class_attrs)
+    return type(class_name, (base_class,), class_attrs)
 
 def create_api_view(name: str, config: dict) -> Tuple[str, Type[APIView]]:
     """Создает APIView на основе конфигурации."""
@@ -475,6 +624,14 @@ def create_api_view(name: str, config: dict) -> Tuple[str, Type[APIView]]:
     params_description = endpoint_config.get("params_description", {})
     responses = endpoint_config.get("responses", {})
 
+    # Кэширование ответов поддерживается только для GET запросов
+    response_cache = None
+    if cache_config := endpoint_config.get("cache"):
+        if method.upper() == "GET":
+            response_cache = ResponseCache.from_config(name, cache_config)
+        else:
+            logger.warning("Кэширование ответов для %s игнорируется: поддерживается только метод GET", name)
+
     # Добавляем параметр tags в create_dynamic_api_view
     tags = endpoint_config.get("tags", [IntegrationSettings.swagger_settings['DEFAULT_TAG']]),
     
@@ -506,7 +663,7 @@ def create_api_view(name: str, config: dict) -> Tuple[str, Type[APIView]]:
     module = importlib.import_module(module_name)
     handler_class = getattr(module, 'HandlerClass')
     
-    handler = create_handler_instance(handler_class, required_params, optional_params)
+    handler = create_handler_instance(handler_class, required_params, optional_params, params_description)
 
     swagger_params = SwaggerSchemaBuilder.create_parameters(
         method, params_description, required_params, optional_params
@@ -522,6 +679,7 @@ def create_api_view(name: str, config: dict) -> Tuple[str, Type[APIView]]:
         swagger_responses=responses,
         throttle_rates=throttle_rates,
         tags=tags,
+        response_cache=response_cache,
     )
 
     # Создаем новый класс с нужными permission_classes
@@ -0,0 +1,219 @@
+"""
+Файл с планом валидации и приведения типов параметров обработчиков.
+
+План компилируется один раз при построении маршрута из `required_params`,
+`optional_params` и `params_description` YAML конфигурации и на каждом
+запросе за один проход проверяет обязательные параметры, подставляет
+значения по умолчанию и приводит типы, собирая ошибки по каждому полю.
+"""
+
+import copy
+import json
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from rest_framework.exceptions import ValidationError
+
+# Маркер отсутствующего значения
+_MISSING = object()
+
+_TRUE_VALUES = frozenset(('true', '1', 'yes', 'on'))
+_FALSE_VALUES = frozenset(('false', '0', 'no', 'off'))
+
+class ParamsValidationError(ValidationError):
+    """Ошибка валидации параметров с описанием ошибок по каждому полю."""
+
+    def __init__(self, errors: Dict[str, str]):
+        super().__init__(errors)
+        self.errors = errors
+
+def coerce_string(value: Any) -> str:
+    return value if isinstance(value, str) else str(value)
+
+def coerce_integer(value: Any) -> int:
+    if isinstance(value, bool):
+        raise ValueError('Ожидается целое число')
+    if isinstance(value, int):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('Ожидается целое число')
+
+def coerce_number(value: Any) -> float:
+    if isinstance(value, bool):
+        raise ValueError('Ожидается число')
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError('Ожидается число')
+
+def coerce_boolean(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    normalized = str(value).strip().lower()
+    if normalized in _TRUE_VALUES:
+        return True
+    if normalized in _FALSE_VALUES:
+        return False
+    raise ValueError('Ожидается логическое значение (true/false)')
+
+def coerce_array(value: Any) -> list:
+    if isinstance(value, list):
+        return value
+    if isinstance(value, tuple):
+        return list(value)
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped.startswith('['):
+            try:
+                parsed = json.loads(stripped)
+            except json.JSONDecodeError:
+                raise ValueError('Некорректный JSON массив')
+            if isinstance(parsed, list):
+                return parsed
+            raise ValueError('Ожидается массив')
+        return [item.strip() for item in stripped.split(',')] if stripped else []
+    raise ValueError('Ожидается массив')
+
+def coerce_object(value: Any) -> dict:
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except json.JSONDecodeError:
+            raise ValueError('Некорректный JSON объект')
+        if isinstance(parsed, dict):
+            return parsed
+    raise ValueError('Ожидается объект')
+
+def coerce_file(value: Any) -> Any:
+    if hasattr(value, 'read') and hasattr(value, 'name'):
+        return value
+    raise ValueError('Ожидается файл')
+
+# Соответствие типов из params_description и функций приведения
+PARAM_COERCERS: Dict[str, Callable[[Any], Any]] = {
+    'string': coerce_string,
+    'integer': coerce_integer,
+    'number': coerce_number,
+    'boolean': coerce_boolean,
+    'array': coerce_array,
+    'object': coerce_object,
+    'file': coerce_file,
+}
+
+def infer_param_type(default_value: Any) -> Optional[str]:
+    """
+    Определяет тип параметра по значению по умолчанию.
+
+    Используется, если тип не указан в params_description.
+    """
+    if isinstance(default_value, bool):
+        return 'boolean'
+    if isinstance(default_value, int):
+        return 'integer'
+    if isinstance(default_value, float):
+        return 'number'
+    if isinstance(default_value, str):
+        return 'string'
+    if isinstance(default_value, list):
+        return 'array'
+    if isinstance(default_value, dict):
+        return 'object'
+    return None
+
+class ParamsPlan:
+    """
+    Скомпилированный план обработки параметров маршрута.
+
+    Каждое правило - кортеж (имя, обязательный, значение по умолчанию, функция приведения,
+    копировать ли значение по умолчанию). Изменяемые значения по умолчанию (list, dict, set)
+    копируются на каждом запросе, чтобы обработчик не изменил общее значение маршрута.
+    Параметры, не описанные в конфигурации (например, `user`), передаются без изменений.
+    """
+
+    __slots__ = ('rules',)
+
+    def __init__(self, rules: Tuple[Tuple[str, bool, Any, Optional[Callable], bool], ...]):
+        self.rules = rules
+
+    @classmethod
+    def compile(cls, required_params: list, optional_params: Dict[str, Any],
+                params_description: Dict[str, Any] = None) -> 'ParamsPlan':
+        """
+        Компилирует план из конфигурации эндпоинта.
+
+        Args:
+            required_params: Список обязательных параметров
+            optional_params: Словарь опциональных параметров с их значениями по умолчанию
+            params_description: Описание параметров из YAML конфигурации
+
+        Returns:
+            ParamsPlan: План обработки параметров
+
+        Raises:
+            ValueError: Если в params_description указан неизвестный тип
+        """
+        params_description = params_description or {}
+        names = list(required_params) + [name for name in optional_params if name not in required_params]
+        names += [name for name in params_description if name not in names]
+
+        rules = []
+        for name in names:
+            description = params_description.get(name)
+            param_type = description.get('type') if isinstance(description, dict) else None
+            default_value = optional_params.get(name, _MISSING)
+
+            if param_type is None and default_value is not _MISSING:
+                param_type = infer_param_type(default_value)
+
+            if param_type is not None and param_type not in PARAM_COERCERS:
+                raise ValueError(f"Неизвестный тип параметра '{name}': {param_type}")
+
+            rules.append((
+                name,
+                name in required_params,
+                default_value,
+                PARAM_COERCERS.get(param_type) if param_type else None,
+                isinstance(default_value, (list, dict, set)),
+            ))
+
+        return cls(tuple(rules))
+
+    def apply(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Проверяет и приводит параметры запроса на месте.
+
+        Args:
+            params: Входящие параметры (словарь изменяется и возвращается)
+
+        Returns:
+            Dict[str, Any]: Подготовленные параметры
+
+        Raises:
+            ParamsValidationError: Если параметры не прошли проверку
+        """
+        errors = None
+        for name, required, default_value, coercer, copy_default in self.rules:
+            value = params.get(name, _MISSING)
+
+            if value is _MISSING:
+                if required:
+                    errors = errors or {}
+                    errors[name] = 'Обязательный параметр не передан'
+                elif default_value is not _MISSING:
+                    params[name] = copy.copy(default_value) if copy_default else default_value
+                continue
+
+            if coercer is not None and value is not None:
+                try:
+                    params[name] = coercer(value)
+                except ValueError as e:
+                    errors = errors or {}
+                    errors[name] = str(e)
+
+        if errors:
+            raise ParamsValidationError(errors)
+        return params
@@ -0,0 +1,298 @@
+"""
+Файл с кэшированием ответов GET эндпоинтов, создаваемых из YAML конфигурации.
+
+Кэширование включается ключом `cache` в описании эндпоинта:
+
+    TasksGraphView:
+      method: GET
+      cache:
+        ttl: 30                  # Время жизни записи в секундах
+        vary_on: [params, user]  # Из чего строится ключ кэша
+        backend: default         # Алиас кэша из настройки CACHES
+        stale_ttl: 60            # Сколько секунд после ttl отдавать устаревшую запись во время пересчета
+
+Закэшированный ответ отдается до вызова обработчика. Поддерживаются
+условные запросы (ETag / Last-Modified с ответом 304) и защита от
+одновременного пересчета одного и того же ключа несколькими запросами:
+пока один запрос пересчитывает устаревшую запись, остальные сразу получают
+ее (X-Cache: STALE), а при холодном ключе ждут не дольше WAIT_TIMEOUT.
+Счетчики кэша ответов выводятся в response-cache-stats/.
+
+Ключи каждого эндпоинта лежат в пространстве имен `auto_api:<имя эндпоинта>`,
+которое можно сбросить командой `clear_cache --namespace`.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from typing import Any, Callable, Dict, List, Optional
+
+from django.core.cache import caches
+from django.http.response import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from rest_framework.response import Response
+
+from src.core.utils.cache.namespaces import namespace_key, anamespace_key
+
+logger = logging.getLogger('utils')
+
+# Допустимые значения vary_on
+VARY_ON_CHOICES = ('params', 'user')
+
+class ResponseCache:
+    """
+    Кэш ответов одного эндпоинта.
+
+    Ключ строится из имени эндпоинта, нормализованных параметров запроса
+    (после применения плана параметров) и, при необходимости, пользователя.
+    Пересчет ключа выполняет только один запрос, пока держится блокировка
+    в том же бэкенде кэша: остальные отдают устаревшую запись, а если ее нет -
+    ждут появления записи не дольше WAIT_TIMEOUT и вычисляют ответ сами.
+    """
+
+    # Время удержания блокировки пересчета, секунды
+    LOCK_TIMEOUT = 30
+    # Наибольшее время ожидания пересчета холодного ключа другим запросом, секунды
+    WAIT_TIMEOUT = 3
+    # Интервал проверки появления записи при ожидании, секунды
+    POLL_INTERVAL = 0.05
+
+    # Все созданные кэши по имени эндпоинта (для статистики)
+    registry: Dict[str, 'ResponseCache'] = {}
+
+    def __init__(self, name: str, ttl: int, vary_on: List[str], backend: str = 'default',
+                 stale_ttl: int = 60):
+        """
+        Args:
+            name: Имя эндпоинта
+            ttl: Время жизни записи в секундах
+            vary_on: Составляющие ключа кэша (params, user)
+            backend: Алиас кэша из настройки CACHES
+            stale_ttl: Время после ttl, в течение которого устаревшая запись отдается во время пересчета
+        """
+        unknown = set(vary_on) - set(VARY_ON_CHOICES)
+        if unknown:
+            raise ValueError(f"Неизвестные значения vary_on для {name}: {', '.join(sorted(unknown))}")
+
+        self.name = name
+        self.ttl = int(ttl)
+        self.vary_on = tuple(vary_on)
+        self.backend = backend
+        self.stale_ttl = int(stale_ttl)
+        self.namespace = f'auto_api:{name}'
+        self._stats = {'hits': 0, 'stale': 0, 'misses': 0, 'not_modified': 0}
+        self._stats_lock = threading.Lock()
+
+        ResponseCache.registry[name] = self
+
+    @classmethod
+    def from_config(cls, name: str, config: Optional[Dict[str, Any]]) -> Optional['ResponseCache']:
+        """
+        Создает кэш из секции `cache` конфигурации эндпоинта.
+
+        Returns:
+            Optional[ResponseCache]: Кэш или None, если кэширование не настроено
+        """
+        if not config:
+            return None
+        return cls(
+            name=name,
+            ttl=config.get('ttl', 60),
+            vary_on=config.get('vary_on', ['params']),
+            backend=config.get('backend', 'default'),
+            stale_ttl=config.get('stale_ttl', 60),
+        )
+
+    @property
+    def cache(self):
+        return caches[self.backend]
+
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            self._stats[counter] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики попаданий и промахов кэша."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def make_key(self, request, params: Dict[str, Any]) -> str:
+        """
+        Формирует ключ кэша внутри пространства имен эндпоинта.
+
+        Args:
+            request: Объект запроса
+            params: Подготовленные параметры обработчика
+        """
+        parts = {}
+        if 'params' in self.vary_on:
+            parts['params'] = {key: value for key, value in params.items() if key != 'user'}
+        if 'user' in self.vary_on:
+            user = getattr(request, 'user', None)
+            parts['user'] = user.pk if user is not None and user.is_authenticated else None
+
+        digest = hashlib.sha1(
+            json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        return f'response:{digest}'
+
+    def build_entry(self, data: Any, status_code: Optional[int]) -> Dict[str, Any]:
+        """Формирует запись кэша с ETag и временем последнего изменения."""
+        body = json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+        return {
+            'data': data,
+            'status': status_code,
+            'etag': f'"{hashlib.sha1(body).hexdigest()}"',
+            'last_modified': int(time.time()),
+            'expires': time.time() + self.ttl,
+        }
+
+    @staticmethod
+    def is_fresh(entry: Dict[str, Any]) -> bool:
+        """Не истекло ли время жизни записи (ttl)."""
+        return entry.get('expires', float('inf')) > time.time()
+
+    def build_response(self, request, entry: Dict[str, Any], state: str,
+                       response_class=Response) -> HttpResponseBase:
+        """
+        Формирует ответ из записи кэша, отвечая 304 на условный запрос.
+
+        Args:
+            request: Объект запроса
+            entry: Запись кэша
+            state: Состояние кэша для заголовка X-Cache (HIT/STALE/MISS)
+            response_class: Класс ответа
+        """
+        django_request = getattr(request, '_request', request)
+        response = response_class(entry['data'], status=entry['status'])
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        max_age = 0 if state == 'STALE' else self.ttl
+        response['Cache-Control'] = f"{'private' if 'user' in self.vary_on else 'public'}, max-age={max_age}"
+        response['X-Cache'] = state
+
+        conditional = get_conditional_response(
+            django_request,
+            etag=entry['etag'],
+            last_modified=entry['last_modified'],
+            response=response,
+        )
+        if conditional is not response:
+            self._count('not_modified')
+        return conditional
+
+    def _store(self, key: str, data: Any, status_code: Optional[int]) -> Dict[str, Any]:
+        entry = self.build_entry(data, status_code)
+        self.cache.set(key, entry, self.ttl + self.stale_ttl)
+        return entry
+
+    def fetch(self, request, params: Dict[str, Any], compute: Callable[[], Any],
+              status_code: Optional[int]) -> HttpResponseBase:
+        """
+        Отдает ответ из кэша или вычисляет его, защищая ключ от одновременного пересчета.
+
+        Args:
+            request: Объект запроса
+            params: Подготовленные параметры обработчика
+            compute: Функция, вызывающая обработчик
+            status_code: Код ответа эндпоинта
+        """
+        key = namespace_key(self.namespace, self.make_key(request, params), self.cache)
+        lock_key = f'{key}:lock'
+
+        entry = self.cache.get(key)
+        if entry is not None and self.is_fresh(entry):
+            self._count('hits')
+            return self.build_response(request, entry, 'HIT')
+
+        lock_acquired = self.cache.add(lock_key, 1, self.LOCK_TIMEOUT)
+        if not lock_acquired and entry is not None:
+            self._count('stale')
+            return self.build_response(request, entry, 'STALE')
+        if not lock_acquired:
+            deadline = time.monotonic() + self.WAIT_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(self.POLL_INTERVAL)
+                entry = self.cache.get(key)
+                if entry is not None:
+                    self._count('hits')
+                    return self.build_response(request, entry, 'HIT')
+                if self.cache.add(lock_key, 1, self.LOCK_TIMEOUT):
+                    lock_acquired = True
+                    break
+            else:
+                logger.warning("Истекло ожидание пересчета кэша %s, вычисляем без блокировки", key)
+
+        try:
+            self._count('misses')
+            data = compute()
+            if isinstance(data, HttpResponseBase):
+                return data
+            entry = self._store(key, data, status_code)
+        finally:
+            if lock_acquired:
+                self.cache.delete(lock_key)
+
+        return self.build_response(request, entry, 'MISS')
+
+    async def afetch(self, request, params: Dict[str, Any], compute: Callable[[], Any],
+                     status_code: Optional[int], response_class=Response) -> HttpResponseBase:
+        """
+        Асинхронный вариант `fetch` для асинхронных обработчиков.
+
+        Args:
+            request: Объект запроса
+            params: Подготовленные параметры обработчика
+            compute: Функция, возвращающая корутину обработчика
+            status_code: Код ответа эндпоинта
+            response_class: Класс ответа
+        """
+        cache = self.cache
+        key = await anamespace_key(self.namespace, self.make_key(request, params), cache)
+        lock_key = f'{key}:lock'
+
+        entry = await cache.aget(key)
+        if entry is not None and self.is_fresh(entry):
+            self._count('hits')
+            return self.build_response(request, entry, 'HIT', response_class)
+
+        lock_acquired = await cache.aadd(lock_key, 1, self.LOCK_TIMEOUT)
+        if not lock_acquired and entry is not None:
+            self._count('stale')
+            return self.build_response(request, entry, 'STALE', response_class)
+        if not lock_acquired:
+            deadline = time.monotonic() + self.WAIT_TIMEOUT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.POLL_INTERVAL)
+                entry = await cache.aget(key)
+                if entry is not None:
+                    self._count('hits')
+                    return self.build_response(request, entry, 'HIT', response_class)
+                if await cache.aadd(lock_key, 1, self.LOCK_TIMEOUT):
+                    lock_acquired = True
+                    break
+            else:
+                logger.warning("Истекло ожидание пересчета кэша %s, вычисляем без блокировки", key)
+
+        try:
+            self._count('misses')
+            data = await compute()
+            if isinstance(data, HttpResponseBase):
+                return data
+            entry = self.build_entry(data, status_code)
+            await cache.aset(key, entry, self.ttl + self.stale_ttl)
+        finally:
+            if lock_acquired:
+                await cache.adelete(lock_key)
+
+        return self.build_response(request, entry, 'MISS', response_class)
+
+def get_response_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Статистика кэшей ответов по всем эндпоинтам."""
+    return {name: response_cache.stats() for name, response_cache in ResponseCache.registry.items()}
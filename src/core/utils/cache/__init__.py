@@ -0,0 +1,6 @@
+"""
+Пакет с расширениями кэширования Django-проекта.
+
+Включает двухуровневый бэкенд кэша (L1 в памяти процесса поверх общего L2)
+и пространства имен ключей с инвалидацией через поколения.
+"""
@@ -0,0 +1,121 @@
+"""
+Файл с пространствами имен ключей кэша.
+
+Ключ в пространстве имен содержит номер поколения пространства. Очистка
+пространства увеличивает поколение: старые ключи становятся недостижимыми
+и истекают по своему TTL. Это работает на любом бэкенде кэша, в том числе
+на тех, что не умеют перечислять ключи (Redis, файловый, двухуровневый).
+
+Пример использования:
+    >>> key = namespace_key('auto_api:TasksGraphView', 'a1b2c3')
+    >>> cache.set(key, data)
+    >>> clear_namespace('auto_api:TasksGraphView')
+"""
+
+from typing import Dict, List
+
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.base import BaseCache
+
+def _version_key(namespace: str) -> str:
+    return f'namespace:{namespace}'
+
+def namespace_version(namespace: str, cache: BaseCache = None) -> int:
+    """
+    Возвращает текущее поколение пространства имен.
+
+    Args:
+        namespace: Имя пространства имен
+        cache: Бэкенд кэша (по умолчанию - default)
+    """
+    cache = cache or default_cache
+    version_key = _version_key(namespace)
+
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, 1, None)
+        version = cache.get(version_key, 1)
+    return version
+
+def namespace_versions(namespaces: List[str], cache: BaseCache = None) -> Dict[str, int]:
+    """
+    Возвращает поколения нескольких пространств имен за одно обращение к кэшу.
+
+    Args:
+        namespaces: Имена пространств имен
+        cache: Бэкенд кэша (по умолчанию - default)
+    """
+    cache = cache or default_cache
+    version_keys = {namespace: _version_key(namespace) for namespace in namespaces}
+
+    found = cache.get_many(list(version_keys.values()))
+    versions = {}
+    for namespace, version_key in version_keys.items():
+        version = found.get(version_key)
+        if version is None:
+            cache.add(version_key, 1, None)
+            version = cache.get(version_key, 1)
+        versions[namespace] = version
+    return versions
+
+async def anamespace_version(namespace: str, cache: BaseCache = None) -> int:
+    """Асинхронный вариант `namespace_version`."""
+    cache = cache or default_cache
+    version_key = _version_key(namespace)
+
+    version = await cache.aget(version_key)
+    if version is None:
+        await cache.aadd(version_key, 1, None)
+        version = await cache.aget(version_key, 1)
+    return version
+
+async def anamespace_versions(namespaces: List[str], cache: BaseCache = None) -> Dict[str, int]:
+    """Асинхронный вариант `namespace_versions`."""
+    cache = cache or default_cache
+    version_keys = {namespace: _version_key(namespace) for namespace in namespaces}
+
+    found = await cache.aget_many(list(version_keys.values()))
+    versions = {}
+    for namespace, version_key in version_keys.items():
+        version = found.get(version_key)
+        if version is None:
+            await cache.aadd(version_key, 1, None)
+            version = await cache.aget(version_key, 1)
+        versions[namespace] = version
+    return versions
+
+def namespace_key(namespace: str, key: str, cache: BaseCache = None) -> str:
+    """
+    Формирует ключ в пространстве имен.
+
+    Args:
+        namespace: Имя пространства имен
+        key: Ключ внутри пространства
+        cache: Бэкенд кэша (по умолчанию - default)
+    """
+    return f'{namespace}:{namespace_version(namespace, cache)}:{key}'
+
+async def anamespace_key(namespace: str, key: str, cache: BaseCache = None) -> str:
+    """Асинхронный вариант `namespace_key`."""
+    return f'{namespace}:{await anamespace_version(namespace, cache)}:{key}'
+
+def clear_namespace(namespace: str, cache: BaseCache = None) -> int:
+    """
+    Инвалидирует все ключи пространства имен.
+
+    Args:
+        namespace: Имя пространства имен
+        cache: Бэкенд кэша (по умолчанию - default)
+
+    Returns:
+        int: Новое поколение пространства имен
+    """
+    cache = cache or default_cache
+    version_key = _version_key(namespace)
+
+    cache.add(version_key, 1, None)
+    try:
+        return cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, 2, None)
+        return 2
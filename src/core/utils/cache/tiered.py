@@ -0,0 +1,163 @@
+"""
+Файл с двухуровневым бэкендом кэша.
+
+L1 - кэш в памяти процесса (LocMemCache) с коротким временем жизни,
+L2 - общий кэш (Redis или файловый), указанный алиасом из настройки CACHES.
+
+Чтение сначала обращается к L1, при промахе - к L2 с сохранением значения в L1.
+Запись и удаление выполняются в L2 и в L1 текущего процесса; в L1 остальных
+процессов устаревшее значение живет не дольше L1_TIMEOUT. Очистка, `incr`
+(на нем построены пространства имен) и `invalidate_l1` публикуют в L2 счетчик
+инвалидации: остальные процессы сбрасывают свой L1, заметив его изменение
+(проверка выполняется не чаще, чем раз в SYNC_INTERVAL секунд).
+
+Пример конфигурации:
+    CACHES = {
+        'default': {...},  # Общий кэш (L2)
+        'tiered': {
+            'BACKEND': 'src.core.utils.cache.tiered.TieredCache',
+            'LOCATION': 'tiered',
+            'OPTIONS': {'L2': 'default', 'L1_TIMEOUT': 5, 'SYNC_INTERVAL': 1},
+        },
+    }
+"""
+
+import threading
+import time
+
+from typing import Any, Dict, Optional
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_MISSING = object()
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: L1 в памяти процесса поверх общего L2."""
+
+    def __init__(self, location: str, params: Dict[str, Any]):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+
+        self.location = location or 'tiered'
+        self.l2_alias = options.get('L2', 'default')
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.sync_interval = options.get('SYNC_INTERVAL', 1)
+
+        self.l1 = LocMemCache(f'tiered-l1:{self.location}', {
+            'TIMEOUT': self.l1_timeout,
+            'OPTIONS': {'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 1000)},
+        })
+
+        self._epoch_key = f'tiered:{self.location}:epoch'
+        self._generation_key = f'tiered:{self.location}:generation'
+        self._state_lock = threading.Lock()
+        self._epoch = None
+        self._generation = 0
+        self._next_sync = 0.0
+
+    @property
+    def l2(self) -> BaseCache:
+        return caches[self.l2_alias]
+
+    def _sync(self) -> None:
+        """Сбрасывает L1, если в L2 опубликована инвалидация."""
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+
+        with self._state_lock:
+            if now < self._next_sync:
+                return
+            state = self.l2.get_many([self._epoch_key, self._generation_key])
+            epoch = (state.get(self._epoch_key, 0), state.get(self._generation_key, 0))
+            if self._epoch is not None and epoch != self._epoch:
+                self.l1.clear()
+            self._epoch = epoch
+            self._generation = epoch[1]
+            self._next_sync = now + self.sync_interval
+
+    def _publish(self, counter_key: str) -> None:
+        """Увеличивает счетчик в L2, оповещая остальные процессы."""
+        self.l2.add(counter_key, 0, None)
+        try:
+            self.l2.incr(counter_key)
+        except ValueError:
+            self.l2.set(counter_key, 1, None)
+        self._next_sync = 0.0
+
+    def tier_key(self, key: str, version: Optional[int] = None) -> str:
+        """Ключ, под которым значение хранится на обоих уровнях."""
+        self._sync()
+        return f'{self._generation}:{self.make_and_validate_key(key, version=version)}'
+
+    def _l2_timeout(self, timeout) -> Optional[float]:
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _l1_timeout(self, timeout) -> Optional[float]:
+        timeout = self._l2_timeout(timeout)
+        if timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def get(self, key, default=None, version=None):
+        key = self.tier_key(key, version)
+        value = self.l1.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = self.l2.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self.l1.set(key, value, self.l1_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.tier_key(key, version)
+        self.l2.set(key, value, self._l2_timeout(timeout))
+        self.l1.set(key, value, self._l1_timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.tier_key(key, version)
+        # Атомарность add обеспечивает только общий уровень
+        if self.l2.add(key, value, self._l2_timeout(timeout)):
+            self.l1.set(key, value, self._l1_timeout(timeout))
+            return True
+        return False
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.tier_key(key, version)
+        self.l1.touch(key, self._l1_timeout(timeout))
+        return self.l2.touch(key, self._l2_timeout(timeout))
+
+    def delete(self, key, version=None):
+        key = self.tier_key(key, version)
+        self.l1.delete(key)
+        return self.l2.delete(key)
+
+    def has_key(self, key, version=None):
+        key = self.tier_key(key, version)
+        return self.l1.has_key(key) or self.l2.has_key(key)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.tier_key(key, version)
+        self.l1.delete(key)
+        value = self.l2.incr(key, delta)
+        self._publish(self._epoch_key)
+        return value
+
+    def invalidate_l1(self) -> None:
+        """Сбрасывает L1 во всех процессах, не затрагивая данные в L2."""
+        self.l1.clear()
+        self._publish(self._epoch_key)
+
+    def clear(self):
+        """
+        Очищает кэш этого уровня.
+
+        L2 общий с другими алиасами, поэтому его записи не удаляются напрямую:
+        увеличивается поколение ключей, и старые записи истекают по своему TTL.
+        """
+        self.l1.clear()
+        self._publish(self._generation_key)
@@ -1,2 +1,3 @@
 from .main import QueryExecutor, OrderedDictQueryExecutor
-from .base import DBManagerInterface, SqlAlchemyManager
\ No newline at end of file
+from .base import DBManagerInterface, SqlAlchemyManager
+from .aio import AsyncQueryExecutor, AsyncOrderedDictQueryExecutor
@@ -0,0 +1,373 @@
+"""
+Файл с асинхронным выполнением запросов.
+
+AsyncQueryExecutor повторяет контракт QueryExecutor (функция get_query,
+возвращающая SQL и параметры, фабрики строк, fetch_batches/iterate), но
+его методы - корутины. Для PostgreSQL запросы выполняются через пул
+асинхронных подключений psycopg 3 без перехода в поток, поэтому
+асинхронный обработчик может выполнить несколько независимых запросов
+одновременно:
+
+>>> tasks, users = await asyncio.gather(
+...     AsyncQueryExecutor.fetchall(get_tasks_query),
+...     AsyncQueryExecutor.fetchall(get_users_query),
+... )
+
+Пул создается на базу и цикл событий при первом запросе; параметры
+подключения берутся из DATABASES так же, как их берет Django, размер пула -
+из ASYNC_DB_POOL. Django с установленным psycopg 3 тоже использует его,
+поэтому синхронный и асинхронный код работают через один драйвер.
+
+Для остальных СУБД (и без psycopg 3) методы выполняют QueryExecutor в потоке
+через sync_to_async. fetchall, fetchone и execute выполняются в потоках пула
+(thread_sensitive=False), поэтому независимые запросы все же идут параллельно,
+но каждый занимает поток и подключение Django этого потока, которое
+закрывается по CONN_MAX_AGE, как после запроса. fetch_batches и iterate
+читают курсор в общем потоке синхронного кода (курсор Django нельзя
+передавать между потоками), поэтому потоковые запросы выполняются по очереди
+с остальным синхронным кодом.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import logging
+import threading
+
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .main import BaseQueryExecutor, QueryExecutor, RowFactoryArg, DEFAULT_BATCH_SIZE
+from . import query_cache
+from .rows import RowFactory, get_row_factory
+from .statements import get_cache_size, is_cache_enabled, track_statement
+from .tunnels import PooledTunnel, acquire_tunnel
+from .types import Callable, Columns
+
+logger = logging.getLogger('utils')
+
+# Параметры пула по умолчанию, если ASYNC_DB_POOL не задан в настройках
+DEFAULT_ASYNC_POOL_OPTIONS = {
+    'min_size': 1,
+    'max_size': 20,
+    'timeout': 30,
+}
+
+# Открытые транзакции текущей задачи: имя базы -> подключение
+_transactions: contextvars.ContextVar = contextvars.ContextVar('async_db_transactions', default={})
+
+# Таблицы, измененные в открытых транзакциях (кэш результатов сбрасывается после фиксации)
+_written_tables: contextvars.ContextVar = contextvars.ContextVar('async_db_written_tables', default=None)
+
+# Номера серверных курсоров (имя курсора уникально в пределах подключения)
+_cursor_numbers = itertools.count()
+
+_pools: Dict[Tuple[str, int], Any] = {}
+_tunnels: Dict[Tuple[str, int], Optional[PooledTunnel]] = {}
+_lock = threading.Lock()
+
+def is_async_supported(alias: str = 'default') -> bool:
+    """Выполняются ли запросы к базе через асинхронный драйвер (PostgreSQL и psycopg 3)."""
+    if connections[alias].vendor != 'postgresql':
+        return False
+    try:
+        import psycopg_pool  # noqa: F401
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    except ImportError:
+        return False
+    return is_psycopg3
+
+def _call_sync(func: Callable, *args, **kwargs) -> Any:
+    """
+    Выполняет синхронный запрос в потоке пула.
+
+    Подключение Django этого потока закрывается по CONN_MAX_AGE, как после
+    запроса: сигнал request_finished в потоки пула не приходит.
+    """
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+async def _run_sync(func: Callable, *args, **kwargs) -> Any:
+    """Выполняет метод синхронного исполнителя в отдельном потоке пула (без очереди общего потока)."""
+    return await sync_to_async(_call_sync, thread_sensitive=False)(func, *args, **kwargs)
+
+def get_connection_params(alias: str = 'default') -> Tuple[Dict[str, Any], Optional[PooledTunnel]]:
+    """
+    Параметры подключения psycopg 3 для базы (как у подключения Django).
+
+    Если для базы настроен SSH, подключение идет через туннель из пула туннелей.
+
+    Returns:
+        Tuple: Параметры подключения и взятый туннель (None - без SSH)
+    """
+    wrapper = connections[alias]
+    params = wrapper.get_connection_params()
+    # Курсоры Django синхронные, асинхронное подключение использует свои
+    params.pop('cursor_factory', None)
+    # Как у подключений Django: каждый запрос вне транзакции фиксируется сразу
+    params['autocommit'] = True
+    tunnel = None
+    ssh_config = wrapper.settings_dict.get('SSH')
+    if ssh_config and ssh_config.get('host'):
+        tunnel, params['port'] = acquire_tunnel(ssh_config)
+        params['host'] = '127.0.0.1'
+    return params, tunnel
+
+def get_pool_options() -> Dict[str, Any]:
+    """Параметры пула асинхронных подключений."""
+    return {**DEFAULT_ASYNC_POOL_OPTIONS, **getattr(settings, 'ASYNC_DB_POOL', {})}
+
+async def get_pool(alias: str = 'default') -> Any:
+    """
+    Возвращает пул асинхронных подключений базы для текущего цикла событий.
+
+    Пул привязан к циклу событий, поэтому при нескольких циклах (например,
+    async_to_sync в разных потоках) у каждого свой пул.
+    """
+    key = (alias, id(asyncio.get_running_loop()))
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+
+    from psycopg_pool import AsyncConnectionPool
+
+    wrapper = connections[alias]
+    timezone_name = wrapper.timezone_name if settings.USE_TZ else None
+
+    async def configure(conn: Any) -> None:
+        if is_cache_enabled():
+            conn.prepared_max = get_cache_size()
+        # Часовой пояс сессии, как у подключений Django
+        if timezone_name:
+            await conn.execute('SELECT set_config(%s, %s, false)', ('TimeZone', timezone_name))
+
+    # Открытие SSH-туннеля блокирует, поэтому выполняется в потоке
+    params, tunnel = await asyncio.to_thread(get_connection_params, alias)
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = AsyncConnectionPool(
+                kwargs=params,
+                configure=configure,
+                open=False,
+                name=f'{alias}-async',
+                **get_pool_options(),
+            )
+            _pools[key] = pool
+            _tunnels[key] = tunnel
+            logger.info(f"Создан пул асинхронных подключений для базы '{alias}'")
+        elif tunnel is not None:
+            tunnel.release()
+    await pool.open()
+    return pool
+
+async def close_pools() -> None:
+    """Закрывает пулы текущего цикла событий."""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _pools if key[1] == loop_id]:
+        await _pools.pop(key).close()
+        tunnel = _tunnels.pop(key, None)
+        if tunnel is not None:
+            tunnel.release()
+
+def get_async_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Статистика пулов асинхронных подключений текущего процесса по имени базы."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for (alias, _), pool in list(_pools.items()):
+        alias_stats = stats.setdefault(alias, {})
+        for name, value in pool.get_stats().items():
+            alias_stats[name] = alias_stats.get(name, 0) + value
+    return stats
+
+
+class AsyncQueryExecutor(BaseQueryExecutor):
+    # Фабрика строк по умолчанию, параметр row_factory запросов ее переопределяет
+    row_factory: str = 'tuple'
+    # Имя базы из DATABASES
+    database: str = 'default'
+    # Синхронный исполнитель для СУБД без асинхронного драйвера
+    sync_executor = QueryExecutor
+
+    @classmethod
+    def _get_columns(cls, cursor: Any) -> Columns:
+        return [element[0] for element in cursor.description or ()]
+
+    @classmethod
+    def _get_row_factory(cls, row_factory: RowFactoryArg = None) -> RowFactory:
+        return get_row_factory(row_factory or cls.row_factory)
+
+    @classmethod
+    @asynccontextmanager
+    async def connection(cls) -> AsyncIterator[Any]:
+        """Подключение открытой транзакции или подключение из пула."""
+        conn = _transactions.get().get(cls.database)
+        if conn is not None:
+            yield conn
+            return
+        pool = await get_pool(cls.database)
+        async with pool.connection() as conn:
+            yield conn
+
+    @classmethod
+    @asynccontextmanager
+    async def transaction(cls) -> AsyncIterator[Any]:
+        """
+        Транзакция: запросы исполнителя внутри блока выполняются в одном подключении.
+
+        При исключении транзакция откатывается. Вложенный блок создает точку
+        сохранения. Задачи, созданные внутри блока (gather), используют то же
+        подключение, и psycopg выполняет их запросы по очереди.
+
+        >>> async with AsyncQueryExecutor.transaction():
+        ...     await AsyncQueryExecutor.execute(get_insert_query, data)
+        ...     await AsyncQueryExecutor.execute(get_update_query, data)
+        """
+        if not is_async_supported(cls.database):
+            raise NotImplementedError('Асинхронные транзакции поддерживаются только для PostgreSQL (psycopg 3)')
+        outermost = _transactions.get().get(cls.database) is None
+        async with cls.connection() as conn:
+            written_token = _written_tables.set([]) if outermost else None
+            try:
+                async with conn.transaction():
+                    token = _transactions.set({**_transactions.get(), cls.database: conn})
+                    try:
+                        yield conn
+                    finally:
+                        _transactions.reset(token)
+                if written_token is not None and _written_tables.get():
+                    await query_cache.ainvalidate_tables(set(_written_tables.get()), cls.database)
+            finally:
+                if written_token is not None:
+                    _written_tables.reset(written_token)
+
+    @classmethod
+    async def _fetch_rows(cls, sql: str, params: Any) -> tuple:
+        async with cls.connection() as conn, conn.cursor() as cursor:
+            with track_statement(sql):
+                await cursor.execute(sql, params)
+            return cls._get_columns(cursor), await cursor.fetchall()
+
+    @classmethod
+    async def fetchall(cls, get_query: Callable, *args, row_factory: RowFactoryArg = None,
+                       cache_ttl: Optional[int] = None, cache_tables: Optional[Iterable[str]] = None, **kwargs):
+        """
+        Выполняет запрос и возвращает все строки.
+
+        Args:
+            get_query: Функция, возвращающая SQL и параметры
+            row_factory: Фабрика строк (по умолчанию фабрика класса)
+            cache_ttl: Время жизни результата в кэше результатов, секунды (None - без кэша)
+            cache_tables: Таблицы-теги результата (по умолчанию - таблицы из FROM/JOIN)
+        """
+        if not is_async_supported(cls.database):
+            return await _run_sync(
+                cls.sync_executor.fetchall, get_query, *args, row_factory=row_factory or cls.row_factory,
+                cache_ttl=cache_ttl, cache_tables=cache_tables, **kwargs
+            )
+        sql, params = cls.get_raw_sql(get_query, *args, **kwargs)
+        # В кэше хранятся колонки и строки, фабрика применяется при каждом чтении
+        columns, rows = await query_cache.acached_result(
+            cls.database, sql, params, partial(cls._fetch_rows, sql, params), cache_ttl, cache_tables
+        )
+        return cls._get_row_factory(row_factory).many(columns, rows)
+
+    @classmethod
+    async def fetchone(cls, get_query, *args, row_factory: RowFactoryArg = None, **kwargs):
+        if not is_async_supported(cls.database):
+            return await _run_sync(
+                cls.sync_executor.fetchone, get_query, *args, row_factory=row_factory or cls.row_factory, **kwargs
+            )
+        sql, params = cls.get_raw_sql(get_query, *args, **kwargs)
+        async with cls.connection() as conn, conn.cursor() as cursor:
+            with track_statement(sql):
+                await cursor.execute(sql, params)
+            row = await cursor.fetchone()
+            return cls._get_row_factory(row_factory).one(cls._get_columns(cursor), row)
+
+    @classmethod
+    async def execute(cls, get_query, *args, **kwargs):
+        if not is_async_supported(cls.database):
+            return await _run_sync(cls.sync_executor.execute, get_query, *args, **kwargs)
+        sql, params = cls.get_raw_sql(get_query, *args, **kwargs)
+        async with cls.connection() as conn:
+            with track_statement(sql):
+                await conn.execute(sql, params)
+        if query_cache.is_enabled():
+            written = _written_tables.get()
+            if written is not None and _transactions.get().get(cls.database) is not None:
+                written.extend(query_cache.get_write_tables(sql))
+            else:
+                await query_cache.ainvalidate_tables(query_cache.get_write_tables(sql), cls.database)
+
+    @classmethod
+    async def fetch_batches(cls, get_query: Callable, *args, batch_size: Optional[int] = None,
+                            row_factory: RowFactoryArg = None, **kwargs) -> AsyncIterator:
+        """
+        Выполняет запрос и лениво возвращает результат пачками.
+
+        Для PostgreSQL используется серверный курсор в транзакции: подключение
+        занято, пока генератор не исчерпан или не закрыт.
+
+        Args:
+            get_query: Функция, возвращающая SQL и параметры
+            batch_size: Количество строк в пачке (по умолчанию DEFAULT_BATCH_SIZE)
+            row_factory: Фабрика строк (по умолчанию фабрика класса)
+
+        Yields:
+            Пачки строк в формате фабрики строк
+        """
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        if not is_async_supported(cls.database):
+            batches = cls.sync_executor.fetch_batches(
+                get_query, *args, batch_size=batch_size, row_factory=row_factory or cls.row_factory, **kwargs
+            )
+            # Генератор держит курсор Django, который нельзя передавать между потоками,
+            # поэтому читается в общем потоке синхронного кода
+            next_batch = sync_to_async(next, thread_sensitive=True)
+            try:
+                while (batch := await next_batch(batches, None)) is not None:
+                    yield batch
+            finally:
+                await sync_to_async(batches.close, thread_sensitive=True)()
+            return
+
+        sql, params = cls.get_raw_sql(get_query, *args, **kwargs)
+        factory = cls._get_row_factory(row_factory)
+        async with cls.connection() as conn, conn.transaction():
+            async with conn.cursor(name=f'async_stream_{next(_cursor_numbers)}') as cursor:
+                with track_statement(sql):
+                    await cursor.execute(sql, params)
+                # Колонки читаются после первого FETCH, как у серверного курсора в QueryExecutor
+                rows = await cursor.fetchmany(batch_size)
+                columns = cls._get_columns(cursor)
+                while rows:
+                    yield factory.many(columns, rows)
+                    rows = await cursor.fetchmany(batch_size)
+
+    @classmethod
+    def iterate(cls, get_query: Callable, *args, batch_size: Optional[int] = None,
+                row_factory: RowFactoryArg = None, **kwargs) -> AsyncIterator:
+        """
+        Выполняет запрос и лениво возвращает строки по одной (асинхронный итератор).
+
+        Фабрика строк проверяется при вызове, а запрос выполняется при первом
+        обращении к итератору.
+
+        Raises:
+            ValueError: Если фабрика колоночная (columnar, numpy) - для них fetch_batches
+        """
+        if cls._get_row_factory(row_factory).columnar:
+            raise ValueError('Колоночный результат нельзя перебирать по строкам, используйте fetch_batches')
+        batches = cls.fetch_batches(get_query, *args, batch_size=batch_size, row_factory=row_factory, **kwargs)
+        return (row async for batch in batches for row in batch)
+
+
+class AsyncOrderedDictQueryExecutor(AsyncQueryExecutor):
+    row_factory: str = 'ordered_dict'
@@ -3,16 +3,21 @@ import abc
 import time
 
 from collections import OrderedDict
-from typing import Any
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
 
 import psycopg2
 import pandas as pd
 
 import sqlalchemy as sa
-from sqlalchemy.sql import text
-from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError
 
+from src.core.utils.database.bulk import DEFAULT_LOAD_CHUNKSIZE, BulkLoader
 from src.core.utils.database.dbconfig import DBConfig
+from src.core.utils.database.engines import get_backoff_delay, get_engine, is_disconnect_error
+from src.core.utils.database import query_cache
+from src.core.utils.database.pgcopy import copy_query_to_file, read_copy_frame
+from src.core.utils.database.rows import RowFactory, get_row_factory
+from src.core.utils.database.statements import PreparedStatements, get_text_clause, is_cache_enabled, track_statement
 
 
 logger = logging.getLogger(__name__)
@@ -20,6 +25,10 @@ logger = logging.getLogger(__name__)
 MAX_RETRIES = 3
 # в секундах
 RETRY_DELAY = 1
+RETRY_MAX_DELAY = 10
+
+# Способы чтения результата в SqlAlchemyManager.fetch_frame
+FRAME_ENGINES = ('pandas', 'copy')
 
 class DBManagerInterface(abc.ABC):
     def _get_query(self, get_query, *args, **kwargs):
@@ -46,8 +55,19 @@ class DBManagerInterface(abc.ABC):
 
 
 class DataBaseManager(DBManagerInterface):
-    def __init__(self, config: DBConfig) -> None:
+    def __init__(self, config: DBConfig, row_factory: Union[str, RowFactory] = 'ordered_dict',
+                 statement_cache: Optional[bool] = None) -> None:
         self.connection = psycopg2.connect(config.POSTGRESQL_URL)
+        self.db_name = config.db_name
+        self.row_factory = row_factory
+        # Таблицы, измененные в текущей транзакции (кэш результатов сбрасывается при close)
+        self._written_tables: List[str] = []
+        # Кэш подготовленных запросов подключения (по умолчанию - настройка STATEMENT_CACHE)
+        if statement_cache is None:
+            statement_cache = is_cache_enabled()
+        self.statements: Optional[PreparedStatements] = (
+            PreparedStatements(self.connection) if statement_cache else None
+        )
 
     def _get_rows(self, rows):
         if not rows:
@@ -57,40 +77,49 @@ class DataBaseManager(DBManagerInterface):
     def _get_columns(self, description):
         return [column[0] for column in description]
 
-    def fetchall(self, sql: str, params: tuple):
+    def _execute(self, cursor, sql: str, params: tuple) -> None:
+        with track_statement(sql):
+            if self.statements is not None:
+                self.statements.execute(cursor, sql, params)
+            else:
+                cursor.execute(sql, params)
+
+    def fetchall(self, sql: str, params: tuple, row_factory: Optional[Union[str, RowFactory]] = None):
         with self.connection.cursor() as cursor:
-            cursor.execute(sql, params)
-            return self.all(cursor)
+            self._execute(cursor, sql, params)
+            return self.all(cursor, row_factory)
 
-    def fetchone(self, sql: str, params: tuple):
+    def fetchone(self, sql: str, params: tuple, row_factory: Optional[Union[str, RowFactory]] = None):
         with self.connection.cursor() as cursor:
-            cursor.execute(sql, params)
-            return self.one(cursor)
+            self._execute(cursor, sql, params)
+            return self.one(cursor, row_factory)
 
     def execute(self, sql: str, params: tuple):
         with self.connection.cursor() as cursor:
-            cursor.execute(sql, params)
-            return None
+            self._execute(cursor, sql, params)
+        if query_cache.is_enabled():
+            self._written_tables.extend(query_cache.get_write_tables(sql))
+        return None
 
-    def one(self, cursor):
+    def one(self, cursor, row_factory: Optional[Union[str, RowFactory]] = None):
         rows = cursor.fetchone()
         if rows:
             columns = self._get_columns(cursor.description)
-            return OrderedDict(zip(columns, rows))
+            return get_row_factory(row_factory or self.row_factory).one(columns, rows)
         else:
             return OrderedDict()
 
-    def all(self, cursor):
+    def all(self, cursor, row_factory: Optional[Union[str, RowFactory]] = None):
         rows = cursor.fetchall()
-        if rows:
-            columns = self._get_columns(cursor.description)
-            return [OrderedDict(zip(columns, row)) for row in rows]
-        else:
-            return []
+        columns = self._get_columns(cursor.description)
+        return get_row_factory(row_factory or self.row_factory).many(columns, rows)
 
     def close(self):
         self.connection.commit()
         self.connection.close()
+        if self._written_tables:
+            query_cache.invalidate_tables(set(self._written_tables), self.db_name)
+            self._written_tables = []
 
 
 class SqlAlchemyManager(DBManagerInterface):
@@ -99,40 +128,87 @@ class SqlAlchemyManager(DBManagerInterface):
         self.engine = self._create_engine()
 
     def _create_engine(self) -> sa.Engine:
-        return sa.create_engine(
-            self.config.SQLALCHEMY_URL,
-            pool_pre_ping=True,
-            pool_recycle=3600,
-            connect_args={
-                "connect_timeout": 10,
-                "keepalives": 1,
-                "keepalives_idle": 30,
-                "keepalives_interval": 10,
-                "keepalives_count": 5
-            }
-        )
+        # Engine и пул общие для всех менеджеров процесса с тем же URL
+        return get_engine(self.config.SQLALCHEMY_URL, alias=self.config.db_name)
 
     def _execute_with_retry(self, operation: callable, *args: Any, **kwargs: Any) -> Any:
-        last_error = None
         for attempt in range(MAX_RETRIES):
             try:
                 return operation(*args, **kwargs)
-            except (OperationalError, SQLAlchemyError) as e:
-                last_error = e
-                if attempt < MAX_RETRIES - 1:
-                    logger.warning(f"Database operation failed (attempt {attempt + 1}/{MAX_RETRIES}): {str(e)}")
-                    time.sleep(RETRY_DELAY)
-                    # Пересоздаем engine при ошибке подключения
-                    self.engine = self._create_engine()
-        raise last_error
-
-    def fetchall(self, get_query, *args, **kwargs) -> pd.DataFrame:
+            except SQLAlchemyError as e:
+                # Повторяются только разрывы подключения, ошибки запроса возвращаются сразу
+                if attempt == MAX_RETRIES - 1 or not is_disconnect_error(e, self.engine):
+                    raise
+                delay = get_backoff_delay(attempt, RETRY_DELAY, RETRY_MAX_DELAY)
+                logger.warning(f"Database connection lost (attempt {attempt + 1}/{MAX_RETRIES}), "
+                               f"retry in {delay:.2f}s: {str(e)}")
+                time.sleep(delay)
+
+    def fetchall(self, get_query, *args, cache_ttl: Optional[int] = None,
+                 cache_tables: Optional[Iterable[str]] = None, **kwargs) -> pd.DataFrame:
+        """
+        Выполняет запрос и возвращает результат в виде DataFrame.
+
+        Args:
+            get_query: Функция, возвращающая SQL и параметры
+            cache_ttl: Время жизни результата в кэше результатов, секунды (None - без кэша)
+            cache_tables: Таблицы-теги результата (по умолчанию - таблицы из FROM/JOIN)
+        """
         sql, params = self._get_query(get_query, *args, **kwargs)
         
         def _fetchall():
-            return pd.read_sql_query(sql, con=self.engine, params=params)
+            with track_statement(sql):
+                return pd.read_sql_query(sql, con=self.engine, params=params)
         
-        return self._execute_with_retry(_fetchall)
+        return query_cache.cached_result(
+            self.config.db_name, sql, params, lambda: self._execute_with_retry(_fetchall),
+            cache_ttl, cache_tables, kind='frame'
+        )
+
+    def fetch_frame(self, get_query, *args, engine: str = 'pandas', dtypes: Optional[Dict[str, Any]] = None,
+                    chunksize: Optional[int] = None,
+                    **kwargs) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+        """
+        Выполняет запрос и возвращает результат в виде DataFrame.
+
+        Args:
+            get_query: Функция, возвращающая SQL и параметры
+            engine: Способ чтения: pandas (read_sql_query) или copy (COPY ... TO STDOUT,
+                только PostgreSQL; для других СУБД используется pandas)
+            dtypes: Подсказки типов по имени колонки
+            chunksize: Количество строк в DataFrame при чтении частями (None - целиком)
+
+        Returns:
+            DataFrame или итератор DataFrame при указанном chunksize
+        """
+        if engine not in FRAME_ENGINES:
+            raise ValueError(f"Неизвестный способ чтения: {engine}. Доступные: {', '.join(FRAME_ENGINES)}")
+
+        sql, params = self._get_query(get_query, *args, **kwargs)
+
+        if engine == 'copy' and self.engine.dialect.name != 'postgresql':
+            logger.warning(f"COPY поддерживается только для PostgreSQL, используется read_sql_query "
+                           f"({self.engine.dialect.name})")
+            engine = 'pandas'
+
+        if engine == 'pandas':
+            def _read_frame():
+                with track_statement(sql):
+                    return pd.read_sql_query(sql, con=self.engine, params=params, dtype=dtypes, chunksize=chunksize)
+
+            return self._execute_with_retry(_read_frame)
+
+        def _copy():
+            raw_connection = self.engine.raw_connection()
+            try:
+                with track_statement(sql):
+                    return copy_query_to_file(raw_connection.driver_connection, sql, params)
+            finally:
+                raw_connection.close()
+
+        # Повтор при ошибке подключения возможен, пока COPY не завершен: разбор идет из файла
+        file, columns = self._execute_with_retry(_copy)
+        return read_copy_frame(file, columns, dtypes=dtypes, chunksize=chunksize)
 
     def fetchone(self, get_query, *args, **kwargs):
         return 0
@@ -140,21 +216,34 @@ class SqlAlchemyManager(DBManagerInterface):
     def execute(self, get_query, *args, **kwargs):
         sql, params = self._get_query(get_query, *args, **kwargs)
         def _execute():
-            with self.engine.begin() as conn:
-                conn.execute(text(sql), params)
-        return self._execute_with_retry(_execute)
+            with self.engine.begin() as conn, track_statement(sql):
+                conn.execute(get_text_clause(sql), params)
+        result = self._execute_with_retry(_execute)
+        query_cache.invalidate_for_query(sql, self.config.db_name)
+        return result
 
     def close(self):
         return 0
 
-    def to_sql(self, df: pd.DataFrame, table_name: str, chunksize: int = 10000):
-        columns = df.select_dtypes(include=["object"]).columns.tolist()
-        dtype = {col_name: sa.types.VARCHAR(250) for col_name in columns}
-        df.to_sql(
-            name=table_name,
-            con=self.engine,
-            if_exists="append",
-            index=False,
-            dtype=dtype,
-            chunksize=chunksize
-        )
\ No newline at end of file
+    def to_sql(self, df: Union[pd.DataFrame, Iterable], table_name: str, chunksize: int = DEFAULT_LOAD_CHUNKSIZE,
+               upsert_keys: Optional[List[str]] = None, columns: Optional[List[str]] = None,
+               dtype: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Загружает DataFrame или итератор строк в таблицу массовой загрузкой СУБД.
+
+        Args:
+            df: DataFrame или итератор строк
+            table_name: Имя таблицы (создается по типам данных, если ее нет)
+            chunksize: Количество строк в части при загрузке
+            upsert_keys: Колонки уникального ключа для обновления существующих строк
+                (у существующей таблицы должен быть первичный ключ или уникальный индекс по ним)
+            columns: Имена колонок для строк-кортежей
+            dtype: Явные типы колонок SQLAlchemy для создаваемой таблицы
+
+        Returns:
+            Dict[str, Any]: Способ загрузки, количество строк и скорость загрузки
+        """
+        loader = BulkLoader(self.engine, chunksize=chunksize)
+        result = loader.load(df, table_name, columns=columns, upsert_keys=upsert_keys, dtype=dtype)
+        query_cache.invalidate_tables([table_name], self.config.db_name)
+        return result
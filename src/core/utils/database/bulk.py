@@ -0,0 +1,418 @@
+"""
+Файл с массовой загрузкой данных в таблицы через штатные механизмы СУБД.
+
+Вместо пакетных INSERT из DataFrame.to_sql данные передаются:
+- PostgreSQL - потоком CSV в `COPY ... FROM STDIN`;
+- MySQL - временным CSV-файлом в `LOAD DATA LOCAL INFILE`
+  (требуется local_infile на сервере и в подключении);
+- MSSQL - `executemany` курсора pyodbc с `fast_executemany`;
+- остальные СУБД (SQLite) - `executemany` через SQLAlchemy.
+
+Отсутствующая таблица создается с типами колонок, определенными по данным
+(вместо VARCHAR(250) для всех строковых колонок). При указании ключей
+данные загружаются во временную таблицу и переносятся в целевую
+с обновлением существующих строк (upsert). Создаваемая таблица получает
+уникальное ограничение по ключам, а у существующей таблицы наличие первичного
+ключа или уникального индекса по ключам проверяется до загрузки: без него
+ON CONFLICT в PostgreSQL и SQLite завершается ошибкой, а MySQL молча
+вставляет дубликаты. Повторы ключа в данных не передаются в базу (ON CONFLICT
+в PostgreSQL и MERGE в MSSQL не обновляют строку дважды): в каждой части
+остается последняя строка ключа, а части переносятся в целевую таблицу по
+одной, поэтому повтор из следующей части обновляет уже перенесенную строку.
+"""
+
+import io
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+from datetime import date, datetime
+from decimal import Decimal
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+from sqlalchemy.sql import text
+
+logger = logging.getLogger('utils')
+
+# Количество строк, форматируемых и передаваемых в базу за один раз
+DEFAULT_LOAD_CHUNKSIZE = 50000
+
+# Длина строковых колонок ключа в СУБД, не индексирующих TEXT без длины
+KEY_STRING_LENGTH = 255
+
+# Границы int64: дробные колонки вне них не приводятся к целым
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63
+
+class IterableReader(io.RawIOBase):
+    """Файлоподобный объект для чтения из итератора байтовых фрагментов (для COPY FROM STDIN)."""
+    def __init__(self, chunks: Iterator[bytes]):
+        self.chunks = chunks
+        self.buffer = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while not self.buffer:
+            try:
+                self.buffer = next(self.chunks)
+            except StopIteration:
+                return 0
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+def iter_frames(data: Union[pd.DataFrame, Iterable[Sequence[Any]]], columns: Optional[List[str]],
+                chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    Разбивает данные на DataFrame по chunksize строк.
+
+    Args:
+        data: DataFrame или итератор строк (кортежи или словари)
+        columns: Имена колонок для строк-кортежей
+        chunksize: Количество строк в части
+    """
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, len(data), chunksize):
+            yield data.iloc[start:start + chunksize]
+        return
+
+    batch = []
+    for row in data:
+        batch.append(row)
+        if len(batch) >= chunksize:
+            yield pd.DataFrame.from_records(batch, columns=columns)
+            batch = []
+    if batch:
+        yield pd.DataFrame.from_records(batch, columns=columns)
+
+def infer_sql_type(series: pd.Series) -> sa.types.TypeEngine:
+    """Тип колонки SQLAlchemy по данным колонки DataFrame."""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return sa.Boolean()
+    if pd.api.types.is_integer_dtype(dtype):
+        return sa.BigInteger()
+    if pd.api.types.is_float_dtype(dtype):
+        return sa.Float(precision=53)
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return sa.DateTime(timezone=True)
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return sa.DateTime()
+    if pd.api.types.is_timedelta64_dtype(dtype):
+        return sa.Interval()
+
+    # Для колонок object тип определяется по первому непустому значению
+    sample = series.dropna()
+    value = sample.iloc[0] if len(sample) else None
+    if isinstance(value, (bool, np.bool_)):
+        return sa.Boolean()
+    if isinstance(value, (int, np.integer)):
+        return sa.BigInteger()
+    if isinstance(value, (float, np.floating)):
+        return sa.Float(precision=53)
+    if isinstance(value, datetime):
+        return sa.DateTime(timezone=value.tzinfo is not None)
+    if isinstance(value, date):
+        return sa.Date()
+    if isinstance(value, Decimal):
+        return sa.Numeric()
+    if isinstance(value, bytes):
+        return sa.LargeBinary()
+    return sa.Text()
+
+def infer_sql_types(frame: pd.DataFrame) -> Dict[str, sa.types.TypeEngine]:
+    """Типы колонок SQLAlchemy для DataFrame."""
+    return {str(column): infer_sql_type(frame[column]) for column in frame.columns}
+
+def _prepare_frame(frame: pd.DataFrame, bool_as_int: bool = False) -> pd.DataFrame:
+    """
+    Подготавливает часть данных к записи в CSV.
+
+    Дробные колонки с целыми значениями (целые с NULL в pandas) выводятся
+    без ".0", иначе их не примет целочисленная колонка таблицы. Значения вне
+    диапазона int64 остаются дробными.
+    """
+    frame = frame.copy(deep=False)
+    for column in frame.columns:
+        series = frame[column]
+        if pd.api.types.is_float_dtype(series.dtype):
+            values = series.dropna()
+            if (len(values) and np.isfinite(values).all() and (values % 1 == 0).all()
+                    and values.min() >= INT64_MIN and values.max() < INT64_MAX):
+                frame[column] = series.astype('Int64')
+        elif bool_as_int and pd.api.types.is_bool_dtype(series.dtype):
+            frame[column] = series.astype('int8')
+    return frame
+
+def _frame_to_csv(frame: pd.DataFrame, na_rep: str, bool_as_int: bool = False) -> bytes:
+    return _prepare_frame(frame, bool_as_int).to_csv(
+        index=False, header=False, na_rep=na_rep, lineterminator='\n', date_format='%Y-%m-%d %H:%M:%S.%f%z'
+    ).encode('utf-8')
+
+class BulkLoader:
+    """
+    Массовая загрузка данных в таблицу.
+
+    Args:
+        engine: Engine SQLAlchemy целевой базы
+        chunksize: Количество строк в части при загрузке
+    """
+    def __init__(self, engine: sa.Engine, chunksize: int = DEFAULT_LOAD_CHUNKSIZE):
+        self.engine = engine
+        self.chunksize = chunksize
+        self.dialect = engine.dialect.name
+        self.quote = engine.dialect.identifier_preparer.quote
+
+    def get_method(self) -> str:
+        """Способ загрузки для диалекта базы."""
+        return {
+            'postgresql': 'copy',
+            'mysql': 'load_data',
+            'mariadb': 'load_data',
+            'mssql': 'fast_executemany',
+        }.get(self.dialect, 'executemany')
+
+    def _split_name(self, table_name: str):
+        schema, _, name = table_name.rpartition('.')
+        return schema or None, name
+
+    def _qualified(self, table_name: str) -> str:
+        if table_name.startswith('#'):
+            # Временная таблица MSSQL
+            return table_name
+        schema, name = self._split_name(table_name)
+        return f'{self.quote(schema)}.{self.quote(name)}' if schema else self.quote(name)
+
+    def ensure_table(self, conn: sa.Connection, table_name: str, sample: pd.DataFrame,
+                     dtype: Optional[Dict[str, sa.types.TypeEngine]] = None,
+                     unique_keys: Optional[List[str]] = None) -> bool:
+        """
+        Создает таблицу по типам данных, если ее нет.
+
+        Args:
+            conn: Подключение
+            table_name: Имя таблицы
+            sample: Часть данных для определения типов колонок
+            dtype: Явные типы колонок
+            unique_keys: Колонки уникального ограничения создаваемой таблицы
+
+        Returns:
+            bool: Создана ли таблица
+        """
+        schema, name = self._split_name(table_name)
+        if sa.inspect(conn).has_table(name, schema=schema):
+            return False
+        types = {**infer_sql_types(sample), **(dtype or {})}
+        constraints = []
+        if unique_keys:
+            if self.dialect not in ('postgresql', 'sqlite'):
+                # MySQL и MSSQL не индексируют TEXT без длины
+                for key in unique_keys:
+                    if isinstance(types.get(key), sa.Text) and key not in (dtype or {}):
+                        types[key] = sa.String(KEY_STRING_LENGTH)
+            constraints.append(sa.UniqueConstraint(*unique_keys, name=f'ux_{name}'[:63]))
+        table = sa.Table(name, sa.MetaData(), *(sa.Column(column, sql_type) for column, sql_type in types.items()),
+                         *constraints, schema=schema)
+        table.create(conn)
+        logger.info(f"Создана таблица {table_name}: {', '.join(f'{c} {t}' for c, t in types.items())}"
+                    + (f", уникальный ключ ({', '.join(unique_keys)})" if unique_keys else ''))
+        return True
+
+    def has_unique_key(self, conn: sa.Connection, table_name: str, keys: List[str]) -> bool:
+        """Есть ли у таблицы первичный ключ, уникальное ограничение или уникальный индекс ровно по keys."""
+        schema, name = self._split_name(table_name)
+        inspector = sa.inspect(conn)
+        candidates = [inspector.get_pk_constraint(name, schema=schema).get('constrained_columns') or []]
+        try:
+            candidates += [c['column_names'] for c in inspector.get_unique_constraints(name, schema=schema)]
+        except NotImplementedError:
+            pass
+        candidates += [i['column_names'] for i in inspector.get_indexes(name, schema=schema) if i.get('unique')]
+        return any(set(candidate) == set(keys) for candidate in candidates if candidate)
+
+    def load(self, data: Union[pd.DataFrame, Iterable[Sequence[Any]]], table_name: str,
+             columns: Optional[List[str]] = None, upsert_keys: Optional[List[str]] = None,
+             dtype: Optional[Dict[str, sa.types.TypeEngine]] = None) -> Dict[str, Any]:
+        """
+        Загружает данные в таблицу в одной транзакции.
+
+        Args:
+            data: DataFrame или итератор строк
+            table_name: Имя таблицы (допускается schema.table)
+            columns: Имена колонок для строк-кортежей
+            upsert_keys: Колонки уникального ключа: существующие строки обновляются;
+                создаваемая таблица получает уникальное ограничение по ним
+            dtype: Явные типы колонок для создаваемой таблицы
+
+        Returns:
+            Dict[str, Any]: Способ загрузки, количество строк, время и скорость загрузки
+
+        Raises:
+            ValueError: Если ключей нет среди колонок данных или у существующей таблицы
+                нет первичного ключа или уникального индекса по ключам
+        """
+        frames = iter_frames(data, columns, self.chunksize)
+        first = next(frames, None)
+        method = self.get_method()
+        started = time.perf_counter()
+        rows = 0
+
+        if first is not None:
+            columns = [str(column) for column in first.columns]
+            frames = _chain(first, frames)
+
+            missing = [key for key in upsert_keys or [] if key not in columns]
+            if missing:
+                raise ValueError(f"Ключи upsert отсутствуют в данных: {', '.join(missing)}")
+
+            with self.engine.begin() as conn:
+                created = self.ensure_table(conn, table_name, first, dtype, unique_keys=upsert_keys)
+                if upsert_keys and not created and not self.has_unique_key(conn, table_name, upsert_keys):
+                    raise ValueError(
+                        f"Для загрузки с обновлением в {table_name} нужен первичный ключ или уникальный "
+                        f"индекс ровно по колонкам ({', '.join(upsert_keys)})"
+                    )
+                if upsert_keys:
+                    staging = self.create_staging_table(conn, table_name)
+                    for frame in frames:
+                        frame = frame.drop_duplicates(subset=upsert_keys, keep='last')
+                        rows += self.copy_frames(conn, staging, columns, iter([frame]))
+                        self.merge(conn, staging, table_name, columns, upsert_keys)
+                        conn.execute(text(f'DELETE FROM {self._qualified(staging)}'))
+                    if self.dialect != 'postgresql':
+                        conn.execute(text(f'DROP TABLE {self._qualified(staging)}'))
+                else:
+                    rows = self.copy_frames(conn, table_name, columns, frames)
+
+        elapsed = time.perf_counter() - started
+        result = {
+            'method': method,
+            'rows': rows,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': int(rows / elapsed) if elapsed else rows,
+        }
+        logger.info(f"Загрузка в {table_name} ({self.dialect}): {result}")
+        return result
+
+    def create_staging_table(self, conn: sa.Connection, table_name: str) -> str:
+        """Создает пустую временную таблицу со структурой целевой."""
+        target = self._qualified(table_name)
+        name = f'bulk_{uuid.uuid4().hex[:12]}'
+        if self.dialect == 'postgresql':
+            conn.execute(text(f'CREATE TEMPORARY TABLE {name} (LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP'))
+            return name
+        if self.dialect in ('mysql', 'mariadb'):
+            conn.execute(text(f'CREATE TEMPORARY TABLE {name} LIKE {target}'))
+            return name
+        if self.dialect == 'mssql':
+            name = f'#{name}'
+            conn.execute(text(f'SELECT TOP 0 * INTO {name} FROM {target}'))
+            return name
+        # SQLite и остальные СУБД: таблица удаляется в load после переноса строк
+        conn.execute(text(f'CREATE TEMPORARY TABLE {name} AS SELECT * FROM {target} WHERE 0'))
+        return name
+
+    def merge(self, conn: sa.Connection, staging: str, table_name: str, columns: List[str],
+              keys: List[str]) -> None:
+        """Переносит строки из временной таблицы в целевую с обновлением по ключу."""
+        target = self._qualified(table_name)
+        staging = self._qualified(staging)
+        quoted = [self.quote(column) for column in columns]
+        key_columns = [self.quote(key) for key in keys]
+        updates = [column for column in quoted if column not in key_columns]
+        column_list = ', '.join(quoted)
+
+        if self.dialect in ('mysql', 'mariadb'):
+            assignments = ', '.join(f'{c} = VALUES({c})' for c in updates or key_columns)
+            sql = (f'INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {staging} '
+                   f'ON DUPLICATE KEY UPDATE {assignments}')
+        elif self.dialect == 'mssql':
+            condition = ' AND '.join(f't.{k} = s.{k}' for k in key_columns)
+            update = f"WHEN MATCHED THEN UPDATE SET {', '.join(f't.{c} = s.{c}' for c in updates)} " if updates else ''
+            sql = (f'MERGE {target} AS t USING {staging} AS s ON {condition} {update}'
+                   f"WHEN NOT MATCHED THEN INSERT ({column_list}) VALUES ({', '.join(f's.{c}' for c in quoted)});")
+        else:
+            # PostgreSQL и SQLite: ON CONFLICT (WHERE true нужен SQLite для разбора INSERT ... SELECT)
+            action = (f"DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in updates)}"
+                      if updates else 'DO NOTHING')
+            sql = (f'INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {staging} WHERE true '
+                   f"ON CONFLICT ({', '.join(key_columns)}) {action}")
+        conn.execute(text(sql))
+
+    def copy_frames(self, conn: sa.Connection, table_name: str, columns: List[str],
+                    frames: Iterator[pd.DataFrame]) -> int:
+        """
+        Передает части данных в таблицу способом, соответствующим СУБД.
+
+        Returns:
+            int: Количество загруженных строк
+        """
+        counter = {'rows': 0}
+
+        def counted() -> Iterator[pd.DataFrame]:
+            for frame in frames:
+                counter['rows'] += len(frame)
+                yield frame
+
+        method = self.get_method()
+        table = self._qualified(table_name)
+        column_list = ', '.join(self.quote(column) for column in columns)
+        driver_connection = conn.connection.driver_connection
+
+        if method == 'copy':
+            stream = IterableReader(_frame_to_csv(frame, na_rep='\\N') for frame in counted())
+            with driver_connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                    io.BufferedReader(stream, buffer_size=1024 * 1024),
+                )
+        elif method == 'load_data':
+            # Без ESCAPED BY значение NULL передается словом NULL
+            for frame in counted():
+                with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as file:
+                    file.write(_frame_to_csv(frame, na_rep='NULL', bool_as_int=True))
+                try:
+                    conn.exec_driver_sql(
+                        f"LOAD DATA LOCAL INFILE '{file.name}' INTO TABLE {table} CHARACTER SET utf8mb4 "
+                        f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                        f"LINES TERMINATED BY '\\n' ({column_list})"
+                    )
+                finally:
+                    os.remove(file.name)
+        elif method == 'fast_executemany':
+            placeholders = ', '.join(['?'] * len(columns))
+            sql = f'INSERT INTO {table} ({column_list}) VALUES ({placeholders})'
+            cursor = driver_connection.cursor()
+            try:
+                # pyodbc передает параметры всей части одним массивом, а не строкой на запрос
+                cursor.fast_executemany = True
+                for frame in counted():
+                    cursor.executemany(sql, _frame_rows(frame))
+            finally:
+                cursor.close()
+        else:
+            # Вставка pandas через SQLAlchemy (insertmanyvalues) в уже созданную таблицу
+            schema, name = self._split_name(table_name)
+            for frame in counted():
+                frame.to_sql(name, conn, schema=schema, if_exists='append', index=False)
+
+        return counter['rows']
+
+def _frame_rows(frame: pd.DataFrame) -> List[tuple]:
+    """Строки части данных с None вместо NaN/NaT (astype(object) дает значения Python)."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    return list(frame.itertuples(index=False, name=None))
+
+def _chain(first: pd.DataFrame, rest: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    yield first
+    yield from rest
@@ -6,11 +6,7 @@ from typing import Optional
 
 from django.conf import settings
 
-from sshtunnel import SSHTunnelForwarder
-
-import socket
-
-from typing import Dict, Optional
+from src.core.utils.database.tunnels import PooledTunnel, acquire_tunnel
 
 import logging
 
@@ -18,64 +14,39 @@ logger = logging.getLogger('utils')
 
 class SSHConnection:
     """
-    Класс для управления SSH-туннелем
+    Класс для использования SSH-туннеля из пула процесса.
+
+    Туннель к SSH-цели открывается один раз и разделяется между потоками;
+    при выходе из контекста он возвращается в пул, а не закрывается.
     """
     def __init__(self, ssh_config: dict) -> None:
+        self.ssh_config = ssh_config
         self.ssh_host = ssh_config.get('host')
         self.ssh_port = ssh_config.get('port', 22)
-        self.ssh_username = ssh_config.get('username')
-        self.ssh_password = ssh_config.get('password')
-        self.ssh_key = ssh_config.get('key_path')
         self.remote_host = ssh_config.get('remote_host')
         self.remote_port = ssh_config.get('remote_port')
-        self.local_port = self._find_free_port()
-        self._tunnel = None
+        self.local_port: Optional[int] = None
+        self._tunnel: Optional[PooledTunnel] = None
 
-    def _find_free_port(self) -> int:
-        """Находит свободный порт на локальной машине"""
-        with socket.socket() as s:
-            s.bind(('', 0))
-            return s.getsockname()[1]
-
-    def __enter__(self) -> SSHTunnelForwarder:
+    def __enter__(self) -> Optional[PooledTunnel]:
         if not self.ssh_host:
             logger.warning("SSH хост не указан, туннель не будет создан")
             return None
 
-        try:
-            ssh_config = {
-                'ssh_address_or_host': (self.ssh_host, self.ssh_port),
-                'remote_bind_address': (self.remote_host, self.remote_port),
-                'local_bind_address': ('127.0.0.1', self.local_port),
-            }
-
-            if self.ssh_key:
-                ssh_config['ssh_pkey'] = self.ssh_key
-            else:
-                ssh_config['ssh_username'] = self.ssh_username
-                ssh_config['ssh_password'] = self.ssh_password
-
-            self._tunnel = SSHTunnelForwarder(**ssh_config)
-            self._tunnel.start()
-            logger.info(f"SSH туннель успешно создан к {self.ssh_host}:{self.ssh_port}")
-            return self._tunnel
-        except Exception as e:
-            logger.error(f"Ошибка при создании SSH туннеля: {str(e)}")
-            raise
+        self._tunnel, self.local_port = acquire_tunnel(self.ssh_config)
+        return self._tunnel
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self._tunnel:
-            try:
-                self._tunnel.close()
-                logger.info("SSH туннель успешно закрыт")
-            except Exception as e:
-                logger.error(f"Ошибка при закрытии SSH туннеля: {str(e)}")
+            self._tunnel.release()
+            self._tunnel = None
 
 class DBConfig:
     """
     Конфигурация для работы с определенной базой данных
     """
     def __init__(self, db_name: str = 'default') -> None:
+        self.db_name = db_name
         self.db_config = settings.DATABASES[db_name]
         self.ENGINE = self.db_config['ENGINE']
         self.DB_NAME = self.db_config['NAME']
@@ -128,6 +99,9 @@ class DBConfig:
         """
         if 'sqlite3' in self.ENGINE:
             return f"sqlite:///{self.DB_NAME}"
+        elif 'mysql' in self.ENGINE:
+            # local_infile нужен для массовой загрузки через LOAD DATA LOCAL INFILE
+            return f"mysql+mysqldb://{self.USERNAME}:{self.PASSWORD}@{self.HOST}:{self.PORT}/{self.DB_NAME}?charset=utf8mb4&local_infile=1"
         elif 'mssql' in self.ENGINE:
             return f"mssql+pyodbc://{self.USERNAME}:{self.PASSWORD}@{self.HOST}:{self.PORT}/{self.DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
         return f"postgresql+psycopg2://{self.USERNAME}:{self.PASSWORD}@{self.HOST}:{self.PORT}/{self.DB_NAME}"
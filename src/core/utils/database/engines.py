@@ -0,0 +1,170 @@
+"""
+Файл с реестром engine SQLAlchemy, общим для процесса.
+
+Engine (и его пул подключений) создается один раз на URL подключения и
+переиспользуется всеми экземплярами SqlAlchemyManager. Параметры пула
+берутся из SQLALCHEMY_POOL в настройках и секции sqlalchemy базы
+в databases.yaml (ключ SQLALCHEMY в DATABASES).
+
+После fork (воркеры Celery, Daphne) дочерний процесс не использует
+подключения родителя: пулы сбрасываются без закрытия чужих сокетов.
+"""
+
+import logging
+import os
+import random
+import threading
+
+from typing import Any, Dict, Optional
+
+import sqlalchemy as sa
+
+from django.conf import settings
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger('utils')
+
+# Параметры пула по умолчанию, если SQLALCHEMY_POOL не задан в настройках
+DEFAULT_POOL_OPTIONS = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_timeout': 30,
+    'pool_recycle': 3600,
+}
+
+# Параметры подключения драйверов: таймаут подключения и keepalive для PostgreSQL
+CONNECT_ARGS = {
+    'postgresql': {
+        'connect_timeout': 10,
+        'keepalives': 1,
+        'keepalives_idle': 30,
+        'keepalives_interval': 10,
+        'keepalives_count': 5,
+    },
+    'mysql': {'connect_timeout': 10},
+    'mssql': {'timeout': 10},
+}
+
+_engines: Dict[str, sa.Engine] = {}
+_aliases: Dict[str, str] = {}
+_lock = threading.Lock()
+
+def get_pool_options(alias: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Параметры пула для базы.
+
+    Args:
+        alias: Имя базы из DATABASES (ее секция SQLALCHEMY переопределяет общие параметры)
+    """
+    options = {**DEFAULT_POOL_OPTIONS, **getattr(settings, 'SQLALCHEMY_POOL', {})}
+    if alias is not None:
+        options.update(settings.DATABASES.get(alias, {}).get('SQLALCHEMY', {}))
+    return options
+
+def create_engine(url: str, alias: Optional[str] = None) -> sa.Engine:
+    """Создает engine с пулом и параметрами подключения для диалекта."""
+    url_object = sa.make_url(url)
+    backend = url_object.get_backend_name()
+    options: Dict[str, Any] = {'pool_pre_ping': True}
+
+    if backend == 'sqlite':
+        # SQLite использует собственный пул без размера и ожидания
+        recycle = get_pool_options(alias).get('pool_recycle')
+        if recycle is not None:
+            options['pool_recycle'] = recycle
+    else:
+        options.update(get_pool_options(alias))
+        options['connect_args'] = CONNECT_ARGS.get(backend, {})
+        if backend == 'mssql':
+            options['fast_executemany'] = True
+
+    return sa.create_engine(url_object, **options)
+
+def get_engine(url: str, alias: Optional[str] = None) -> sa.Engine:
+    """
+    Возвращает engine для URL, создавая его при первом обращении.
+
+    Args:
+        url: URL подключения SQLAlchemy
+        alias: Имя базы из DATABASES (для параметров пула и статистики)
+    """
+    engine = _engines.get(url)
+    if engine is not None:
+        return engine
+    with _lock:
+        engine = _engines.get(url)
+        if engine is None:
+            engine = create_engine(url, alias)
+            _engines[url] = engine
+            _aliases[url] = alias or engine.url.database or ''
+            logger.info(f"Создан engine SQLAlchemy для '{_aliases[url]}' ({engine.url.render_as_string()})")
+    return engine
+
+def dispose_engines() -> None:
+    """Закрывает подключения всех engine и очищает реестр."""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _aliases.clear()
+
+def _reset_after_fork() -> None:
+    # Подключения родителя остаются открытыми для него: пул только забывается
+    for engine in list(_engines.values()):
+        engine.dispose(close=False)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def is_disconnect_error(error: BaseException, engine: sa.Engine) -> bool:
+    """
+    Является ли ошибка разрывом подключения (повтор имеет смысл).
+
+    Ошибки SQL (синтаксис, ограничения, блокировки) повтором не исправляются.
+    При разрыве SQLAlchemy сам инвалидирует пул: подключения, открытые
+    до разрыва, будут переоткрыты при следующей выдаче.
+    """
+    if not isinstance(error, DBAPIError):
+        return False
+    if error.connection_invalidated:
+        return True
+    try:
+        return bool(engine.dialect.is_disconnect(error.orig, None, None))
+    except Exception:
+        return False
+
+def get_backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Задержка перед повтором: экспоненциальная, со случайной составляющей,
+    чтобы процессы не переподключались одновременно.
+
+    Args:
+        attempt: Номер неудачной попытки, начиная с 0
+        base: Задержка первой попытки, секунды
+        cap: Максимальная задержка, секунды
+    """
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def get_engine_stats(alias: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Статистика пулов engine текущего процесса.
+
+    Args:
+        alias: Имя базы (None - все engine)
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Статистика по URL подключения (без пароля)
+    """
+    stats = {}
+    for url, engine in list(_engines.items()):
+        if alias is not None and _aliases.get(url) != alias:
+            continue
+        pool = engine.pool
+        pool_stats: Dict[str, Any] = {'alias': _aliases.get(url), 'pool': type(pool).__name__}
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            method = getattr(pool, name, None)
+            if callable(method):
+                pool_stats[name] = method()
+        stats[engine.url.render_as_string(hide_password=True)] = pool_stats
+    return stats
@@ -0,0 +1,122 @@
+"""
+Файл с потоковой выгрузкой результатов запросов в JSON и CSV.
+
+StreamingExport принимает ленивый источник строк (QueryExecutor.iterate,
+OrderedDictQueryExecutor.iterate) и отдает его через StreamingHttpResponse:
+строки сериализуются и отправляются клиенту по мере чтения из базы, поэтому
+выгрузка миллионов строк не требует памяти под весь результат. Под ASGI ответ
+получает асинхронный итератор: каждый фрагмент читается через
+sync_to_async(thread_sensitive=True) в потоке, где открыт курсор базы, - иначе
+Django прочитал бы синхронный итератор в память целиком.
+
+Пример обработчика:
+>>> rows = OrderedDictQueryExecutor.iterate(get_report_query, date_from)
+>>> return StreamingExport(rows, fmt='csv', filename='report.csv')
+"""
+
+import csv
+
+from collections.abc import Mapping
+from typing import Any, Iterable, Iterator, List, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from src.core.utils.server.streaming import aiter_sync, is_asgi_request
+
+# Размер фрагмента ответа: строки накапливаются до этого размера, чтобы не отправлять их по одной
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+EXPORT_CONTENT_TYPES = {
+    'json': 'application/json',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+class _Echo:
+    """Буфер для csv.writer, возвращающий записанную строку вместо ее хранения."""
+    def write(self, value: str) -> str:
+        return value
+
+def _chunked(parts: Iterable[str]) -> Iterator[bytes]:
+    """Склеивает строки во фрагменты размером около EXPORT_CHUNK_SIZE."""
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+class StreamingExport:
+    """
+    Результат обработчика для потоковой выгрузки строк.
+
+    Args:
+        rows: Ленивый источник строк (словари, строки фабрики record или кортежи)
+        columns: Имена колонок; для словарей берутся из первой строки,
+            для кортежей без columns JSON выдает массивы, а CSV - строки без заголовка
+        fmt: Формат выгрузки (json или csv)
+        filename: Имя файла для Content-Disposition (None - без вложения)
+    """
+    def __init__(self, rows: Iterable[Any], columns: Optional[List[str]] = None,
+                 fmt: str = 'json', filename: Optional[str] = None):
+        if fmt not in EXPORT_CONTENT_TYPES:
+            raise ValueError(
+                f"Неподдерживаемый формат выгрузки: {fmt}. "
+                f"Поддерживаемые форматы: {', '.join(EXPORT_CONTENT_TYPES)}"
+            )
+        self.rows = rows
+        self.columns = columns
+        self.fmt = fmt
+        self.filename = filename
+
+    def iter_json(self) -> Iterator[str]:
+        """Сериализует строки в JSON-массив."""
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        separator = '['
+        for row in self.rows:
+            if isinstance(row, Mapping):
+                # Строки фабрики record сериализуются как объекты
+                row = row if isinstance(row, dict) else dict(row)
+            elif self.columns is not None:
+                row = dict(zip(self.columns, row))
+            yield separator
+            yield encoder.encode(row)
+            separator = ','
+        yield '[]' if separator == '[' else ']'
+
+    def iter_csv(self) -> Iterator[str]:
+        """Сериализует строки в CSV с заголовком из имен колонок."""
+        writer = csv.writer(_Echo())
+        if self.columns is not None:
+            yield writer.writerow(self.columns)
+
+        for row in self.rows:
+            if isinstance(row, Mapping):
+                if self.columns is None:
+                    self.columns = list(row.keys())
+                    yield writer.writerow(self.columns)
+                row = [row.get(column) for column in self.columns]
+            yield writer.writerow(row)
+
+    def response(self, request=None) -> StreamingHttpResponse:
+        """
+        Формирует потоковый ответ.
+
+        Args:
+            request: Объект запроса; для запроса под ASGI тело ответа - асинхронный итератор
+        """
+        parts = self.iter_csv() if self.fmt == 'csv' else self.iter_json()
+        content = _chunked(parts)
+        if request is not None and is_asgi_request(request):
+            content = aiter_sync(content, thread_sensitive=True)
+        response = StreamingHttpResponse(content, content_type=EXPORT_CONTENT_TYPES[self.fmt])
+        if self.filename:
+            response['Content-Disposition'] = f'attachment; filename="{self.filename}"'
+        # Выгрузка формируется по мере чтения, прокси не должен буферизовать ее целиком
+        response['X-Accel-Buffering'] = 'no'
+        return response
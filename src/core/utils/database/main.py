@@ -1,17 +1,26 @@
-from collections import OrderedDict
-from typing import Tuple
+from functools import partial
+from typing import Any, Iterable, Iterator, Optional, Union
 
-from django.db import connection
+from django.db import connections, transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
 from django.db.backends.utils import CursorWrapper
 
+from . import query_cache
+from .routers import get_read_alias, get_write_alias
+from .rows import RowFactory, get_row_factory
+from .statements import track_statement
 from .types import (
     RawSQL,
     Callable,
-    ListOrderedDict,
     Columns,
-    FetchResult,
 )
 
+# Количество строк, получаемых из базы за один fetchmany при потоковом чтении
+DEFAULT_BATCH_SIZE = 2000
+
+# Имя фабрики строк из rows.ROW_FACTORIES, ее экземпляр или None (фабрика класса)
+RowFactoryArg = Optional[Union[str, RowFactory]]
+
 
 class BaseQueryExecutor:
     @classmethod
@@ -24,60 +33,190 @@ class BaseQueryExecutor:
         return sql, params
 
     @classmethod
-    def fetchall(cls, get_query: Callable, *args, **kwargs):
+    def fetchall(cls, get_query: Callable, *args, row_factory: RowFactoryArg = None,
+                 cache_ttl: Optional[int] = None, cache_tables: Optional[Iterable[str]] = None, **kwargs):
         pass
 
     @classmethod
-    def fetchone(cls, get_query, *args, **kwargs):
+    def fetchone(cls, get_query, *args, row_factory: RowFactoryArg = None, **kwargs):
         pass
 
     @classmethod
     def execute(cls, get_query, *args, **kwargs):
         pass
 
+    @classmethod
+    def fetch_batches(cls, get_query: Callable, *args, batch_size: Optional[int] = None,
+                      row_factory: RowFactoryArg = None, **kwargs) -> Iterator:
+        pass
+
+    @classmethod
+    def iterate(cls, get_query: Callable, *args, batch_size: Optional[int] = None,
+                row_factory: RowFactoryArg = None, **kwargs) -> Iterator:
+        pass
+
 
 class QueryExecutor(BaseQueryExecutor):
+    # Фабрика строк по умолчанию, параметр row_factory запросов ее переопределяет
+    row_factory: str = 'tuple'
+    # Основная база из DATABASES; чтение идет на ее реплики, если они описаны
+    database: str = 'default'
+
     @classmethod
-    def _get_many_result(cls, cursor: CursorWrapper) -> FetchResult:
-        return cursor.fetchall()
+    def _get_connection(cls, write: bool = False) -> BaseDatabaseWrapper:
+        """Подключение для чтения (реплика) или записи (основная база)."""
+        return connections[get_write_alias(cls.database) if write else get_read_alias(cls.database)]
 
     @classmethod
-    def _get_result(cls, cursor: CursorWrapper) -> Tuple:
-        return cursor.fetchone()
+    def _get_columns(cls, cursor: CursorWrapper) -> Columns:
+        return [element[0] for element in cursor.description or ()]
 
     @classmethod
-    def fetchall(cls, get_query: Callable, *args, **kwargs):
-        sql, params = cls.get_raw_sql(get_query, *args, **kwargs)
-        with connection.cursor() as cursor:
+    def _get_row_factory(cls, row_factory: RowFactoryArg = None) -> RowFactory:
+        return get_row_factory(row_factory or cls.row_factory)
+
+    @classmethod
+    def _get_many_result(cls, cursor: CursorWrapper, row_factory: RowFactoryArg = None) -> Any:
+        return cls._get_batch_result(cursor, cursor.fetchall(), row_factory)
+
+    @classmethod
+    def _get_batch_result(cls, cursor: CursorWrapper, rows: list, row_factory: RowFactoryArg = None) -> Any:
+        return cls._get_row_factory(row_factory).many(cls._get_columns(cursor), rows)
+
+    @classmethod
+    def _get_result(cls, cursor: CursorWrapper, row_factory: RowFactoryArg = None) -> Any:
+        return cls._get_row_factory(row_factory).one(cls._get_columns(cursor), cursor.fetchone())
+
+    @classmethod
+    def _execute(cls, cursor: CursorWrapper, sql: str, params: Any) -> None:
+        with track_statement(sql):
             cursor.execute(sql, params)
-            return cls._get_many_result(cursor)
 
     @classmethod
-    def fetchone(cls, get_query, *args, **kwargs):
+    def _stream_cursor(cls, connection: BaseDatabaseWrapper) -> CursorWrapper:
+        """
+        Курсор для потокового чтения.
+
+        На PostgreSQL это именованный (серверный) курсор: строки передаются
+        клиенту по мере fetchmany, а не целиком при execute. Для остальных СУБД
+        и при DISABLE_SERVER_SIDE_CURSORS (pgbouncer в режиме транзакций)
+        используется обычный курсор.
+        """
+        if (connection.features.can_use_chunked_reads
+                and not connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS')):
+            return connection.chunked_cursor()
+        return connection.cursor()
+
+    @classmethod
+    def _fetch_rows(cls, sql: str, params: Any) -> tuple:
+        """
+        Колонки и строки запроса для заполнения кэша результатов.
+
+        Читает из основной базы: запись кэша живет cache_ttl секунд и сбрасывается
+        только при следующей записи в таблицу, поэтому результат отстающей
+        реплики остался бы в кэше и после того, как реплика догонит основную базу.
+        """
+        with cls._get_connection(write=True).cursor() as cursor:
+            cls._execute(cursor, sql, params)
+            return cls._get_columns(cursor), cursor.fetchall()
+
+    @classmethod
+    def fetchall(cls, get_query: Callable, *args, row_factory: RowFactoryArg = None,
+                 cache_ttl: Optional[int] = None, cache_tables: Optional[Iterable[str]] = None, **kwargs):
+        """
+        Выполняет запрос и возвращает все строки.
+
+        Args:
+            get_query: Функция, возвращающая SQL и параметры
+            row_factory: Фабрика строк (по умолчанию фабрика класса)
+            cache_ttl: Время жизни результата в кэше результатов, секунды (None - без кэша);
+                при промахе кэша запрос выполняется в основной базе, а не на реплике
+            cache_tables: Таблицы-теги результата (по умолчанию - таблицы из FROM/JOIN)
+        """
         sql, params = cls.get_raw_sql(get_query, *args, **kwargs)
-        with connection.cursor() as cursor:
-            cursor.execute(sql, params)
-            return cls._get_result(cursor)
+        if cache_ttl:
+            # В кэше хранятся колонки и строки, фабрика применяется при каждом чтении
+            columns, rows = query_cache.cached_result(
+                cls.database, sql, params, partial(cls._fetch_rows, sql, params), cache_ttl, cache_tables
+            )
+            return cls._get_row_factory(row_factory).many(columns, rows)
+        with cls._get_connection().cursor() as cursor:
+            cls._execute(cursor, sql, params)
+            return cls._get_many_result(cursor, row_factory)
+
+    @classmethod
+    def fetchone(cls, get_query, *args, row_factory: RowFactoryArg = None, **kwargs):
+        sql, params = cls.get_raw_sql(get_query, *args, **kwargs)
+        with cls._get_connection().cursor() as cursor:
+            cls._execute(cursor, sql, params)
+            return cls._get_result(cursor, row_factory)
 
     @classmethod
     def execute(cls, get_query, *args, **kwargs):
         sql, params = cls.get_raw_sql(get_query, *args, **kwargs)
+        connection = cls._get_connection(write=True)
         with connection.cursor() as cursor:
-            cursor.execute(sql, params)
-
+            cls._execute(cursor, sql, params)
+        if query_cache.is_enabled():
+            # Кэш результатов сбрасывается после фиксации транзакции, чтобы не закэшировать старые данные
+            transaction.on_commit(
+                partial(query_cache.invalidate_for_query, sql, cls.database), using=connection.alias
+            )
 
-class OrderedDictQueryExecutor(QueryExecutor):
     @classmethod
-    def __get_columns(cls, cursor: CursorWrapper) -> Columns:
-        return [element[0] for element in cursor.description]
+    def fetch_batches(cls, get_query: Callable, *args, batch_size: Optional[int] = None,
+                      row_factory: RowFactoryArg = None, **kwargs) -> Iterator:
+        """
+        Выполняет запрос и лениво возвращает результат пачками.
+
+        Курсор открыт, пока генератор не исчерпан или не закрыт, поэтому
+        в памяти находится не больше одной пачки.
+
+        Args:
+            get_query: Функция, возвращающая SQL и параметры
+            batch_size: Количество строк в пачке (по умолчанию DEFAULT_BATCH_SIZE)
+            row_factory: Фабрика строк (по умолчанию фабрика класса)
+
+        Yields:
+            Пачки строк в формате фабрики строк
+        """
+        sql, params = cls.get_raw_sql(get_query, *args, **kwargs)
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        factory = cls._get_row_factory(row_factory)
+        with cls._stream_cursor(cls._get_connection()) as cursor:
+            cls._execute(cursor, sql, params)
+            # У серверного курсора psycopg2 description заполняется только после первого FETCH
+            rows = cursor.fetchmany(batch_size)
+            columns = cls._get_columns(cursor)
+            while rows:
+                yield factory.many(columns, rows)
+                rows = cursor.fetchmany(batch_size)
 
     @classmethod
-    def _get_many_result(cls, cursor: CursorWrapper) -> ListOrderedDict:
-        columns: list[str] = cls.__get_columns(cursor)
-        return [OrderedDict(zip(columns, row)) for row in cursor.fetchall()]
+    def iterate(cls, get_query: Callable, *args, batch_size: Optional[int] = None,
+                row_factory: RowFactoryArg = None, **kwargs) -> Iterator:
+        """
+        Выполняет запрос и лениво возвращает строки по одной.
 
-    @classmethod
-    def _get_result(cls, cursor: CursorWrapper) -> OrderedDict:
-        columns: list[str] = cls.__get_columns(cursor)
-        row = cursor.fetchone()
-        return OrderedDict(zip(columns, row))
+        Фабрика строк проверяется при вызове, а запрос выполняется при первом
+        обращении к итератору.
+
+        Args:
+            get_query: Функция, возвращающая SQL и параметры
+            batch_size: Количество строк, получаемых из базы за раз
+            row_factory: Фабрика строк (колоночные фабрики не поддерживаются)
+
+        Returns:
+            Iterator: Строки в формате фабрики строк
+
+        Raises:
+            ValueError: Если фабрика колоночная (columnar, numpy) - для них fetch_batches
+        """
+        if cls._get_row_factory(row_factory).columnar:
+            raise ValueError('Колоночный результат нельзя перебирать по строкам, используйте fetch_batches')
+        batches = cls.fetch_batches(get_query, *args, batch_size=batch_size, row_factory=row_factory, **kwargs)
+        return (row for batch in batches for row in batch)
+
+
+class OrderedDictQueryExecutor(QueryExecutor):
+    row_factory: str = 'ordered_dict'
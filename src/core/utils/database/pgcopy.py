@@ -0,0 +1,185 @@
+"""
+Файл с колоночной выгрузкой результата запроса PostgreSQL через COPY.
+
+`COPY (<запрос>) TO STDOUT` передает результат одним потоком CSV без
+создания Python-объекта на каждую ячейку: поток записывается во временный
+файл (в памяти до COPY_SPOOL_SIZE, далее на диске) и разбирается
+C-парсером pandas сразу в массивы NumPy по колонкам.
+
+Типы колонок определяются по описанию запроса (выполняется с LIMIT 0) и
+переопределяются подсказками dtypes. NULL выгружается как `\\N` и становится
+NaN, пустая строка остается пустой строкой; непустое значение `\\N` в
+текстовой колонке тоже прочитается как NaN.
+"""
+
+import logging
+import tempfile
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from psycopg2.extensions import encodings
+
+logger = logging.getLogger('utils')
+
+# Объем результата COPY, который держится в памяти до переноса во временный файл
+COPY_SPOOL_SIZE = 64 * 1024 * 1024
+
+# Типы pandas для OID типов PostgreSQL. Целые и bool определяет парсер
+# (int64/bool, при NULL - float64/object, как в read_sql_query): явные
+# nullable-типы Int64/boolean замедляют разбор примерно вдвое
+PG_TYPE_DTYPES = {
+    700: 'float64',     # float4
+    701: 'float64',     # float8
+    1700: 'float64',    # numeric (как coerce_float в read_sql_query)
+    18: 'object',       # char
+    19: 'object',       # name
+    25: 'object',       # text
+    1042: 'object',     # bpchar
+    1043: 'object',     # varchar
+}
+
+# Представление NULL в CSV: без него NULL и пустая строка выгружаются одинаково
+COPY_NULL = '\\N'
+
+# Колонки дат и времени разбираются после чтения CSV
+PG_DATE_TYPES = {1082, 1114}
+PG_DATE_TZ_TYPES = {1184}
+
+def prepare_copy_query(cursor: Any, sql: str, params: Any) -> str:
+    """
+    Подставляет параметры в запрос на стороне клиента (COPY не принимает параметры).
+
+    Args:
+        cursor: Курсор psycopg2
+        sql: Запрос
+        params: Параметры запроса
+
+    Returns:
+        str: Запрос с подставленными значениями
+    """
+    query = cursor.mogrify(sql, params or None)
+    if isinstance(query, bytes):
+        query = query.decode(encodings.get(cursor.connection.encoding, 'utf-8'))
+    return query.strip().rstrip(';')
+
+def describe_query(cursor: Any, query: str) -> List[Tuple[str, int]]:
+    """Имена и OID типов колонок результата (запрос выполняется с LIMIT 0)."""
+    cursor.execute(f'SELECT * FROM ({query}) AS copy_query LIMIT 0')
+    return [(column[0], column[1]) for column in cursor.description]
+
+def copy_query_to_file(raw_connection: Any, sql: str, params: Any) -> Tuple[Any, List[Tuple[str, int]]]:
+    """
+    Выполняет COPY результата запроса во временный файл.
+
+    Соединение остается в исходном состоянии: COPY выполняется в транзакции,
+    которая откатывается (SET LOCAL действует только внутри нее).
+
+    Args:
+        raw_connection: DBAPI-соединение psycopg2
+        sql: Запрос
+        params: Параметры запроса
+
+    Returns:
+        Tuple: Файл с CSV (позиция в начале) и описание колонок
+    """
+    file = tempfile.SpooledTemporaryFile(max_size=COPY_SPOOL_SIZE, mode='w+b')
+    try:
+        with raw_connection.cursor() as cursor:
+            query = prepare_copy_query(cursor, sql, params)
+            # Время с часовым поясом выгружается в UTC, чтобы его можно было разобрать одним форматом
+            cursor.execute("SET LOCAL TIME ZONE 'UTC'")
+            columns = describe_query(cursor, query)
+            cursor.copy_expert(
+                f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER false, NULL '{COPY_NULL}')", file
+            )
+    except Exception:
+        file.close()
+        raise
+    finally:
+        raw_connection.rollback()
+
+    file.seek(0)
+    return file, columns
+
+def get_copy_dtypes(columns: List[Tuple[str, int]],
+                    dtypes: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, bool]]:
+    """
+    Типы колонок для чтения CSV.
+
+    Args:
+        columns: Имена и OID типов колонок
+        dtypes: Подсказки типов по имени колонки (имеют приоритет)
+
+    Returns:
+        Tuple: Типы для read_csv и колонки дат (имя -> признак часового пояса)
+    """
+    dtypes = dtypes or {}
+    csv_dtypes = {}
+    date_columns = {}
+    for name, type_code in columns:
+        if name in dtypes:
+            csv_dtypes[name] = dtypes[name]
+        elif type_code in PG_DATE_TYPES or type_code in PG_DATE_TZ_TYPES:
+            csv_dtypes[name] = 'object'
+            date_columns[name] = type_code in PG_DATE_TZ_TYPES
+        elif type_code in PG_TYPE_DTYPES:
+            csv_dtypes[name] = PG_TYPE_DTYPES[type_code]
+    return csv_dtypes, date_columns
+
+def _convert_dates(frame: pd.DataFrame, date_columns: Dict[str, bool]) -> pd.DataFrame:
+    for name, with_tz in date_columns.items():
+        frame[name] = pd.to_datetime(frame[name], format='ISO8601', utc=with_tz)
+    return frame
+
+def read_copy_frame(file: Any, columns: List[Tuple[str, int]], dtypes: Optional[Dict[str, Any]] = None,
+                    chunksize: Optional[int] = None) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """
+    Разбирает CSV, полученный COPY, в DataFrame.
+
+    Args:
+        file: Файл с CSV без заголовка
+        columns: Имена и OID типов колонок
+        dtypes: Подсказки типов по имени колонки
+        chunksize: Количество строк в DataFrame при чтении частями (None - целиком)
+
+    Returns:
+        DataFrame или итератор DataFrame (файл закрывается после чтения)
+    """
+    # read_csv не допускает повторяющихся имен (например, id из двух таблиц в JOIN)
+    names = []
+    for position, (name, type_code) in enumerate(columns):
+        if name in names:
+            name = f'{name}_{position}'
+            columns[position] = (name, type_code)
+        names.append(name)
+    csv_dtypes, date_columns = get_copy_dtypes(columns, dtypes)
+    options = {
+        'names': names,
+        'header': None,
+        'dtype': csv_dtypes,
+        'true_values': ['t'],
+        'false_values': ['f'],
+        'keep_default_na': False,
+        'na_values': [COPY_NULL],
+    }
+
+    if not file.read(1):
+        # pandas не разбирает пустой CSV
+        file.close()
+        frame = pd.DataFrame({name: pd.Series(dtype=csv_dtypes.get(name, 'object')) for name in names})
+        frame = _convert_dates(frame, date_columns)
+        return frame if chunksize is None else iter(())
+    file.seek(0)
+
+    if chunksize is None:
+        with file:
+            return _convert_dates(pd.read_csv(file, **options), date_columns)
+
+    def iter_chunks() -> Iterator[pd.DataFrame]:
+        with file, pd.read_csv(file, chunksize=chunksize, **options) as reader:
+            for chunk in reader:
+                yield _convert_dates(chunk, date_columns)
+
+    return iter_chunks()
@@ -0,0 +1,70 @@
+"""
+Файл со статистикой переиспользования подключений к базам данных.
+
+Для баз с пулом psycopg 3 возвращается статистика пула (размер, свободные
+подключения, ожидающие запросы, время ожидания), для остальных - настройки
+постоянных подключений и состояние подключения текущего потока. Отдельно
+приводится статистика пулов engine SQLAlchemy и асинхронных подключений
+(AsyncQueryExecutor), созданных для базы, состояние ее SSH-туннеля и
+состояние ее реплик.
+Статистика относится к текущему процессу.
+"""
+
+import logging
+
+from typing import Any, Dict
+
+from django.db import connections
+
+from src.core.utils.database.aio import get_async_pool_stats
+from src.core.utils.database.engines import get_engine_stats
+from src.core.utils.database.routers import get_replica_stats
+from src.core.utils.database.tunnels import get_tunnel_stats
+
+logger = logging.getLogger('utils')
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Возвращает статистику подключений по всем базам из DATABASES.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Статистика по имени базы
+    """
+    stats = {}
+    async_stats = get_async_pool_stats()
+    replica_stats = get_replica_stats()
+    for alias in connections:
+        wrapper = connections[alias]
+        settings_dict = wrapper.settings_dict
+        alias_stats = {
+            'vendor': wrapper.vendor,
+            'conn_max_age': settings_dict.get('CONN_MAX_AGE', 0),
+            'conn_health_checks': settings_dict.get('CONN_HEALTH_CHECKS', False),
+            'connected': wrapper.connection is not None,
+            'pool': None,
+            # Пулы engine SQLAlchemy (SqlAlchemyManager) этой базы
+            'sqlalchemy': get_engine_stats(alias),
+            # Пулы асинхронных подключений (сумма по циклам событий)
+            'async_pool': async_stats.get(alias),
+            # Туннель из пула SSH-туннелей (None, если база без SSH или туннель не открывался)
+            'ssh_tunnel': get_tunnel_stats(settings_dict['SSH']) if settings_dict.get('SSH') else None,
+            # Реплики основной базы: доступность, отставание, вес (None, если реплик нет)
+            'replicas': replica_stats.get(alias, {}).get('replicas'),
+        }
+
+        # Пул создается при первом подключении, здесь он только читается
+        pool = getattr(wrapper, '_connection_pools', {}).get(alias)
+        if pool is not None:
+            alias_stats['pool'] = pool.get_stats()
+        elif settings_dict.get('OPTIONS', {}).get('pool'):
+            alias_stats['pool'] = {}
+
+        stats[alias] = alias_stats
+    return stats
+
+def log_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Записывает статистику подключений в лог и возвращает ее."""
+    stats = get_pool_stats()
+    for alias, alias_stats in stats.items():
+        logger.info("Подключения к базе '%s': %s", alias, alias_stats)
+    return stats
@@ -0,0 +1,248 @@
+"""
+Файл с кэшем результатов запросов исполнителей.
+
+Кэш включается настройкой QUERY_CACHE и параметром cache_ttl запроса:
+
+>>> QueryExecutor.fetchall(get_report_query, year, cache_ttl=300)
+>>> await AsyncQueryExecutor.fetchall(get_report_query, year, cache_ttl=300)
+>>> manager.fetchall(get_report_query, year, cache_ttl=300, cache_tables=['orders'])
+
+Ключ записи - хеш нормализованного текста запроса, параметров и имени базы.
+Каждая таблица запроса (cache_tables или таблицы после FROM/JOIN) - тег,
+то есть пространство имен query:<база>:<таблица>; номер его поколения входит
+в ключ. Запись в таблицу через execute() или to_sql() увеличивает поколение
+тега (после фиксации транзакции), и записи, прочитавшие таблицу, становятся
+недостижимыми. Тег можно сбросить и вручную:
+
+>>> python src/manage.py clear_cache --namespace query:default:orders
+
+Результат хранится в сериализованном виде: pickle протокола 5, где массивы
+NumPy (колонки DataFrame) передаются внешними буферами и записываются
+подряд без промежуточных копий. Результаты больше QUERY_CACHE_MAX_ENTRY_SIZE
+не кэшируются; общий объем ограничен бэкендом кэша (MAX_ENTRIES, maxmemory).
+"""
+
+import hashlib
+import json
+import logging
+import pickle
+import re
+import struct
+import threading
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+
+from src.core.utils.cache.namespaces import anamespace_versions, clear_namespace, namespace_versions
+from src.core.utils.database.statements import normalize_sql
+
+logger = logging.getLogger('utils')
+
+# Таблицы, из которых читает запрос
+READ_TABLE_RE = re.compile(r'\b(?:from|join)\s+(?:only\s+)?([\w."]+)', re.IGNORECASE)
+
+# Таблицы, в которые пишет запрос
+WRITE_TABLE_RE = re.compile(
+    r'\b(?:insert\s+into|update|delete\s+from|merge\s+into|truncate(?:\s+table)?|copy'
+    r'|alter\s+table|drop\s+table(?:\s+if\s+exists)?)\s+(?:only\s+)?([\w."]+)',
+    re.IGNORECASE,
+)
+
+# Слова, которые регулярные выражения принимают за имя таблицы (DO UPDATE SET, FOR UPDATE OF)
+NOT_TABLES = {'set', 'of', 'nowait', 'skip', 'lateral', 'select', 'table'}
+
+# Заголовок сериализованного результата: количество внешних буферов
+_HEADER = struct.Struct('<I')
+_LENGTH = struct.Struct('<Q')
+
+_stats = {'hits': 0, 'misses': 0, 'skipped': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+def is_enabled() -> bool:
+    """Включен ли кэш результатов запросов."""
+    return getattr(settings, 'QUERY_CACHE', False)
+
+def get_cache() -> BaseCache:
+    """Бэкенд кэша результатов (алиас QUERY_CACHE_BACKEND)."""
+    return caches[getattr(settings, 'QUERY_CACHE_BACKEND', 'default')]
+
+def _count(counter: str, value: int = 1) -> None:
+    with _stats_lock:
+        _stats[counter] += value
+
+def get_query_cache_stats() -> Dict[str, int]:
+    """Счетчики попаданий и промахов кэша результатов текущего процесса."""
+    with _stats_lock:
+        return dict(_stats)
+
+def normalize_table(table: str) -> str:
+    """Имя таблицы для тега: без кавычек и схемы (public.orders и orders - один тег)."""
+    return table.replace('"', '').rsplit('.', 1)[-1].lower()
+
+def _table_names(regex: re.Pattern, sql: str) -> List[str]:
+    tables = []
+    for match in regex.finditer(sql):
+        name = normalize_table(match.group(1))
+        if name and name not in NOT_TABLES and name not in tables:
+            tables.append(name)
+    return tables
+
+def get_read_tables(sql: str) -> List[str]:
+    """Таблицы после FROM и JOIN (имена CTE и функций тоже попадают, что лишь расширяет инвалидацию)."""
+    return _table_names(READ_TABLE_RE, sql)
+
+def get_write_tables(sql: str) -> List[str]:
+    """Таблицы, изменяемые запросом (INSERT, UPDATE, DELETE, MERGE, TRUNCATE, COPY, ALTER, DROP)."""
+    return _table_names(WRITE_TABLE_RE, sql)
+
+def get_tag_namespace(database: str, table: str) -> str:
+    """Пространство имен тега таблицы."""
+    return f'query:{database}:{normalize_table(table)}'
+
+def serialize_result(value: Any) -> bytes:
+    """
+    Сериализует результат: pickle протокола 5 и внешние буферы подряд.
+
+    Формат: количество буферов, затем для pickle и каждого буфера - длина и данные.
+    """
+    buffers: List[pickle.PickleBuffer] = []
+    payload = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+    parts = [_HEADER.pack(len(buffers)), _LENGTH.pack(len(payload)), payload]
+    for buffer in buffers:
+        raw = buffer.raw()
+        parts.append(_LENGTH.pack(raw.nbytes))
+        parts.append(raw)
+    return b''.join(parts)
+
+def deserialize_result(data: bytes) -> Any:
+    """
+    Восстанавливает результат, сериализованный serialize_result.
+
+    Буферы - срезы одной изменяемой копии данных, поэтому массивы DataFrame
+    доступны для записи, а данные копируются один раз.
+    """
+    view = memoryview(bytearray(data))
+    (count,) = _HEADER.unpack_from(view, 0)
+    offset = _HEADER.size
+    chunks = []
+    for _ in range(count + 1):
+        (length,) = _LENGTH.unpack_from(view, offset)
+        offset += _LENGTH.size
+        chunks.append(view[offset:offset + length])
+        offset += length
+    return pickle.loads(chunks[0], buffers=chunks[1:])
+
+def make_key(database: str, sql: str, params: Any, versions: Dict[str, int], kind: str = 'rows') -> str:
+    """Ключ записи: хеш базы, вида результата, нормализованного запроса, параметров и поколений тегов."""
+    raw = json.dumps(
+        [database, kind, normalize_sql(sql), params, sorted(versions.items())],
+        sort_keys=True, default=repr,
+    )
+    return f'query:{database}:{hashlib.sha1(raw.encode("utf-8")).hexdigest()}'
+
+def cached_result(database: str, sql: str, params: Any, compute: Callable[[], Any], ttl: Optional[int],
+                  tables: Optional[Iterable[str]] = None, kind: str = 'rows') -> Any:
+    """
+    Возвращает результат запроса из кэша или вычисляет и сохраняет его.
+
+    Args:
+        database: Имя базы из DATABASES
+        sql: Запрос
+        params: Параметры запроса
+        compute: Функция, выполняющая запрос
+        ttl: Время жизни записи, секунды (None или 0 - без кэша)
+        tables: Теги записи (по умолчанию - таблицы из FROM/JOIN запроса)
+        kind: Вид результата (rows - колонки и строки, frame - DataFrame)
+    """
+    if not ttl or not is_enabled():
+        return compute()
+
+    cache = get_cache()
+    tables = list(tables) if tables is not None else get_read_tables(sql)
+    namespaces = [get_tag_namespace(database, table) for table in tables]
+    versions = namespace_versions(namespaces, cache) if namespaces else {}
+    key = make_key(database, sql, params, versions, kind)
+
+    data = cache.get(key)
+    if data is not None:
+        _count('hits')
+        return deserialize_result(data)
+
+    _count('misses')
+    value = compute()
+    data = _serialize_for_cache(value)
+    if data is not None:
+        cache.set(key, data, ttl)
+    return value
+
+async def acached_result(database: str, sql: str, params: Any, compute: Callable[[], Awaitable[Any]],
+                         ttl: Optional[int], tables: Optional[Iterable[str]] = None, kind: str = 'rows') -> Any:
+    """
+    Асинхронный вариант `cached_result`: compute возвращает корутину.
+    """
+    if not ttl or not is_enabled():
+        return await compute()
+
+    cache = get_cache()
+    tables = list(tables) if tables is not None else get_read_tables(sql)
+    namespaces = [get_tag_namespace(database, table) for table in tables]
+    versions = await anamespace_versions(namespaces, cache) if namespaces else {}
+    key = make_key(database, sql, params, versions, kind)
+
+    data = await cache.aget(key)
+    if data is not None:
+        _count('hits')
+        return deserialize_result(data)
+
+    _count('misses')
+    value = await compute()
+    data = _serialize_for_cache(value)
+    if data is not None:
+        await cache.aset(key, data, ttl)
+    return value
+
+def _serialize_for_cache(value: Any) -> Optional[bytes]:
+    """Сериализованный результат или None, если он больше QUERY_CACHE_MAX_ENTRY_SIZE."""
+    data = serialize_result(value)
+    if len(data) > getattr(settings, 'QUERY_CACHE_MAX_ENTRY_SIZE', 16 * 1024 * 1024):
+        _count('skipped')
+        logger.debug(f"Результат запроса не кэшируется: {len(data)} байт")
+        return None
+    return data
+
+def invalidate_tables(tables: Iterable[str], database: str = 'default') -> None:
+    """
+    Инвалидирует записи, помеченные тегами таблиц.
+
+    Args:
+        tables: Имена таблиц
+        database: Имя базы из DATABASES
+    """
+    if not is_enabled():
+        return
+    cache = get_cache()
+    for table in tables:
+        clear_namespace(get_tag_namespace(database, table), cache)
+        _count('invalidations')
+
+async def ainvalidate_tables(tables: Iterable[str], database: str = 'default') -> None:
+    """Асинхронный вариант `invalidate_tables`."""
+    if is_enabled():
+        await sync_to_async(invalidate_tables)(list(tables), database)
+
+def invalidate_for_query(sql: str, database: str = 'default') -> List[str]:
+    """
+    Инвалидирует теги таблиц, в которые пишет запрос.
+
+    Returns:
+        List[str]: Таблицы запроса (пустой список, если кэш выключен)
+    """
+    if not is_enabled():
+        return []
+    tables = get_write_tables(sql)
+    invalidate_tables(tables, database)
+    return tables
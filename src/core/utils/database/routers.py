@@ -0,0 +1,360 @@
+"""
+Файл с маршрутизацией запросов между основной базой и репликами.
+
+Реплики описываются в databases.yaml:
+
+    databases:
+      default:
+        engine: postgresql
+        ...
+      default_replica:
+        engine: postgresql
+        role: replica        # primary (по умолчанию) или replica
+        replica_of: default  # Основная база реплики
+        weight: 2            # Доля чтений (взвешенный round-robin)
+        max_lag: 10          # Максимальное отставание, секунды (не задано - не проверяется)
+        ...
+
+Чтение (ORM через PrimaryReplicaRouter и QueryExecutor) направляется на
+исправные реплики взвешенным round-robin, запись - на основную базу. После
+записи чтение закрепляется за основной базой: до конца запроса, а через cookie
+REPLICA_PIN_COOKIE - еще на REPLICA_PIN_SECONDS секунд (чтобы клиент видел свои
+изменения после перенаправления); вне запросов (Celery, команды) - на
+REPLICA_PIN_SECONDS секунд. Внутри транзакции основной базы чтение тоже идет
+в нее. Запросы с cache_ttl при промахе кэша результатов выполняются в основной
+базе, чтобы в кэш не попал результат отстающей реплики.
+
+Состояние реплик (доступность и отставание) проверяется в фоновом потоке не
+чаще, чем раз в REPLICA_CHECK_INTERVAL секунд; пока проверка идет, используется
+предыдущий результат. Если исправных реплик нет, чтение идет в основную базу.
+"""
+
+import contextvars
+import logging
+import math
+import os
+import threading
+import time
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger('utils')
+
+# Cookie, закрепляющая чтение клиента за основной базой после записи
+REPLICA_PIN_COOKIE = 'replica_pin'
+
+# Запросы отставания реплики, секунды (0 - реплика догнала основную базу)
+LAG_QUERIES = {
+    'postgresql': (
+        "SELECT CASE WHEN NOT pg_is_in_recovery() "
+        "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+    'mysql': 'SHOW REPLICA STATUS',
+}
+
+# Колонки отставания в SHOW REPLICA STATUS (MySQL 8.0.22+ и старые версии)
+MYSQL_LAG_COLUMNS = ('Seconds_Behind_Source', 'Seconds_Behind_Master')
+
+
+class Replica:
+    """Реплика и ее состояние."""
+
+    def __init__(self, alias: str, weight: int = 1, max_lag: Optional[float] = None) -> None:
+        self.alias = alias
+        self.weight = max(int(weight), 0)
+        self.max_lag = max_lag
+        self.healthy = True
+        self.lag: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        # Текущий вес для плавного взвешенного round-robin
+        self.current_weight = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'alias': self.alias,
+            'weight': self.weight,
+            'max_lag': self.max_lag,
+            'healthy': self.healthy,
+            'lag': self.lag,
+            'last_error': self.last_error,
+            'checked_at': self.checked_at,
+        }
+
+
+def get_replica_lag(alias: str) -> float:
+    """
+    Отставание реплики в секундах (подключение потока закрывается после проверки).
+
+    Raises:
+        Exception: Если реплика недоступна или репликация остановлена
+    """
+    connection = connections[alias]
+    try:
+        query = LAG_QUERIES.get(connection.vendor)
+        with connection.cursor() as cursor:
+            if query is None:
+                cursor.execute('SELECT 1')
+                return 0.0
+            cursor.execute(query)
+            row = cursor.fetchone()
+            if connection.vendor != 'mysql':
+                return float(row[0] or 0)
+            if row is None:
+                raise RuntimeError('Репликация не настроена')
+            columns = [column[0] for column in cursor.description]
+            for name in MYSQL_LAG_COLUMNS:
+                if name in columns:
+                    lag = row[columns.index(name)]
+                    if lag is None:
+                        raise RuntimeError('Репликация остановлена')
+                    return float(lag)
+            return 0.0
+    finally:
+        connection.close()
+
+
+class ReplicaSet:
+    """
+    Основная база и ее реплики.
+    """
+    def __init__(self, primary: str, replicas: List[Replica]) -> None:
+        self.primary = primary
+        self.replicas = replicas
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._checking = False
+
+    def choose(self) -> str:
+        """
+        Выбирает реплику для чтения плавным взвешенным round-robin
+        (как в nginx: реплики с большим весом не идут подряд).
+
+        Returns:
+            str: Имя реплики или основной базы, если исправных реплик нет
+        """
+        self.refresh_in_background()
+        with self._lock:
+            best = None
+            total = 0
+            for replica in self.replicas:
+                if not replica.healthy or not replica.weight:
+                    continue
+                replica.current_weight += replica.weight
+                total += replica.weight
+                if best is None or replica.current_weight > best.current_weight:
+                    best = replica
+            if best is None:
+                return self.primary
+            best.current_weight -= total
+            return best.alias
+
+    def check(self) -> None:
+        """Проверяет доступность и отставание реплик."""
+        for replica in self.replicas:
+            try:
+                lag = get_replica_lag(replica.alias)
+            except Exception as e:
+                replica.lag = None
+                replica.last_error = str(e)
+                healthy = False
+            else:
+                replica.lag = lag
+                replica.last_error = None
+                healthy = replica.max_lag is None or lag <= replica.max_lag
+            replica.checked_at = time.time()
+            if healthy != replica.healthy:
+                log = logger.info if healthy else logger.warning
+                log(f"Реплика '{replica.alias}' {'снова используется' if healthy else 'исключена'}: "
+                    f"отставание {replica.lag}, ошибка {replica.last_error}")
+            replica.healthy = healthy
+
+    def refresh_in_background(self) -> None:
+        """Запускает проверку реплик в фоновом потоке, если предыдущая устарела."""
+        interval = getattr(settings, 'REPLICA_CHECK_INTERVAL', 5)
+        now = time.monotonic()
+        with self._lock:
+            if self._checking or now - self._checked_at < interval:
+                return
+            self._checking = True
+
+        def run() -> None:
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Ошибка при проверке реплик '{self.primary}': {str(e)}")
+            finally:
+                with self._lock:
+                    self._checked_at = time.monotonic()
+                    self._checking = False
+
+        threading.Thread(target=run, name=f'replica-check-{self.primary}', daemon=True).start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'primary': self.primary, 'replicas': [replica.get_stats() for replica in self.replicas]}
+
+
+_replica_sets: Optional[Dict[str, ReplicaSet]] = None
+_replica_sets_lock = threading.Lock()
+
+def get_replica_sets() -> Dict[str, ReplicaSet]:
+    """Наборы реплик по имени основной базы (из ключа REPLICA в DATABASES)."""
+    global _replica_sets
+    if _replica_sets is None:
+        with _replica_sets_lock:
+            if _replica_sets is None:
+                replicas: Dict[str, List[Replica]] = {}
+                for alias, db_settings in settings.DATABASES.items():
+                    replica_config = db_settings.get('REPLICA')
+                    if replica_config:
+                        replicas.setdefault(replica_config['of'], []).append(
+                            Replica(alias, replica_config.get('weight', 1), replica_config.get('max_lag'))
+                        )
+                _replica_sets = {primary: ReplicaSet(primary, items) for primary, items in replicas.items()}
+    return _replica_sets
+
+def _reset_after_fork() -> None:
+    # Фоновые проверки не переживают fork: дочерний процесс начинает с нуля
+    global _replica_sets
+    _replica_sets = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def get_primary(alias: str) -> str:
+    """Основная база для имени реплики (для основной базы - она сама)."""
+    replica_config = settings.DATABASES.get(alias, {}).get('REPLICA')
+    return replica_config['of'] if replica_config else alias
+
+def get_replica_stats() -> Dict[str, Dict[str, Any]]:
+    """Состояние реплик текущего процесса по имени основной базы."""
+    return {primary: replica_set.get_stats() for primary, replica_set in get_replica_sets().items()}
+
+
+class PinState:
+    """Закрепление чтения за основной базой в текущем контексте."""
+
+    __slots__ = ('until', 'wrote', 'request')
+
+    def __init__(self, request: bool = False, pinned: bool = False) -> None:
+        self.until = math.inf if pinned else 0.0
+        self.wrote = False
+        self.request = request
+
+_pin: contextvars.ContextVar = contextvars.ContextVar('replica_pin', default=None)
+
+def pin_to_primary() -> None:
+    """Закрепляет чтение за основной базой после записи."""
+    state = _pin.get()
+    if state is None:
+        state = PinState()
+        _pin.set(state)
+    state.wrote = True
+    # В запросе - до его конца (далее cookie), вне запроса - на REPLICA_PIN_SECONDS
+    state.until = math.inf if state.request else time.monotonic() + getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+def is_pinned() -> bool:
+    """Закреплено ли чтение за основной базой."""
+    state = _pin.get()
+    return state is not None and state.until > time.monotonic()
+
+def get_read_alias(alias: str = DEFAULT_DB_ALIAS) -> str:
+    """
+    База для чтения: реплика основной базы alias или сама основная база.
+
+    Args:
+        alias: Имя основной базы из DATABASES
+    """
+    replica_set = get_replica_sets().get(alias)
+    if replica_set is None or is_pinned() or connections[alias].in_atomic_block:
+        return alias
+    return replica_set.choose()
+
+def get_write_alias(alias: str = DEFAULT_DB_ALIAS) -> str:
+    """
+    База для записи (основная) с закреплением последующего чтения за ней.
+
+    Args:
+        alias: Имя базы из DATABASES
+    """
+    primary = get_primary(alias)
+    if primary in get_replica_sets():
+        pin_to_primary()
+    return primary
+
+
+class PrimaryReplicaRouter:
+    """
+    Маршрутизатор Django: чтение - с реплик базы default, запись - в основную базу.
+
+    Подключается в DATABASE_ROUTERS, если в databases.yaml есть реплики.
+    """
+    def db_for_read(self, model: Any, **hints: Any) -> Optional[str]:
+        return get_read_alias(DEFAULT_DB_ALIAS)
+
+    def db_for_write(self, model: Any, **hints: Any) -> Optional[str]:
+        return get_write_alias(DEFAULT_DB_ALIAS)
+
+    def allow_relation(self, obj1: Any, obj2: Any, **hints: Any) -> Optional[bool]:
+        # Объекты реплики и основной базы - одни и те же данные
+        if get_primary(obj1._state.db or DEFAULT_DB_ALIAS) == get_primary(obj2._state.db or DEFAULT_DB_ALIAS):
+            return True
+        return None
+
+    def allow_migrate(self, db: str, app_label: str, model_name: Optional[str] = None, **hints: Any) -> Optional[bool]:
+        # Схема реплики приходит с основной базы
+        if settings.DATABASES.get(db, {}).get('REPLICA'):
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    """
+    Middleware закрепления чтения за основной базой.
+
+    Запрос с cookie REPLICA_PIN_COOKIE читает из основной базы. Если запрос
+    выполнил запись, cookie выставляется на REPLICA_PIN_SECONDS секунд.
+    Без реплик middleware ничего не делает.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Any) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, request: Any) -> Tuple[Optional[PinState], Any]:
+        if not get_replica_sets():
+            return None, None
+        state = PinState(request=True, pinned=REPLICA_PIN_COOKIE in request.COOKIES)
+        return state, _pin.set(state)
+
+    def _finish(self, response: Any, state: Optional[PinState]) -> Any:
+        pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        if state is not None and state.wrote and pin_seconds:
+            response.set_cookie(REPLICA_PIN_COOKIE, '1', max_age=pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+    def __call__(self, request: Any) -> Any:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self._start(request)
+        try:
+            return self._finish(self.get_response(request), state)
+        finally:
+            if token is not None:
+                _pin.reset(token)
+
+    async def __acall__(self, request: Any) -> Any:
+        state, token = self._start(request)
+        try:
+            return self._finish(await self.get_response(request), state)
+        finally:
+            if token is not None:
+                _pin.reset(token)
@@ -0,0 +1,254 @@
+"""
+Файл с фабриками строк для результатов запросов.
+
+Фабрика превращает строки курсора (кортежи) и имена колонок в структуру,
+которую получает вызывающий код. Выбирается для каждого запроса параметром
+row_factory у QueryExecutor / OrderedDictQueryExecutor / DataBaseManager:
+
+- tuple - кортежи курсора без преобразования;
+- dict - обычные словари (упорядочены, как и OrderedDict);
+- ordered_dict - OrderedDict на каждую строку (прежнее поведение);
+- record - экземпляры класса со __slots__, создаваемого один раз на набор
+  колонок: доступ по атрибуту (row.name) и по имени колонки (row['name']),
+  в несколько раз меньше памяти, чем словарь на строку;
+- columnar - словарь списков по колонкам;
+- numpy - структурированный массив NumPy.
+
+Все варианты сериализуются JSONRenderer DRF: record - как объект,
+numpy - как массив массивов.
+"""
+
+import keyword
+
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .types import Columns
+
+class Record(Mapping):
+    """
+    Базовый класс строки результата.
+
+    Классы-наследники создаются make_record_class для каждого набора колонок.
+    Значения хранятся в слотах, имена колонок - в классе, поэтому строка
+    занимает примерно столько же памяти, сколько кортеж.
+    """
+    __slots__ = ()
+
+    # Имена колонок и соответствующие им имена слотов
+    _columns: Tuple[str, ...] = ()
+    _fields: Tuple[str, ...] = ()
+    _index: Dict[str, str] = {}
+
+    def __getitem__(self, column: str) -> Any:
+        return getattr(self, self._index[column])
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __repr__(self) -> str:
+        values = ', '.join(f'{column}={self[column]!r}' for column in self._index)
+        return f'{type(self).__name__}({values})'
+
+    def __reduce__(self):
+        return make_record, (self._columns, tuple(getattr(self, field) for field in self._fields))
+
+    def _asdict(self) -> Dict[str, Any]:
+        """Строка в виде словаря."""
+        return {column: getattr(self, field) for column, field in self._index.items()}
+
+def _make_field_names(columns: Sequence[str]) -> Tuple[str, ...]:
+    """
+    Имена слотов для колонок.
+
+    Колонки с именами, которые не являются идентификаторами Python, совпадают
+    с методами Record или повторяются (например, id из двух таблиц в JOIN),
+    получают имена вида _<номер>; по имени колонки они по-прежнему доступны
+    через row['имя'].
+    """
+    reserved = set(dir(Record))
+    fields = []
+    seen = set()
+    for position, column in enumerate(columns):
+        name = str(column)
+        if (not name.isidentifier() or keyword.iskeyword(name) or name.startswith('_')
+                or name in reserved or name in seen):
+            name = f'_{position}'
+        seen.add(name)
+        fields.append(name)
+    return tuple(fields)
+
+@lru_cache(maxsize=256)
+def make_record_class(columns: Tuple[str, ...]) -> type:
+    """
+    Создает класс строки для набора колонок (кэшируется по именам колонок).
+
+    Args:
+        columns: Имена колонок в порядке курсора
+
+    Returns:
+        type: Наследник Record со слотами под колонки
+    """
+    fields = _make_field_names(columns)
+
+    # __init__ генерируется с позиционными параметрами: так строка создается
+    # одним вызовом без циклов на Python
+    args = ''.join(f', {field}' for field in fields)
+    body = ''.join(f'\n    self.{field} = {field}' for field in fields) or '\n    pass'
+    namespace: Dict[str, Any] = {}
+    exec(f'def __init__(self{args}):{body}', namespace)
+
+    index = {}
+    for column, field in zip(columns, fields):
+        # При повторяющихся именах по имени колонки доступна первая из них
+        index.setdefault(column, field)
+
+    return type('Record', (Record,), {
+        '__slots__': fields,
+        '__init__': namespace['__init__'],
+        '_columns': columns,
+        '_fields': fields,
+        '_index': index,
+    })
+
+def make_record(columns: Tuple[str, ...], values: Sequence[Any]) -> Record:
+    """Создает строку по именам колонок и значениям (используется при pickle)."""
+    return make_record_class(columns)(*values)
+
+def _unique_names(columns: Columns) -> List[str]:
+    """Имена колонок без повторов: повторяющиеся получают суффикс _<номер>."""
+    names = []
+    for position, column in enumerate(columns):
+        names.append(column if column not in names else f'{column}_{position}')
+    return names
+
+class RowFactory:
+    """
+    Базовая фабрика строк.
+
+    Атрибут columnar означает, что результат пачки - не список строк,
+    а одна структура на всю пачку (такой результат нельзя перебирать по строкам).
+    """
+    columnar = False
+
+    def many(self, columns: Columns, rows: List[Tuple]) -> Any:
+        """Преобразует пачку строк курсора."""
+        raise NotImplementedError
+
+    def one(self, columns: Columns, row: Optional[Tuple]) -> Any:
+        """Преобразует одну строку курсора (None - строки нет)."""
+        if row is None:
+            return None
+        return self.many(columns, [row])[0]
+
+class TupleRowFactory(RowFactory):
+    def many(self, columns: Columns, rows: List[Tuple]) -> List[Tuple]:
+        return rows
+
+    def one(self, columns: Columns, row: Optional[Tuple]) -> Optional[Tuple]:
+        return row
+
+class DictRowFactory(RowFactory):
+    def many(self, columns: Columns, rows: List[Tuple]) -> List[Dict[str, Any]]:
+        return [dict(zip(columns, row)) for row in rows]
+
+class OrderedDictRowFactory(RowFactory):
+    def many(self, columns: Columns, rows: List[Tuple]) -> List[OrderedDict]:
+        return [OrderedDict(zip(columns, row)) for row in rows]
+
+class RecordRowFactory(RowFactory):
+    def many(self, columns: Columns, rows: List[Tuple]) -> List[Record]:
+        record_class = make_record_class(tuple(columns))
+        return [record_class(*row) for row in rows]
+
+class ColumnarRowFactory(RowFactory):
+    columnar = True
+
+    def many(self, columns: Columns, rows: List[Tuple]) -> Dict[str, List[Any]]:
+        if not rows:
+            return {column: [] for column in _unique_names(columns)}
+        return {column: list(values) for column, values in zip(_unique_names(columns), zip(*rows))}
+
+    def one(self, columns: Columns, row: Optional[Tuple]) -> Optional[Dict[str, List[Any]]]:
+        if row is None:
+            return None
+        return self.many(columns, [row])
+
+class NumpyRowFactory(RowFactory):
+    """
+    Структурированный массив NumPy.
+
+    Колонка получает нативный тип NumPy, если все ее значения имеют один тип
+    из bool, int, float; остальные колонки (строки, даты, Decimal, NULL,
+    разнотипные значения) хранятся как object.
+    """
+    columnar = True
+
+    NATIVE_DTYPES = {bool: '?', int: 'i8', float: 'f8'}
+
+    def get_field_dtype(self, values: Tuple) -> str:
+        types = set(map(type, values))
+        if len(types) == 1:
+            return self.NATIVE_DTYPES.get(types.pop(), 'O')
+        return 'O'
+
+    def many(self, columns: Columns, rows: List[Tuple]) -> np.ndarray:
+        names = _unique_names(columns)
+        if not rows:
+            return np.empty(0, dtype=[(name, 'O') for name in names])
+
+        values_by_column = list(zip(*rows))
+        dtype = np.dtype([
+            (name, self.get_field_dtype(values))
+            for name, values in zip(names, values_by_column)
+        ])
+        result = np.empty(len(rows), dtype=dtype)
+        for name, values in zip(names, values_by_column):
+            try:
+                result[name] = values
+            except OverflowError:
+                # int вне диапазона int64
+                result = result.astype([(field, 'O' if field == name else dtype[field]) for field in names])
+                result[name] = values
+        return result
+
+    def one(self, columns: Columns, row: Optional[Tuple]) -> Optional[np.ndarray]:
+        if row is None:
+            return None
+        return self.many(columns, [row])
+
+ROW_FACTORIES: Dict[str, RowFactory] = {
+    'tuple': TupleRowFactory(),
+    'dict': DictRowFactory(),
+    'ordered_dict': OrderedDictRowFactory(),
+    'record': RecordRowFactory(),
+    'columnar': ColumnarRowFactory(),
+    'numpy': NumpyRowFactory(),
+}
+
+def get_row_factory(row_factory: Union[str, RowFactory]) -> RowFactory:
+    """
+    Возвращает фабрику строк по имени.
+
+    Args:
+        row_factory: Имя из ROW_FACTORIES или экземпляр RowFactory
+
+    Raises:
+        ValueError: Если фабрика с таким именем не зарегистрирована
+    """
+    if isinstance(row_factory, RowFactory):
+        return row_factory
+    try:
+        return ROW_FACTORIES[row_factory]
+    except KeyError:
+        raise ValueError(
+            f"Неизвестная фабрика строк: {row_factory}. "
+            f"Доступные: {', '.join(ROW_FACTORIES)}"
+        )
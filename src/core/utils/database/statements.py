@@ -0,0 +1,392 @@
+"""
+Файл с кэшем подготовленных запросов и статистикой выполнения запросов.
+
+Кэш включается настройкой STATEMENT_CACHE и работает по-разному для
+исполнителей:
+- QueryExecutor и AsyncQueryExecutor (psycopg 3): подготовку выполняет
+  драйвер - запрос, выполненный в подключении STATEMENT_PREPARE_THRESHOLD
+  раз, подготавливается на сервере (PREPARE), подготовленные запросы
+  вытесняются по LRU после STATEMENT_CACHE_SIZE (prepared_max);
+- DataBaseManager (psycopg2): PreparedStatements явно выполняет PREPARE
+  при первом вызове и EXECUTE при следующих, с тем же ограничением LRU.
+  Типы параметров PREPARE задаются явно по типам значений Python (см.
+  PARAM_TYPES), иначе параметр без контекста (`SELECT %s`) стал бы text;
+  запросы с параметрами других типов (списки, словари, адаптеры psycopg2)
+  выполняются без подготовки;
+- SqlAlchemyManager: конструкция text() создается один раз на текст
+  запроса и переиспользуется, поэтому ключ кэша компиляции SQLAlchemy
+  не пересчитывается.
+
+Статистика (STATEMENT_STATS) собирается по тексту запроса с нормализованными
+пробелами: количество выполнений, суммарное и максимальное время.
+Статистика относится к текущему процессу.
+"""
+
+import datetime
+import decimal
+import logging
+import re
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from sqlalchemy.sql import text
+from sqlalchemy.sql.elements import TextClause
+
+logger = logging.getLogger('utils')
+
+# Поля статистики, по которым можно сортировать
+STATEMENT_STATS_ORDERING = ('count', 'total_time', 'max_time', 'mean_time')
+
+# Запросы, которые PostgreSQL позволяет подготовить
+PREPARABLE_KEYWORDS = ('select', 'insert', 'update', 'delete', 'with', 'values', 'merge', 'table')
+
+# Параметры запроса psycopg2: %s, %(name)s и экранированный %%
+PLACEHOLDER_RE = re.compile(r'%\((\w+)\)s|%s|%%')
+
+# Типы параметров PREPARE по типам значений Python. Строки и None объявляются
+# как unknown: тип выводится из контекста, как для литерала psycopg2 ('...', NULL).
+# Порядок важен: bool - подкласс int, datetime - подкласс date.
+PARAM_TYPES: Tuple[Tuple[type, str], ...] = (
+    (bool, 'boolean'),
+    (float, 'double precision'),
+    (decimal.Decimal, 'numeric'),
+    (str, 'unknown'),
+    (type(None), 'unknown'),
+    (datetime.datetime, 'timestamp'),
+    (datetime.date, 'date'),
+    (datetime.time, 'time'),
+    (datetime.timedelta, 'interval'),
+    (bytes, 'bytea'),
+    (memoryview, 'bytea'),
+    (uuid.UUID, 'uuid'),
+)
+
+def is_cache_enabled() -> bool:
+    """Включен ли кэш подготовленных запросов."""
+    return getattr(settings, 'STATEMENT_CACHE', False)
+
+def is_stats_enabled() -> bool:
+    """Включен ли сбор статистики запросов."""
+    return getattr(settings, 'STATEMENT_STATS', False)
+
+def get_cache_size() -> int:
+    """Количество запросов в кэше на подключение."""
+    return getattr(settings, 'STATEMENT_CACHE_SIZE', 100)
+
+def normalize_sql(sql: str) -> str:
+    """Текст запроса с одним пробелом между словами (ключ статистики)."""
+    return ' '.join(str(sql).split())
+
+
+class LRUCache:
+    """
+    Потокобезопасный словарь ограниченного размера с вытеснением давно не использованных ключей.
+    """
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> List[Tuple[Hashable, Any]]:
+        """
+        Добавляет значение.
+
+        Returns:
+            List[Tuple[Hashable, Any]]: Вытесненные пары ключ-значение
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            evicted = []
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False))
+            return evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class StatementStat:
+    """Статистика выполнения одного запроса."""
+
+    __slots__ = ('sql', 'count', 'errors', 'total_time', 'max_time')
+
+    def __init__(self, sql: str) -> None:
+        self.sql = sql
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'sql': self.sql,
+            'count': self.count,
+            'errors': self.errors,
+            'total_time': round(self.total_time, 6),
+            'max_time': round(self.max_time, 6),
+            'mean_time': round(self.total_time / self.count, 6) if self.count else 0.0,
+        }
+
+_stats: OrderedDict = OrderedDict()
+_stats_lock = threading.Lock()
+
+def record_statement(sql: str, seconds: float, error: bool = False) -> None:
+    """
+    Добавляет выполнение запроса в статистику.
+
+    Хранится не больше STATEMENT_STATS_SIZE запросов: при переполнении
+    удаляется давно не выполнявшийся.
+    """
+    key = normalize_sql(sql)
+    with _stats_lock:
+        stat = _stats.get(key)
+        if stat is None:
+            stat = _stats[key] = StatementStat(key)
+            if len(_stats) > getattr(settings, 'STATEMENT_STATS_SIZE', 500):
+                _stats.popitem(last=False)
+        else:
+            _stats.move_to_end(key)
+        stat.count += 1
+        stat.errors += error
+        stat.total_time += seconds
+        stat.max_time = max(stat.max_time, seconds)
+
+@contextmanager
+def track_statement(sql: str) -> Iterator[None]:
+    """Замеряет выполнение запроса в блоке, если сбор статистики включен."""
+    if not is_stats_enabled():
+        yield
+        return
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        record_statement(sql, time.perf_counter() - started, error)
+
+def get_statement_stats(limit: int = 20, order_by: str = 'total_time') -> List[Dict[str, Any]]:
+    """
+    Самые нагружающие базу запросы.
+
+    Args:
+        limit: Количество запросов
+        order_by: Поле сортировки по убыванию (STATEMENT_STATS_ORDERING)
+
+    Returns:
+        List[Dict[str, Any]]: Статистика запросов
+    """
+    if order_by not in STATEMENT_STATS_ORDERING:
+        raise ValueError(f"Неизвестное поле сортировки: {order_by}. "
+                         f"Доступные: {', '.join(STATEMENT_STATS_ORDERING)}")
+    with _stats_lock:
+        stats = [stat.as_dict() for stat in _stats.values()]
+    stats.sort(key=lambda stat: stat[order_by], reverse=True)
+    return stats[:limit]
+
+def reset_statement_stats() -> None:
+    """Очищает статистику запросов."""
+    with _stats_lock:
+        _stats.clear()
+
+_text_clauses: Optional[LRUCache] = None
+
+def get_text_clause(sql: str) -> TextClause:
+    """
+    Конструкция text() для запроса SQLAlchemy (из кэша, если он включен).
+
+    TextClause неизменяема, поэтому одна конструкция безопасно используется
+    разными потоками и engine.
+    """
+    global _text_clauses
+    if not is_cache_enabled():
+        return text(sql)
+    if _text_clauses is None:
+        _text_clauses = LRUCache(get_cache_size())
+    clause = _text_clauses.get(sql)
+    if clause is None:
+        clause = text(sql)
+        _text_clauses.put(sql, clause)
+    return clause
+
+def to_server_placeholders(sql: str, params: Any) -> Optional[Tuple[str, List[Any]]]:
+    """
+    Переводит параметры psycopg2 (%s, %(name)s) в параметры PostgreSQL ($1, $2, ...).
+
+    Returns:
+        Запрос для PREPARE и значения параметров по порядку или None,
+        если параметры запроса и переданные значения не согласуются
+    """
+    positional = not isinstance(params, dict)
+    values: List[Any] = []
+    names: Dict[str, int] = {}
+    invalid = False
+
+    def replace(match: re.Match) -> str:
+        nonlocal invalid
+        token = match.group(0)
+        if token == '%%':
+            return '%'
+        name = match.group(1)
+        if positional != (name is None):
+            invalid = True
+            return token
+        if positional:
+            values.append(None)
+            return f'${len(values)}'
+        if name not in names:
+            names[name] = len(names) + 1
+        return f'${names[name]}'
+
+    prepared_sql = PLACEHOLDER_RE.sub(replace, sql)
+    if invalid:
+        return None
+    if positional:
+        params = tuple(params or ())
+        if len(params) != len(values):
+            return None
+        return prepared_sql, list(params)
+    try:
+        return prepared_sql, [params[name] for name in names]
+    except KeyError:
+        return None
+
+
+def get_param_type(value: Any) -> Optional[str]:
+    """Тип параметра PREPARE для значения или None, если тип нельзя задать."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        # Как у литерала psycopg2: integer, bigint или numeric по величине
+        if -2 ** 31 <= value < 2 ** 31:
+            return 'integer'
+        return 'bigint' if -2 ** 63 <= value < 2 ** 63 else 'numeric'
+    for python_type, param_type in PARAM_TYPES:
+        if isinstance(value, python_type):
+            if param_type == 'timestamp' and value.tzinfo is not None:
+                return 'timestamptz'
+            return param_type
+    return None
+
+def get_param_types(values: Sequence[Any]) -> Optional[Tuple[str, ...]]:
+    """Типы параметров PREPARE или None, если тип какого-либо значения нельзя задать."""
+    types = tuple(get_param_type(value) for value in values)
+    return None if None in types else types
+
+
+class PreparedStatements:
+    """
+    Кэш подготовленных запросов одного подключения psycopg2.
+
+    Запрос подготавливается (PREPARE) при первом выполнении и далее выполняется
+    по имени (EXECUTE), поэтому сервер не разбирает и не планирует его повторно.
+    Подготовленные запросы живут до закрытия подключения; при превышении размера
+    кэша давно не использованный запрос освобождается (DEALLOCATE). Запросы,
+    которые PostgreSQL не может подготовить (DDL, параметры неопределенного
+    типа), выполняются как обычно.
+
+    Типы параметров объявляются в PREPARE по значениям (get_param_types) и
+    входят в ключ кэша: один запрос с целыми и с дробными значениями
+    подготавливается дважды. Ограничения:
+    - запросы со значениями типов вне PARAM_TYPES (списки, словари, Json и
+      другие адаптеры psycopg2) не подготавливаются;
+    - объявленный тип не приводится неявно к более узкому: если параметр
+      integer передается в функцию от smallint или сравнивается с колонкой
+      несовместимого типа, PREPARE завершается ошибкой и запрос с такими
+      типами выполняется без подготовки.
+    """
+    def __init__(self, connection: Any, maxsize: Optional[int] = None) -> None:
+        self.connection = connection
+        self._names = LRUCache(maxsize or get_cache_size())
+        self._unpreparable = LRUCache(maxsize or get_cache_size())
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _is_preparable(self, sql: str) -> bool:
+        words = sql.lstrip(' \t\n(').split(None, 1)
+        return bool(words) and words[0].lower() in PREPARABLE_KEYWORDS
+
+    def _prepare(self, cursor: Any, key: Tuple[str, Tuple[str, ...]], prepared_sql: str) -> Optional[str]:
+        with self._lock:
+            self._counter += 1
+            name = f'stmt_{self._counter}'
+        # Ошибка PREPARE не должна прерывать транзакцию пользователя
+        in_transaction = not self.connection.autocommit
+        if in_transaction:
+            cursor.execute('SAVEPOINT stmt_prepare')
+        try:
+            types = key[1]
+            cursor.execute(f"PREPARE {name} ({', '.join(types)}) AS {prepared_sql}" if types
+                           else f'PREPARE {name} AS {prepared_sql}')
+        except Exception as e:
+            if in_transaction:
+                cursor.execute('ROLLBACK TO SAVEPOINT stmt_prepare')
+            logger.debug(f"Запрос выполняется без подготовки: {str(e)}")
+            self._unpreparable.put(key, True)
+            return None
+        if in_transaction:
+            cursor.execute('RELEASE SAVEPOINT stmt_prepare')
+
+        for _, evicted_name in self._names.put(key, name):
+            cursor.execute(f'DEALLOCATE {evicted_name}')
+        return name
+
+    def execute(self, cursor: Any, sql: str, params: Any = None) -> None:
+        """
+        Выполняет запрос в курсоре, подготавливая его при первом выполнении.
+
+        Args:
+            cursor: Курсор подключения
+            sql: Запрос с параметрами psycopg2
+            params: Значения параметров
+        """
+        converted = to_server_placeholders(sql, params) if self._is_preparable(sql) else None
+        types = get_param_types(converted[1]) if converted is not None else None
+        key = (sql, types)
+        if types is None or self._unpreparable.get(key) is not None:
+            cursor.execute(sql, params)
+            return
+
+        name = self._names.get(key)
+        if name is None:
+            name = self._prepare(cursor, key, converted[0])
+            if name is None:
+                cursor.execute(sql, params)
+                return
+
+        values = converted[1]
+        if values:
+            cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(values))})", values)
+        else:
+            cursor.execute(f'EXECUTE {name}')
+
+    def clear(self) -> None:
+        """Забывает подготовленные запросы (после переподключения)."""
+        self._names.clear()
+        self._unpreparable.clear()
+
+@receiver(connection_created)
+def configure_prepared_statements(sender: Any, connection: Any, **kwargs: Any) -> None:
+    """Задает размер кэша подготовленных запросов psycopg 3 для подключений Django."""
+    if is_cache_enabled() and hasattr(connection.connection, 'prepared_max'):
+        connection.connection.prepared_max = get_cache_size()
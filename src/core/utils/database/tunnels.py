@@ -0,0 +1,251 @@
+"""
+Файл с пулом SSH-туннелей, общим для процесса.
+
+Туннель создается один раз на SSH-цель (SSH-сервер, пользователь и удаленный
+адрес базы) и используется всеми потоками процесса: SSHConnection и DBConfig
+берут его из пула и возвращают обратно, не закрывая. Счетчик ссылок
+показывает, сколько пользователей у туннеля сейчас.
+
+Локальный порт выбирает ОС при открытии туннеля (bind на порт 0), поэтому
+два процесса не получат один порт. SSH-сессия поддерживается keepalive;
+если она разорвана, туннель переоткрывается при следующем обращении на тот
+же локальный порт (URL подключения и engine SQLAlchemy не меняются).
+Туннели без пользователей закрываются через SSH_TUNNEL_IDLE_TIMEOUT секунд
+(0 - держатся до завершения процесса).
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+
+from sshtunnel import SSHTunnelForwarder
+
+logger = logging.getLogger('utils')
+
+LOCAL_HOST = '127.0.0.1'
+
+# Интервал keepalive SSH-сессии по умолчанию, секунды
+DEFAULT_KEEPALIVE = 30
+
+TunnelKey = Tuple[Any, ...]
+
+class PooledTunnel:
+    """
+    Туннель к одной SSH-цели со счетчиком ссылок и переподключением.
+    """
+    def __init__(self, ssh_config: dict) -> None:
+        self.ssh_config = ssh_config
+        self.local_port: Optional[int] = None
+        self.refs = 0
+        self.reconnects = 0
+        self.created_at: Optional[float] = None
+        self.last_used = time.monotonic()
+        self.last_error: Optional[str] = None
+        self.closed = False
+        self._forwarder: Optional[SSHTunnelForwarder] = None
+        self._lock = threading.Lock()
+
+    @property
+    def target(self) -> str:
+        """Описание цели туннеля для логов и статистики."""
+        config = self.ssh_config
+        user = f"{config.get('username')}@" if config.get('username') else ''
+        return (f"{user}{config.get('host')}:{config.get('port', 22)} -> "
+                f"{config.get('remote_host')}:{config.get('remote_port')}")
+
+    @property
+    def is_active(self) -> bool:
+        """Открыта ли SSH-сессия и слушает ли туннель локальный порт."""
+        forwarder = self._forwarder
+        return bool(forwarder is not None and forwarder.is_active and forwarder.is_alive)
+
+    def _create_forwarder(self, local_port: int) -> SSHTunnelForwarder:
+        config = self.ssh_config
+        options = {
+            'ssh_address_or_host': (config.get('host'), config.get('port', 22)),
+            'remote_bind_address': (config.get('remote_host'), config.get('remote_port')),
+            'local_bind_address': (LOCAL_HOST, local_port),
+            'set_keepalive': getattr(settings, 'SSH_TUNNEL_KEEPALIVE', DEFAULT_KEEPALIVE),
+        }
+        if config.get('username'):
+            options['ssh_username'] = config['username']
+        if config.get('key_path'):
+            options['ssh_pkey'] = config['key_path']
+        else:
+            options['ssh_password'] = config.get('password')
+        return SSHTunnelForwarder(**options)
+
+    def _start(self) -> None:
+        forwarder = None
+        if self.local_port is not None:
+            # Переподключение на прежний порт, чтобы URL подключения не менялся
+            try:
+                forwarder = self._create_forwarder(self.local_port)
+                forwarder.start()
+            except Exception as e:
+                logger.warning(f"Порт {self.local_port} SSH туннеля {self.target} недоступен: {str(e)}")
+                self._stop_forwarder(forwarder)
+                forwarder = None
+
+        if forwarder is None:
+            forwarder = self._create_forwarder(0)
+            forwarder.start()
+
+        self._forwarder = forwarder
+        self.local_port = forwarder.local_bind_port
+        self.created_at = time.time()
+        self.last_error = None
+
+    @staticmethod
+    def _stop_forwarder(forwarder: Optional[SSHTunnelForwarder]) -> None:
+        if forwarder is None:
+            return
+        try:
+            forwarder.stop(force=True)
+        except Exception as e:
+            logger.error(f"Ошибка при закрытии SSH туннеля: {str(e)}")
+
+    def acquire(self) -> Optional[int]:
+        """
+        Берет туннель, открывая или переоткрывая его при необходимости.
+
+        Returns:
+            Optional[int]: Локальный порт туннеля (None, если туннель уже удален из пула)
+        """
+        with self._lock:
+            if self.closed:
+                return None
+            if not self.is_active:
+                reconnect = self._forwarder is not None
+                self._stop_forwarder(self._forwarder)
+                self._forwarder = None
+                try:
+                    self._start()
+                except Exception as e:
+                    self.last_error = str(e)
+                    logger.error(f"Ошибка при создании SSH туннеля {self.target}: {str(e)}")
+                    raise
+                if reconnect:
+                    self.reconnects += 1
+                    logger.warning(f"SSH туннель {self.target} переподключен, порт {self.local_port}")
+                else:
+                    logger.info(f"SSH туннель {self.target} создан, порт {self.local_port}")
+            self.refs += 1
+            self.last_used = time.monotonic()
+            return self.local_port
+
+    def release(self) -> None:
+        """Возвращает туннель в пул (туннель остается открытым)."""
+        with self._lock:
+            self.refs = max(0, self.refs - 1)
+            self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        """Закрывает туннель."""
+        with self._lock:
+            self.closed = True
+            self._stop_forwarder(self._forwarder)
+            self._forwarder = None
+            logger.info(f"SSH туннель {self.target} закрыт")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Состояние туннеля."""
+        return {
+            'target': self.target,
+            'active': self.is_active,
+            'local_port': self.local_port,
+            'refs': self.refs,
+            'reconnects': self.reconnects,
+            'created_at': self.created_at,
+            'idle_seconds': round(time.monotonic() - self.last_used, 1) if not self.refs else 0,
+            'last_error': self.last_error,
+        }
+
+_tunnels: Dict[TunnelKey, PooledTunnel] = {}
+_lock = threading.Lock()
+
+def get_tunnel_key(ssh_config: dict) -> TunnelKey:
+    """Ключ туннеля: SSH-сервер, учетные данные и удаленный адрес базы."""
+    return (
+        ssh_config.get('host'),
+        ssh_config.get('port', 22),
+        ssh_config.get('username'),
+        ssh_config.get('key_path'),
+        ssh_config.get('remote_host'),
+        ssh_config.get('remote_port'),
+    )
+
+def _close_idle_tunnels() -> None:
+    idle_timeout = getattr(settings, 'SSH_TUNNEL_IDLE_TIMEOUT', 0)
+    if not idle_timeout:
+        return
+    now = time.monotonic()
+    with _lock:
+        idle = [key for key, tunnel in _tunnels.items()
+                if not tunnel.refs and now - tunnel.last_used > idle_timeout]
+        tunnels = [_tunnels.pop(key) for key in idle]
+    for tunnel in tunnels:
+        tunnel.close()
+
+def acquire_tunnel(ssh_config: dict) -> Tuple[PooledTunnel, int]:
+    """
+    Берет из пула туннель для SSH-цели, открывая его при первом обращении.
+    После использования туннель возвращается вызовом release().
+
+    Args:
+        ssh_config: Настройки SSH базы (ключ SSH в DATABASES)
+
+    Returns:
+        Tuple[PooledTunnel, int]: Туннель и его локальный порт
+    """
+    _close_idle_tunnels()
+    key = get_tunnel_key(ssh_config)
+    while True:
+        with _lock:
+            tunnel = _tunnels.get(key)
+            if tunnel is None:
+                tunnel = _tunnels[key] = PooledTunnel(ssh_config)
+        # Туннель мог быть закрыт как неиспользуемый между получением и открытием
+        local_port = tunnel.acquire()
+        if local_port is not None:
+            return tunnel, local_port
+
+def close_tunnels() -> None:
+    """Закрывает все туннели пула."""
+    with _lock:
+        tunnels = list(_tunnels.values())
+        _tunnels.clear()
+    for tunnel in tunnels:
+        tunnel.close()
+
+def get_tunnel_stats(ssh_config: Optional[dict] = None) -> Any:
+    """
+    Состояние туннелей текущего процесса.
+
+    Args:
+        ssh_config: Настройки SSH базы (None - все туннели)
+
+    Returns:
+        Состояние туннеля базы (None, если он не открывался) или список состояний всех туннелей
+    """
+    if ssh_config is not None:
+        tunnel = _tunnels.get(get_tunnel_key(ssh_config))
+        return tunnel.get_stats() if tunnel is not None else None
+    return [tunnel.get_stats() for tunnel in list(_tunnels.values())]
+
+def _reset_after_fork() -> None:
+    # Потоки туннелей не переживают fork: дочерний процесс открывает свои
+    global _lock
+    _lock = threading.Lock()
+    _tunnels.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+atexit.register(close_tunnels)
@@ -0,0 +1,6 @@
+"""
+Пакет с функциями по работе с файлами, которые отдаются и принимаются API.
+
+Включает отдачу файлов с поддержкой HTTP Range, условных запросов и
+передачи отдачи веб-серверу (X-Accel-Redirect / X-Sendfile).
+"""
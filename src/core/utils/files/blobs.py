@@ -0,0 +1,193 @@
+"""
+Файл с хранилищем загруженных файлов, адресуемым по содержимому.
+
+Содержимое хранится один раз в `MEDIA_ROOT/blobs/<ab>/<cd>/<sha256>`
+(два уровня каталогов по префиксу хеша, чтобы в одном каталоге не
+накапливались сотни тысяч файлов). Индекс в БД связывает логические имена
+(StoredFile) с блобами (Blob) и ведет счетчик ссылок: повторная загрузка
+того же отчета добавляет только строку индекса.
+
+Блоб без ссылок не удаляется сразу: его удаляет сборка мусора
+(`python src/manage.py gc_blobs`) после периода ожидания, чтобы не
+конфликтовать с загрузкой того же содержимого, идущей в этот момент.
+"""
+
+import logging
+import os
+import time
+import uuid
+
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from src.core.utils.models import Blob, StoredFile
+
+logger = logging.getLogger('utils')
+
+# Время, в течение которого блоб без ссылок и файлы без записи в индексе не удаляются, секунды
+BLOB_GC_GRACE = 60 * 60
+
+def get_blob_root() -> str:
+    """Корневая директория хранилища блобов."""
+    return os.path.join(os.path.abspath(settings.MEDIA_ROOT), 'blobs')
+
+def blob_path(sha256: str) -> str:
+    """Путь к файлу блоба."""
+    return os.path.join(get_blob_root(), sha256[:2], sha256[2:4], sha256)
+
+def make_file_name(original_name: str) -> str:
+    """Логическое имя файла: метка времени и безопасное исходное имя."""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"{timestamp}_{get_valid_filename(os.path.basename(original_name)) or 'file'}"
+
+def find_blob(sha256: str) -> Optional[Blob]:
+    """Возвращает блоб по хешу, если его содержимое есть на диске."""
+    blob = Blob.objects.filter(pk=sha256).first()
+    if blob is not None and os.path.isfile(blob_path(sha256)):
+        return blob
+    return None
+
+def _place_blob(path: Optional[str], sha256: str) -> None:
+    """Переносит файл в хранилище или удаляет его, если такой блоб уже есть."""
+    target = blob_path(sha256)
+    if os.path.isfile(target):
+        if path is not None:
+            os.remove(path)
+        return
+    if path is None:
+        raise FileNotFoundError(target)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(path, target)
+
+def add_file(original_name: str, sha256: str, size: int, path: Optional[str] = None,
+             content_type: str = '') -> Tuple[StoredFile, bool]:
+    """
+    Добавляет файл в хранилище.
+
+    Args:
+        original_name: Исходное имя файла
+        sha256: Хеш содержимого
+        size: Размер файла
+        path: Путь к записанному файлу на том же томе (None - блоб уже должен существовать)
+        content_type: Тип содержимого
+
+    Returns:
+        Tuple[StoredFile, bool]: Запись индекса и признак того, что содержимое уже было в хранилище
+
+    Raises:
+        FileNotFoundError: Если path не указан, а блоба нет на диске
+    """
+    with transaction.atomic():
+        # Блокировка строки блоба не дает сборке мусора удалить его, пока файл переносится
+        blob = Blob.objects.select_for_update().filter(pk=sha256).first()
+        existed = blob is not None and os.path.isfile(blob_path(sha256))
+        if blob is None:
+            try:
+                with transaction.atomic():
+                    blob = Blob.objects.create(sha256=sha256, size=size)
+            except IntegrityError:
+                blob = Blob.objects.select_for_update().get(pk=sha256)
+
+        _place_blob(path, sha256)
+        Blob.objects.filter(pk=sha256).update(refcount=F('refcount') + 1, updated_at=timezone.now())
+
+        name = make_file_name(original_name)
+        while True:
+            try:
+                with transaction.atomic():
+                    stored = StoredFile.objects.create(
+                        name=name,
+                        blob=blob,
+                        original_name=os.path.basename(original_name),
+                        content_type=content_type or '',
+                    )
+                break
+            except IntegrityError:
+                # Файл с таким именем уже загружен в эту же секунду
+                name = f'{uuid.uuid4().hex[:8]}_{name}'
+
+    return stored, existed
+
+def resolve_file(name: str) -> Optional[StoredFile]:
+    """
+    Находит файл по логическому имени (поиск по уникальному индексу).
+
+    Returns:
+        Optional[StoredFile]: Запись индекса с блобом или None
+    """
+    return StoredFile.objects.select_related('blob').filter(name=name).first()
+
+def delete_file(name: str) -> bool:
+    """
+    Удаляет логический файл и уменьшает счетчик ссылок блоба.
+
+    Returns:
+        bool: Был ли файл найден
+    """
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().filter(name=name).first()
+        if stored is None:
+            return False
+        blob_id = stored.blob_id
+        stored.delete()
+        Blob.objects.filter(pk=blob_id, refcount__gt=0).update(
+            refcount=F('refcount') - 1, updated_at=timezone.now()
+        )
+    return True
+
+def collect_garbage(grace: int = BLOB_GC_GRACE, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Удаляет блобы без ссылок и файлы хранилища без записи в индексе.
+
+    Args:
+        grace: Минимальный возраст удаляемых блобов и файлов, секунды
+        dry_run: Только подсчитать, ничего не удаляя
+
+    Returns:
+        Dict[str, int]: Количество удаленных блобов, файлов-сирот и освобожденных байт
+    """
+    stats = {'blobs': 0, 'orphans': 0, 'bytes': 0}
+    cutoff = timezone.now() - timedelta(seconds=grace)
+
+    candidates = Blob.objects.filter(refcount=0, updated_at__lt=cutoff).values_list('pk', flat=True)
+    for sha256 in candidates.iterator():
+        with transaction.atomic():
+            blob = (Blob.objects.select_for_update(skip_locked=True)
+                    .filter(pk=sha256, refcount=0, updated_at__lt=cutoff).first())
+            if blob is None:
+                continue
+            stats['blobs'] += 1
+            stats['bytes'] += blob.size
+            if dry_run:
+                continue
+            try:
+                os.remove(blob_path(sha256))
+            except FileNotFoundError:
+                pass
+            blob.delete()
+
+    # Файлы на диске без строки в индексе (например, после сбоя между переносом и записью в БД)
+    root = get_blob_root()
+    deadline = time.time() - grace
+    for directory, _, files in os.walk(root):
+        for file_name in files:
+            path = os.path.join(directory, file_name)
+            try:
+                file_stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if file_stat.st_mtime >= deadline or Blob.objects.filter(pk=file_name).exists():
+                continue
+            stats['orphans'] += 1
+            stats['bytes'] += file_stat.st_size
+            if not dry_run:
+                os.remove(path)
+
+    logger.info("Сборка мусора хранилища файлов: %s", stats)
+    return stats
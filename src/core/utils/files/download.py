@@ -0,0 +1,395 @@
+"""
+Файл с отдачей файлов по HTTP.
+
+Обработчик возвращает описание файла (FileDownload), а view формирует ответ
+с учетом заголовков запроса:
+    - условные запросы: ETag строится из inode, времени изменения и размера
+      файла, ответ 304 / 412 формируется без чтения файла;
+    - Range и If-Range: один диапазон отдается ответом 206, несколько -
+      ответом multipart/byteranges, недопустимый диапазон - ответом 416;
+    - передача отдачи веб-серверу (настройка FILE_DOWNLOAD_OFFLOAD):
+      'x-accel-redirect' для nginx или 'x-sendfile' для Apache/lighttpd.
+      В этом случае Python только проверяет доступ, а байты (и диапазоны)
+      отдает веб-сервер.
+
+Файл открывается один раз, метаданные читаются через fstat открытого
+дескриптора. Под WSGI полный файл и одиночный диапазон отдаются через
+FileResponse, поэтому с `wsgi.file_wrapper` (gunicorn, uWSGI) передача
+выполняется через sendfile без копирования в Python. Под ASGI (Daphne)
+синхронный итератор ответа Django читает целиком в память, поэтому ответ
+получает асинхронный итератор, читающий файл блоками CHUNK_SIZE в потоке.
+"""
+
+import io
+import mimetypes
+import os
+import re
+import stat
+import uuid
+
+from typing import Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from src.core.utils.server.streaming import aiter_sync, is_asgi_request
+
+# Размер блока чтения файла
+CHUNK_SIZE = 512 * 1024
+
+# Максимальное число диапазонов в одном запросе (защита от запросов из тысяч мелких диапазонов)
+MAX_RANGES = 16
+
+_RANGE_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+class RangeNotSatisfiable(Exception):
+    """Запрошенные диапазоны не пересекаются с файлом."""
+
+class FileRange:
+    """
+    Файлоподобный объект, ограниченный диапазоном байт.
+
+    Читает не дальше конца диапазона и отдает дескриптор исходного файла,
+    позиционированный на начало диапазона, поэтому WSGI-сервер может
+    передать диапазон через sendfile, ограничив его длиной Content-Length.
+    """
+
+    def __init__(self, file: io.BufferedReader, start: int, length: int):
+        """
+        Args:
+            file: Открытый файл
+            start: Смещение начала диапазона
+            length: Длина диапазона
+        """
+        self.file = file
+        self.remaining = length
+        self.name = file.name
+        file.seek(start)
+
+    def read(self, size: int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def close(self) -> None:
+        self.file.close()
+
+class FileDownload:
+    """
+    Описание файла, который нужно отдать клиенту.
+
+    Возвращается обработчиком вместо готового ответа: заголовки Range и
+    условные заголовки учитываются view при формировании ответа.
+    """
+
+    def __init__(self, path: str, filename: Optional[str] = None, content_type: Optional[str] = None,
+                 as_attachment: bool = True, cache_control: str = 'private, no-cache'):
+        """
+        Args:
+            path: Абсолютный путь к файлу
+            filename: Имя файла для клиента (по умолчанию - имя файла на диске)
+            content_type: Тип содержимого (по умолчанию определяется по расширению)
+            as_attachment: Отдавать файл как вложение
+            cache_control: Значение заголовка Cache-Control
+        """
+        self.path = path
+        self.filename = filename or os.path.basename(path)
+        self.content_type = content_type or guess_content_type(self.filename)
+        self.as_attachment = as_attachment
+        self.cache_control = cache_control
+
+    def open(self) -> Tuple[io.BufferedReader, os.stat_result]:
+        """
+        Открывает файл и читает его метаданные одним fstat.
+
+        Raises:
+            FileNotFoundError: Если файл не существует или не является обычным файлом
+        """
+        file = open(self.path, 'rb')
+        try:
+            file_stat = os.fstat(file.fileno())
+        except OSError:
+            file.close()
+            raise
+        if not stat.S_ISREG(file_stat.st_mode):
+            file.close()
+            raise FileNotFoundError(self.path)
+        return file, file_stat
+
+    def response(self, request) -> HttpResponseBase:
+        """
+        Формирует ответ на запрос файла.
+
+        Args:
+            request: Объект запроса
+
+        Raises:
+            FileNotFoundError: Если файл не найден
+        """
+        return build_file_response(request, self)
+
+def guess_content_type(filename: str) -> str:
+    """Определяет content_type по расширению файла."""
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+def make_etag(file_stat: os.stat_result) -> str:
+    """ETag файла из inode, времени изменения и размера."""
+    return f'"{file_stat.st_ino:x}-{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"'
+
+def parse_range_header(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Разбирает заголовок Range.
+
+    Args:
+        header: Значение заголовка Range
+        size: Размер файла
+
+    Returns:
+        Optional[List[Tuple[int, int]]]: Отсортированные непересекающиеся диапазоны
+            (начало, конец включительно) или None, если заголовок нужно игнорировать
+
+    Raises:
+        RangeNotSatisfiable: Если ни один диапазон не пересекается с файлом
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+
+    parts = spec.split(',')
+    if len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        match = _RANGE_RE.match(part)
+        if not match:
+            return None
+        first, last = match.groups()
+        if not first:
+            if not last:
+                return None
+            # Суффиксный диапазон: последние N байт
+            suffix = int(last)
+            if suffix == 0:
+                continue
+            ranges.append((max(size - suffix, 0), size - 1))
+            continue
+
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    # Объединяем пересекающиеся и смежные диапазоны
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def if_range_matches(request, etag: str, last_modified: int) -> bool:
+    """Проверяет условие If-Range: диапазон отдается, только если файл не изменился."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and date >= last_modified
+
+def get_offload_response(download: FileDownload) -> Optional[HttpResponse]:
+    """
+    Формирует ответ с передачей отдачи файла веб-серверу.
+
+    Returns:
+        Optional[HttpResponse]: Ответ или None, если передача не настроена
+    """
+    offload = getattr(settings, 'FILE_DOWNLOAD_OFFLOAD', None)
+    if not offload:
+        return None
+
+    response = HttpResponse(content_type=download.content_type)
+    if offload == 'x-accel-redirect':
+        relative = os.path.relpath(download.path, os.path.abspath(settings.MEDIA_ROOT))
+        prefix = getattr(settings, 'FILE_DOWNLOAD_ACCEL_PREFIX', '/protected/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + relative.replace(os.sep, '/')
+    elif offload == 'x-sendfile':
+        response['X-Sendfile'] = os.path.abspath(download.path)
+    else:
+        raise ValueError(f'Неизвестный способ передачи отдачи файла: {offload}')
+    return response
+
+def iter_file(file: io.BufferedReader, start: int, length: int) -> Iterator[bytes]:
+    """Генерирует блоки диапазона файла и закрывает файл."""
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+def iter_byteranges(file: io.BufferedReader, ranges: List[Tuple[int, int]], size: int,
+                    content_type: str, boundary: str) -> Iterator[bytes]:
+    """Генерирует тело ответа multipart/byteranges."""
+    try:
+        for start, end in ranges:
+            yield byterange_header(boundary, content_type, start, end, size)
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+            yield b'\r\n'
+        yield f'--{boundary}--\r\n'.encode('ascii')
+    finally:
+        file.close()
+
+def byterange_header(boundary: str, content_type: str, start: int, end: int, size: int) -> bytes:
+    return (
+        f'--{boundary}\r\n'
+        f'Content-Type: {content_type}\r\n'
+        f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+    ).encode('ascii')
+
+def build_file_response(request, download: FileDownload) -> HttpResponseBase:
+    """
+    Формирует ответ на запрос файла с учетом Range и условных заголовков.
+
+    Args:
+        request: Объект запроса
+        download: Описание файла
+
+    Returns:
+        HttpResponseBase: Ответ 200, 206, 304, 412 или 416
+
+    Raises:
+        FileNotFoundError: Если файл не найден
+    """
+    file, file_stat = download.open()
+    size = file_stat.st_size
+    etag = make_etag(file_stat)
+    last_modified = int(file_stat.st_mtime)
+
+    try:
+        conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if conditional is not None:
+            file.close()
+            return _set_common_headers(conditional, download, etag, last_modified)
+
+        offload = get_offload_response(download)
+        if offload is not None:
+            # Диапазоны и условные запросы к самим байтам обрабатывает веб-сервер
+            file.close()
+            _set_disposition(offload, download)
+            return _set_common_headers(offload, download, etag, last_modified)
+
+        ranges = None
+        range_header = request.META.get('HTTP_RANGE')
+        if range_header and request.method in ('GET', 'HEAD') and if_range_matches(request, etag, last_modified):
+            ranges = parse_range_header(range_header, size)
+    except RangeNotSatisfiable:
+        file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return _set_common_headers(response, download, etag, last_modified)
+    except BaseException:
+        file.close()
+        raise
+
+    if is_asgi_request(request):
+        response = _build_asgi_response(file, ranges, size, download.content_type)
+    elif not ranges:
+        response = FileResponse(file, content_type=download.content_type)
+        response.block_size = CHUNK_SIZE
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = FileResponse(FileRange(file, start, end - start + 1), status=206,
+                                content_type=download.content_type)
+        response.block_size = CHUNK_SIZE
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        response = _build_byteranges_response(file, ranges, size, download.content_type)
+
+    _set_disposition(response, download)
+    return _set_common_headers(response, download, etag, last_modified)
+
+def _build_byteranges_response(file: io.BufferedReader, ranges: List[Tuple[int, int]], size: int,
+                               content_type: str, asgi: bool = False) -> StreamingHttpResponse:
+    """Ответ multipart/byteranges (под ASGI - с асинхронным итератором)."""
+    boundary = uuid.uuid4().hex
+    content = iter_byteranges(file, ranges, size, content_type, boundary)
+    if asgi:
+        content = aiter_sync(content, thread_sensitive=False)
+    length = sum(
+        len(byterange_header(boundary, content_type, start, end, size)) + (end - start + 1) + 2
+        for start, end in ranges
+    ) + len(boundary) + 6
+    response = StreamingHttpResponse(
+        content,
+        status=206,
+        content_type=f'multipart/byteranges; boundary={boundary}',
+    )
+    response['Content-Length'] = str(length)
+    return response
+
+def _build_asgi_response(file: io.BufferedReader, ranges: Optional[List[Tuple[int, int]]],
+                         size: int, content_type: str) -> StreamingHttpResponse:
+    """Ответ с асинхронным итератором: блоки файла читаются в потоке пула, не блокируя event loop."""
+    if ranges and len(ranges) > 1:
+        response = _build_byteranges_response(file, ranges, size, content_type, asgi=True)
+    else:
+        start, end = ranges[0] if ranges else (0, size - 1)
+        response = StreamingHttpResponse(
+            aiter_sync(iter_file(file, start, end - start + 1), thread_sensitive=False),
+            status=206 if ranges else 200,
+            content_type=content_type,
+        )
+        response['Content-Length'] = str(end - start + 1)
+        if ranges:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    # Файл закрывается и тогда, когда сервер не дочитал ответ
+    response._resource_closers.append(file.close)
+    return response
+
+def _set_disposition(response: HttpResponseBase, download: FileDownload) -> None:
+    disposition = content_disposition_header(download.as_attachment, download.filename)
+    if disposition:
+        response['Content-Disposition'] = disposition
+
+def _set_common_headers(response: HttpResponseBase, download: FileDownload,
+                        etag: str, last_modified: int) -> HttpResponseBase:
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = download.cache_control
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
@@ -0,0 +1,547 @@
+"""
+Файл с потоковой загрузкой файлов.
+
+StreamingUploadHandler подключается к эндпоинтам с параметром `file`
+и пишет байты прямо на диск по мере получения, одновременно считая SHA-256.
+Файл создается во временной директории внутри MEDIA_ROOT, поэтому перенос
+в хранилище блобов - это переименование без повторной записи.
+
+Загрузка по частям (для файлов в несколько ГБ):
+    1. init     - создается сессия загрузки (upload_id), возвращается текущее смещение;
+    2. chunk    - PUT части файла на `.../<upload_id>/` со смещением в заголовке
+                  `Upload-Offset` (или параметре `offset` строки запроса),
+                  часть пишется сразу в файл сессии;
+    3. finalize - проверяется размер и хеш, файл переносится в хранилище блобов.
+Прерванную загрузку можно продолжить с последнего записанного смещения.
+
+Одинаковое содержимое хранится один раз (см. `blobs.py`). Одновременные
+загрузки одного содержимого объединяются: байты передает только первая
+сессия с объявленным хешем, остальные получают свой upload_id в состоянии
+`waiting`. Когда первая сессия завершена, состояние ожидающих становится
+`exists`, и их finalize регистрирует свое имя файла на уже сохраненное
+содержимое. Если первая сессия брошена или не прошла проверку хеша,
+ожидающая сессия сама становится загружающей (`uploading`).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+from rest_framework.exceptions import NotFound, ValidationError
+
+from src.core.utils.files.blobs import add_file, find_blob
+from src.core.utils.files.download import guess_content_type
+
+# Размер блока, которым данные передаются обработчику загрузки
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Время жизни незавершенной сессии загрузки, секунды
+UPLOAD_SESSION_TTL = 24 * 60 * 60
+
+# Время удержания блокировки сессии, секунды (продлевается с каждым блоком данных,
+# поэтому после обрыва соединения сессия освобождается не позднее, чем через это время)
+UPLOAD_LOCK_TIMEOUT = 60
+
+# Хеши сессий, части которых принимает текущий процесс: upload_id -> (смещение, хеш)
+_session_hashers: Dict[str, Tuple[int, Any]] = {}
+_session_hashers_lock = threading.Lock()
+
+def get_upload_dir() -> str:
+    """Директория загруженных файлов."""
+    return os.path.join(os.path.abspath(settings.MEDIA_ROOT), 'uploads')
+
+def get_partial_dir() -> str:
+    """Директория незавершенных загрузок (на том же томе, что и хранилище блобов)."""
+    path = os.path.join(get_upload_dir(), '.partial')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def hash_file(path: str) -> str:
+    """Считает SHA-256 файла."""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(UPLOAD_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def validate_sha256(value: Optional[str]) -> Optional[str]:
+    """Проверяет формат SHA-256 и приводит его к нижнему регистру."""
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    if len(value) != 64 or any(char not in '0123456789abcdef' for char in value):
+        raise ValidationError('Некорректный SHA-256')
+    return value
+
+def store_file(path: str, sha256: str, original_name: str, content_type: str = '') -> Tuple[str, bool]:
+    """
+    Переносит полностью записанный файл в хранилище блобов.
+
+    Args:
+        path: Путь к записанному файлу во временной директории
+        sha256: Хеш содержимого
+        original_name: Исходное имя файла
+        content_type: Тип содержимого
+
+    Returns:
+        Tuple[str, bool]: Логическое имя файла и признак того, что такое содержимое уже было загружено
+    """
+    stored, deduplicated = add_file(original_name, sha256, os.path.getsize(path), path, content_type)
+    return stored.name, deduplicated
+
+def cleanup_partial_uploads(max_age: int = UPLOAD_SESSION_TTL, dry_run: bool = False) -> int:
+    """
+    Удаляет брошенные незавершенные загрузки старше max_age секунд.
+
+    Returns:
+        int: Количество удаленных файлов
+    """
+    deadline = time.time() - max_age
+    removed = 0
+    with os.scandir(get_partial_dir()) as entries:
+        for entry in entries:
+            try:
+                if not entry.is_file() or entry.stat().st_mtime >= deadline:
+                    continue
+                if not dry_run:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+    return removed
+
+class StreamedUploadedFile(UploadedFile):
+    """Загруженный файл, записанный на диск обработчиком StreamingUploadHandler."""
+
+    def __init__(self, file, name: str, content_type: str, size: int, charset: Optional[str],
+                 content_type_extra: Optional[dict], path: str, sha256: Optional[str],
+                 session: Optional['UploadSession'] = None, offset: int = 0):
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.path = path
+        self.sha256 = sha256
+        self.session = session
+        self.offset = offset
+
+    def temporary_file_path(self) -> str:
+        return self.path
+
+    def store(self) -> Tuple[str, bool]:
+        """
+        Переносит файл в хранилище блобов.
+
+        Returns:
+            Tuple[str, bool]: Логическое имя файла и признак дедупликации
+        """
+        self.file.close()
+        return store_file(self.path, self.sha256, self.name, self.content_type)
+
+def store_uploaded_file(file: UploadedFile) -> Dict[str, Any]:
+    """
+    Сохраняет загруженный файл в хранилище блобов.
+
+    Файлы, принятые StreamingUploadHandler, переносятся без повторной записи;
+    остальные записываются один раз с подсчетом хеша.
+
+    Returns:
+        Dict[str, Any]: Имя файла, хеш и признак дедупликации
+    """
+    if isinstance(file, StreamedUploadedFile) and file.session is None:
+        file_name, deduplicated = file.store()
+        return {'file_name': file_name, 'sha256': file.sha256, 'deduplicated': deduplicated}
+
+    hasher = hashlib.sha256()
+    path = os.path.join(get_partial_dir(), f'{uuid.uuid4().hex}.part')
+    with open(path, 'xb') as destination:
+        for chunk in file.chunks(UPLOAD_CHUNK_SIZE):
+            destination.write(chunk)
+            hasher.update(chunk)
+    sha256 = hasher.hexdigest()
+    file_name, deduplicated = store_file(path, sha256, file.name, file.content_type)
+    return {'file_name': file_name, 'sha256': sha256, 'deduplicated': deduplicated}
+
+class UploadSession:
+    """
+    Сессия загрузки файла по частям.
+
+    Состояние хранится рядом с данными в `uploads/.partial`: `<upload_id>.json`
+    с метаданными и `<upload_id>.part` с уже записанными байтами. Текущее
+    смещение - размер файла `.part`, поэтому сессию может продолжить любой процесс.
+
+    Ожидающая сессия (leader_id задан) не имеет своих данных: содержимое
+    с тем же хешем загружается в сессии leader_id.
+    """
+
+    def __init__(self, upload_id: str, filename: str, size: int, sha256: Optional[str] = None,
+                 created: Optional[float] = None, leader_id: Optional[str] = None):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.created = created or time.time()
+        self.leader_id = leader_id
+
+    @staticmethod
+    def validate_id(upload_id: str) -> str:
+        try:
+            return uuid.UUID(str(upload_id)).hex
+        except ValueError:
+            raise NotFound('Сессия загрузки не найдена')
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(get_partial_dir(), f'{self.upload_id}.json')
+
+    @property
+    def data_path(self) -> str:
+        return os.path.join(get_partial_dir(), f'{self.upload_id}.part')
+
+    @property
+    def lock_key(self) -> str:
+        return f'upload:session:{self.upload_id}:lock'
+
+    @property
+    def coalesce_key(self) -> str:
+        return f'upload:sha256:{self.sha256}'
+
+    @property
+    def offset(self) -> int:
+        """Количество уже записанных байт (для ожидающей сессии - в загружающей сессии)."""
+        data_path = self.data_path
+        if self.leader_id:
+            data_path = os.path.join(get_partial_dir(), f'{self.leader_id}.part')
+        try:
+            return os.stat(data_path).st_size
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def is_stored(self) -> bool:
+        """Есть ли объявленное содержимое в хранилище блобов."""
+        blob = find_blob(self.sha256) if self.sha256 else None
+        return blob is not None and blob.size == self.size
+
+    @classmethod
+    def create(cls, filename: str, size: int, sha256: Optional[str] = None) -> Tuple['UploadSession', bool]:
+        """
+        Создает сессию загрузки.
+
+        Если содержимое с тем же объявленным хешем уже загружается, создается
+        ожидающая сессия: у нее свой upload_id и имя файла, но байты передает
+        только загружающая сессия.
+
+        Returns:
+            Tuple[UploadSession, bool]: Сессия и признак того, что она ожидает другую сессию
+        """
+        session = cls(uuid.uuid4().hex, os.path.basename(filename), int(size), sha256)
+        if sha256:
+            session.leader_id = session._claim()
+        if not session.leader_id:
+            with open(session.data_path, 'xb'):
+                pass
+        session._save()
+        return session, bool(session.leader_id)
+
+    def _claim(self) -> Optional[str]:
+        """
+        Закрепляет хеш за сессией, если его не загружает другая живая сессия.
+
+        Returns:
+            Optional[str]: Идентификатор загружающей сессии (None - загружает эта сессия)
+        """
+        if cache.add(self.coalesce_key, self.upload_id, UPLOAD_SESSION_TTL):
+            return None
+        existing_id = cache.get(self.coalesce_key)
+        if existing_id and existing_id != self.upload_id:
+            try:
+                leader = UploadSession.load(existing_id)
+            except NotFound:
+                leader = None
+            if leader is not None and not leader.leader_id:
+                return leader.upload_id
+        cache.set(self.coalesce_key, self.upload_id, UPLOAD_SESSION_TTL)
+        return None
+
+    def _save(self) -> None:
+        """Записывает метаданные сессии (атомарно заменяя прежние)."""
+        path = f'{self.meta_path}.{uuid.uuid4().hex}.tmp'
+        with open(path, 'x', encoding='utf-8') as file:
+            json.dump({
+                'filename': self.filename,
+                'size': self.size,
+                'sha256': self.sha256,
+                'created': self.created,
+                'leader_id': self.leader_id,
+            }, file)
+        os.replace(path, self.meta_path)
+
+    def _follow(self) -> None:
+        """
+        Проверяет загружающую сессию ожидающей сессии.
+
+        Если загружающая сессия брошена или удалена, а содержимого в хранилище
+        нет, ожидающая сессия переходит к другой загружающей сессии или
+        начинает загрузку сама.
+        """
+        try:
+            UploadSession.load(self.leader_id)
+            return
+        except NotFound:
+            pass
+        if self.is_stored:
+            return
+        self.leader_id = self._claim()
+        if not self.leader_id:
+            open(self.data_path, 'ab').close()
+        self._save()
+
+    @classmethod
+    def load(cls, upload_id: str) -> 'UploadSession':
+        """
+        Загружает сессию по идентификатору.
+
+        Raises:
+            NotFound: Если сессия не найдена или устарела
+        """
+        upload_id = cls.validate_id(upload_id)
+        try:
+            with open(os.path.join(get_partial_dir(), f'{upload_id}.json'), 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+        except FileNotFoundError:
+            raise NotFound('Сессия загрузки не найдена')
+
+        session = cls(upload_id, meta['filename'], meta['size'], meta.get('sha256'), meta.get('created'),
+                      meta.get('leader_id'))
+        if time.time() - session.created > UPLOAD_SESSION_TTL:
+            session.delete()
+            raise NotFound('Сессия загрузки устарела')
+        if session.leader_id:
+            session._follow()
+        return session
+
+    @property
+    def state(self) -> str:
+        """
+        Состояние сессии: uploading - клиент передает части,
+        waiting - содержимое загружается в другой сессии,
+        exists - содержимое в хранилище, осталось вызвать finalize.
+        """
+        if not self.leader_id:
+            return 'uploading'
+        return 'exists' if self.is_stored else 'waiting'
+
+    def status(self) -> Dict[str, Any]:
+        """Состояние сессии для ответа клиенту."""
+        return {
+            'upload_id': self.upload_id,
+            'state': self.state,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.offset,
+            'chunk_size': UPLOAD_CHUNK_SIZE,
+        }
+
+    def acquire(self) -> None:
+        """
+        Захватывает сессию на время записи части.
+
+        Raises:
+            ValidationError: Если в сессию уже пишет другой запрос
+        """
+        if not cache.add(self.lock_key, 1, UPLOAD_LOCK_TIMEOUT):
+            raise ValidationError('В эту сессию уже выполняется загрузка')
+
+    def refresh(self) -> None:
+        """Продлевает блокировку сессии во время записи части."""
+        cache.touch(self.lock_key, UPLOAD_LOCK_TIMEOUT)
+
+    def release(self) -> None:
+        cache.delete(self.lock_key)
+
+    def open_at(self, offset: int):
+        """
+        Открывает файл сессии для записи с указанного смещения.
+
+        Raises:
+            ValidationError: Если сессия ожидает другую сессию или смещение не совпадает с уже записанным объемом
+        """
+        if self.leader_id:
+            raise ValidationError(f'Содержимое загружается в сессии {self.leader_id}')
+        current = self.offset
+        if offset != current:
+            raise ValidationError(f'Неверное смещение {offset}, ожидается {current}')
+        file = open(self.data_path, 'r+b')
+        file.seek(offset)
+        return file
+
+    def hasher_at(self, offset: int):
+        """Возвращает хеш, продолжающийся с указанного смещения, если он есть в этом процессе."""
+        with _session_hashers_lock:
+            state = _session_hashers.pop(self.upload_id, None)
+        if offset == 0:
+            return hashlib.sha256()
+        if state is not None and state[0] == offset:
+            return state[1]
+        return None
+
+    def save_hasher(self, offset: int, hasher) -> None:
+        if hasher is None:
+            return
+        with _session_hashers_lock:
+            _session_hashers[self.upload_id] = (offset, hasher)
+
+    def finalize(self) -> Dict[str, Any]:
+        """
+        Завершает загрузку: проверяет размер и хеш и переносит файл в хранилище блобов.
+
+        Raises:
+            ValidationError: Если файл загружен не полностью или хеш не совпадает
+        """
+        self.acquire()
+        try:
+            if self.leader_id:
+                return self._finalize_stored()
+            offset = self.offset
+            if offset != self.size:
+                raise ValidationError(f'Загружено {offset} из {self.size} байт')
+
+            with _session_hashers_lock:
+                state = _session_hashers.pop(self.upload_id, None)
+            if state is not None and state[0] == offset:
+                sha256 = state[1].hexdigest()
+            else:
+                # Части принимали разные процессы: считаем хеш по файлу
+                sha256 = hash_file(self.data_path)
+
+            if self.sha256 and sha256 != self.sha256:
+                self.delete()
+                raise ValidationError('Хеш загруженного файла не совпадает с заявленным')
+
+            file_name, deduplicated = store_file(
+                self.data_path, sha256, self.filename, guess_content_type(self.filename)
+            )
+            self.delete()
+            return {'file_name': file_name, 'sha256': sha256, 'size': offset, 'deduplicated': deduplicated}
+        finally:
+            self.release()
+
+    def _finalize_stored(self) -> Dict[str, Any]:
+        """Регистрирует имя файла ожидающей сессии на содержимое из хранилища."""
+        stored = None
+        if self.is_stored:
+            try:
+                stored, _ = add_file(self.filename, self.sha256, self.size,
+                                     content_type=guess_content_type(self.filename))
+            except FileNotFoundError:
+                # Блоб удален сборкой мусора между проверкой и записью
+                pass
+        if stored is None:
+            raise ValidationError(f'Содержимое еще загружается в сессии {self.leader_id}')
+        self.delete()
+        return {'file_name': stored.name, 'sha256': self.sha256, 'size': self.size, 'deduplicated': True}
+
+    def delete(self) -> None:
+        """Удаляет данные сессии."""
+        for path in (self.data_path, self.meta_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with _session_hashers_lock:
+            _session_hashers.pop(self.upload_id, None)
+        if self.sha256 and cache.get(self.coalesce_key) == self.upload_id:
+            cache.delete(self.coalesce_key)
+
+class StreamingUploadHandler(FileUploadHandler):
+    """
+    Обработчик загрузки, пишущий файл на диск по мере получения байт.
+
+    Если маршрут содержит `upload_id`, часть дописывается в файл сессии
+    с заявленного смещения, иначе файл пишется во временную директорию uploads.
+    """
+
+    chunk_size = UPLOAD_CHUNK_SIZE
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None,
+                 content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.session = None
+        self.offset = 0
+
+        resolver_match = getattr(self.request, 'resolver_match', None)
+        upload_id = resolver_match.kwargs.get('upload_id') if resolver_match else None
+
+        if upload_id is None:
+            self.path = os.path.join(get_partial_dir(), f'{uuid.uuid4().hex}.part')
+            self.file = open(self.path, 'xb')
+            self.hasher = hashlib.sha256()
+            return
+
+        offset = self.request.headers.get('Upload-Offset', self.request.GET.get('offset'))
+        try:
+            self.offset = int(offset)
+        except (TypeError, ValueError):
+            raise ValidationError('Не указано смещение части (заголовок Upload-Offset)')
+
+        session = UploadSession.load(upload_id)
+        session.acquire()
+        try:
+            self.file = session.open_at(self.offset)
+        except Exception:
+            session.release()
+            raise
+        self.session = session
+        self.path = session.data_path
+        self.hasher = session.hasher_at(self.offset)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.session is not None:
+            if self.offset + start + len(raw_data) > self.session.size:
+                self.upload_interrupted()
+                raise ValidationError('Часть выходит за пределы объявленного размера файла')
+            self.session.refresh()
+        self.file.write(raw_data)
+        if self.hasher is not None:
+            self.hasher.update(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.file.flush()
+        sha256 = None
+        if self.session is None:
+            sha256 = self.hasher.hexdigest()
+        else:
+            self.file.close()
+            self.session.save_hasher(self.offset + file_size, self.hasher)
+            self.session.release()
+
+        uploaded = StreamedUploadedFile(
+            self.file, self.file_name, self.content_type, file_size, self.charset,
+            self.content_type_extra, self.path, sha256, self.session, self.offset,
+        )
+        self.file = None
+        return uploaded
+
+    def upload_interrupted(self):
+        file = getattr(self, 'file', None)
+        if file is None:
+            return
+        file.close()
+        self.file = None
+        if self.session is None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        else:
+            # Уже записанные байты остаются в сессии: загрузка продолжится с нового смещения
+            self.session.release()
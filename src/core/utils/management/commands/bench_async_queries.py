@@ -0,0 +1,136 @@
+"""
+Файл для определения команды Django для замера параллельного выполнения запросов.
+
+Этот файл содержит класс Command, который наследуется от BaseCommand и
+имитирует запросы к API, каждый из которых выполняет несколько независимых
+запросов к базе (по умолчанию 20). Сравниваются:
+- sync: последовательное выполнение через QueryExecutor;
+- thread: asyncio.gather над sync_to_async(QueryExecutor) - переход в поток на каждый запрос;
+- async: asyncio.gather над AsyncQueryExecutor (пул асинхронных подключений psycopg 3).
+
+Для баз, отличных от PostgreSQL с psycopg 3, режим async выполняет запросы в потоке.
+
+Пример использования:
+>>> python src/manage.py bench_async_queries
+>>> python src/manage.py bench_async_queries --requests 100 --fan-out 20 --sleep 5
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from src.core.utils.database import AsyncQueryExecutor, QueryExecutor
+from src.core.utils.database.aio import close_pools, is_async_supported
+
+logger = logging.getLogger('core.utils.commands')
+
+def get_bench_query(rows: int, sleep: float):
+    """Запрос, агрегирующий rows строк; на PostgreSQL с задержкой sleep секунд."""
+    sql = (
+        "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s) "
+        "SELECT COUNT(*), SUM(n) FROM seq"
+    )
+    if connection.vendor == 'postgresql' and sleep:
+        return f"{sql} CROSS JOIN pg_sleep(%s)", (rows, sleep)
+    return sql, (rows,)
+
+class Command(BaseCommand):
+    """
+    Команда Django для замера параллельного выполнения запросов.
+    """
+    help = 'Замер выполнения независимых запросов: последовательно, в потоках и асинхронно'
+
+    def add_arguments(self, parser) -> None:
+        """
+        Добавляет аргументы командной строки.
+
+        Args:
+            parser: Парсер аргументов командной строки
+        """
+        parser.add_argument('--requests', type=int, default=50, help='Количество имитируемых запросов к API')
+        parser.add_argument('--fan-out', type=int, default=20, help='Количество запросов к базе на один запрос к API')
+        parser.add_argument('--rows', type=int, default=1000, help='Количество строк, агрегируемых одним запросом')
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Задержка одного запроса на PostgreSQL (pg_sleep), миллисекунды')
+        parser.add_argument(
+            '--mode',
+            action='append',
+            choices=['sync', 'thread', 'async'],
+            help='Режим (можно указать несколько, по умолчанию - все)'
+        )
+
+    def report(self, mode: str, latencies: list, elapsed: float) -> None:
+        msg = (f'{mode}: {len(latencies)} запросов за {elapsed:.2f} с, '
+               f'в среднем {statistics.mean(latencies) * 1000:.1f} мс, '
+               f'p95 {statistics.quantiles(latencies, n=20)[-1] * 1000:.1f} мс')
+        logger.info(msg)
+        self.stdout.write(self.style.SUCCESS(msg))
+
+    def run_sync(self, requests: int, fan_out: int, query_args: tuple) -> list:
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            for _ in range(fan_out):
+                QueryExecutor.fetchone(get_bench_query, *query_args)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    async def run_async(self, fetchone, requests: int, fan_out: int, query_args: tuple) -> list:
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            await asyncio.gather(*(fetchone(get_bench_query, *query_args) for _ in range(fan_out)))
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    async def run_async_modes(self, modes: list, requests: int, fan_out: int, query_args: tuple) -> dict:
+        fetchers = {
+            # thread_sensitive=False: каждый запрос в своем потоке пула, как без общего потока Django
+            'thread': sync_to_async(QueryExecutor.fetchone, thread_sensitive=False),
+            'async': AsyncQueryExecutor.fetchone,
+        }
+        results = {}
+        try:
+            for mode in modes:
+                # Первый запрос открывает пул подключений и не учитывается
+                await fetchers[mode](get_bench_query, *query_args)
+                started = time.perf_counter()
+                latencies = await self.run_async(fetchers[mode], requests, fan_out, query_args)
+                results[mode] = (latencies, time.perf_counter() - started)
+        finally:
+            await close_pools()
+        return results
+
+    def handle(self, *args: tuple, **options: dict) -> None:
+        """
+        Выполняет замер.
+
+        Args:
+            *args: Позиционные аргументы
+            **options: Именованные аргументы
+        """
+        logger.info('Запуск команды bench_async_queries')
+        modes = options['mode'] or ['sync', 'thread', 'async']
+        requests, fan_out = options['requests'], options['fan_out']
+        if requests < 2 or fan_out < 1:
+            raise CommandError('Нужно не меньше двух запросов к API и одного запроса к базе на каждый')
+        query_args = (options['rows'], options['sleep'] / 1000)
+
+        self.stdout.write(f'СУБД: {connection.vendor}, асинхронный драйвер: '
+                          f'{"да" if is_async_supported() else "нет"}')
+
+        if 'sync' in modes:
+            started = time.perf_counter()
+            latencies = self.run_sync(requests, fan_out, query_args)
+            self.report('sync', latencies, time.perf_counter() - started)
+
+        async_modes = [mode for mode in modes if mode != 'sync']
+        if async_modes:
+            results = asyncio.run(self.run_async_modes(async_modes, requests, fan_out, query_args))
+            for mode, (latencies, elapsed) in results.items():
+                self.report(mode, latencies, elapsed)
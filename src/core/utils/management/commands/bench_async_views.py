@@ -0,0 +1,134 @@
+"""
+Файл для определения команды Django для замера асинхронных view auto_api.
+
+Этот файл содержит класс Command, который наследуется от BaseCommand и
+сравнивает обработку параллельных запросов view, созданными фабрикой
+create_dynamic_api_view для синхронного и асинхронного обработчика. Оба
+обработчика ожидают ввод-вывод (--io-ms миллисекунд): синхронный - time.sleep,
+асинхронный - asyncio.sleep.
+
+Запросы выполняются так же, как под ASGI (Daphne): синхронный view
+вызывается через sync_to_async(thread_sensitive=True) - все такие view
+выполняются в одном потоке по очереди, - асинхронный view ожидается прямо
+в event loop. Одновременно выполняется --concurrency запросов (по умолчанию 500).
+
+Пример использования:
+>>> python src/manage.py bench_async_views
+>>> python src/manage.py bench_async_views --concurrency 500 --requests 2000 --io-ms 20
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncRequestFactory
+from rest_framework import permissions
+from rest_framework.renderers import JSONRenderer
+
+from src.core.utils.auto_api.base_handler import BaseHandler
+from src.core.utils.auto_api.methods_generation import create_dynamic_api_view
+
+logger = logging.getLogger('core.utils.commands')
+
+class SyncBenchHandler(BaseHandler):
+    def process(self):
+        time.sleep(self.params['io_ms'] / 1000)
+        return {"value": self.params['value']}
+
+class AsyncBenchHandler(BaseHandler):
+    async def process(self):
+        await asyncio.sleep(self.params['io_ms'] / 1000)
+        return {"value": self.params['value']}
+
+def create_bench_view(handler_class):
+    """View auto_api для обработчика без аутентификации и throttling."""
+    handler = handler_class(required_params=['value'], optional_params={'io_ms': 10},
+                            params_description={'value': {'type': 'integer'}})
+    view_class = create_dynamic_api_view(
+        method='GET', renderers=[JSONRenderer], handler=handler, status_code=200,
+        swagger_description='', swagger_params=[], swagger_responses={},
+    )
+    view_class.permission_classes = [permissions.AllowAny]
+    view_class.authentication_classes = []
+    return view_class.as_view()
+
+class Command(BaseCommand):
+    """
+    Команда Django для замера асинхронных view auto_api.
+    """
+    help = 'Замер параллельных запросов к синхронным и асинхронным view auto_api'
+
+    def add_arguments(self, parser) -> None:
+        """
+        Добавляет аргументы командной строки.
+
+        Args:
+            parser: Парсер аргументов командной строки
+        """
+        parser.add_argument('--concurrency', type=int, default=500, help='Количество одновременных запросов')
+        parser.add_argument('--requests', type=int, help='Общее количество запросов (по умолчанию - 2 * concurrency)')
+        parser.add_argument('--io-ms', type=int, default=10, help='Время ожидания ввода-вывода в обработчике, мс')
+        parser.add_argument('--mode', action='append', choices=['sync', 'async'],
+                            help='Режим (можно указать несколько, по умолчанию - оба)')
+
+    def report(self, mode: str, latencies: list, elapsed: float) -> None:
+        msg = (f'{mode}: {len(latencies)} запросов за {elapsed:.2f} с ({len(latencies) / elapsed:.0f} запр/с), '
+               f'медиана {statistics.median(latencies) * 1000:.1f} мс, '
+               f'p95 {statistics.quantiles(latencies, n=20)[-1] * 1000:.1f} мс')
+        logger.info(msg)
+        self.stdout.write(self.style.SUCCESS(msg))
+
+    async def run(self, call, requests: int, concurrency: int, io_ms: int) -> tuple:
+        factory = AsyncRequestFactory()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one(value: int) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await call(factory.get('/bench/', {'value': value, 'io_ms': io_ms}))
+                if response.status_code != 200:
+                    raise CommandError(f'Неожиданный ответ {response.status_code}: {response.content[:200]!r}')
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(value) for value in range(requests)))
+        return latencies, time.perf_counter() - started
+
+    def handle(self, *args: tuple, **options: dict) -> None:
+        """
+        Выполняет замер.
+
+        Args:
+            *args: Позиционные аргументы
+            **options: Именованные аргументы
+        """
+        logger.info('Запуск команды bench_async_views')
+        concurrency = options['concurrency']
+        requests = options['requests'] or 2 * concurrency
+        if concurrency < 1 or requests < 2:
+            raise CommandError('Нужно не меньше одного одновременного запроса и двух запросов всего')
+
+        sync_view = create_bench_view(SyncBenchHandler)
+        async_view = create_bench_view(AsyncBenchHandler)
+
+        def call_sync(request):
+            return sync_view(request).render()
+
+        async def call_async(request):
+            response = await async_view(request)
+            await response.render()
+            return response
+
+        calls = {
+            # Так Django под ASGI вызывает синхронный view: view и рендеринг - в общем потоке
+            'sync': sync_to_async(call_sync, thread_sensitive=True),
+            'async': call_async,
+        }
+
+        for mode in options['mode'] or ['sync', 'async']:
+            latencies, elapsed = asyncio.run(self.run(calls[mode], requests, concurrency, options['io_ms']))
+            self.report(mode, latencies, elapsed)
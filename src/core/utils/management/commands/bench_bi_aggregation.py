@@ -0,0 +1,138 @@
+"""
+Файл для определения команды Django для замера агрегации данных BI-графиков.
+
+Этот файл содержит класс Command, который наследуется от BaseCommand и
+сравнивает прежнюю агрегацию transform_data_for_bi_graph (циклы Python по
+списку словарей) с колоночным движком bi.aggregation на параметрах агрегации
+обработчика statistic/tasks_graph (count по status и unique_count по
+process_id). Движок замеряется на тех же строках-словарях (включая их
+преобразование в колонки) и на готовых колонках NumPy.
+
+Строки-словари для 10 млн задач занимают несколько гигабайт памяти;
+--max-legacy-rows ограничивает размер, для которого они создаются.
+
+Пример использования:
+>>> python src/manage.py bench_bi_aggregation
+>>> python src/manage.py bench_bi_aggregation --rows 1000000 --max-legacy-rows 1000000
+"""
+
+import gc
+import logging
+import time
+
+import numpy as np
+
+from django.core.management.base import BaseCommand, CommandError
+
+from src.external.examples.bi.aggregation import aggregate
+from src.external.examples.bi.scripts import aggregation_params_def
+
+logger = logging.getLogger('core.utils.commands')
+
+STATUSES = np.array(['Pending', 'In Progress', 'Completed', 'Cancelled'], dtype=object)
+
+def legacy_transform(bpm_data, aggregation_params):
+    """Прежняя реализация transform_data_for_bi_graph (эталон для сравнения)."""
+    aggregated_data = {}
+
+    for param in aggregation_params:
+        key = param.get('key')
+        aggregation_type = param.get('aggregation_type')
+        data_source = param.get('data_source')
+
+        if aggregation_type == 'count':
+            counts = {}
+            for item in bpm_data[data_source]:
+                value = item.get(key)
+                if value in counts:
+                    counts[value] += 1
+                else:
+                    counts[value] = 1
+            aggregated_data[f"{key}_counts"] = counts
+
+        elif aggregation_type == 'unique_count':
+            unique_counts = {}
+            for item in bpm_data[data_source]:
+                value = item.get(key)
+                if value in unique_counts:
+                    unique_counts[value].add(item["id"])
+                else:
+                    unique_counts[value] = {item["id"]}
+            unique_counts = {k: len(v) for k, v in unique_counts.items()}
+            aggregated_data[f"{key}_unique_counts"] = unique_counts
+
+    return aggregated_data
+
+def get_task_columns(rows: int, processes: int, seed: int) -> dict:
+    """Колонки задач: id, process_id и status."""
+    rng = np.random.default_rng(seed)
+    return {
+        'id': np.arange(1, rows + 1),
+        'process_id': rng.integers(1, processes + 1, rows),
+        'status': STATUSES[rng.integers(0, len(STATUSES), rows)],
+    }
+
+def to_records(columns: dict) -> list:
+    """Колонки как список словарей (формат прежних источников данных)."""
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*(columns[name].tolist() for name in names))]
+
+class Command(BaseCommand):
+    """
+    Команда Django для замера агрегации данных BI-графиков.
+    """
+    help = 'Замер агрегации BI-графиков: циклы Python против колоночного движка'
+
+    def add_arguments(self, parser) -> None:
+        """
+        Добавляет аргументы командной строки.
+
+        Args:
+            parser: Парсер аргументов командной строки
+        """
+        parser.add_argument('--rows', type=int, action='append',
+                            help='Количество задач (можно указать несколько, по умолчанию - 10 тыс., 1 млн и 10 млн)')
+        parser.add_argument('--processes', type=int, default=1000, help='Количество процессов')
+        parser.add_argument('--max-legacy-rows', type=int, default=10_000_000,
+                            help='Наибольшее количество задач для замеров на строках-словарях')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора случайных чисел')
+
+    def measure(self, func, *args) -> tuple:
+        gc.collect()
+        started = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - started
+
+    def handle(self, *args: tuple, **options: dict) -> None:
+        """
+        Выполняет замер.
+
+        Args:
+            *args: Позиционные аргументы
+            **options: Именованные аргументы
+        """
+        logger.info('Запуск команды bench_bi_aggregation')
+        sizes = options['rows'] or [10_000, 1_000_000, 10_000_000]
+        if min(sizes) < 1 or options['processes'] < 1:
+            raise CommandError('Количество задач и процессов должно быть положительным')
+
+        for rows in sizes:
+            columns = get_task_columns(rows, options['processes'], options['seed'])
+            result, columnar_time = self.measure(aggregate, {'tasks': columns}, aggregation_params_def)
+            msg = f'{rows} задач: движок на колонках {columnar_time:.3f} с'
+
+            if rows <= options['max_legacy_rows']:
+                records = {'tasks': to_records(columns)}
+                expected, legacy_time = self.measure(legacy_transform, records, aggregation_params_def)
+                records_result, records_time = self.measure(aggregate, records, aggregation_params_def)
+                del records
+                if result != expected or records_result != expected:
+                    raise CommandError(f'Результаты движка и прежней агрегации различаются ({rows} задач)')
+                msg += (f', на словарях {records_time:.3f} с, циклы Python {legacy_time:.3f} с; '
+                        f'ускорение {legacy_time / records_time:.1f}x (словари), '
+                        f'{legacy_time / columnar_time:.1f}x (колонки)')
+            else:
+                msg += ' (циклы Python пропущены: --max-legacy-rows)'
+
+            logger.info(msg)
+            self.stdout.write(self.style.SUCCESS(msg))
@@ -0,0 +1,98 @@
+"""
+Файл для определения команды Django для замера скорости массовой загрузки данных.
+
+Этот файл содержит класс Command, который наследуется от BaseCommand и сравнивает
+скорость загрузки синтетического DataFrame в указанную базу стандартным
+DataFrame.to_sql (пакетные INSERT) и BulkLoader (COPY для PostgreSQL,
+LOAD DATA для MySQL, fast_executemany для MSSQL). Тестовые таблицы удаляются
+после замера.
+
+Пример использования:
+>>> python src/manage.py bench_bulk_load
+>>> python src/manage.py bench_bulk_load --database analytics --rows 1000000 --upsert
+"""
+
+import logging
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+from django.core.management.base import BaseCommand
+
+from src.core.utils.database import SqlAlchemyManager
+from src.core.utils.database.dbconfig import DBConfig
+
+logger = logging.getLogger('core.utils.commands')
+
+def make_bench_frame(rows: int) -> pd.DataFrame:
+    """Синтетический DataFrame с колонками основных типов."""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'id': np.arange(rows, dtype='int64'),
+        'name': [f'name {i}' for i in range(rows)],
+        'amount': rng.random(rows) * 1000,
+        'quantity': rng.integers(0, 100, rows),
+        'is_active': rng.random(rows) > 0.5,
+        'created_at': pd.Timestamp('2024-01-01') + pd.to_timedelta(np.arange(rows), unit='s'),
+    })
+
+class Command(BaseCommand):
+    """
+    Команда Django для замера скорости массовой загрузки данных.
+    """
+    help = 'Замер скорости загрузки DataFrame: to_sql и BulkLoader'
+
+    def add_arguments(self, parser) -> None:
+        """
+        Добавляет аргументы командной строки.
+
+        Args:
+            parser: Парсер аргументов командной строки
+        """
+        parser.add_argument('--database', default='default', help='Имя базы данных из DATABASES')
+        parser.add_argument('--rows', type=int, default=200_000, help='Количество строк')
+        parser.add_argument('--chunksize', type=int, default=10000, help='Размер пакета для to_sql')
+        parser.add_argument('--upsert', action='store_true', help='Дополнительно замерить загрузку с upsert')
+
+    def report(self, name: str, rows: int, elapsed: float) -> None:
+        msg = f'{name}: {rows} строк за {elapsed:.2f} с, {rows / elapsed:.0f} строк/с'
+        logger.info(msg)
+        self.stdout.write(self.style.SUCCESS(msg))
+
+    def handle(self, *args: tuple, **options: dict) -> None:
+        """
+        Выполняет замер.
+
+        Args:
+            *args: Позиционные аргументы
+            **options: Именованные аргументы
+        """
+        logger.info('Запуск команды bench_bulk_load')
+        frame = make_bench_frame(options['rows'])
+        suffix = uuid.uuid4().hex[:8]
+        tables = [f'bench_to_sql_{suffix}', f'bench_bulk_{suffix}']
+
+        with DBConfig(options['database']) as config:
+            manager = SqlAlchemyManager(config)
+            self.stdout.write(f'СУБД: {manager.engine.dialect.name}')
+            try:
+                started = time.perf_counter()
+                frame.to_sql(tables[0], manager.engine, if_exists='append', index=False,
+                             chunksize=options['chunksize'])
+                self.report('DataFrame.to_sql', len(frame), time.perf_counter() - started)
+
+                result = manager.to_sql(frame, tables[1])
+                self.report(f"BulkLoader ({result['method']})", result['rows'], result['seconds'])
+
+                if options['upsert']:
+                    with manager.engine.begin() as conn:
+                        conn.exec_driver_sql(f'CREATE UNIQUE INDEX ux_{tables[1]} ON {tables[1]} (id)')
+                    result = manager.to_sql(frame, tables[1], upsert_keys=['id'])
+                    self.report(f"BulkLoader upsert ({result['method']})", result['rows'], result['seconds'])
+            finally:
+                with manager.engine.begin() as conn:
+                    for table in tables:
+                        sa.Table(table, sa.MetaData()).drop(conn, checkfirst=True)
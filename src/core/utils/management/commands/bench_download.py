@@ -0,0 +1,156 @@
+"""
+Файл для определения команды Django для замера пропускной способности отдачи файлов.
+
+Этот файл содержит класс Command, который наследуется от BaseCommand и замеряет
+скорость формирования и чтения ответов `build_file_response` для полного файла,
+докачки с середины и нескольких диапазонов, а также стандартного FileResponse
+для сравнения. Тестовый файл создается разреженным, поэтому замер показывает
+накладные расходы Python, а не скорость диска.
+
+Те же ответы замеряются и под ASGI: запрос ASGIRequest, тело читается
+асинхронно, как его читает ASGI-обработчик Django. Для каждого ответа
+выводятся время до первого блока и пик памяти Python (tracemalloc):
+стандартный FileResponse под ASGI читается в память целиком, ответы
+`build_file_response` - блоками.
+
+Пример использования:
+>>> python src/manage.py bench_download
+>>> python src/manage.py bench_download --size-mb 4096 --repeat 3
+>>> python src/manage.py bench_download --mode asgi
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+from django.core.management.base import BaseCommand
+from django.http import FileResponse
+from django.test import AsyncRequestFactory, RequestFactory
+
+from src.core.utils.files.download import FileDownload, build_file_response
+
+logger = logging.getLogger('core.utils.commands')
+
+class Command(BaseCommand):
+    """
+    Команда Django для замера пропускной способности отдачи файлов.
+    """
+    help = 'Замер пропускной способности отдачи файлов'
+
+    def add_arguments(self, parser) -> None:
+        """
+        Добавляет аргументы командной строки.
+
+        Args:
+            parser: Парсер аргументов командной строки
+        """
+        parser.add_argument('--size-mb', type=int, default=1024, help='Размер тестового файла в МБ')
+        parser.add_argument('--repeat', type=int, default=1, help='Количество повторов каждого замера')
+        parser.add_argument('--dir', default=None, help='Директория для тестового файла')
+        parser.add_argument('--mode', action='append', choices=['wsgi', 'asgi'],
+                            help='Режим (можно указать несколько, по умолчанию - оба)')
+
+    def measure(self, make_response, repeat: int) -> tuple:
+        """
+        Замеряет время чтения ответа.
+
+        Returns:
+            tuple: (статус ответа, количество байт, лучшее время в секундах)
+        """
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = make_response()
+            total = sum(len(chunk) for chunk in response.streaming_content)
+            response.close()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return response.status_code, total, best
+
+    async def ameasure(self, make_response, repeat: int) -> tuple:
+        """
+        Замеряет время асинхронного чтения ответа, как под ASGI.
+
+        Returns:
+            tuple: (статус ответа, количество байт, лучшее время, время до первого блока
+                в секундах, пик памяти в байтах)
+        """
+        best = first = peak = None
+        for _ in range(repeat):
+            tracemalloc.start()
+            started = time.perf_counter()
+            response = make_response()
+            total = 0
+            first_chunk = None
+            with warnings.catch_warnings():
+                # Предупреждение Django о чтении синхронного итератора целиком
+                warnings.simplefilter('ignore')
+                async for chunk in response:
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - started
+                    total += len(chunk)
+            response.close()
+            elapsed = time.perf_counter() - started
+            peak = max(peak or 0, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            best = elapsed if best is None else min(best, elapsed)
+            first = first_chunk if first is None else min(first, first_chunk or 0)
+        return response.status_code, total, best, first or 0, peak
+
+    def make_cases(self, factory, path: str, download: FileDownload, size: int) -> dict:
+        """Замеряемые ответы для фабрики запросов (RequestFactory или AsyncRequestFactory)."""
+        return {
+            'FileResponse (стандартный)': lambda: FileResponse(open(path, 'rb')),
+            'Полный файл': lambda: build_file_response(factory.get('/'), download),
+            'Докачка с середины': lambda: build_file_response(
+                factory.get('/', headers={'Range': f'bytes={size // 2}-'}), download
+            ),
+            'Четыре диапазона': lambda: build_file_response(
+                factory.get('/', headers={'Range': ','.join(
+                    f'bytes={i * size // 4}-{i * size // 4 + size // 8}' if i == 0
+                    else f'{i * size // 4}-{i * size // 4 + size // 8}'
+                    for i in range(4)
+                )}), download
+            ),
+        }
+
+    def handle(self, *args: tuple, **options: dict) -> None:
+        """
+        Выполняет замер.
+
+        Args:
+            *args: Позиционные аргументы
+            **options: Именованные аргументы
+        """
+        logger.info('Запуск команды bench_download')
+        size = options['size_mb'] * 1024 * 1024
+        modes = options['mode'] or ['wsgi', 'asgi']
+
+        with tempfile.TemporaryDirectory(dir=options['dir']) as directory:
+            path = os.path.join(directory, 'bench.bin')
+            with open(path, 'wb') as file:
+                file.truncate(size)
+            download = FileDownload(path)
+
+            if 'wsgi' in modes:
+                for name, make_response in self.make_cases(RequestFactory(), path, download, size).items():
+                    status, total, elapsed = self.measure(make_response, options['repeat'])
+                    msg = (f'{name}: статус {status}, {total / 1024 / 1024:.0f} МБ за {elapsed:.2f} с, '
+                           f'{total / 1024 / 1024 / elapsed:.0f} МБ/с')
+                    logger.info(msg)
+                    self.stdout.write(self.style.SUCCESS(msg))
+
+            if 'asgi' in modes:
+                for name, make_response in self.make_cases(AsyncRequestFactory(), path, download, size).items():
+                    status, total, elapsed, first, peak = asyncio.run(
+                        self.ameasure(make_response, options['repeat'])
+                    )
+                    msg = (f'ASGI, {name}: статус {status}, {total / 1024 / 1024:.0f} МБ за {elapsed:.2f} с, '
+                           f'{total / 1024 / 1024 / elapsed:.0f} МБ/с, первый блок через {first * 1000:.1f} мс, '
+                           f'пик памяти {peak / 1024 / 1024:.1f} МБ')
+                    logger.info(msg)
+                    self.stdout.write(self.style.SUCCESS(msg))
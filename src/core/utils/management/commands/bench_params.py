@@ -0,0 +1,110 @@
+"""
+Файл для определения команды Django для замера обработки параметров auto_api.
+
+Этот файл содержит класс Command, который наследуется от BaseCommand и
+сравнивает прежнюю обработку параметров обработчика (проверка обязательных
+параметров через множества, слияние словарей optional_params и параметров
+запроса, поиск функции приведения в TYPE_CONVERTERS по типу значения по
+умолчанию для каждого параметра) со скомпилированным планом ParamsPlan.
+
+Пример использования:
+>>> python src/manage.py bench_params
+>>> python src/manage.py bench_params --calls 500000 --params 20
+"""
+
+import logging
+import time
+
+from typing import Any, Dict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from src.core.utils.auto_api.params_plan import ParamsPlan
+
+logger = logging.getLogger('core.utils.commands')
+
+# Прежние функции приведения BaseHandler
+TYPE_CONVERTERS = {
+    int: int,
+    float: float,
+    bool: lambda x: str(x).lower() == 'true',
+    str: str,
+}
+
+def legacy_prepare(required_params: list, optional_params: Dict[str, Any], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Прежняя обработка параметров BaseHandler (validate_params + prepare_params)."""
+    if missing_params := set(required_params) - set(kwargs):
+        raise ValueError(f"Missing required parameters: {', '.join(missing_params)}")
+
+    def convert_param_type(param_name, param_value):
+        if param_name not in optional_params:
+            return param_value
+        default_value = optional_params[param_name]
+        converter = TYPE_CONVERTERS.get(type(default_value))
+        if not converter:
+            return param_value
+        try:
+            return converter(param_value)
+        except (ValueError, TypeError):
+            return default_value
+
+    return {key: convert_param_type(key, value) for key, value in {**optional_params, **kwargs}.items()}
+
+def build_config(params: int) -> tuple:
+    """Конфигурация маршрута и параметры запроса: половина параметров передана строками."""
+    defaults = (10, 1.5, True, 'text')
+    required_params = ['id']
+    optional_params = {f'param_{i}': defaults[i % len(defaults)] for i in range(params)}
+    request = {'id': '42', **{name: str(value) for name, value in list(optional_params.items())[::2]}}
+    return required_params, optional_params, request
+
+class Command(BaseCommand):
+    """
+    Команда Django для замера обработки параметров auto_api.
+    """
+    help = 'Сравнение прежней обработки параметров обработчиков и ParamsPlan'
+
+    def add_arguments(self, parser) -> None:
+        """
+        Добавляет аргументы командной строки.
+
+        Args:
+            parser: Парсер аргументов командной строки
+        """
+        parser.add_argument('--calls', type=int, default=200_000, help='Количество вызовов')
+        parser.add_argument('--params', type=int, default=10, help='Количество опциональных параметров маршрута')
+
+    def report(self, name: str, calls: int, elapsed: float) -> None:
+        msg = f'{name}: {calls} вызовов за {elapsed:.3f} с ({elapsed / calls * 1e6:.2f} мкс на вызов)'
+        logger.info(msg)
+        self.stdout.write(self.style.SUCCESS(msg))
+
+    def handle(self, *args: tuple, **options: dict) -> None:
+        """
+        Выполняет замер.
+
+        Args:
+            *args: Позиционные аргументы
+            **options: Именованные аргументы
+        """
+        logger.info('Запуск команды bench_params')
+        calls = options['calls']
+        if calls < 1 or options['params'] < 0:
+            raise CommandError('Количество вызовов должно быть положительным, параметров - неотрицательным')
+
+        required_params, optional_params, request = build_config(options['params'])
+        plan = ParamsPlan.compile(required_params, optional_params)
+
+        started = time.perf_counter()
+        for _ in range(calls):
+            legacy_prepare(required_params, optional_params, request)
+        legacy = time.perf_counter() - started
+        self.report('legacy', calls, legacy)
+
+        started = time.perf_counter()
+        for _ in range(calls):
+            plan.apply(dict(request))
+        compiled = time.perf_counter() - started
+        self.report('ParamsPlan', calls, compiled)
+
+        self.stdout.write(self.style.SUCCESS(f'Ускорение: {legacy / compiled:.2f}x'))
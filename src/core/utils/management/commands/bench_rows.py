@@ -0,0 +1,92 @@
+"""
+Файл для определения команды Django для замера фабрик строк результатов запросов.
+
+Этот файл содержит класс Command, который наследуется от BaseCommand и замеряет
+время и пиковую память преобразования результата запроса фабриками строк
+(tuple, dict, ordered_dict, record, columnar, numpy). Строки генерируются
+рекурсивным CTE в базе default, поэтому замер включает чтение из курсора.
+
+Пример использования:
+>>> python src/manage.py bench_rows
+>>> python src/manage.py bench_rows --rows 100000 --factory record --factory ordered_dict
+"""
+
+import gc
+import logging
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from src.core.utils.database import QueryExecutor
+from src.core.utils.database.rows import ROW_FACTORIES
+
+logger = logging.getLogger('core.utils.commands')
+
+def get_bench_query(rows: int):
+    """Запрос, возвращающий rows строк из шести колонок разных типов."""
+    sql = (
+        "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s) "
+        "SELECT n AS id, 'name' || n AS name, n * 1.5 AS amount, n %% 2 AS flag, "
+        "'2024-01-01' AS created, 'note' AS note FROM seq"
+    )
+    return sql, (rows,)
+
+class Command(BaseCommand):
+    """
+    Команда Django для замера фабрик строк результатов запросов.
+    """
+    help = 'Замер времени и памяти фабрик строк результатов запросов'
+
+    def add_arguments(self, parser) -> None:
+        """
+        Добавляет аргументы командной строки.
+
+        Args:
+            parser: Парсер аргументов командной строки
+        """
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Количество строк')
+        parser.add_argument(
+            '--factory',
+            action='append',
+            choices=list(ROW_FACTORIES),
+            help='Фабрика строк (можно указать несколько, по умолчанию - все)'
+        )
+
+    def measure(self, row_factory: str, rows: int) -> tuple:
+        """
+        Замеряет получение результата одной фабрикой.
+
+        Returns:
+            tuple: (время в секундах, пиковая память в байтах, память результата в байтах)
+        """
+        gc.collect()
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = QueryExecutor.fetchall(get_bench_query, rows, row_factory=row_factory)
+        elapsed = time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        return elapsed, peak, current
+
+    def handle(self, *args: tuple, **options: dict) -> None:
+        """
+        Выполняет замер.
+
+        Args:
+            *args: Позиционные аргументы
+            **options: Именованные аргументы
+        """
+        logger.info('Запуск команды bench_rows')
+        factories = options['factory'] or list(ROW_FACTORIES)
+        rows = options['rows']
+        if rows < 1:
+            raise CommandError('Количество строк должно быть положительным')
+
+        for row_factory in factories:
+            elapsed, peak, current = self.measure(row_factory, rows)
+            msg = (f'{row_factory}: {rows} строк за {elapsed:.2f} с, '
+                   f'результат {current / 1024 / 1024:.0f} МБ, пик {peak / 1024 / 1024:.0f} МБ')
+            logger.info(msg)
+            self.stdout.write(self.style.SUCCESS(msg))
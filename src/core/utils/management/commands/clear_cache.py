@@ -1,29 +1,93 @@
 """
 Файл для определения команды Django для очистки системного кэша.
 
-Этот файл содержит класс Command, который наследуется от BaseCommand и предоставляет 
+Этот файл содержит класс Command, который наследуется от BaseCommand и предоставляет
 функциональность для очистки кэша Django через стандартный интерфейс кэширования.
+Поддерживается очистка отдельных алиасов из CACHES, отдельных пространств имен
+ключей (например, кэша ответов одного эндпоинта auto_api) и только уровня L1
+двухуровневого кэша.
 
 Пример использования:
 >>> python src/manage.py clear_cache
+>>> python src/manage.py clear_cache --alias default
+>>> python src/manage.py clear_cache --namespace auto_api:TasksGraphView
+>>> python src/manage.py clear_cache --tier l1
 """
 
 import logging
 
-from django.core.management.base import BaseCommand
-from django.core.cache import cache
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.cache import caches
+
+from src.core.utils.cache.namespaces import clear_namespace
+from src.core.utils.cache.tiered import TieredCache
 
 logger = logging.getLogger('core.utils.commands')
 
 class Command(BaseCommand):
     """
     Команда Django для очистки системного кэша.
-    
+
     Использует стандартный интерфейс кэширования Django для
-    полной очистки всего кэша.
+    полной очистки кэша, сброса пространств имен или уровня L1.
     """
     help = 'Очистка системного кэша'
 
+    def add_arguments(self, parser) -> None:
+        """
+        Добавляет аргументы командной строки.
+
+        Args:
+            parser: Парсер аргументов командной строки
+        """
+        parser.add_argument(
+            '--alias',
+            action='append',
+            dest='aliases',
+            help='Алиас кэша из CACHES (можно указать несколько раз, по умолчанию - все)'
+        )
+        parser.add_argument(
+            '--namespace',
+            action='append',
+            dest='namespaces',
+            help='Очистить только пространство имен ключей (можно указать несколько раз)'
+        )
+        parser.add_argument(
+            '--tier',
+            choices=['all', 'l1'],
+            default='all',
+            help='Уровень очистки: all - весь кэш, l1 - только память процессов двухуровневого кэша'
+        )
+
+    def clear_alias(self, alias: str, namespaces: list, tier: str) -> str:
+        """
+        Очищает один алиас кэша.
+
+        Args:
+            alias: Алиас кэша
+            namespaces: Пространства имен для очистки (пусто - весь алиас)
+            tier: Уровень очистки
+
+        Returns:
+            str: Описание выполненного действия
+        """
+        cache = caches[alias]
+
+        if namespaces:
+            for namespace in namespaces:
+                clear_namespace(namespace, cache)
+            return f"{alias}: сброшены пространства имен {', '.join(namespaces)}"
+
+        if tier == 'l1':
+            if not isinstance(cache, TieredCache):
+                return f'{alias}: пропущен (не двухуровневый кэш)'
+            cache.invalidate_l1()
+            return f'{alias}: сброшен уровень L1'
+
+        cache.clear()
+        return f'{alias}: очищен'
+
     def handle(self, *args: tuple, **options: dict) -> None:
         """
         Выполняет команду очистки кэша.
@@ -33,12 +97,22 @@ class Command(BaseCommand):
             **options: Именованные аргументы
         """
         logger.info('Запуск команды clear_cache')
+
+        aliases = options['aliases'] or list(settings.CACHES)
+        unknown = [alias for alias in aliases if alias not in settings.CACHES]
+        if unknown:
+            raise CommandError(f"Неизвестные алиасы кэша: {', '.join(unknown)}")
+
         try:
-            cache.clear()
+            for alias in aliases:
+                msg = self.clear_alias(alias, options['namespaces'] or [], options['tier'])
+                logger.info(msg)
+                self.stdout.write(msg)
+
             msg = 'Кэш успешно очищен'
             logger.info(msg)
             self.stdout.write(self.style.SUCCESS(msg))
         except Exception as e:
             msg = f'Ошибка при очистке кэша: {str(e)}'
             logger.error(msg)
-            self.stdout.write(self.style.ERROR(msg))
\ No newline at end of file
+            self.stdout.write(self.style.ERROR(msg))
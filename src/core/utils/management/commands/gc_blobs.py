@@ -0,0 +1,68 @@
+"""
+Файл для определения команды Django для сборки мусора в хранилище загруженных файлов.
+
+Этот файл содержит класс Command, который наследуется от BaseCommand и удаляет
+блобы, на которые не осталось ссылок, файлы хранилища без записи в индексе
+и брошенные незавершенные загрузки.
+
+Пример использования:
+>>> python src/manage.py gc_blobs
+>>> python src/manage.py gc_blobs --dry-run --grace 0
+"""
+
+import logging
+
+from django.core.management.base import BaseCommand
+
+from src.core.utils.files.blobs import BLOB_GC_GRACE, collect_garbage
+from src.core.utils.files.upload import UPLOAD_SESSION_TTL, cleanup_partial_uploads
+
+logger = logging.getLogger('core.utils.commands')
+
+class Command(BaseCommand):
+    """
+    Команда Django для сборки мусора в хранилище загруженных файлов.
+    """
+    help = 'Удаление неиспользуемых файлов из хранилища загрузок'
+
+    def add_arguments(self, parser) -> None:
+        """
+        Добавляет аргументы командной строки.
+
+        Args:
+            parser: Парсер аргументов командной строки
+        """
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=BLOB_GC_GRACE,
+            help='Минимальный возраст удаляемых блобов в секундах'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет удалено'
+        )
+
+    def handle(self, *args: tuple, **options: dict) -> None:
+        """
+        Выполняет сборку мусора.
+
+        Args:
+            *args: Позиционные аргументы
+            **options: Именованные аргументы
+        """
+        logger.info('Запуск команды gc_blobs')
+        try:
+            stats = collect_garbage(grace=options['grace'], dry_run=options['dry_run'])
+            partial = cleanup_partial_uploads(UPLOAD_SESSION_TTL, dry_run=options['dry_run'])
+
+            prefix = 'Будет удалено' if options['dry_run'] else 'Удалено'
+            msg = (f"{prefix}: блобов - {stats['blobs']}, файлов без индекса - {stats['orphans']}, "
+                   f"незавершенных загрузок - {partial}; освобождено байт - {stats['bytes']}")
+            logger.info(msg)
+            self.stdout.write(self.style.SUCCESS(msg))
+        except Exception as e:
+            msg = f'Ошибка при сборке мусора: {str(e)}'
+            logger.error(msg)
+            self.stdout.write(self.style.ERROR(msg))
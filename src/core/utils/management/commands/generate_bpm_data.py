@@ -0,0 +1,116 @@
+"""
+Файл для определения команды Django для генерации синтетических данных BPM.
+
+Этот файл содержит класс Command, который наследуется от BaseCommand и
+генерирует процессы, задачи и пользователей векторным генератором
+(bpm/generator.py) для нагрузочного тестирования BI-обработчиков. Данные
+генерируются частями по --chunk-size строк и записываются в базу массовой
+загрузкой (COPY для PostgreSQL, LOAD DATA для MySQL) или в Parquet, не
+накапливаясь в памяти. Без --output данные только генерируются (замер скорости).
+
+Пример использования:
+>>> python src/manage.py generate_bpm_data --tasks 1000000
+>>> python src/manage.py generate_bpm_data --processes 1000000 --tasks 10000000 --users 100000 --output database
+>>> python src/manage.py generate_bpm_data --output parquet --path data/bpm --seed 42 --process-zipf 0.8
+>>> python src/manage.py generate_bpm_data --status-weights "Completed=6,In Progress=2,Pending=1,Cancelled=1"
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from src.external.examples.bpm.generator import (
+    DEFAULT_CHUNK_SIZE,
+    TABLES,
+    BpmGenerator,
+    write_parquet,
+    write_to_database,
+)
+
+logger = logging.getLogger('core.utils.commands')
+
+def parse_status_weights(value: str) -> dict:
+    """Веса статусов из строки 'Статус=вес,...'."""
+    weights = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        status, separator, weight = item.rpartition('=')
+        if not separator or not status.strip():
+            raise CommandError(f"Неверный вес статуса '{item}', ожидается 'Статус=вес'")
+        try:
+            weights[status.strip()] = float(weight)
+        except ValueError:
+            raise CommandError(f"Неверный вес статуса '{item}', вес должен быть числом")
+    return weights
+
+class Command(BaseCommand):
+    """
+    Команда Django для генерации синтетических данных BPM.
+    """
+    help = 'Генерация синтетических процессов, задач и пользователей BPM'
+
+    def add_arguments(self, parser) -> None:
+        """
+        Добавляет аргументы командной строки.
+
+        Args:
+            parser: Парсер аргументов командной строки
+        """
+        parser.add_argument('--processes', type=int, default=100_000, help='Количество процессов')
+        parser.add_argument('--tasks', type=int, default=1_000_000, help='Количество задач')
+        parser.add_argument('--users', type=int, default=10_000, help='Количество пользователей')
+        parser.add_argument('--seed', type=int, help='Начальное значение генератора (по умолчанию - случайное)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Количество строк в части')
+        parser.add_argument('--status-weights', help="Веса статусов задач: 'Статус=вес,...' (по умолчанию - равные)")
+        parser.add_argument('--process-zipf', type=float, default=0.0,
+                            help='Показатель закона Ципфа для задач по процессам (0 - равномерно)')
+        parser.add_argument('--user-zipf', type=float, default=1.0,
+                            help='Показатель закона Ципфа для задач по пользователям (0 - равномерно)')
+        parser.add_argument('--table', action='append', choices=TABLES,
+                            help='Таблица (можно указать несколько, по умолчанию - все)')
+        parser.add_argument('--output', choices=('database', 'parquet'),
+                            help='Куда записать данные (по умолчанию - только генерация)')
+        parser.add_argument('--database', default='default', help='Имя базы данных из DATABASES')
+        parser.add_argument('--table-prefix', default='bpm_', help='Префикс имен таблиц в базе')
+        parser.add_argument('--path', default='bpm_data', help='Каталог для Parquet')
+
+    def handle(self, *args: tuple, **options: dict) -> None:
+        """
+        Выполняет генерацию.
+
+        Args:
+            *args: Позиционные аргументы
+            **options: Именованные аргументы
+        """
+        logger.info('Запуск команды generate_bpm_data')
+        try:
+            generator = BpmGenerator(
+                options['processes'], options['tasks'], options['users'], seed=options['seed'],
+                status_weights=parse_status_weights(options['status_weights'] or '') or None,
+                process_zipf=options['process_zipf'], user_zipf=options['user_zipf'],
+                chunk_size=options['chunk_size'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        tables = options['table'] or list(TABLES)
+        self.stdout.write(f'seed: {generator.seed}')
+
+        if options['output'] == 'database':
+            results = write_to_database(generator, options['database'], options['table_prefix'], tables)
+        elif options['output'] == 'parquet':
+            try:
+                results = write_parquet(generator, options['path'], tables)
+            except ImportError as e:
+                raise CommandError(f'Для записи в Parquet необходимо установить пакет pyarrow: {e}')
+        else:
+            results = {}
+            for table in tables:
+                started = time.perf_counter()
+                rows = sum(len(columns['id']) for columns in generator.iter_columns(table))
+                results[table] = {'rows': rows, 'seconds': round(time.perf_counter() - started, 3)}
+
+        for table, result in results.items():
+            speed = result['rows'] / result['seconds'] if result['seconds'] else result['rows']
+            msg = f"{table}: {result['rows']} строк за {result['seconds']:.2f} с, {speed:.0f} строк/с"
+            logger.info(msg)
+            self.stdout.write(self.style.SUCCESS(msg))
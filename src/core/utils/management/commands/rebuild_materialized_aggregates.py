@@ -0,0 +1,83 @@
+"""
+Файл для определения команды Django для пересчета материализованных агрегатов BI.
+
+Этот файл содержит класс Command, который наследуется от BaseCommand и полностью
+пересчитывает состояние материализованных представлений (bi/materialized.py)
+по данным их загрузчиков. Пересчет нужен после изменения исходных данных в
+обход apply_changes и для устаревших групп (удаления из скетчей уникальных
+значений и экстремумов).
+
+Пример использования:
+>>> python src/manage.py rebuild_materialized_aggregates
+>>> python src/manage.py rebuild_materialized_aggregates --view tasks_graph
+>>> python src/manage.py rebuild_materialized_aggregates --stale
+>>> python src/manage.py rebuild_materialized_aggregates --status
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from src.external.examples.bi.materialized import (
+    get_materialized_status,
+    get_materialized_views,
+    rebuild_view,
+)
+
+logger = logging.getLogger('core.utils.commands')
+
+class Command(BaseCommand):
+    """
+    Команда Django для пересчета материализованных агрегатов BI.
+    """
+    help = 'Полный пересчет материализованных агрегатов BI'
+
+    def add_arguments(self, parser) -> None:
+        """
+        Добавляет аргументы командной строки.
+
+        Args:
+            parser: Парсер аргументов командной строки
+        """
+        parser.add_argument('--view', action='append',
+                            help='Представление (можно указать несколько, по умолчанию - все)')
+        parser.add_argument('--stale', action='store_true',
+                            help='Пересчитать только представления с устаревшими или не построенными агрегатами')
+        parser.add_argument('--status', action='store_true', help='Только показать состояние агрегатов')
+
+    def handle(self, *args: tuple, **options: dict) -> None:
+        """
+        Выполняет пересчет.
+
+        Args:
+            *args: Позиционные аргументы
+            **options: Именованные аргументы
+        """
+        logger.info('Запуск команды rebuild_materialized_aggregates')
+        views = get_materialized_views()
+        names = options['view'] or list(views)
+        unknown = [name for name in names if name not in views]
+        if unknown:
+            raise CommandError(f"Неизвестные представления: {', '.join(unknown)}. "
+                               f"Доступные: {', '.join(views) or 'нет'}")
+
+        for name in names:
+            status = get_materialized_status(name)
+            if options['status']:
+                for item in status:
+                    self.stdout.write(
+                        f"{name}.{item['name']}: версия {item['version']}, групп {item['groups']}, "
+                        f"устаревших {item['stale_groups']}" if item['built'] else f"{name}.{item['name']}: не построен"
+                    )
+                continue
+
+            if options['stale'] and all(item['built'] and not item['stale_groups'] for item in status):
+                continue
+
+            started = time.perf_counter()
+            groups = rebuild_view(name)
+            msg = (f"Представление '{name}' пересчитано за {time.perf_counter() - started:.2f} с: "
+                   + ', '.join(f'{spec_name} - {count} групп' for spec_name, count in groups.items()))
+            logger.info(msg)
+            self.stdout.write(self.style.SUCCESS(msg))
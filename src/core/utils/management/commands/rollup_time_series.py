@@ -0,0 +1,65 @@
+"""
+Файл для определения команды Django для обновления агрегатов временных рядов BI.
+
+Этот файл содержит класс Command, который наследуется от BaseCommand и
+обновляет агрегаты временных рядов по интервалам (bi/rollups.py) так же, как
+периодическая задача refresh_time_rollups. С --rebuild агрегаты ряда удаляются
+и пересчитываются по всем событиям загрузчика - это нужно после изменения
+событий в уже сохраненных интервалах и после изменения интервалов ряда.
+
+Пример использования:
+>>> python src/manage.py rollup_time_series
+>>> python src/manage.py rollup_time_series --series task_status --rebuild
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from src.external.examples.bi.rollups import get_registered_series, refresh_time_series
+
+logger = logging.getLogger('core.utils.commands')
+
+class Command(BaseCommand):
+    """
+    Команда Django для обновления агрегатов временных рядов BI.
+    """
+    help = 'Обновление агрегатов временных рядов BI по интервалам'
+
+    def add_arguments(self, parser) -> None:
+        """
+        Добавляет аргументы командной строки.
+
+        Args:
+            parser: Парсер аргументов командной строки
+        """
+        parser.add_argument('--series', action='append',
+                            help='Временной ряд (можно указать несколько, по умолчанию - все)')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Удалить агрегаты и пересчитать по всем событиям')
+
+    def handle(self, *args: tuple, **options: dict) -> None:
+        """
+        Выполняет обновление.
+
+        Args:
+            *args: Позиционные аргументы
+            **options: Именованные аргументы
+        """
+        logger.info('Запуск команды rollup_time_series')
+        registered = get_registered_series()
+        names = options['series'] or list(registered)
+        unknown = [name for name in names if name not in registered]
+        if unknown:
+            raise CommandError(f"Неизвестные ряды: {', '.join(unknown)}. "
+                               f"Доступные: {', '.join(registered) or 'нет'}")
+
+        for name in names:
+            started = time.perf_counter()
+            buckets = refresh_time_series(name, rebuild=options['rebuild'])
+            msg = (f"Ряд '{name}' обновлен за {time.perf_counter() - started:.2f} с: "
+                   + (', '.join(f'{bucket} - {count} интервалов' for bucket, count in buckets.items())
+                      or 'новых событий нет'))
+            logger.info(msg)
+            self.stdout.write(self.style.SUCCESS(msg))
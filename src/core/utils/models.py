@@ -1 +1,34 @@
-from django.db import models
\ No newline at end of file
+from django.db import models
+
+class Blob(models.Model):
+    """
+    Содержимое файла в хранилище, адресуемом по хешу.
+
+    Файл лежит в `MEDIA_ROOT/blobs/<ab>/<cd>/<sha256>`. `refcount` - число
+    логических файлов, ссылающихся на содержимое; блобы с нулевым счетчиком
+    удаляет команда `gc_blobs`.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['refcount', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.sha256} ({self.refcount})"
+
+class StoredFile(models.Model):
+    """Логическое имя загруженного файла, указывающее на блоб."""
+    name = models.CharField(max_length=255, unique=True)
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, related_name='files')
+    original_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,49 @@
+"""
+Файл с вспомогательными функциями потоковых ответов под ASGI.
+
+Под ASGI Django не может отдавать синхронный итератор StreamingHttpResponse
+по частям: он читает его целиком в память (sync_to_async(list)) и только затем
+отправляет клиенту. Поэтому под ASGI потоковые ответы получают асинхронный
+итератор, который забирает каждую часть синхронного итератора в потоке:
+
+>>> if is_asgi_request(request):
+...     content = aiter_sync(iter_rows(), thread_sensitive=True)
+>>> response = StreamingHttpResponse(content)
+"""
+
+from typing import AsyncIterator, Iterator, TypeVar
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+T = TypeVar('T')
+
+# Маркер окончания итератора: StopIteration нельзя передать из потока в корутину
+_DONE = object()
+
+def is_asgi_request(request) -> bool:
+    """
+    Обрабатывается ли запрос ASGI-сервером.
+
+    Args:
+        request: Запрос Django или DRF
+    """
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+async def aiter_sync(iterator: Iterator[T], thread_sensitive: bool = True) -> AsyncIterator[T]:
+    """
+    Асинхронный итератор по синхронному: каждая часть читается через sync_to_async.
+
+    Args:
+        iterator: Синхронный итератор (генератор закрывается по окончании или отмене)
+        thread_sensitive: Читать в общем потоке синхронного кода (нужно для
+            подключений к базе Django) или в отдельном потоке пула (чтение файлов)
+    """
+    next_part = sync_to_async(next, thread_sensitive=thread_sensitive)
+    try:
+        while (part := await next_part(iterator, _DONE)) is not _DONE:
+            yield part
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=thread_sensitive)()
@@ -13,6 +13,14 @@ celery_app.conf.beat_schedule = {
         'task': 'src.core.utils.tasks.monitor_sqlite_status',
         'schedule': timedelta(seconds=10),
     },
+    'gc-blobs': {
+        'task': 'src.core.utils.tasks.gc_blobs',
+        'schedule': timedelta(hours=1),
+    },
+    'refresh-bi-rollups': {
+        'task': 'src.external.examples.bi.tasks.refresh_time_rollups',
+        'schedule': timedelta(minutes=1),
+    },
 }
 
 @shared_task
@@ -22,4 +30,18 @@ def monitor_sqlite_status():
     Записывает текущий статус в лог-файл каждые 10 секунд.
     """
     logger.info("Начало выполнения задачи monitor_sqlite_status")
-    logger.info("Конец выполнения задачи monitor_sqlite_status")
\ No newline at end of file
+    logger.info("Конец выполнения задачи monitor_sqlite_status")
+
+@shared_task
+def gc_blobs():
+    """
+    Сборка мусора в хранилище загруженных файлов.
+    Удаляет блобы без ссылок и брошенные незавершенные загрузки раз в час.
+    """
+    from src.core.utils.files.blobs import collect_garbage
+    from src.core.utils.files.upload import cleanup_partial_uploads
+
+    logger.info("Начало выполнения задачи gc_blobs")
+    collect_garbage()
+    cleanup_partial_uploads()
+    logger.info("Конец выполнения задачи gc_blobs")
@@ -0,0 +1,464 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pandas as pd
+import sqlalchemy as sa
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from src.core.utils.auto_api.base_handler import BaseHandler
+from src.core.utils.auto_api.params_plan import ParamsPlan
+from src.core.utils.auto_api.response_cache import ResponseCache, get_response_cache_stats
+from src.core.utils.cache.namespaces import clear_namespace, namespace_key
+from src.core.utils.cache.tiered import TieredCache
+from src.core.utils.database import aio
+from src.core.utils.database.bulk import BulkLoader, _prepare_frame
+from src.core.utils.database.export import StreamingExport
+from src.core.utils.database.main import QueryExecutor
+from src.core.utils.database.pgcopy import copy_query_to_file, read_copy_frame
+from src.core.utils.database.statements import PreparedStatements
+from src.core.utils.files.download import FileDownload, build_file_response
+from src.core.utils.files.upload import UploadSession
+from src.core.utils.models import StoredFile
+
+class EchoHandler(BaseHandler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prefix = 'echo'
+
+    def process(self):
+        value = self.params['value']
+        # Переключение потоков между чтением параметров и ответом
+        threading.Event().wait(0.0005)
+        return {'prefix': self.prefix, 'value': value, 'again': self.params['value']}
+
+class BaseHandlerIsolationTests(SimpleTestCase):
+    """Параметры запроса не разделяются между параллельными вызовами одного обработчика маршрута."""
+
+    def setUp(self):
+        self.handler = EchoHandler(required_params=['value'], optional_params={},
+                                   params_description={'value': {'type': 'integer'}})
+
+    def test_concurrent_requests_are_isolated(self):
+        with ThreadPoolExecutor(max_workers=64) as executor:
+            results = list(executor.map(lambda value: (value, self.handler(value=str(value))), range(5000)))
+
+        for value, result in results:
+            self.assertEqual(result['value'], value)
+            self.assertEqual(result['again'], value)
+        self.assertEqual(self.handler.params, {})
+
+    def test_init_state_is_preserved(self):
+        self.assertEqual(self.handler(value=1)['prefix'], 'echo')
+
+class ParamsPlanTests(SimpleTestCase):
+    def test_mutable_defaults_are_copied(self):
+        plan = ParamsPlan.compile([], {'tags': [], 'filters': {}})
+        first = plan.apply({})
+        first['tags'].append('changed')
+        first['filters']['key'] = 'changed'
+
+        self.assertEqual(plan.apply({}), {'tags': [], 'filters': {}})
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'response-cache-tests'}})
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.response_cache = ResponseCache('ResponseCacheTestsView', ttl=30, vary_on=['params'])
+        self.request = RequestFactory().get('/')
+
+    def test_stale_entry_is_served_while_recomputing(self):
+        self.response_cache.fetch(self.request, {}, lambda: {'value': 1}, 200)
+        key = namespace_key(self.response_cache.namespace, self.response_cache.make_key(self.request, {}))
+        entry = caches['default'].get(key)
+        caches['default'].set(key, {**entry, 'expires': 0}, 60)
+        # Пересчет выполняет другой запрос
+        caches['default'].add(f'{key}:lock', 1, 30)
+
+        started = time.monotonic()
+        response = self.response_cache.fetch(self.request, {}, lambda: {'value': 2}, 200)
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(response.data, {'value': 1})
+        self.assertEqual(get_response_cache_stats()['ResponseCacheTestsView']['stale'], 1)
+
+class AsgiDownloadTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'data.bin')
+        self.content = bytes(range(256)) * 4096
+        with open(self.path, 'wb') as file:
+            file.write(self.content)
+
+    async def read(self, response) -> bytes:
+        self.assertTrue(response.is_async)
+        return b''.join([chunk async for chunk in response])
+
+    async def test_full_file_is_streamed_asynchronously(self):
+        response = build_file_response(AsyncRequestFactory().get('/'), FileDownload(self.path))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await self.read(response), self.content)
+
+    async def test_ranges_are_streamed_asynchronously(self):
+        request = AsyncRequestFactory().get('/', headers={'Range': 'bytes=10-19,100-'})
+        response = build_file_response(request, FileDownload(self.path))
+        body = await self.read(response)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(len(body), int(response['Content-Length']))
+        self.assertIn(self.content[10:20], body)
+
+class AsgiExportTests(SimpleTestCase):
+    async def test_export_is_streamed_asynchronously(self):
+        rows = ({'id': i, 'name': f'row {i}'} for i in range(3))
+        response = StreamingExport(rows, fmt='csv').response(AsyncRequestFactory().get('/'))
+
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response])
+        self.assertEqual(body.decode('utf-8').splitlines(), ['id,name', '0,row 0', '1,row 1', '2,row 2'])
+
+class BulkLoaderUpsertTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = sa.create_engine('sqlite://')
+        self.loader = BulkLoader(self.engine)
+
+    def count(self, table: str) -> int:
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql(f'SELECT COUNT(*) FROM {table}').scalar()
+
+    def test_created_table_gets_unique_key(self):
+        frame = pd.DataFrame({'code': ['a', 'b'], 'value': [1, 2]})
+        self.loader.load(frame, 'items', upsert_keys=['code'])
+        self.loader.load(frame.assign(value=[10, 20]), 'items', upsert_keys=['code'])
+
+        self.assertEqual(self.count('items'), 2)
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql('SELECT SUM(value) FROM items').scalar(), 30)
+
+    def test_existing_table_without_unique_key_is_rejected(self):
+        frame = pd.DataFrame({'code': ['a'], 'value': [1]})
+        self.loader.load(frame, 'plain')
+
+        with self.assertRaisesMessage(ValueError, 'уникальный индекс'):
+            self.loader.load(frame, 'plain', upsert_keys=['code'])
+        self.assertEqual(self.count('plain'), 1)
+
+    def test_duplicate_keys_keep_last_row(self):
+        loader = BulkLoader(self.engine, chunksize=2)
+        frame = pd.DataFrame({'code': ['a', 'a', 'b', 'a'], 'value': [1, 2, 3, 4]})
+        result = loader.load(frame, 'items', upsert_keys=['code'])
+
+        # Повтор в части отбрасывается, повтор из следующей части обновляет строку
+        self.assertEqual(result['rows'], 3)
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql('SELECT code, value FROM items ORDER BY code').all(),
+                             [('a', 4), ('b', 3)])
+
+    def test_floats_outside_int64_stay_floats(self):
+        frame = _prepare_frame(pd.DataFrame({'big': [2.0 ** 63, 1.0], 'small': [2.0, None]}))
+
+        self.assertEqual(frame['big'].dtype, 'float64')
+        self.assertEqual(frame['small'].dtype, 'Int64')
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+class PreparedStatementsTests(SimpleTestCase):
+    def setUp(self):
+        self.cursor = RecordingCursor()
+        self.statements = PreparedStatements(SimpleNamespace(autocommit=True))
+
+    def test_param_types_are_declared(self):
+        self.statements.execute(self.cursor, 'SELECT %s AS v, %s AS w', (42, 'text'))
+        self.statements.execute(self.cursor, 'SELECT %s AS v, %s AS w', (43, 'more'))
+
+        self.assertEqual(self.cursor.statements, [
+            ('PREPARE stmt_1 (integer, unknown) AS SELECT $1 AS v, $2 AS w', None),
+            ('EXECUTE stmt_1 (%s, %s)', [42, 'text']),
+            ('EXECUTE stmt_1 (%s, %s)', [43, 'more']),
+        ])
+
+    def test_other_param_types_are_prepared_separately(self):
+        self.statements.execute(self.cursor, 'SELECT %(v)s', {'v': 1})
+        self.statements.execute(self.cursor, 'SELECT %(v)s', {'v': 1.5})
+
+        self.assertEqual(self.cursor.statements[2][0], 'PREPARE stmt_2 (double precision) AS SELECT $1')
+
+    def test_values_without_declared_type_are_not_prepared(self):
+        self.statements.execute(self.cursor, 'SELECT %s', ([1, 2],))
+
+        self.assertEqual(self.cursor.statements, [('SELECT %s', ([1, 2],))])
+
+@override_settings(QUERY_CACHE=True, QUERY_CACHE_BACKEND='default',
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'async-query-cache-tests'}})
+class AsyncQueryCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    async def test_fetchall_uses_query_cache(self):
+        fetch_rows = AsyncMock(return_value=(['v'], [(1,)]))
+        with patch.object(aio, 'is_async_supported', return_value=True), \
+                patch.object(aio.AsyncQueryExecutor, '_fetch_rows', fetch_rows):
+            first = await aio.AsyncQueryExecutor.fetchall(lambda: ('SELECT 1 AS v FROM items', ()), cache_ttl=30)
+            second = await aio.AsyncQueryExecutor.fetchall(lambda: ('SELECT 1 AS v FROM items', ()), cache_ttl=30,
+                                                           cache_tables=['items'])
+
+        self.assertEqual(first, [(1,)])
+        self.assertEqual(second, [(1,)])
+        fetch_rows.assert_awaited_once()
+
+class AsyncFallbackTests(SimpleTestCase):
+    async def test_sync_queries_run_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def fetchall(get_query, *args, **kwargs):
+            # В общем потоке синхронного кода второй запрос не дождался бы первого
+            barrier.wait()
+            return get_query()
+
+        with patch.object(aio, 'is_async_supported', return_value=False), \
+                patch.object(aio.AsyncQueryExecutor.sync_executor, 'fetchall', side_effect=fetchall):
+            results = await asyncio.gather(
+                aio.AsyncQueryExecutor.fetchall(lambda: 'first'),
+                aio.AsyncQueryExecutor.fetchall(lambda: 'second'),
+            )
+
+        self.assertEqual(results, ['first', 'second'])
+
+class QueryCacheFillTests(SimpleTestCase):
+    def test_cache_is_filled_from_primary(self):
+        cursor = MagicMock(description=[('v',)])
+        cursor.fetchall.return_value = [(1,)]
+        connection = MagicMock()
+        connection.cursor.return_value.__enter__.return_value = cursor
+        with patch.object(QueryExecutor, '_get_connection', return_value=connection) as get_connection:
+            self.assertEqual(QueryExecutor._fetch_rows('SELECT 1 AS v', ()), (['v'], [(1,)]))
+
+        get_connection.assert_called_once_with(write=True)
+
+class NamedCursor:
+    """Серверный курсор psycopg2: description заполняется только после первого FETCH."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchmany(self, size):
+        self.description = [('id',), ('name',)]
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+class CopyCursor(MagicMock):
+    """Курсор psycopg2, выгружающий строки COPY в формате CSV, как PostgreSQL."""
+
+    def copy_expert(self, sql, file):
+        self.copy_sql = sql
+        null = sql.split("NULL '")[1].split("'")[0]
+        for row in self.rows:
+            file.write(','.join(null if value is None else f'"{value}"' if isinstance(value, str) else str(value)
+                                for value in row).encode() + b'\n')
+
+class CopyRoundTripTests(SimpleTestCase):
+    def test_null_and_empty_string_are_distinguished(self):
+        cursor = CopyCursor(description=[('id', 23), ('name', 25)])
+        cursor.mogrify.return_value = b'SELECT id, name FROM items'
+        cursor.rows = [(1, ''), (2, None), (None, 'text')]
+        connection = MagicMock()
+        connection.cursor.return_value.__enter__.return_value = cursor
+
+        file, columns = copy_query_to_file(connection, 'SELECT id, name FROM items', ())
+        frame = read_copy_frame(file, columns)
+
+        self.assertIn("NULL '\\N'", cursor.copy_sql)
+        self.assertEqual(frame['name'].tolist()[0::2], ['', 'text'])
+        self.assertTrue(pd.isna(frame['name'][1]))
+        self.assertEqual(frame['id'].tolist()[:2], [1, 2])
+        self.assertTrue(pd.isna(frame['id'][2]))
+
+class FetchBatchesTests(SimpleTestCase):
+    def setUp(self):
+        patcher = patch.object(QueryExecutor, '_get_connection')
+        self.get_connection = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stream(self, rows):
+        return patch.object(QueryExecutor, '_stream_cursor', return_value=NamedCursor(rows))
+
+    def test_columns_are_read_after_first_fetch(self):
+        with self.stream([(1, 'a'), (2, 'b'), (3, 'c')]):
+            batches = list(QueryExecutor.fetch_batches(lambda: ('SELECT id, name FROM items', ()),
+                                                       batch_size=2, row_factory='dict'))
+
+        self.assertEqual(batches, [[{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}], [{'id': 3, 'name': 'c'}]])
+
+    def test_iterate_returns_records(self):
+        with self.stream([(1, 'a')]):
+            records = list(QueryExecutor.iterate(lambda: ('SELECT id, name FROM items', ()), row_factory='record'))
+
+        self.assertEqual(dict(records[0]), {'id': 1, 'name': 'a'})
+
+    def test_iterate_rejects_columnar_factory_on_call(self):
+        with self.assertRaises(ValueError):
+            QueryExecutor.iterate(lambda: ('SELECT 1', ()), row_factory='columnar')
+        with self.assertRaises(ValueError):
+            aio.AsyncQueryExecutor.iterate(lambda: ('SELECT 1', ()), row_factory='columnar')
+
+        self.get_connection.assert_not_called()
+
+class UploadSessionCoalescingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        for override in (override_settings(MEDIA_ROOT=media_root.name),
+                         override_settings(CACHES={'default': {
+                             'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                             'LOCATION': 'upload-session-tests'}})):
+            override.enable()
+            self.addCleanup(override.disable)
+        caches['default'].clear()
+        self.content = b'report'
+        self.sha256 = hashlib.sha256(self.content).hexdigest()
+
+    def upload(self, session):
+        with session.open_at(0) as file:
+            file.write(self.content)
+
+    def test_every_requester_gets_own_file(self):
+        first, first_coalesced = UploadSession.create('first.txt', len(self.content), self.sha256)
+        second, second_coalesced = UploadSession.create('second.txt', len(self.content), self.sha256)
+
+        self.assertFalse(first_coalesced)
+        self.assertTrue(second_coalesced)
+        self.assertNotEqual(first.upload_id, second.upload_id)
+        self.assertEqual(UploadSession.load(second.upload_id).status()['state'], 'waiting')
+
+        self.upload(first)
+        first.finalize()
+        second = UploadSession.load(second.upload_id)
+        self.assertEqual(second.status()['state'], 'exists')
+        stored = second.finalize()
+
+        self.assertTrue(stored['deduplicated'])
+        self.assertEqual(sorted(StoredFile.objects.values_list('original_name', flat=True)),
+                         ['first.txt', 'second.txt'])
+
+    def test_waiting_session_takes_over_abandoned_upload(self):
+        first, _ = UploadSession.create('first.txt', len(self.content), self.sha256)
+        second, _ = UploadSession.create('second.txt', len(self.content), self.sha256)
+        first.delete()
+
+        second = UploadSession.load(second.upload_id)
+        self.assertEqual(second.status()['state'], 'uploading')
+        self.upload(second)
+        second.finalize()
+
+        self.assertEqual(list(StoredFile.objects.values_list('original_name', flat=True)), ['second.txt'])
+
+TIERED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-l2-tests'},
+    'tiered': {
+        'BACKEND': 'src.core.utils.cache.tiered.TieredCache',
+        'LOCATION': 'tiered-tests',
+        'OPTIONS': {'L2': 'default', 'L1_TIMEOUT': 60, 'SYNC_INTERVAL': 0},
+    },
+}
+
+@override_settings(CACHES=TIERED_CACHES)
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = caches['tiered']
+        self.l2 = caches['default']
+        self.cache.l1.clear()
+        self.l2.clear()
+
+    def other_process(self) -> TieredCache:
+        """Кэш другого процесса: общий L2 и счетчики, свой L1."""
+        other = TieredCache('tiered-tests', TIERED_CACHES['tiered'])
+        other.l1 = LocMemCache('tiered-l1:other-process', {'TIMEOUT': 60})
+        other.l1.clear()
+        return other
+
+    def test_l1_hit_does_not_read_l2(self):
+        self.cache.set('key', 'value')
+        self.l2.delete(self.cache.tier_key('key'))
+
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_l2_hit_fills_l1(self):
+        other = self.other_process()
+        self.cache.set('key', 'value')
+
+        self.assertEqual(other.get('key'), 'value')
+        self.assertEqual(other.l1.get(other.tier_key('key')), 'value')
+
+    def test_invalidation_is_seen_by_other_process(self):
+        other = self.other_process()
+        self.cache.set('key', 'old')
+        self.assertEqual(other.get('key'), 'old')
+
+        self.cache.set('key', 'new')
+        # Без инвалидации другой процесс читает свой L1
+        self.assertEqual(other.get('key'), 'old')
+        self.cache.invalidate_l1()
+        self.assertEqual(other.get('key'), 'new')
+
+        self.cache.clear()
+        self.assertIsNone(other.get('key'))
+
+    def test_namespace_generation_bump(self):
+        other = self.other_process()
+        old_key = namespace_key('reports', 'page', self.cache)
+        self.cache.set(old_key, 'old')
+        self.assertEqual(other.get(namespace_key('reports', 'page', other)), 'old')
+
+        self.assertEqual(clear_namespace('reports', self.cache), 2)
+
+        new_key = namespace_key('reports', 'page', other)
+        self.assertNotEqual(new_key, old_key)
+        self.assertIsNone(other.get(new_key))
+
+    def test_clear_cache_command(self):
+        other = self.other_process()
+        self.cache.set(namespace_key('reports', 'page', self.cache), 'report')
+        self.cache.set('key', 'value')
+
+        call_command('clear_cache', '--alias', 'tiered', '--namespace', 'reports', stdout=StringIO())
+        self.assertIsNone(self.cache.get(namespace_key('reports', 'page', self.cache)))
+        self.assertEqual(self.cache.get('key'), 'value')
+
+        # Значение остается только в L1 другого процесса
+        self.assertEqual(other.get('key'), 'value')
+        self.l2.delete(self.cache.tier_key('key'))
+        self.assertEqual(other.get('key'), 'value')
+        out = StringIO()
+        call_command('clear_cache', '--tier', 'l1', stdout=out)
+        self.assertIn('default: пропущен', out.getvalue())
+        self.assertIsNone(other.get('key'))
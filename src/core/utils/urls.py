@@ -8,8 +8,14 @@ from django.urls import (
 
 from src.core.utils.views import (
     CheckDatabaseConnectionView,
+    DatabasePoolStatsView,
+    DatabaseStatementStatsView,
+    ResponseCacheStatsView,
 )
 
 urlpatterns = [
     path('check-database-connection/', CheckDatabaseConnectionView.as_view(), name='check-database-connection'),
+    path('database-pool-stats/', DatabasePoolStatsView.as_view(), name='database-pool-stats'),
+    path('database-statement-stats/', DatabaseStatementStatsView.as_view(), name='database-statement-stats'),
+    path('response-cache-stats/', ResponseCacheStatsView.as_view(), name='response-cache-stats'),
 ]
\ No newline at end of file
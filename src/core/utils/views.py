@@ -9,6 +9,7 @@ import psycopg2
 
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser
 
 from django.core.management import call_command
 from django.db.utils import OperationalError
@@ -19,7 +20,16 @@ from drf_yasg import openapi
 
 from src.config.env import env
 from src.config.settings.base import BASE_DIR
+from src.core.utils.auto_api.response_cache import get_response_cache_stats
 from src.core.utils.base.base_views import BaseAPIView
+from src.core.utils.database.pool import log_pool_stats
+from src.core.utils.database.query_cache import get_query_cache_stats
+from src.core.utils.database.statements import (
+    STATEMENT_STATS_ORDERING,
+    get_statement_stats,
+    is_cache_enabled,
+    is_stats_enabled,
+)
 
 class CheckDatabaseConnectionView(BaseAPIView):
     """
@@ -169,4 +179,107 @@ class CheckDatabaseConnectionView(BaseAPIView):
             return Response(
                 {"message": error_message}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+class DatabasePoolStatsView(BaseAPIView):
+    """
+    APIView для просмотра статистики подключений к базам данных.
+
+    Методы:
+        get(request, *args, **kwargs): Возвращает статистику пулов и постоянных подключений.
+    """
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description="Статистика пулов и постоянных подключений к базам данных текущего процесса.",
+        responses={
+            200: 'Статистика подключений по каждой базе данных.',
+            403: 'Недостаточно прав.',
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        Обрабатывает GET-запрос статистики подключений.
+
+        Возвращает:
+            Response: Статистика подключений по имени базы данных.
+        """
+        return Response(log_pool_stats(), status=status.HTTP_200_OK)
+
+class DatabaseStatementStatsView(BaseAPIView):
+    """
+    APIView для просмотра статистики выполнения запросов.
+
+    Методы:
+        get(request, *args, **kwargs): Возвращает самые нагружающие базу запросы.
+    """
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Самые нагружающие базу запросы исполнителей текущего процесса: количество выполнений, "
+            "суммарное, максимальное и среднее время. Статистика собирается при API_STATEMENT_STATS=true."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, default=20,
+                description='Количество запросов'
+            ),
+            openapi.Parameter(
+                'order_by', openapi.IN_QUERY, type=openapi.TYPE_STRING, default='total_time',
+                enum=list(STATEMENT_STATS_ORDERING), description='Поле сортировки (по убыванию)'
+            ),
+        ],
+        responses={
+            200: 'Статистика запросов.',
+            400: 'Неверные параметры запроса.',
+            403: 'Недостаточно прав.',
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        Обрабатывает GET-запрос статистики запросов.
+
+        Возвращает:
+            Response: Признаки включения кэша и статистики, список запросов и счетчики кэша результатов.
+        """
+        try:
+            limit = int(request.query_params.get('limit', 20))
+            statements = get_statement_stats(limit, request.query_params.get('order_by', 'total_time'))
+        except ValueError as e:
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'statement_cache': is_cache_enabled(),
+            'statement_stats': is_stats_enabled(),
+            'statements': statements,
+            'query_cache': get_query_cache_stats(),
+        }, status=status.HTTP_200_OK)
+
+class ResponseCacheStatsView(BaseAPIView):
+    """
+    APIView для просмотра статистики кэша ответов эндпоинтов auto_api.
+
+    Методы:
+        get(request, *args, **kwargs): Возвращает счетчики кэша ответов по эндпоинтам.
+    """
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Счетчики кэша ответов эндпоинтов auto_api текущего процесса: попадания, устаревшие ответы, "
+            "промахи и ответы 304."
+        ),
+        responses={
+            200: 'Счетчики кэша ответов по имени эндпоинта.',
+            403: 'Недостаточно прав.',
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        Обрабатывает GET-запрос статистики кэша ответов.
+
+        Возвращает:
+            Response: Счетчики кэша ответов по имени эндпоинта.
+        """
+        return Response(get_response_cache_stats(), status=status.HTTP_200_OK)
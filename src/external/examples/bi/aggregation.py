@@ -0,0 +1,399 @@
+"""
+Файл с колоночным движком агрегации данных для BI-графиков.
+
+Движок принимает тот же формат параметров агрегации, что и
+transform_data_for_bi_graph:
+
+    {
+        "key": "status",                 # Ключ группировки или список ключей
+        "aggregation_type": "count",     # Тип агрегации (AGGREGATION_TYPES)
+        "data_source": "tasks",          # Источник данных в bpm_data
+        "value": "duration",             # Агрегируемая колонка (для unique_count - id)
+        "percentile": 95,                # Для percentile, 0..100 (по умолчанию 50)
+        "bins": 10,                      # Для histogram: количество или границы интервалов
+        "precision": 12,                 # Для approx_unique_count: точность HyperLogLog
+        "name": "status_counts",         # Ключ результата (по умолчанию - KEY_SUFFIXES)
+    }
+
+Источник данных - список словарей (строк), словарь колонок или DataFrame.
+Из строк-словарей извлекаются только используемые колонки, каждая один раз;
+коды групп для одинаковых ключей группировки тоже вычисляются один раз и
+переиспользуются всеми агрегациями источника. Сами агрегации - векторные
+операции NumPy (bincount, ufunc.at) и группировки pandas без циклов Python
+по строкам.
+
+Результат агрегации - словарь {значение ключа: значение агрегата} в порядке
+первого появления значения ключа; при группировке по нескольким ключам -
+вложенные словари. Результат histogram - {'edges': границы, 'counts': счетчики
+интервалов по группам}.
+"""
+
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .sketches import DEFAULT_PRECISION, estimate, grouped_registers
+
+# Ключ результата: <ключи через _>[_<колонка>]_<суффикс>
+KEY_SUFFIXES = {
+    'count': 'counts',
+    'unique_count': 'unique_counts',
+    'approx_unique_count': 'approx_unique_counts',
+    'sum': 'sum',
+    'mean': 'mean',
+    'min': 'min',
+    'max': 'max',
+    'percentile': 'percentile',
+    'histogram': 'histogram',
+}
+
+AGGREGATION_TYPES = tuple(KEY_SUFFIXES)
+
+# Агрегации, которым нужна колонка value
+VALUE_AGGREGATIONS = ('sum', 'mean', 'min', 'max', 'percentile', 'histogram')
+
+# Колонка уникальных значений по умолчанию (как в transform_data_for_bi_graph)
+DEFAULT_UNIQUE_VALUE = 'id'
+
+DEFAULT_HISTOGRAM_BINS = 10
+
+# Битовая карта пар (группа, значение) для unique_count не меньше этого размера допустима всегда
+BITMAP_MIN_SIZE = 1 << 20
+
+
+class AggregationSpec:
+    """
+    Разобранный параметр агрегации.
+    """
+    __slots__ = ('keys', 'aggregation_type', 'data_source', 'value', 'percentile', 'bins', 'precision', 'name')
+
+    def __init__(self, params: Mapping[str, Any]) -> None:
+        """
+        Args:
+            params: Параметр агрегации (формат описан в модуле)
+
+        Raises:
+            ValueError: Если тип агрегации неизвестен или не задана колонка value
+        """
+        key = params.get('key')
+        self.keys: Tuple[str, ...] = tuple(key) if isinstance(key, (list, tuple)) else (key,)
+        self.aggregation_type = params.get('aggregation_type')
+        self.data_source = params.get('data_source')
+        if self.aggregation_type not in KEY_SUFFIXES:
+            raise ValueError(f"Неизвестный тип агрегации: {self.aggregation_type}. "
+                             f"Доступные: {', '.join(AGGREGATION_TYPES)}")
+        if not all(self.keys):
+            raise ValueError(f'Не задан ключ группировки: {dict(params)}')
+
+        self.value = params.get('value')
+        if self.value is None:
+            if self.aggregation_type in VALUE_AGGREGATIONS:
+                raise ValueError(f"Для агрегации {self.aggregation_type} нужна колонка value")
+            if self.aggregation_type != 'count':
+                self.value = DEFAULT_UNIQUE_VALUE
+
+        self.percentile = float(params.get('percentile', 50))
+        if not 0 <= self.percentile <= 100:
+            raise ValueError(f'Процентиль должен быть от 0 до 100: {self.percentile}')
+        self.bins = params.get('bins', DEFAULT_HISTOGRAM_BINS)
+        self.precision = int(params.get('precision', DEFAULT_PRECISION))
+        self.name = params.get('name') or self.default_name()
+
+    def default_name(self) -> str:
+        parts = list(self.keys)
+        if self.aggregation_type in VALUE_AGGREGATIONS:
+            parts.append(self.value)
+        parts.append(KEY_SUFFIXES[self.aggregation_type])
+        return '_'.join(parts)
+
+
+def to_python(value: Any) -> Any:
+    """Значение NumPy/pandas как значение Python для JSON (пропуски - None)."""
+    if value is None or (not isinstance(value, (str, bytes)) and pd.isna(value)):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+def nest(labels: Iterable[Tuple], values: Iterable[Any]) -> Dict[Hashable, Any]:
+    """Значения групп как словарь по значению ключа (вложенный для нескольких ключей)."""
+    result: Dict[Hashable, Any] = {}
+    for label, value in zip(labels, values):
+        level = result
+        for part in label[:-1]:
+            level = level.setdefault(part, {})
+        level[label[-1]] = value
+    return result
+
+def extract_column(rows: List[Mapping[str, Any]], name: str) -> np.ndarray:
+    """
+    Колонка из строк-словарей.
+
+    Тип определяется по значениям один раз (infer_dtype): целые и вещественные
+    колонки без пропусков становятся массивами int64/float64, остальные
+    остаются массивами объектов. Вывод типа в конструкторе pandas.Series
+    на списке объектов в несколько раз медленнее.
+    """
+    values = np.fromiter((row.get(name) for row in rows), dtype=object, count=len(rows))
+    inferred = pd.api.types.infer_dtype(values, skipna=False)
+    if inferred == 'integer':
+        return values.astype(np.int64)
+    if inferred in ('floating', 'mixed-integer-float'):
+        return values.astype(np.float64)
+    return values
+
+
+class Grouping:
+    """
+    Коды групп строк по одному или нескольким ключам.
+
+    Attributes:
+        codes: Номер группы каждой строки (np.intp)
+        labels: Значения ключей каждой группы (кортежи) в порядке первого появления
+    """
+    def __init__(self, context: 'AggregationContext', keys: Tuple[str, ...]) -> None:
+        columns = [self.factorize(context, key) for key in keys]
+        if len(columns) == 1:
+            codes, uniques = columns[0]
+            self.codes = codes
+            self.labels: List[Tuple] = [(label,) for label in uniques]
+            return
+
+        # Коды отдельных ключей объединяются в один номер, номера перенумеровываются по появлению
+        dims = tuple(max(len(uniques), 1) for _, uniques in columns)
+        combined = np.ravel_multi_index([codes for codes, _ in columns], dims)
+        self.codes, combined_uniques = pd.factorize(combined)
+        positions = np.unravel_index(combined_uniques, dims)
+        self.labels = [
+            tuple(columns[i][1][position] for i, position in enumerate(group))
+            for group in zip(*(position.tolist() for position in positions))
+        ]
+
+    @staticmethod
+    def factorize(context: 'AggregationContext', key: str) -> Tuple[np.ndarray, List[Any]]:
+        if not context.has_column(key):
+            # Как item.get(key): строки без ключа попадают в группу None
+            return np.zeros(len(context), dtype=np.intp), [None]
+        codes, uniques = pd.factorize(context.column(key), use_na_sentinel=False)
+        return codes.astype(np.intp, copy=False), [to_python(value) for value in uniques]
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def nest(self, values: Iterable[Any]) -> Dict[Hashable, Any]:
+        return nest(self.labels, values)
+
+
+class AggregationContext:
+    """
+    Агрегации одного источника данных.
+
+    Преобразования, общие для нескольких агрегаций (извлечение колонок, коды
+    групп, числовые колонки, ключи значений), выполняются один раз.
+    """
+    def __init__(self, rows: Any) -> None:
+        """
+        Args:
+            rows: Строки-словари, словарь колонок или DataFrame
+        """
+        if not isinstance(rows, (pd.DataFrame, Mapping, list)):
+            rows = list(rows)
+        self.rows = rows
+        self._columns: Dict[str, pd.Series] = {}
+        self._groupings: Dict[Tuple[str, ...], Grouping] = {}
+        self._numeric: Dict[str, np.ndarray] = {}
+        self._value_keys: Dict[Tuple[str, bool], Tuple[np.ndarray, int]] = {}
+
+    def __len__(self) -> int:
+        if isinstance(self.rows, Mapping):
+            return len(next(iter(self.rows.values()), ()))
+        return len(self.rows)
+
+    def has_column(self, name: str) -> bool:
+        # В строках-словарях отсутствующий ключ - None (item.get)
+        return isinstance(self.rows, list) or name in self.rows
+
+    def column(self, name: str) -> pd.Series:
+        """
+        Колонка источника.
+
+        Raises:
+            ValueError: Если колонки нет в словаре колонок или DataFrame
+        """
+        if name not in self._columns:
+            if isinstance(self.rows, list):
+                self._columns[name] = pd.Series(extract_column(self.rows, name), copy=False)
+            elif name in self.rows:
+                self._columns[name] = pd.Series(self.rows[name], copy=False)
+            else:
+                raise ValueError(f"Колонка '{name}' отсутствует в источнике данных")
+        return self._columns[name]
+
+    def grouping(self, keys: Tuple[str, ...]) -> Grouping:
+        if keys not in self._groupings:
+            self._groupings[keys] = Grouping(self, keys)
+        return self._groupings[keys]
+
+    def numeric(self, name: str) -> np.ndarray:
+        """Колонка как float64 (нечисловые значения - NaN)."""
+        if name not in self._numeric:
+            self._numeric[name] = pd.to_numeric(self.column(name), errors='coerce').to_numpy(np.float64, na_value=np.nan)
+        return self._numeric[name]
+
+    def value_keys(self, name: str, factorize: bool = False) -> Tuple[np.ndarray, int]:
+        """
+        Значения колонки как неотрицательные целые и их диапазон.
+
+        Целые колонки только сдвигаются к нулю (без хеширования значений),
+        остальные (и все при factorize=True) заменяются кодами factorize.
+        """
+        key = (name, factorize)
+        if key not in self._value_keys:
+            column = self.column(name)
+            if not factorize and pd.api.types.is_integer_dtype(column.dtype):
+                values = column.to_numpy(np.int64)
+                low, high = int(values.min()), int(values.max())
+                if high - low < 1 << 62:
+                    self._value_keys[key] = (values - low, high - low + 1)
+                    return self._value_keys[key]
+            codes, uniques = pd.factorize(column, use_na_sentinel=False)
+            self._value_keys[key] = (codes.astype(np.int64, copy=False), max(len(uniques), 1))
+        return self._value_keys[key]
+
+    def is_integral(self, name: str) -> bool:
+        return pd.api.types.is_integer_dtype(self.column(name).dtype)
+
+    def aggregate(self, spec: AggregationSpec) -> Dict[Hashable, Any]:
+        """Результат одной агрегации."""
+        if not len(self):
+            return {'edges': [], 'counts': {}} if spec.aggregation_type == 'histogram' else {}
+        grouping = self.grouping(spec.keys)
+        return AGGREGATORS[spec.aggregation_type](self, spec, grouping)
+
+
+def valid_values(context: AggregationContext, spec: AggregationSpec,
+                 grouping: Grouping) -> Tuple[np.ndarray, np.ndarray]:
+    """Коды групп и значения колонки value без пропусков."""
+    values = context.numeric(spec.value)
+    valid = ~np.isnan(values)
+    return grouping.codes[valid], values[valid]
+
+def histogram_counts(codes: np.ndarray, values: np.ndarray, edges: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Счетчики интервалов гистограммы по группам.
+
+    Интервалы [a, b), последний - [a, b], как в np.histogram; значения вне
+    границ не учитываются.
+
+    Returns:
+        np.ndarray: Счетчики формы (n_groups, len(edges) - 1)
+    """
+    n_bins = len(edges) - 1
+    bins = np.searchsorted(edges, values, side='right') - 1
+    bins[values == edges[-1]] = n_bins - 1
+    inside = (bins >= 0) & (bins < n_bins)
+    counts = np.bincount(codes[inside] * n_bins + bins[inside], minlength=n_groups * n_bins)
+    return counts.reshape(n_groups, n_bins)
+
+def aggregate_count(context: AggregationContext, spec: AggregationSpec, grouping: Grouping) -> Dict:
+    return grouping.nest(np.bincount(grouping.codes, minlength=len(grouping)).tolist())
+
+def aggregate_unique_count(context: AggregationContext, spec: AggregationSpec, grouping: Grouping) -> Dict:
+    # Пара (группа, значение) - одно число: при небольшом диапазоне пар они
+    # отмечаются в битовой карте, иначе уникальные пары находятся хешированием
+    values, span = context.value_keys(spec.value)
+    n_groups = len(grouping)
+    if n_groups > ((1 << 62) - 1) // span:
+        values, span = context.value_keys(spec.value, factorize=True)
+    pairs = grouping.codes.astype(np.int64) * span + values
+    if n_groups * span <= max(4 * len(pairs), BITMAP_MIN_SIZE):
+        seen = np.zeros(n_groups * span, dtype=bool)
+        seen[pairs] = True
+        counts = np.count_nonzero(seen.reshape(n_groups, span), axis=1)
+    else:
+        counts = np.bincount(pd.unique(pairs) // span, minlength=n_groups)
+    return grouping.nest(counts.tolist())
+
+def aggregate_approx_unique_count(context: AggregationContext, spec: AggregationSpec, grouping: Grouping) -> Dict:
+    registers = grouped_registers(grouping.codes, len(grouping), context.column(spec.value).to_numpy(), spec.precision)
+    return grouping.nest(np.rint(estimate(registers)).astype(np.int64).tolist())
+
+def _or_none(values: np.ndarray, present: np.ndarray) -> List[Any]:
+    return [value if has_value else None for value, has_value in zip(values.tolist(), present.tolist())]
+
+def aggregate_sum(context: AggregationContext, spec: AggregationSpec, grouping: Grouping) -> Dict:
+    codes, values = valid_values(context, spec, grouping)
+    sums = np.bincount(codes, weights=values, minlength=len(grouping))
+    if context.is_integral(spec.value):
+        sums = sums.astype(np.int64)
+    return grouping.nest(sums.tolist())
+
+def aggregate_mean(context: AggregationContext, spec: AggregationSpec, grouping: Grouping) -> Dict:
+    codes, values = valid_values(context, spec, grouping)
+    counts = np.bincount(codes, minlength=len(grouping))
+    sums = np.bincount(codes, weights=values, minlength=len(grouping))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    return grouping.nest(_or_none(means, counts > 0))
+
+def _extreme(ufunc: np.ufunc, initial: float) -> Callable:
+    def aggregate_extreme(context: AggregationContext, spec: AggregationSpec, grouping: Grouping) -> Dict:
+        codes, values = valid_values(context, spec, grouping)
+        result = np.full(len(grouping), initial)
+        ufunc.at(result, codes, values)
+        present = np.bincount(codes, minlength=len(grouping)) > 0
+        if context.is_integral(spec.value):
+            result = np.where(present, result, 0).astype(np.int64)
+        return grouping.nest(_or_none(result, present))
+    return aggregate_extreme
+
+def aggregate_percentile(context: AggregationContext, spec: AggregationSpec, grouping: Grouping) -> Dict:
+    codes, values = valid_values(context, spec, grouping)
+    quantiles = pd.Series(values).groupby(codes).quantile(spec.percentile / 100).reindex(range(len(grouping)))
+    return grouping.nest(to_python(value) for value in quantiles.to_numpy())
+
+def aggregate_histogram(context: AggregationContext, spec: AggregationSpec, grouping: Grouping) -> Dict:
+    codes, values = valid_values(context, spec, grouping)
+    if isinstance(spec.bins, int):
+        edges = np.histogram_bin_edges(values, bins=spec.bins) if len(values) else np.linspace(0, 1, spec.bins + 1)
+    else:
+        edges = np.asarray(spec.bins, dtype=np.float64)
+    counts = histogram_counts(codes, values, edges, len(grouping))
+    return {'edges': edges.tolist(), 'counts': grouping.nest(counts.tolist())}
+
+AGGREGATORS: Dict[str, Callable[[AggregationContext, AggregationSpec, Grouping], Dict]] = {
+    'count': aggregate_count,
+    'unique_count': aggregate_unique_count,
+    'approx_unique_count': aggregate_approx_unique_count,
+    'sum': aggregate_sum,
+    'mean': aggregate_mean,
+    'min': _extreme(np.minimum, np.inf),
+    'max': _extreme(np.maximum, -np.inf),
+    'percentile': aggregate_percentile,
+    'histogram': aggregate_histogram,
+}
+
+def aggregate(data: Mapping[str, Any], aggregation_params: Iterable[Mapping[str, Any]],
+              contexts: Optional[Dict[str, AggregationContext]] = None) -> Dict[str, Any]:
+    """
+    Вычисляет агрегации над источниками данных.
+
+    Args:
+        data: Источники данных по имени (строки-словари, словари колонок или DataFrame)
+        aggregation_params: Параметры агрегаций
+        contexts: Контексты источников для переиспользования между вызовами
+
+    Returns:
+        Dict[str, Any]: Результаты агрегаций по ключу результата
+
+    Raises:
+        ValueError: Если параметр агрегации неверен
+        KeyError: Если источника данных нет в data
+    """
+    specs = [AggregationSpec(params) for params in aggregation_params]
+    contexts = {} if contexts is None else contexts
+    result = {}
+    for spec in specs:
+        if spec.data_source not in contexts:
+            contexts[spec.data_source] = AggregationContext(data[spec.data_source])
+        result[spec.name] = contexts[spec.data_source].aggregate(spec)
+    return result
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 class ExamplesBiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'src.external.examples.bi'
-    label = 'examples_bi'
\ No newline at end of file
+    label = 'examples_bi'
+
+    def ready(self) -> None:
+        # Регистрирует материализованные представления для команд и обработчиков
+        from src.external.examples.bi import scripts  # noqa: F401
@@ -0,0 +1,103 @@
+"""
+Файл с прореживанием временных рядов для графиков.
+
+Ряд из n точек сокращается до заданного количества точек так, чтобы график
+сохранял форму:
+
+- lttb (Largest-Triangle-Three-Buckets) - точки делятся на интервалы, из
+  каждого выбирается точка, образующая треугольник наибольшей площади с уже
+  выбранной точкой и средней точкой следующего интервала; сохраняет визуальную
+  форму ряда;
+- minmax - из каждого интервала берутся точки минимума и максимума; сохраняет
+  выбросы (пики и провалы).
+
+Функции возвращают индексы выбранных точек в порядке возрастания; первая и
+последняя точки ряда сохраняются.
+
+>>> indices = downsample(x, y, 500)
+>>> x[indices], y[indices]
+"""
+
+from typing import Callable, Dict
+
+import numpy as np
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Прореживание Largest-Triangle-Three-Buckets.
+
+    Args:
+        x: Координаты точек (возрастающие)
+        y: Значения точек
+        points: Количество точек результата
+
+    Returns:
+        np.ndarray: Индексы выбранных точек
+    """
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+    if points < 3:
+        return np.array([0, n - 1])[:max(points, 1)]
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Интервалы средних точек: [bounds[i], bounds[i + 1]); последний - последняя точка
+    bounds = (np.arange(points - 1) * ((n - 2) / (points - 2))).astype(np.int64) + 1
+    bounds[-1] = n - 1
+    bounds = np.append(bounds, n)
+    sizes = np.diff(bounds)
+    mean_x = np.add.reduceat(x, bounds[:-1]) / sizes
+    mean_y = np.add.reduceat(y, bounds[:-1]) / sizes
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        # Удвоенная площадь треугольника (a, точка интервала, средняя точка следующего)
+        areas = np.abs((x[a] - mean_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+def minmax(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Прореживание по минимуму и максимуму интервалов.
+
+    Args:
+        x: Координаты точек (возрастающие)
+        y: Значения точек
+        points: Наибольшее количество точек результата
+
+    Returns:
+        np.ndarray: Индексы выбранных точек
+    """
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+    if points < 4:
+        return np.array([0, n - 1])[:max(points, 1)]
+    bins = np.arange(n) * ((points - 2) // 2) // n
+    # Точки отсортированы по интервалу и значению: первая в интервале - минимум, последняя - максимум
+    order = np.lexsort((np.asarray(y), bins))
+    sorted_bins = bins[order]
+    first = np.flatnonzero(np.r_[True, sorted_bins[1:] != sorted_bins[:-1]])
+    last = np.r_[first[1:] - 1, n - 1]
+    return np.union1d(np.union1d(order[first], order[last]), [0, n - 1])
+
+DOWNSAMPLERS: Dict[str, Callable[[np.ndarray, np.ndarray, int], np.ndarray]] = {
+    'lttb': lttb,
+    'minmax': minmax,
+}
+
+def downsample(x: np.ndarray, y: np.ndarray, points: int, method: str = 'lttb') -> np.ndarray:
+    """
+    Индексы точек ряда после прореживания до points точек.
+
+    Raises:
+        ValueError: Если метод неизвестен
+    """
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"Неизвестный метод прореживания: {method}. Доступные: {', '.join(DOWNSAMPLERS)}")
+    return DOWNSAMPLERS[method](x, y, points)
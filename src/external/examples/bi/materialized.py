@@ -0,0 +1,484 @@
+"""
+Файл с материализованными агрегатами BI-графиков.
+
+Материализованное представление - именованный набор параметров агрегации
+(формат transform_data_for_bi_graph) и загрузчик исходных данных. Состояние
+каждой агрегации хранится в модели MaterializedAggregate и обновляется
+изменениями строк, а не пересчетом:
+
+>>> register_materialized_view('tasks_graph', aggregation_params, load_tasks)
+>>> apply_changes('tasks', added=[task], removed=[old_task], changed=[(before, after)])
+>>> get_materialized('tasks_graph')  # Формат transform_data_for_bi_graph
+
+Чтение собирает результат из состояния за O(количества групп) и кэшируется
+в процессе до изменения версии состояния. Состояния агрегаций объединяются
+(merge), поэтому полный пересчет строит состояние каждой пачки загрузчика
+отдельно и складывает их; так же складываются состояния партиций.
+
+Агрегации и удаление строк:
+- count, sum, mean и histogram с явными границами (bins - список) - точно;
+- unique_count и approx_unique_count - скетч HyperLogLog на группу;
+- min и max - текущий экстремум группы.
+Скетч и экстремум нельзя уменьшить: если строка уходит из группы, в которой
+остаются другие строки, группа помечается устаревшей (для уникальных значений
+результат - оценка сверху) до пересчета командой
+rebuild_materialized_aggregates --stale. Группа, из которой ушли все строки,
+удаляется сразу. percentile и histogram без явных границ зависят от всех
+значений группы и не материализуются.
+"""
+
+import logging
+import pickle
+import threading
+
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from django.db import transaction
+from django.db.models import F
+
+from .aggregation import AggregationContext, AggregationSpec, Grouping, histogram_counts, nest, valid_values
+from .models import MaterializedAggregate
+from .sketches import estimate, grouped_registers
+
+logger = logging.getLogger('utils')
+
+Label = Tuple[Hashable, ...]
+
+
+class AggregateState:
+    """
+    Состояние одной агрегации по группам.
+
+    Attributes:
+        rows: Количество строк каждой группы (группа без строк удаляется)
+        values: Данные агрегации каждой группы
+        stale: Группы, результат которых неточен до пересчета
+    """
+    def __init__(self) -> None:
+        self.rows: Dict[Label, int] = {}
+        self.values: Dict[Label, Any] = {}
+        self.stale: Set[Label] = set()
+
+    def update(self, spec: AggregationSpec, context: AggregationContext, sign: int) -> None:
+        """
+        Добавляет (sign=1) или удаляет (sign=-1) строки источника.
+
+        Args:
+            spec: Параметр агрегации
+            context: Строки
+            sign: 1 - добавление, -1 - удаление
+        """
+        if not len(context):
+            return
+        grouping = context.grouping(spec.keys)
+        self.apply(spec, context, grouping, sign)
+        counts = np.bincount(grouping.codes, minlength=len(grouping)).tolist()
+        for label, count in zip(grouping.labels, counts):
+            if not count:
+                continue
+            remaining = self.rows.get(label, 0) + sign * count
+            if remaining > 0:
+                self.rows[label] = remaining
+            else:
+                self.rows.pop(label, None)
+                self.values.pop(label, None)
+                self.stale.discard(label)
+
+    def apply(self, spec: AggregationSpec, context: AggregationContext, grouping: Grouping, sign: int) -> None:
+        """Изменяет values групп строк (rows изменяет update)."""
+
+    def merge(self, other: 'AggregateState') -> 'AggregateState':
+        """Добавляет состояние другой части данных."""
+        for label, count in other.rows.items():
+            self.rows[label] = self.rows.get(label, 0) + count
+        for label, value in other.values.items():
+            self.values[label] = value if label not in self.values else self.merge_value(self.values[label], value)
+        self.stale |= other.stale
+        return self
+
+    def merge_value(self, value: Any, other: Any) -> Any:
+        raise NotImplementedError
+
+    def result(self, spec: AggregationSpec) -> Any:
+        """Результат агрегации в формате движка aggregation."""
+        raise NotImplementedError
+
+
+class CountState(AggregateState):
+    """count: количество строк группы - это rows."""
+
+    def result(self, spec: AggregationSpec) -> Any:
+        return nest(self.rows.keys(), self.rows.values())
+
+
+class SumState(AggregateState):
+    """sum и mean: сумма и количество непустых значений группы."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.integral = True
+
+    def apply(self, spec: AggregationSpec, context: AggregationContext, grouping: Grouping, sign: int) -> None:
+        self.integral = self.integral and context.is_integral(spec.value)
+        codes, values = valid_values(context, spec, grouping)
+        sums = np.bincount(codes, weights=values, minlength=len(grouping)).tolist()
+        counts = np.bincount(codes, minlength=len(grouping)).tolist()
+        for label, total, count in zip(grouping.labels, sums, counts):
+            if count:
+                current = self.values.get(label, (0.0, 0))
+                self.values[label] = (current[0] + sign * total, current[1] + sign * count)
+
+    def merge(self, other: 'AggregateState') -> 'AggregateState':
+        self.integral = self.integral and other.integral
+        return super().merge(other)
+
+    def merge_value(self, value: Any, other: Any) -> Any:
+        return value[0] + other[0], value[1] + other[1]
+
+    def result(self, spec: AggregationSpec) -> Any:
+        results = []
+        for label in self.rows:
+            total, count = self.values.get(label, (0.0, 0))
+            if spec.aggregation_type == 'mean':
+                results.append(total / count if count > 0 else None)
+            else:
+                results.append(int(round(total)) if self.integral else total)
+        return nest(self.rows.keys(), results)
+
+
+class ExtremeState(AggregateState):
+    """min и max: текущий экстремум группы."""
+
+    def __init__(self, is_min: bool) -> None:
+        super().__init__()
+        self.is_min = is_min
+        self.integral = True
+
+    def apply(self, spec: AggregationSpec, context: AggregationContext, grouping: Grouping, sign: int) -> None:
+        self.integral = self.integral and context.is_integral(spec.value)
+        ufunc, initial = (np.minimum, np.inf) if self.is_min else (np.maximum, -np.inf)
+        codes, values = valid_values(context, spec, grouping)
+        extremes = np.full(len(grouping), initial)
+        ufunc.at(extremes, codes, values)
+        present = np.bincount(codes, minlength=len(grouping)) > 0
+
+        for label, extreme, has_value in zip(grouping.labels, extremes.tolist(), present.tolist()):
+            if not has_value:
+                continue
+            current = self.values.get(label)
+            if sign > 0:
+                self.values[label] = extreme if current is None else self.merge_value(current, extreme)
+            elif current is not None and (extreme <= current if self.is_min else extreme >= current):
+                # Удалено текущее значение экстремума: следующее неизвестно без пересчета
+                self.stale.add(label)
+
+    def merge(self, other: 'AggregateState') -> 'AggregateState':
+        self.integral = self.integral and other.integral
+        return super().merge(other)
+
+    def merge_value(self, value: Any, other: Any) -> Any:
+        return min(value, other) if self.is_min else max(value, other)
+
+    def result(self, spec: AggregationSpec) -> Any:
+        values = [self.values.get(label) for label in self.rows]
+        if self.integral:
+            values = [None if value is None else int(value) for value in values]
+        return nest(self.rows.keys(), values)
+
+
+class HistogramState(AggregateState):
+    """histogram с явными границами: счетчики интервалов группы."""
+
+    def apply(self, spec: AggregationSpec, context: AggregationContext, grouping: Grouping, sign: int) -> None:
+        codes, values = valid_values(context, spec, grouping)
+        counts = histogram_counts(codes, values, np.asarray(spec.bins, dtype=np.float64), len(grouping))
+        for label, group_counts in zip(grouping.labels, counts):
+            current = self.values.get(label)
+            self.values[label] = sign * group_counts if current is None else current + sign * group_counts
+
+    def merge_value(self, value: Any, other: Any) -> Any:
+        return value + other
+
+    def result(self, spec: AggregationSpec) -> Any:
+        n_bins = len(spec.bins) - 1
+        counts = [self.values.get(label, np.zeros(n_bins, dtype=np.int64)).tolist() for label in self.rows]
+        return {'edges': [float(edge) for edge in spec.bins], 'counts': nest(self.rows.keys(), counts)}
+
+
+class SketchState(AggregateState):
+    """unique_count и approx_unique_count: регистры HyperLogLog группы."""
+
+    def apply(self, spec: AggregationSpec, context: AggregationContext, grouping: Grouping, sign: int) -> None:
+        if sign < 0:
+            # Значение нельзя убрать из скетча
+            self.stale.update(label for label in grouping.labels if label in self.values)
+            return
+        registers = grouped_registers(
+            grouping.codes, len(grouping), context.column(spec.value).to_numpy(), spec.precision
+        )
+        for label, group_registers in zip(grouping.labels, registers):
+            current = self.values.get(label)
+            self.values[label] = group_registers.copy() if current is None else np.maximum(current, group_registers)
+
+    def merge_value(self, value: Any, other: Any) -> Any:
+        return np.maximum(value, other)
+
+    def result(self, spec: AggregationSpec) -> Any:
+        labels = [label for label in self.rows if label in self.values]
+        if not labels:
+            return {}
+        counts = np.rint(estimate(np.stack([self.values[label] for label in labels]))).astype(np.int64)
+        return nest(labels, counts.tolist())
+
+STATE_CLASSES: Dict[str, Callable[[], AggregateState]] = {
+    'count': CountState,
+    'sum': SumState,
+    'mean': SumState,
+    'min': partial(ExtremeState, True),
+    'max': partial(ExtremeState, False),
+    'histogram': HistogramState,
+    'unique_count': SketchState,
+    'approx_unique_count': SketchState,
+}
+
+def create_state(spec: AggregationSpec) -> AggregateState:
+    """
+    Пустое состояние агрегации.
+
+    Raises:
+        ValueError: Если агрегация не материализуется
+    """
+    if spec.aggregation_type not in STATE_CLASSES:
+        raise ValueError(f"Агрегация {spec.aggregation_type} не материализуется: "
+                         f"ее результат зависит от всех значений группы")
+    if spec.aggregation_type == 'histogram' and not isinstance(spec.bins, (list, tuple)):
+        raise ValueError('Материализованная гистограмма требует явных границ интервалов (bins - список)')
+    return STATE_CLASSES[spec.aggregation_type]()
+
+class MaterializedView:
+    """
+    Материализованное представление: параметры агрегации и загрузчик данных.
+
+    Загрузчик - функция без аргументов, возвращающая пачки исходных данных
+    {источник: строки} (формат источников движка aggregation) для полного пересчета.
+    """
+    def __init__(self, name: str, aggregation_params: Iterable[Mapping[str, Any]],
+                 loader: Callable[[], Iterable[Mapping[str, Any]]]) -> None:
+        self.name = name
+        self.params = [dict(params) for params in aggregation_params]
+        self.specs = [AggregationSpec(params) for params in self.params]
+        self.loader = loader
+        for spec in self.specs:
+            create_state(spec)
+
+    @property
+    def data_sources(self) -> Set[str]:
+        return {spec.data_source for spec in self.specs}
+
+_views: Dict[str, MaterializedView] = {}
+
+# Результаты чтения по представлению: (версии состояний, результат)
+_results: Dict[str, Tuple[Tuple, Dict[str, Any]]] = {}
+_results_lock = threading.Lock()
+
+def register_materialized_view(name: str, aggregation_params: Iterable[Mapping[str, Any]],
+                               loader: Callable[[], Iterable[Mapping[str, Any]]]) -> MaterializedView:
+    """
+    Регистрирует материализованное представление.
+
+    Args:
+        name: Имя представления
+        aggregation_params: Параметры агрегации (формат transform_data_for_bi_graph)
+        loader: Загрузчик пачек исходных данных для полного пересчета
+
+    Raises:
+        ValueError: Если параметр агрегации неверен или агрегация не материализуется
+    """
+    view = MaterializedView(name, aggregation_params, loader)
+    _views[name] = view
+    return view
+
+def get_materialized_views() -> Dict[str, MaterializedView]:
+    """Зарегистрированные представления по имени."""
+    return dict(_views)
+
+def get_view(name: str) -> MaterializedView:
+    """
+    Raises:
+        KeyError: Если представление не зарегистрировано
+    """
+    if name not in _views:
+        raise KeyError(f"Материализованное представление '{name}' не зарегистрировано")
+    return _views[name]
+
+def serialize_state(state: AggregateState) -> bytes:
+    return pickle.dumps(state, protocol=5)
+
+def deserialize_state(data: Any) -> AggregateState:
+    return pickle.loads(bytes(data))
+
+def _load_records(view: MaterializedView, lock: bool = False) -> Dict[str, MaterializedAggregate]:
+    """Записи состояний представления, построенные по текущим параметрам агрегации."""
+    queryset = MaterializedAggregate.objects.filter(view=view.name)
+    if lock:
+        queryset = queryset.select_for_update()
+    records = {record.name: record for record in queryset}
+    return {
+        spec.name: records[spec.name] for spec, params in zip(view.specs, view.params)
+        if spec.name in records and records[spec.name].spec == params
+    }
+
+def rebuild_view(name: str, missing_only: bool = False) -> Optional[Dict[str, int]]:
+    """
+    Полностью пересчитывает состояние представления по данным загрузчика.
+
+    Состояние каждой пачки строится отдельно и объединяется с остальными.
+    Записи представления заблокированы на время загрузки и записи, поэтому
+    пересчеты выполняются по очереди, а apply_changes ждет окончания пересчета:
+    изменения, зафиксированные до блокировки, видны загрузчику, остальные
+    применяются к уже пересчитанному состоянию.
+
+    Args:
+        name: Имя представления
+        missing_only: Пересчитать, только если состояние не построено
+            (например, его построил параллельный пересчет)
+
+    Returns:
+        Optional[Dict[str, int]]: Количество групп по ключу результата (None - пересчет не нужен)
+    """
+    view = get_view(name)
+    # Записи-заготовки (пустые параметры - состояние не построено) нужны, чтобы
+    # первый пересчет мог их заблокировать, а параллельный не создал их повторно
+    MaterializedAggregate.objects.bulk_create(
+        [MaterializedAggregate(view=name, name=spec.name, spec={}, state=b'') for spec in view.specs],
+        ignore_conflicts=True,
+    )
+
+    with transaction.atomic():
+        records = _load_records(view, lock=True)
+        if missing_only and len(records) == len(view.specs):
+            return None
+
+        states = {spec.name: create_state(spec) for spec in view.specs}
+        for batch in view.loader():
+            contexts: Dict[str, AggregationContext] = {}
+            for spec in view.specs:
+                if spec.data_source not in batch:
+                    continue
+                if spec.data_source not in contexts:
+                    contexts[spec.data_source] = AggregationContext(batch[spec.data_source])
+                partial_state = create_state(spec)
+                partial_state.update(spec, contexts[spec.data_source], 1)
+                states[spec.name].merge(partial_state)
+
+        for spec, params in zip(view.specs, view.params):
+            MaterializedAggregate.objects.filter(view=name, name=spec.name).update(
+                spec=params, state=serialize_state(states[spec.name]), version=F('version') + 1
+            )
+        MaterializedAggregate.objects.filter(view=name).exclude(name__in=[spec.name for spec in view.specs]).delete()
+
+    logger.info(f"Материализованное представление '{name}' пересчитано")
+    return {spec_name: len(state.rows) for spec_name, state in states.items()}
+
+def _changed_rows(spec: AggregationSpec, changed: Sequence[Tuple[Mapping, Mapping]]) -> Tuple[List, List]:
+    """Строки до и после изменения, в которых изменились колонки агрегации."""
+    columns = spec.keys + ((spec.value,) if spec.value else ())
+    pairs = [(before, after) for before, after in changed
+             if any(before.get(column) != after.get(column) for column in columns)]
+    return [before for before, _ in pairs], [after for _, after in pairs]
+
+def apply_changes(data_source: str, added: Any = None, removed: Any = None,
+                  changed: Optional[Sequence[Tuple[Mapping, Mapping]]] = None) -> List[str]:
+    """
+    Применяет изменения строк источника к состояниям представлений.
+
+    Вызывается кодом, изменяющим исходные данные, в той же транзакции:
+    состояние изменяется вместе с данными или не изменяется вовсе.
+
+    Args:
+        data_source: Источник данных (например, tasks)
+        added: Добавленные строки (формат источников движка aggregation)
+        removed: Удаленные строки
+        changed: Пары строк (до, после) изменения
+
+    Returns:
+        List[str]: Обновленные представления (представления без состояния
+        пропускаются: оно будет построено полным пересчетом при чтении)
+    """
+    views = [view for view in _views.values() if data_source in view.data_sources]
+    added_context = AggregationContext(added) if added is not None else None
+    removed_context = AggregationContext(removed) if removed is not None else None
+    updated = []
+
+    with transaction.atomic():
+        for view in views:
+            records = _load_records(view, lock=True)
+            specs = [spec for spec in view.specs if spec.data_source == data_source]
+            if any(spec.name not in records for spec in specs):
+                logger.warning(f"Состояние представления '{view.name}' не построено, изменения пропущены")
+                continue
+
+            for spec in specs:
+                record = records[spec.name]
+                state = deserialize_state(record.state)
+                if removed_context is not None:
+                    state.update(spec, removed_context, -1)
+                if changed:
+                    before, after = _changed_rows(spec, changed)
+                    if before:
+                        state.update(spec, AggregationContext(before), -1)
+                        state.update(spec, AggregationContext(after), 1)
+                if added_context is not None:
+                    state.update(spec, added_context, 1)
+                MaterializedAggregate.objects.filter(pk=record.pk).update(
+                    state=serialize_state(state), version=F('version') + 1
+                )
+            updated.append(view.name)
+    return updated
+
+def get_materialized(name: str) -> Dict[str, Any]:
+    """
+    Результат представления в формате transform_data_for_bi_graph.
+
+    Если состояние не построено или параметры агрегации изменились,
+    выполняется полный пересчет (параллельные чтения ждут один пересчет).
+    """
+    view = get_view(name)
+    versions = dict(MaterializedAggregate.objects.filter(view=name).values_list('name', 'version'))
+    key = tuple(versions.get(spec.name) for spec in view.specs)
+    with _results_lock:
+        cached = _results.get(name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    records = _load_records(view)
+    if len(records) != len(view.specs):
+        rebuild_view(name, missing_only=True)
+        records = _load_records(view)
+
+    result = {spec.name: deserialize_state(records[spec.name].state).result(spec) for spec in view.specs}
+    key = tuple(records[spec.name].version for spec in view.specs)
+    with _results_lock:
+        _results[name] = (key, result)
+    return result
+
+def get_materialized_status(name: str) -> List[Dict[str, Any]]:
+    """Состояние агрегаций представления: версия, количество групп и устаревших групп."""
+    view = get_view(name)
+    records = _load_records(view)
+    status = []
+    for spec in view.specs:
+        record = records.get(spec.name)
+        state = deserialize_state(record.state) if record is not None else None
+        status.append({
+            'name': spec.name,
+            'built': record is not None,
+            'version': record.version if record is not None else None,
+            'groups': len(state.rows) if state is not None else 0,
+            'stale_groups': len(state.stale) if state is not None else 0,
+            'updated_at': record.updated_at if record is not None else None,
+        })
+    return status
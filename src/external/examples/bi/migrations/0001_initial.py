@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-18 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterializedAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view', models.CharField(max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('spec', models.JSONField()),
+                ('state', models.BinaryField()),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('view', 'name'), name='examples_bi_materialized_view_name')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-18 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('examples_bi', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('series', models.CharField(max_length=255)),
+                ('bucket', models.CharField(max_length=16)),
+                ('key', models.CharField(blank=True, default='', max_length=255)),
+                ('start', models.DateTimeField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('sum', models.FloatField(null=True)),
+                ('min', models.FloatField(null=True)),
+                ('max', models.FloatField(null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['series', 'bucket', 'start'], name='examples_bi_rollup_range')],
+                'constraints': [models.UniqueConstraint(fields=('series', 'bucket', 'key', 'start'), name='examples_bi_rollup_unique')],
+            },
+        ),
+    ]
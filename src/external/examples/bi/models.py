@@ -1,3 +1,54 @@
 from django.db import models
 
-# Создавайте свои модели здесь
\ No newline at end of file
+class MaterializedAggregate(models.Model):
+    """
+    Сохраненное состояние агрегации материализованного представления BI.
+
+    Одна запись - одна агрегация (name - ключ результата) представления view.
+    `spec` - параметры агрегации, по которым построено состояние: при их
+    изменении состояние пересчитывается. `version` увеличивается при каждом
+    изменении состояния.
+    """
+    view = models.CharField(max_length=255)
+    name = models.CharField(max_length=255)
+    spec = models.JSONField()
+    state = models.BinaryField()
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['view', 'name'], name='examples_bi_materialized_view_name'),
+        ]
+
+    def __str__(self):
+        return f"{self.view}.{self.name} (v{self.version})"
+
+class TimeRollup(models.Model):
+    """
+    Агрегат временного ряда BI за один интервал.
+
+    Одна запись - значения ряда `series` в интервале длины `bucket`
+    (minute, hour, day), начинающемся в `start`, для значения ключа
+    группировки `key` ('' - ряд без ключа или пустой ключ). `sum`, `min` и
+    `max` - по колонке значения ряда (NULL, если ее нет).
+    """
+    series = models.CharField(max_length=255)
+    bucket = models.CharField(max_length=16)
+    key = models.CharField(max_length=255, blank=True, default='')
+    start = models.DateTimeField()
+    count = models.BigIntegerField(default=0)
+    sum = models.FloatField(null=True)
+    min = models.FloatField(null=True)
+    max = models.FloatField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['series', 'bucket', 'key', 'start'], name='examples_bi_rollup_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['series', 'bucket', 'start'], name='examples_bi_rollup_range'),
+        ]
+
+    def __str__(self):
+        return f"{self.series}/{self.bucket}/{self.key or '-'} {self.start:%Y-%m-%d %H:%M}"
@@ -0,0 +1,291 @@
+"""
+Файл с выполнением параметров агрегации BI в базе данных.
+
+Источник данных, зарегистрированный как таблица, агрегируется запросом, а не
+в процессе: параметры агрегации источника компилируются в один запрос -
+GROUP BY для каждого набора ключей группировки, объединенные UNION ALL, - и
+из базы передаются только агрегированные строки:
+
+>>> register_table_source('tasks', 'bpm_task')
+>>> aggregate_sources(aggregation_params)                    # Формат transform_data_for_bi_graph
+>>> aggregate_sources(aggregation_params, cache_ttl=60)      # Через кэш результатов запросов
+
+Соответствие агрегаций SQL:
+- count - COUNT(*), unique_count и approx_unique_count - COUNT(DISTINCT ...)
+  (точное значение вместо оценки) и 1, если в группе есть NULL: движок
+  считает пропуск отдельным значением, а COUNT(DISTINCT) его не учитывает;
+- sum, mean, min, max - SUM (0 для групп без значений, как в движке), AVG, MIN, MAX;
+- percentile - percentile_cont ... WITHIN GROUP (только PostgreSQL).
+Остальные агрегации (histogram, percentile на других СУБД) выполняются
+движком aggregation над колонками, нужными только этим агрегациям.
+Источники без таблицы берутся из data и агрегируются в процессе.
+
+Запросы выполняются через QueryExecutor базы источника, поэтому чтение идет
+с реплик (если они описаны) и может кэшироваться (cache_ttl) с инвалидацией
+по таблице источника.
+"""
+
+import re
+
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from django.db import connections
+
+from src.core.utils.database import QueryExecutor
+
+from .aggregation import AggregationContext, AggregationSpec, aggregate, nest
+
+# Имена таблиц и колонок, допустимые в запросе (schema.table для таблиц)
+IDENTIFIER_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# Агрегации, выполняемые любой СУБД: шаблон выражения над колонкой value
+SQL_AGGREGATES = {
+    'count': 'COUNT(*)',
+    'unique_count': 'COUNT(DISTINCT {value}) + MAX(CASE WHEN {value} IS NULL THEN 1 ELSE 0 END)',
+    'approx_unique_count': 'COUNT(DISTINCT {value}) + MAX(CASE WHEN {value} IS NULL THEN 1 ELSE 0 END)',
+    'sum': 'COALESCE(SUM({value}), 0)',
+    'mean': 'AVG({value})',
+    'min': 'MIN({value})',
+    'max': 'MAX({value})',
+}
+
+# Агрегации с вещественным результатом (Decimal из базы не приводится к int)
+FLOAT_AGGREGATIONS = {'mean', 'percentile'}
+
+# Агрегации, выполняемые только некоторыми СУБД
+VENDOR_AGGREGATES = {
+    'postgresql': {
+        'percentile': 'percentile_cont(%s) WITHIN GROUP (ORDER BY {value})',
+    },
+}
+
+
+class TableSource:
+    """Источник данных - таблица базы."""
+
+    __slots__ = ('table', 'database')
+
+    def __init__(self, table: str, database: str = 'default') -> None:
+        """
+        Raises:
+            ValueError: Если имя таблицы недопустимо
+        """
+        if not all(IDENTIFIER_RE.match(part) for part in table.split('.')):
+            raise ValueError(f'Недопустимое имя таблицы: {table}')
+        self.table = table
+        self.database = database
+
+_sources: Dict[str, TableSource] = {}
+
+def register_table_source(data_source: str, table: str, database: str = 'default') -> TableSource:
+    """
+    Регистрирует таблицу как источник данных параметров агрегации.
+
+    Args:
+        data_source: Имя источника в параметрах агрегации (data_source)
+        table: Таблица (schema.table или table)
+        database: База из DATABASES
+    """
+    source = TableSource(table, database)
+    _sources[data_source] = source
+    return source
+
+def get_table_sources() -> Dict[str, TableSource]:
+    """Зарегистрированные источники-таблицы по имени."""
+    return dict(_sources)
+
+@lru_cache(maxsize=None)
+def get_executor(database: str) -> type:
+    """Исполнитель запросов базы database."""
+    if database == QueryExecutor.database:
+        return QueryExecutor
+    return type(f'QueryExecutor_{database}', (QueryExecutor,), {'database': database})
+
+def quote_identifier(name: str, vendor_quote: Any) -> str:
+    """
+    Raises:
+        ValueError: Если имя колонки недопустимо
+    """
+    if not IDENTIFIER_RE.match(str(name)):
+        raise ValueError(f'Недопустимое имя колонки: {name}')
+    return vendor_quote(name)
+
+def from_db(value: Any, as_float: bool = False) -> Any:
+    """Значение из базы как значение движка aggregation (Decimal - int или float)."""
+    if value is None:
+        return None
+    if as_float:
+        return float(value)
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+def is_pushable(spec: AggregationSpec, vendor: str) -> bool:
+    """Выполняется ли агрегация запросом на СУБД vendor."""
+    return spec.aggregation_type in SQL_AGGREGATES or spec.aggregation_type in VENDOR_AGGREGATES.get(vendor, {})
+
+
+class CompiledQuery:
+    """
+    Запрос агрегаций одного источника.
+
+    Attributes:
+        sql: Запрос
+        params: Параметры запроса
+        groupings: Наборы ключей группировки (номер набора - колонка grouping_id)
+        key_columns: Колонки ключей в результате (все ключи всех наборов)
+        specs: Агрегации по номеру колонки значения
+    """
+    def __init__(self, sql: str, params: List[Any], groupings: List[Tuple[str, ...]],
+                 key_columns: List[str], specs: List[AggregationSpec]) -> None:
+        self.sql = sql
+        self.params = params
+        self.groupings = groupings
+        self.key_columns = key_columns
+        self.specs = specs
+
+    def __call__(self) -> Tuple[str, List[Any]]:
+        # Функция запроса для QueryExecutor
+        return self.sql, self.params
+
+    def parse(self, rows: Iterable[Tuple]) -> Dict[str, Any]:
+        """
+        Разбирает строки результата в результаты агрегаций.
+
+        Returns:
+            Dict[str, Any]: Результаты по ключу результата (формат движка aggregation)
+        """
+        key_index = {key: index for index, key in enumerate(self.key_columns)}
+        offset = 1 + len(self.key_columns)
+        labels: Dict[str, List[Tuple]] = {spec.name: [] for spec in self.specs}
+        values: Dict[str, List[Any]] = {spec.name: [] for spec in self.specs}
+        spec_columns = [
+            (offset + index, spec, spec.aggregation_type in FLOAT_AGGREGATIONS) for index, spec in enumerate(self.specs)
+        ]
+
+        for row in rows:
+            keys = self.groupings[row[0]]
+            label = tuple(from_db(row[1 + key_index[key]]) for key in keys)
+            for column, spec, as_float in spec_columns:
+                if spec.keys == keys:
+                    labels[spec.name].append(label)
+                    values[spec.name].append(from_db(row[column], as_float))
+        return {spec.name: nest(labels[spec.name], values[spec.name]) for spec in self.specs}
+
+def compile_source(specs: List[AggregationSpec], table: str, vendor: str, quote: Any) -> CompiledQuery:
+    """
+    Компилирует агрегации одного источника в запрос.
+
+    Каждый набор ключей группировки - SELECT с GROUP BY; колонки ключей и
+    значений других наборов в нем - NULL, поэтому типы колонок UNION ALL совпадают.
+
+    Args:
+        specs: Агрегации, выполняемые запросом (is_pushable)
+        table: Таблица источника
+        vendor: СУБД (connection.vendor)
+        quote: Функция экранирования имен (connection.ops.quote_name)
+    """
+    groupings: List[Tuple[str, ...]] = []
+    key_columns: List[str] = []
+    for spec in specs:
+        if spec.keys not in groupings:
+            groupings.append(spec.keys)
+        key_columns.extend(key for key in spec.keys if key not in key_columns)
+
+    table_sql = '.'.join(quote(part) for part in table.split('.'))
+    templates = {**SQL_AGGREGATES, **VENDOR_AGGREGATES.get(vendor, {})}
+    selects: List[str] = []
+    params: List[Any] = []
+    for grouping_id, keys in enumerate(groupings):
+        columns = [f'{grouping_id} AS grouping_id']
+        columns += [
+            f'{quote_identifier(key, quote) if key in keys else "NULL"} AS k{index}'
+            for index, key in enumerate(key_columns)
+        ]
+        for index, spec in enumerate(specs):
+            if spec.keys != keys:
+                columns.append(f'NULL AS a{index}')
+                continue
+            value = quote_identifier(spec.value, quote) if spec.value else None
+            columns.append(f'{templates[spec.aggregation_type].format(value=value)} AS a{index}')
+            if spec.aggregation_type == 'percentile':
+                params.append(spec.percentile / 100)
+        group_by = ', '.join(quote_identifier(key, quote) for key in keys)
+        selects.append(f"SELECT {', '.join(columns)} FROM {table_sql} GROUP BY {group_by}")
+
+    return CompiledQuery(' UNION ALL '.join(selects), params, groupings, key_columns, specs)
+
+def fetch_columns(source: TableSource, columns: List[str], cache_ttl: Optional[int] = None) -> Dict[str, List[Any]]:
+    """Колонки таблицы источника для агрегаций, выполняемых в процессе."""
+    connection = connections[source.database]
+    quote = connection.ops.quote_name
+    table_sql = '.'.join(quote(part) for part in source.table.split('.'))
+    sql = f"SELECT {', '.join(quote_identifier(column, quote) for column in columns)} FROM {table_sql}"
+    return get_executor(source.database).fetchall(
+        lambda: (sql, ()), row_factory='columnar', cache_ttl=cache_ttl, cache_tables=[source.table]
+    )
+
+def aggregate_table(source: TableSource, specs: List[AggregationSpec],
+                    cache_ttl: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Агрегации одного источника-таблицы: запросом и, для остальных, в процессе.
+
+    Args:
+        source: Таблица источника
+        specs: Агрегации источника
+        cache_ttl: Время жизни результатов в кэше результатов запросов, секунды
+    """
+    connection = connections[source.database]
+    pushed = [spec for spec in specs if is_pushable(spec, connection.vendor)]
+    local = [spec for spec in specs if not is_pushable(spec, connection.vendor)]
+    result: Dict[str, Any] = {}
+
+    if pushed:
+        query = compile_source(pushed, source.table, connection.vendor, connection.ops.quote_name)
+        rows = get_executor(source.database).fetchall(
+            query, row_factory='tuple', cache_ttl=cache_ttl, cache_tables=[source.table]
+        )
+        result.update(query.parse(rows))
+
+    if local:
+        columns: List[str] = []
+        for spec in local:
+            columns.extend(column for column in spec.keys + (spec.value,) if column and column not in columns)
+        context = AggregationContext(fetch_columns(source, columns, cache_ttl))
+        result.update({spec.name: context.aggregate(spec) for spec in local})
+    return result
+
+def aggregate_sources(aggregation_params: Iterable[Mapping[str, Any]], data: Optional[Mapping[str, Any]] = None,
+                      cache_ttl: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Вычисляет агрегации: над таблицами - в базе, над остальными источниками - в процессе.
+
+    Args:
+        aggregation_params: Параметры агрегации (формат transform_data_for_bi_graph)
+        data: Данные источников, не зарегистрированных как таблицы
+        cache_ttl: Время жизни результатов запросов в кэше, секунды (None - без кэша)
+
+    Returns:
+        Dict[str, Any]: Результаты в порядке параметров агрегации
+
+    Raises:
+        ValueError: Если параметр агрегации неверен
+        KeyError: Если источника нет ни среди таблиц, ни в data
+    """
+    params = [dict(item) for item in aggregation_params]
+    specs = [AggregationSpec(item) for item in params]
+    results: Dict[str, Any] = {}
+
+    by_source: Dict[str, List[AggregationSpec]] = {}
+    for spec in specs:
+        if spec.data_source in _sources:
+            by_source.setdefault(spec.data_source, []).append(spec)
+    for data_source, source_specs in by_source.items():
+        results.update(aggregate_table(_sources[data_source], source_specs, cache_ttl))
+
+    local_params = [item for item, spec in zip(params, specs) if spec.data_source not in _sources]
+    if local_params:
+        results.update(aggregate(data or {}, local_params))
+    return {spec.name: results[spec.name] for spec in specs}
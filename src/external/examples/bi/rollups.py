@@ -0,0 +1,357 @@
+"""
+Файл с агрегатами временных рядов BI по интервалам времени.
+
+Временной ряд - загрузчик событий с отметкой времени, необязательная колонка
+ключа группировки (например, status) и необязательная колонка значения. Для
+каждого интервала (minute, hour, day) ряд хранится в модели TimeRollup как
+количество событий и сумма, минимум и максимум значения по интервалам и ключам:
+
+>>> register_time_series('task_status', load_task_events, timestamp='created_at', key='status')
+>>> refresh_time_series('task_status')             # Периодическая задача refresh_time_rollups
+>>> get_time_series('task_status', start=start, end=end, points=300)
+
+Обновление инкрементальное. Загрузчик получает начало последнего сохраненного
+интервала самой мелкой длины и возвращает события не раньше него; интервалы
+с этими событиями пересчитываются (последний из них мог быть неполным), более
+крупные интервалы пересчитываются из мелких, а не из событий. События,
+пришедшие с опозданием в уже сохраненные интервалы, учитываются полным
+пересчетом (rollup_time_series --rebuild). Мелкие интервалы старше срока
+хранения (retention) удаляются.
+
+Чтение выбирает самый мелкий интервал, для которого диапазон укладывается в
+ROLLUP_OVERSAMPLING * points интервалов и который еще хранится, и прореживает
+каждый ряд до points точек (downsampling.py), поэтому размер ответа не
+зависит от длины диапазона.
+"""
+
+import logging
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .downsampling import DOWNSAMPLERS, downsample
+from .models import TimeRollup
+
+logger = logging.getLogger('utils')
+
+# Длина интервала и частота pandas по имени интервала (от мелкого к крупному)
+BUCKETS = {
+    'minute': (timedelta(minutes=1), 'min'),
+    'hour': (timedelta(hours=1), 'h'),
+    'day': (timedelta(days=1), 'D'),
+}
+
+# Срок хранения интервалов по умолчанию (None - без ограничения)
+DEFAULT_RETENTION: Dict[str, Optional[timedelta]] = {
+    'minute': timedelta(days=7),
+    'hour': timedelta(days=366),
+    'day': None,
+}
+
+METRICS = ('count', 'sum', 'mean', 'min', 'max')
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+DEFAULT_RANGE = timedelta(days=7)
+
+# Сколько интервалов на точку ответа допустимо читать перед прореживанием
+ROLLUP_OVERSAMPLING = 4
+
+BATCH_SIZE = 1000
+
+
+class TimeSeries:
+    """
+    Описание временного ряда.
+
+    Загрузчик - функция loader(since), возвращающая события с отметкой времени
+    не раньше since (None - все события) в любом формате, который принимает
+    pandas.DataFrame (строки-словари, словарь колонок, DataFrame).
+    """
+    def __init__(self, name: str, loader: Callable[[Optional[datetime]], Any], timestamp: str = 'created_at',
+                 key: Optional[str] = None, value: Optional[str] = None,
+                 buckets: Iterable[str] = tuple(BUCKETS),
+                 retention: Optional[Mapping[str, Optional[timedelta]]] = None) -> None:
+        """
+        Raises:
+            ValueError: Если интервал неизвестен
+        """
+        unknown = [bucket for bucket in buckets if bucket not in BUCKETS]
+        if unknown or not buckets:
+            raise ValueError(f"Неизвестные интервалы: {', '.join(unknown) or 'не заданы'}. "
+                             f"Доступные: {', '.join(BUCKETS)}")
+        self.name = name
+        self.loader = loader
+        self.timestamp = timestamp
+        self.key = key
+        self.value = value
+        self.buckets = [bucket for bucket in BUCKETS if bucket in buckets]
+        self.retention = {**DEFAULT_RETENTION, **(retention or {})}
+
+_series: Dict[str, TimeSeries] = {}
+
+def register_time_series(name: str, loader: Callable[[Optional[datetime]], Any], **options: Any) -> TimeSeries:
+    """
+    Регистрирует временной ряд.
+
+    Args:
+        name: Имя ряда
+        loader: Загрузчик событий loader(since)
+        **options: timestamp, key, value, buckets, retention (см. TimeSeries)
+    """
+    series = TimeSeries(name, loader, **options)
+    _series[name] = series
+    return series
+
+def get_registered_series() -> Dict[str, TimeSeries]:
+    """Зарегистрированные временные ряды по имени."""
+    return dict(_series)
+
+def get_series_definition(name: str) -> TimeSeries:
+    """
+    Raises:
+        KeyError: Если ряд не зарегистрирован
+    """
+    if name not in _series:
+        raise KeyError(f"Временной ряд '{name}' не зарегистрирован")
+    return _series[name]
+
+def to_utc(moment: datetime) -> datetime:
+    """Момент времени в UTC (время без часового пояса считается временем UTC)."""
+    return moment.replace(tzinfo=dt_timezone.utc) if moment.tzinfo is None else moment.astimezone(dt_timezone.utc)
+
+def floor_time(moment: datetime, bucket: str) -> datetime:
+    """Начало интервала bucket, содержащего moment."""
+    moment = pd.Timestamp(moment)
+    moment = moment.tz_localize('UTC') if moment.tzinfo is None else moment.tz_convert('UTC')
+    return moment.floor(BUCKETS[bucket][1]).to_pydatetime()
+
+def rollup_events(series: TimeSeries, events: Any, bucket: str) -> pd.DataFrame:
+    """
+    Агрегаты событий по интервалам bucket и ключам.
+
+    Returns:
+        pd.DataFrame: Колонки start, key, count, sum, min, max
+    """
+    frame = events if isinstance(events, pd.DataFrame) else pd.DataFrame(events)
+    if frame.empty:
+        return pd.DataFrame(columns=['start', 'key', 'count', 'sum', 'min', 'max'])
+    grouped = pd.DataFrame({
+        'start': pd.to_datetime(frame[series.timestamp], utc=True).dt.floor(BUCKETS[bucket][1]),
+        'key': frame[series.key].astype(object).where(frame[series.key].notna(), '').astype(str)
+               if series.key else '',
+        'value': pd.to_numeric(frame[series.value], errors='coerce') if series.value else np.nan,
+    }).groupby(['start', 'key'], sort=False)
+    result = grouped['value'].agg(['size', 'sum', 'min', 'max']).reset_index().rename(columns={'size': 'count'})
+    if not series.value:
+        result[['sum', 'min', 'max']] = np.nan
+    return result
+
+def combine_rollups(rollups: pd.DataFrame, bucket: str) -> pd.DataFrame:
+    """Агрегаты более крупных интервалов bucket из агрегатов мелких."""
+    rollups = rollups.assign(start=pd.to_datetime(rollups['start'], utc=True).dt.floor(BUCKETS[bucket][1]))
+    return rollups.groupby(['start', 'key'], sort=False).agg(
+        count=('count', 'sum'), sum=('sum', lambda values: values.sum(min_count=1)),
+        min=('min', 'min'), max=('max', 'max'),
+    ).reset_index()
+
+def save_rollups(series: str, bucket: str, rollups: pd.DataFrame) -> int:
+    """
+    Сохраняет агрегаты интервалов (вставка или замена существующих).
+
+    Returns:
+        int: Количество сохраненных интервалов
+    """
+    def to_float(value: Any) -> Optional[float]:
+        return None if pd.isna(value) else float(value)
+
+    records = [
+        TimeRollup(series=series, bucket=bucket, key=key, start=start.to_pydatetime(), count=int(count),
+                   sum=to_float(total), min=to_float(minimum), max=to_float(maximum))
+        for start, key, count, total, minimum, maximum in rollups[['start', 'key', 'count', 'sum', 'min', 'max']]
+        .itertuples(index=False, name=None)
+    ]
+    connection = connections[router.db_for_write(TimeRollup)]
+    # На MySQL конфликт определяется любым уникальным индексом, unique_fields не передаются
+    unique_fields = (['series', 'bucket', 'key', 'start']
+                     if connection.features.supports_update_conflicts_with_target else None)
+    TimeRollup.objects.bulk_create(
+        records, batch_size=BATCH_SIZE, update_conflicts=True,
+        unique_fields=unique_fields, update_fields=['count', 'sum', 'min', 'max'],
+    )
+    return len(records)
+
+def purge_rollups(series: TimeSeries, now: Optional[datetime] = None) -> int:
+    """Удаляет интервалы старше срока хранения."""
+    now = now or timezone.now()
+    deleted = 0
+    for bucket in series.buckets:
+        retention = series.retention.get(bucket)
+        if retention is not None:
+            deleted += TimeRollup.objects.filter(series=series.name, bucket=bucket,
+                                                 start__lt=now - retention).delete()[0]
+    return deleted
+
+def refresh_time_series(name: str, rebuild: bool = False) -> Dict[str, int]:
+    """
+    Обновляет агрегаты ряда по новым событиям.
+
+    Args:
+        name: Имя ряда
+        rebuild: Удалить агрегаты и пересчитать по всем событиям
+
+    Returns:
+        Dict[str, int]: Количество пересчитанных интервалов по имени интервала
+
+    Raises:
+        KeyError: Если ряд не зарегистрирован
+    """
+    series = get_series_definition(name)
+    finest = series.buckets[0]
+    result: Dict[str, int] = {}
+
+    since = None
+    if not rebuild:
+        since = TimeRollup.objects.filter(series=name, bucket=finest).aggregate(last=Max('start'))['last']
+    rollups = rollup_events(series, series.loader(since), finest)
+    if since is not None:
+        rollups = rollups[rollups['start'] >= pd.Timestamp(since)]
+
+    with transaction.atomic(using=router.db_for_write(TimeRollup)):
+        if rebuild:
+            TimeRollup.objects.filter(series=name).delete()
+        result[finest] = save_rollups(name, finest, rollups)
+
+        if len(rollups):
+            changed_from = rollups['start'].min().to_pydatetime()
+            for bucket in series.buckets[1:]:
+                lower = floor_time(changed_from, bucket)
+                finer = pd.DataFrame.from_records(
+                    TimeRollup.objects.filter(series=name, bucket=finest, start__gte=lower)
+                    .values('start', 'key', 'count', 'sum', 'min', 'max')
+                )
+                result[bucket] = save_rollups(name, bucket, combine_rollups(finer, bucket))
+
+        purge_rollups(series)
+    return result
+
+def refresh_all_time_series() -> Dict[str, Dict[str, int]]:
+    """Обновляет агрегаты всех зарегистрированных рядов; ошибка одного ряда не останавливает остальные."""
+    results = {}
+    for name in _series:
+        try:
+            results[name] = refresh_time_series(name)
+        except Exception:
+            logger.exception(f"Ошибка обновления агрегатов временного ряда '{name}'")
+    return results
+
+def choose_bucket(series: TimeSeries, start: datetime, end: datetime, points: int,
+                  now: Optional[datetime] = None) -> str:
+    """
+    Самый мелкий интервал, для которого диапазон укладывается в
+    ROLLUP_OVERSAMPLING * points интервалов и который хранится с начала диапазона.
+    """
+    now = now or timezone.now()
+    for bucket in series.buckets:
+        retention = series.retention.get(bucket)
+        if retention is not None and start < now - retention:
+            continue
+        if (end - start) / BUCKETS[bucket][0] <= ROLLUP_OVERSAMPLING * points:
+            return bucket
+    return series.buckets[-1]
+
+def metric_values(frame: pd.DataFrame, metric: str) -> pd.Series:
+    if metric == 'mean':
+        return frame['sum'] / frame['count'].where(frame['count'] > 0)
+    return frame[metric]
+
+def get_time_series(name: str, metric: str = 'count', start: Optional[datetime] = None,
+                    end: Optional[datetime] = None, points: int = DEFAULT_POINTS, method: str = 'lttb',
+                    bucket: Optional[str] = None, keys: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Ряд для графика: значения метрики по ключам, прореженные до points точек.
+
+    Для count и sum интервалы без событий - нули, для mean, min и max они
+    пропускаются.
+
+    Args:
+        name: Имя ряда
+        metric: count, sum, mean, min или max
+        start: Начало диапазона (по умолчанию - end - DEFAULT_RANGE)
+        end: Конец диапазона, не включается (по умолчанию - текущее время)
+        points: Наибольшее количество точек каждого ряда (от 3 до MAX_POINTS)
+        method: Метод прореживания (lttb или minmax)
+        bucket: Интервал (по умолчанию выбирается по диапазону и points)
+        keys: Значения ключа (по умолчанию - все)
+
+    Returns:
+        Dict[str, Any]: Интервал, диапазон и точки [время в мс, значение] по значению ключа
+
+    Raises:
+        KeyError: Если ряд не зарегистрирован
+        ValueError: Если параметры неверны
+    """
+    series = get_series_definition(name)
+    if metric not in METRICS:
+        raise ValueError(f"Неизвестная метрика: {metric}. Доступные: {', '.join(METRICS)}")
+    if metric != 'count' and not series.value:
+        raise ValueError(f"У ряда '{name}' нет колонки значения, доступна только метрика count")
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"Неизвестный метод прореживания: {method}. Доступные: {', '.join(DOWNSAMPLERS)}")
+    if not 3 <= points <= MAX_POINTS:
+        raise ValueError(f'Количество точек должно быть от 3 до {MAX_POINTS}: {points}')
+    if bucket is not None and bucket not in series.buckets:
+        raise ValueError(f"Неизвестный интервал: {bucket}. Доступные: {', '.join(series.buckets)}")
+
+    # Диапазон приводится к UTC: с ним сравниваются интервалы и строится шкала времени
+    end = to_utc(end or timezone.now())
+    start = to_utc(start) if start else end - DEFAULT_RANGE
+    if start >= end:
+        raise ValueError('Начало диапазона должно быть раньше конца')
+    if bucket is None:
+        bucket = choose_bucket(series, start, end, points)
+    elif (end - start) / BUCKETS[bucket][0] > ROLLUP_OVERSAMPLING * MAX_POINTS:
+        raise ValueError(f'Слишком длинный диапазон для интервала {bucket}')
+    first = floor_time(start, bucket)
+
+    queryset = TimeRollup.objects.filter(series=name, bucket=bucket, start__gte=first, start__lt=end)
+    if keys:
+        queryset = queryset.filter(key__in=keys)
+    frame = pd.DataFrame.from_records(
+        queryset.order_by('key', 'start').values('key', 'start', 'count', 'sum', 'min', 'max'),
+        columns=['key', 'start', 'count', 'sum', 'min', 'max'],
+    )
+    frame['start'] = pd.to_datetime(frame['start'], utc=True)
+
+    result: Dict[str, List[List[Any]]] = {}
+    timeline = pd.date_range(first, end, freq=BUCKETS[bucket][1], inclusive='left')
+    for key, group in frame.groupby('key', sort=True):
+        values = metric_values(group, metric).set_axis(group['start'])
+        if metric in ('count', 'sum'):
+            values = values.reindex(timeline, fill_value=0)
+        values = values.dropna()
+        if values.empty:
+            continue
+        x = values.index.as_unit('ms').asi8
+        y = values.to_numpy(dtype=np.float64)
+        indices = downsample(x, y, points, method)
+        result[key] = [
+            [int(moment), int(value) if metric == 'count' else value]
+            for moment, value in zip(x[indices].tolist(), y[indices].tolist())
+        ]
+
+    return {
+        'series': name,
+        'metric': metric,
+        'bucket': bucket,
+        'start': first.isoformat(),
+        'end': end.isoformat(),
+        'points': result,
+    }
@@ -1,3 +1,16 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from django.utils import timezone
+
+from src.external.examples.bpm.scripts import get_tasks
+
+from .aggregation import aggregate
+from .materialized import register_materialized_view
+from .rollups import register_time_series
+
 aggregation_params_def = [
     {
         "key": "status", 
@@ -12,32 +25,30 @@ aggregation_params_def = [
 ]
 
 def transform_data_for_bi_graph(bpm_data, aggregation_params = aggregation_params_def):
-    aggregated_data = {}
-
-    for param in aggregation_params:
-        key = param.get('key')
-        aggregation_type = param.get('aggregation_type')
-        data_source = param.get('data_source')
-
-        if aggregation_type == 'count':
-            counts = {}
-            for item in bpm_data[data_source]:
-                value = item.get(key)
-                if value in counts:
-                    counts[value] += 1
-                else:
-                    counts[value] = 1
-            aggregated_data[f"{key}_counts"] = counts
-
-        elif aggregation_type == 'unique_count':
-            unique_counts = {}
-            for item in bpm_data[data_source]:
-                value = item.get(key)
-                if value in unique_counts:
-                    unique_counts[value].add(item["id"])
-                else:
-                    unique_counts[value] = {item["id"]}
-            unique_counts = {k: len(v) for k, v in unique_counts.items()}
-            aggregated_data[f"{key}_unique_counts"] = unique_counts
-
-    return aggregated_data
\ No newline at end of file
+    # Агрегации одного источника вычисляются колоночно за один проход (см. aggregation.py)
+    return aggregate(bpm_data, aggregation_params)
+
+def load_bpm_batches():
+    # Пачки данных BPM для полного пересчета материализованных агрегатов;
+    # в примере данные генерируются, рабочий загрузчик читает их из базы пачками
+    yield get_tasks(10, 10, 10)
+
+# Материализованные агрегаты графика задач: обновляются через apply_changes('tasks', ...)
+register_materialized_view('tasks_graph', aggregation_params_def, load_bpm_batches)
+
+TASK_STATUSES = np.array(['Pending', 'In Progress', 'Completed', 'Cancelled'], dtype=object)
+
+def load_task_events(since, events_per_minute=10):
+    # События изменения статусов задач для временного ряда; в примере они генерируются
+    # (не раньше чем за сутки), рабочий загрузчик читает события не раньше since из базы
+    end = timezone.now()
+    start = max(since or end - timedelta(days=1), end - timedelta(days=1))
+    count = int((end - start).total_seconds() / 60 * events_per_minute)
+    rng = np.random.default_rng()
+    return {
+        "created_at": pd.Timestamp(start) + pd.to_timedelta(rng.random(count) * (end - start).total_seconds(), unit='s'),
+        "status": TASK_STATUSES[rng.integers(0, len(TASK_STATUSES), count)],
+    }
+
+# Количество задач по статусам во времени: обновляется периодической задачей refresh_time_rollups
+register_time_series('task_status', load_task_events, timestamp='created_at', key='status')
@@ -0,0 +1,17 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger('utils')
+
+@shared_task
+def refresh_time_rollups():
+    """
+    Обновление агрегатов временных рядов BI по интервалам (bi/rollups.py).
+    Пересчитывает интервалы с новыми событиями и удаляет интервалы старше срока хранения.
+    """
+    from src.external.examples.bi.rollups import refresh_all_time_series
+
+    logger.info("Начало выполнения задачи refresh_time_rollups")
+    refresh_all_time_series()
+    logger.info("Конец выполнения задачи refresh_time_rollups")
@@ -1,3 +1,262 @@
-from django.test import TestCase
+import random
 
-# Создавайте свои тесты здесь
\ No newline at end of file
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from . import materialized, pushdown, rollups
+from .aggregation import AggregationContext, AggregationSpec, aggregate
+from .downsampling import lttb, minmax
+from .models import MaterializedAggregate, TimeRollup
+
+class PushdownTests(TestCase):
+    """Агрегации источника-таблицы в базе совпадают с агрегациями движка над теми же строками."""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(1)
+        cls.rows = [
+            {
+                'id': i,
+                'process_id': rng.randint(1, 30),
+                'status': rng.choice(['Pending', 'Completed', 'Cancelled', None]),
+                'duration': rng.choice([rng.randint(1, 100), None]),
+                'weight': rng.random(),
+                'assignee': rng.choice([rng.randint(1, 5), None]),
+            }
+            for i in range(2000)
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE pushdown_tasks (id integer, process_id integer, status text, '
+                           'duration integer, weight real, assignee integer)')
+            cursor.executemany('INSERT INTO pushdown_tasks VALUES (%s, %s, %s, %s, %s, %s)',
+                               [tuple(row.values()) for row in cls.rows])
+
+    def setUp(self):
+        sources = patch.dict(pushdown._sources, {'tasks': pushdown.TableSource('pushdown_tasks')})
+        sources.start()
+        self.addCleanup(sources.stop)
+
+    def assertSameResults(self, params):
+        expected = aggregate({'tasks': self.rows}, params)
+        result = pushdown.aggregate_sources(params)
+
+        self.assertEqual(list(result), list(expected))
+        for name, value in expected.items():
+            if name.endswith('_mean'):
+                self.assertEqual(result[name].keys(), value.keys())
+                for key in value:
+                    self.assertAlmostEqual(result[name][key], value[key])
+            else:
+                self.assertEqual(result[name], value, name)
+
+    def test_pushed_aggregations_match_engine(self):
+        self.assertSameResults([
+            {'key': 'status', 'aggregation_type': 'count', 'data_source': 'tasks'},
+            {'key': 'status', 'aggregation_type': 'unique_count', 'value': 'process_id', 'data_source': 'tasks'},
+            {'key': 'status', 'aggregation_type': 'sum', 'value': 'duration', 'data_source': 'tasks'},
+            {'key': 'status', 'aggregation_type': 'mean', 'value': 'weight', 'data_source': 'tasks'},
+            {'key': 'process_id', 'aggregation_type': 'max', 'value': 'duration', 'data_source': 'tasks'},
+            {'key': ['status', 'process_id'], 'aggregation_type': 'count', 'data_source': 'tasks'},
+        ])
+
+    def test_unique_count_counts_null_as_value(self):
+        self.assertSameResults([
+            {'key': 'status', 'aggregation_type': 'unique_count', 'value': 'assignee', 'data_source': 'tasks'},
+            {'key': 'process_id', 'aggregation_type': 'unique_count', 'value': 'status', 'data_source': 'tasks'},
+        ])
+
+    def test_local_aggregations_and_sources(self):
+        memory = [{'x': 1}, {'x': 1}, {'x': 2}]
+        params = [
+            {'key': 'status', 'aggregation_type': 'histogram', 'value': 'duration', 'bins': [0, 50, 100],
+             'data_source': 'tasks'},
+            {'key': 'x', 'aggregation_type': 'count', 'data_source': 'memory'},
+        ]
+        self.assertEqual(pushdown.aggregate_sources(params, data={'memory': memory}),
+                         aggregate({'tasks': self.rows, 'memory': memory}, params))
+
+class DownsamplingTests(SimpleTestCase):
+    def setUp(self):
+        self.x = np.arange(1000, dtype=np.int64)
+        self.y = np.sin(self.x / 50.0)
+        self.y[333] = 10.0
+        self.y[666] = -10.0
+
+    def test_lttb_keeps_ends_and_peaks(self):
+        indices = lttb(self.x, self.y, 100)
+
+        self.assertEqual(len(indices), 100)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertIn(333, indices)
+        self.assertIn(666, indices)
+
+    def test_minmax_keeps_extremes(self):
+        indices = minmax(self.x, self.y, 100)
+
+        self.assertLessEqual(len(indices), 100)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertIn(333, indices)
+        self.assertIn(666, indices)
+
+    def test_short_series_is_not_downsampled(self):
+        for method in (lttb, minmax):
+            self.assertEqual(method(self.x[:10], self.y[:10], 100).tolist(), list(range(10)))
+
+class TimeRollupTests(TestCase):
+    def setUp(self):
+        self.hour = rollups.floor_time(datetime.now(timezone.utc) - timedelta(hours=3), 'hour')
+        self.events = []
+        self.since = []
+
+        def load_events(since):
+            self.since.append(since)
+            return [event for event in self.events if since is None or event['created_at'] >= since]
+
+        series = rollups.TimeSeries('test_events', load_events, key='status', value='duration')
+        registry = patch.dict(rollups._series, {'test_events': series})
+        registry.start()
+        self.addCleanup(registry.stop)
+
+    def add_event(self, minutes, status='done', duration=1.0):
+        self.events.append({'created_at': self.hour + timedelta(minutes=minutes), 'status': status,
+                            'duration': duration})
+
+    def stored(self, bucket):
+        return {
+            (row.start, row.key): (row.count, row.sum, row.min, row.max)
+            for row in TimeRollup.objects.filter(series='test_events', bucket=bucket)
+        }
+
+    def test_combine_rollups(self):
+        finer = pd.DataFrame({
+            'start': [self.hour, self.hour + timedelta(minutes=1), self.hour + timedelta(minutes=61)],
+            'key': ['done', 'done', 'done'],
+            'count': [2, 3, 1],
+            'sum': [4.0, np.nan, 5.0],
+            'min': [1.0, np.nan, 5.0],
+            'max': [3.0, np.nan, 5.0],
+        })
+        combined = rollups.combine_rollups(finer, 'hour').set_index('start')
+
+        self.assertEqual(combined['count'].tolist(), [5, 1])
+        self.assertEqual(combined['sum'].tolist(), [4.0, 5.0])
+        self.assertEqual(combined['min'].tolist(), [1.0, 5.0])
+        self.assertEqual(combined['max'].tolist(), [3.0, 5.0])
+
+    def test_incremental_refresh(self):
+        self.add_event(0, duration=2.0)
+        self.add_event(5, duration=4.0)
+        rollups.refresh_time_series('test_events')
+
+        # Новое событие в последнем сохраненном интервале и событие в следующем часе
+        self.add_event(5, duration=6.0)
+        self.add_event(70, status='failed', duration=3.0)
+        rollups.refresh_time_series('test_events')
+
+        last_minute = self.hour + timedelta(minutes=5)
+        self.assertEqual(self.since, [None, last_minute])
+        self.assertEqual(self.stored('minute'), {
+            (self.hour, 'done'): (1, 2.0, 2.0, 2.0),
+            (last_minute, 'done'): (2, 10.0, 4.0, 6.0),
+            (self.hour + timedelta(minutes=70), 'failed'): (1, 3.0, 3.0, 3.0),
+        })
+        self.assertEqual(self.stored('hour'), {
+            (self.hour, 'done'): (3, 12.0, 2.0, 6.0),
+            (self.hour + timedelta(hours=1), 'failed'): (1, 3.0, 3.0, 3.0),
+        })
+
+    def test_range_with_offset_is_converted_to_utc(self):
+        self.add_event(0)
+        self.add_event(1)
+        rollups.refresh_time_series('test_events')
+
+        moscow = timezone(timedelta(hours=3))
+        series = rollups.get_time_series('test_events', start=self.hour.astimezone(moscow),
+                                         end=(self.hour + timedelta(minutes=3)).astimezone(moscow), bucket='minute')
+
+        self.assertEqual(series['start'], self.hour.isoformat())
+        start_ms = int(self.hour.timestamp() * 1000)
+        self.assertEqual(series['points'], {'done': [[start_ms, 1], [start_ms + 60000, 1], [start_ms + 120000, 0]]})
+
+TASKS = [
+    {'status': 'done', 'duration': 5},
+    {'status': 'done', 'duration': 15},
+    {'status': 'open', 'duration': 25},
+]
+
+class MaterializedStateTests(SimpleTestCase):
+    def build(self, params, rows):
+        spec = AggregationSpec({'data_source': 'tasks', 'key': 'status', **params})
+        state = materialized.create_state(spec)
+        state.update(spec, AggregationContext(rows), 1)
+        return spec, state
+
+    def test_merged_states_match_single_state(self):
+        for params in ({'aggregation_type': 'count'}, {'aggregation_type': 'sum', 'value': 'duration'},
+                       {'aggregation_type': 'max', 'value': 'duration'}):
+            spec, state = self.build(params, TASKS[:1])
+            state.merge(self.build(params, TASKS[1:])[1])
+
+            self.assertEqual(state.result(spec), self.build(params, TASKS)[1].result(spec), params)
+
+    def test_removal(self):
+        spec, state = self.build({'aggregation_type': 'max', 'value': 'duration'}, TASKS)
+        state.update(spec, AggregationContext([TASKS[1]]), -1)
+        self.assertEqual(state.stale, {('done',)})
+
+        state.update(spec, AggregationContext([TASKS[2]]), -1)
+        self.assertEqual(list(state.rows), [('done',)])
+
+        spec, state = self.build({'aggregation_type': 'sum', 'value': 'duration'}, TASKS)
+        state.update(spec, AggregationContext([TASKS[1]]), -1)
+        self.assertEqual(state.result(spec), {'done': 5, 'open': 25})
+        self.assertEqual(state.stale, set())
+
+    def test_histogram_bins(self):
+        spec, state = self.build({'aggregation_type': 'histogram', 'value': 'duration', 'bins': [0, 10, 20, 30]}, TASKS)
+        state.update(spec, AggregationContext([TASKS[0]]), -1)
+
+        self.assertEqual(state.result(spec), {'edges': [0.0, 10.0, 20.0, 30.0],
+                                              'counts': {'done': [0, 1, 0], 'open': [0, 0, 1]}})
+
+    def test_histogram_requires_explicit_bins(self):
+        with self.assertRaises(ValueError):
+            self.build({'aggregation_type': 'histogram', 'value': 'duration', 'bins': 10}, TASKS)
+
+class MaterializedViewTests(TestCase):
+    def setUp(self):
+        self.loads = 0
+
+        def load_tasks():
+            self.loads += 1
+            yield {'tasks': TASKS}
+
+        view = materialized.MaterializedView('test_tasks', [
+            {'data_source': 'tasks', 'key': 'status', 'aggregation_type': 'count'},
+        ], load_tasks)
+        registry = patch.dict(materialized._views, {'test_tasks': view}, clear=True)
+        registry.start()
+        self.addCleanup(registry.stop)
+        materialized._results.clear()
+
+    def test_view_is_built_once(self):
+        self.assertEqual(materialized.get_materialized('test_tasks'), {'status_counts': {'done': 2, 'open': 1}})
+        self.assertIsNone(materialized.rebuild_view('test_tasks', missing_only=True))
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(MaterializedAggregate.objects.get(view='test_tasks').version, 1)
+
+    def test_changes_are_applied_to_built_state(self):
+        with self.assertLogs('utils', 'WARNING'):
+            self.assertEqual(materialized.apply_changes('tasks', added=[{'status': 'open'}]), [])
+
+        materialized.rebuild_view('test_tasks')
+        materialized.apply_changes('tasks', added=[{'status': 'open'}], removed=[TASKS[0]])
+
+        self.assertEqual(materialized.get_materialized('test_tasks'), {'status_counts': {'done': 1, 'open': 2}})
@@ -0,0 +1,245 @@
+"""
+Файл с векторным генератором синтетических данных BPM.
+
+Процессы, задачи и пользователи генерируются колонками NumPy частями по
+chunk_size строк, поэтому объем данных ограничен не памятью, а временем:
+
+>>> generator = BpmGenerator(1_000_000, 10_000_000, 100_000, seed=42, process_zipf=0.8)
+>>> for frame in generator.iter_chunks('tasks'):    # DataFrame по chunk_size строк
+...     ...
+>>> generator.generate('users')                     # Вся таблица одним DataFrame
+>>> write_to_database(generator, 'default')         # Таблицы bpm_processes, bpm_tasks, bpm_users
+>>> write_parquet(generator, 'data/bpm')            # data/bpm/<таблица>/part-00000.parquet
+
+Распределения:
+- status_weights - веса статусов задач (по умолчанию статусы равновероятны);
+- process_zipf - показатель закона Ципфа для количества задач процесса
+  (0 - задачи распределяются по процессам равномерно);
+- user_zipf - показатель закона Ципфа для активности пользователей
+  (исполнитель задачи user_id; 0 - равномерно). Без пользователей
+  user_id задач - None.
+Вероятность k-го по популярности процесса (пользователя) пропорциональна
+1 / k ** s; соответствие популярности и id перемешивается.
+
+При одинаковых seed и chunk_size данные повторяются: генератор каждой части
+создается из seed, таблицы и номера части, поэтому части можно генерировать
+независимо и в любом порядке.
+"""
+
+import logging
+import os
+import time
+
+from typing import Any, Dict, Iterator, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger('utils')
+
+STATUSES = ('Pending', 'In Progress', 'Completed', 'Cancelled')
+TABLES = ('processes', 'tasks', 'users')
+
+# Независимые потоки случайных чисел генератора
+SEED_STREAMS = ('samplers',) + TABLES
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+DESCRIPTION_LENGTH = 50
+
+ALPHABET = np.frombuffer(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789', dtype=np.uint8)
+
+def random_strings(rng: np.random.Generator, count: int, length: int) -> np.ndarray:
+    """Случайные строки из букв и цифр одной длины (массив строк NumPy)."""
+    codes = ALPHABET[rng.integers(0, len(ALPHABET), (count, length), dtype=np.uint8)]
+    return codes.view(f'S{length}').ravel().astype(f'U{length}')
+
+def numbered(prefix: str, ids: np.ndarray) -> np.ndarray:
+    """Строки вида '<prefix><id>'."""
+    return np.char.add(prefix, ids.astype(str))
+
+class ZipfSampler:
+    """
+    Выбор id от 1 до n по закону Ципфа с показателем s (0 - равномерно).
+    При n = 0 выбираются пропуски (None).
+
+    Args:
+        n: Количество id
+        s: Показатель распределения
+        rng: Генератор для перемешивания соответствия популярности и id
+    """
+    def __init__(self, n: int, s: float, rng: np.random.Generator) -> None:
+        self.n = n
+        self.cdf = None
+        self.ids = None
+        if s > 0 and n > 0:
+            weights = np.arange(1, n + 1, dtype=np.float64) ** -s
+            self.cdf = np.cumsum(weights)
+            self.cdf /= self.cdf[-1]
+            self.ids = rng.permutation(n) + 1
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        if self.n == 0:
+            return np.full(size, None, dtype=object)
+        if self.cdf is None:
+            return rng.integers(1, self.n + 1, size)
+        ranks = np.minimum(np.searchsorted(self.cdf, rng.random(size), side='right'), self.n - 1)
+        return self.ids[ranks]
+
+class BpmGenerator:
+    """
+    Генератор синтетических процессов, задач и пользователей BPM.
+
+    Args:
+        num_processes: Количество процессов
+        num_tasks: Количество задач
+        num_users: Количество пользователей
+        seed: Начальное значение генератора (None - случайное)
+        status_weights: Веса статусов задач {статус: вес}
+        process_zipf: Показатель закона Ципфа для задач по процессам
+        user_zipf: Показатель закона Ципфа для задач по пользователям
+        chunk_size: Количество строк в части
+
+    Raises:
+        ValueError: Если параметры неверны
+    """
+    def __init__(self, num_processes: int, num_tasks: int, num_users: int, seed: Optional[int] = None,
+                 status_weights: Optional[Mapping[str, float]] = None, process_zipf: float = 0.0,
+                 user_zipf: float = 1.0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        if min(num_processes, num_tasks, num_users) < 0:
+            raise ValueError('Количество процессов, задач и пользователей не может быть отрицательным')
+        if num_tasks > 0 and num_processes == 0:
+            raise ValueError('Для задач нужен хотя бы один процесс')
+        if chunk_size < 1:
+            raise ValueError(f'Размер части должен быть положительным: {chunk_size}')
+        if process_zipf < 0 or user_zipf < 0:
+            raise ValueError('Показатель закона Ципфа не может быть отрицательным')
+
+        weights = dict(status_weights) if status_weights else dict.fromkeys(STATUSES, 1.0)
+        probabilities = np.asarray(list(weights.values()), dtype=np.float64)
+        if (probabilities < 0).any() or probabilities.sum() <= 0:
+            raise ValueError(f'Веса статусов должны быть неотрицательными и не все нулевыми: {weights}')
+
+        self.sizes = {'processes': num_processes, 'tasks': num_tasks, 'users': num_users}
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().entropy % (1 << 63))
+        self.chunk_size = chunk_size
+        self.statuses = np.array(list(weights), dtype=object)
+        self.status_probabilities = probabilities / probabilities.sum()
+
+        rng = self.rng('samplers')
+        self.processes = ZipfSampler(num_processes, process_zipf, rng)
+        self.users = ZipfSampler(num_users, user_zipf, rng)
+
+    def rng(self, table: str, chunk: int = 0) -> np.random.Generator:
+        """Генератор части chunk таблицы table (или вспомогательного потока SEED_STREAMS)."""
+        return np.random.default_rng([self.seed, SEED_STREAMS.index(table), chunk])
+
+    def generate_processes(self, rng: np.random.Generator, ids: np.ndarray) -> Dict[str, np.ndarray]:
+        return {
+            'id': ids,
+            'name': numbered('Process ', ids),
+            'description': random_strings(rng, len(ids), DESCRIPTION_LENGTH),
+        }
+
+    def generate_tasks(self, rng: np.random.Generator, ids: np.ndarray) -> Dict[str, np.ndarray]:
+        statuses = rng.choice(len(self.statuses), len(ids), p=self.status_probabilities)
+        return {
+            'id': ids,
+            'process_id': self.processes.sample(rng, len(ids)),
+            'user_id': self.users.sample(rng, len(ids)),
+            'name': numbered('Task ', ids),
+            'status': self.statuses[statuses],
+        }
+
+    def generate_users(self, rng: np.random.Generator, ids: np.ndarray) -> Dict[str, np.ndarray]:
+        emails = np.char.add(np.char.add(random_strings(rng, len(ids), 8), '@'), random_strings(rng, len(ids), 5))
+        return {
+            'id': ids,
+            'name': numbered('User ', ids),
+            'email': np.char.add(emails, '.com'),
+        }
+
+    def generate_chunk(self, table: str, chunk: int) -> Dict[str, np.ndarray]:
+        """
+        Колонки части chunk таблицы table.
+
+        Raises:
+            ValueError: Если таблица неизвестна
+        """
+        if table not in TABLES:
+            raise ValueError(f"Неизвестная таблица: {table}. Доступные: {', '.join(TABLES)}")
+        start = chunk * self.chunk_size
+        ids = np.arange(start + 1, min(start + self.chunk_size, self.sizes[table]) + 1, dtype=np.int64)
+        return getattr(self, f'generate_{table}')(self.rng(table, chunk), ids)
+
+    def iter_columns(self, table: str) -> Iterator[Dict[str, np.ndarray]]:
+        """Части таблицы как словари колонок NumPy."""
+        # Пустая таблица - одна пустая часть
+        for chunk in range(max(1, -(-self.sizes[table] // self.chunk_size))):
+            yield self.generate_chunk(table, chunk)
+
+    def iter_chunks(self, table: str) -> Iterator[pd.DataFrame]:
+        """Части таблицы как DataFrame."""
+        for columns in self.iter_columns(table):
+            yield pd.DataFrame(columns)
+
+    def generate(self, table: str) -> pd.DataFrame:
+        """Вся таблица одним DataFrame."""
+        frames = list(self.iter_chunks(table))
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+def write_to_database(generator: BpmGenerator, database: str = 'default', table_prefix: str = 'bpm_',
+                      tables: Sequence[str] = TABLES) -> Dict[str, Dict[str, Any]]:
+    """
+    Записывает таблицы в базу частями через массовую загрузку (SqlAlchemyManager.to_sql).
+
+    Args:
+        generator: Генератор данных
+        database: База из DATABASES
+        table_prefix: Префикс имен таблиц
+        tables: Таблицы для записи
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Количество строк и время записи по таблице
+    """
+    from src.core.utils.database import SqlAlchemyManager
+    from src.core.utils.database.dbconfig import DBConfig
+
+    results = {}
+    with DBConfig(database) as config:
+        manager = SqlAlchemyManager(config)
+        for table in tables:
+            started = time.perf_counter()
+            rows = 0
+            for frame in generator.iter_chunks(table):
+                rows += manager.to_sql(frame, f'{table_prefix}{table}')['rows']
+            results[table] = {'rows': rows, 'seconds': round(time.perf_counter() - started, 3)}
+            logger.info(f"Синтетические данные BPM: {table_prefix}{table} - {results[table]}")
+    return results
+
+def write_parquet(generator: BpmGenerator, path: str, tables: Sequence[str] = TABLES) -> Dict[str, Dict[str, Any]]:
+    """
+    Записывает таблицы в Parquet: каталог на таблицу, файл на часть (part-00000.parquet, ...).
+
+    Каталог таблицы читается как один набор данных (pd.read_parquet('<path>/tasks')).
+    Нужен пакет pyarrow или fastparquet.
+
+    Args:
+        generator: Генератор данных
+        path: Каталог для записи
+        tables: Таблицы для записи
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Количество строк, файлов и время записи по таблице
+    """
+    results = {}
+    for table in tables:
+        directory = os.path.join(path, table)
+        os.makedirs(directory, exist_ok=True)
+        started = time.perf_counter()
+        rows = files = 0
+        for files, frame in enumerate(generator.iter_chunks(table), start=1):
+            frame.to_parquet(os.path.join(directory, f'part-{files - 1:05d}.parquet'), index=False)
+            rows += len(frame)
+        results[table] = {'rows': rows, 'files': files, 'seconds': round(time.perf_counter() - started, 3)}
+        logger.info(f"Синтетические данные BPM: {directory} - {results[table]}")
+    return results
@@ -1,39 +1,18 @@
-import random
-import string
+from .generator import TABLES, BpmGenerator
 
-def generate_random_string(length):
-    return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
+def to_records(columns):
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*(columns[name].tolist() for name in names))]
 
-def generate_random_email():
-    return f"{generate_random_string(8)}@{generate_random_string(5)}.com"
-
-def generate_random_status():
-    return random.choice(['Pending', 'In Progress', 'Completed', 'Cancelled'])
-
-def get_tasks(num_processes, num_tasks, num_users):
-    # Генерация данных о процессах
-    processes = [
-        {"id": i + 1, "name": f"Process {i + 1}", "description": generate_random_string(50)}
-        for i in range(num_processes)
-    ]
-
-    # Генерация данных о задачах
-    tasks = [
-        {"id": i + 1, "process_id": random.randint(1, num_processes), "name": f"Task {i + 1}", "status": generate_random_status()}
-        for i in range(num_tasks)
-    ]
-
-    # Генерация данных о пользователях
-    users = [
-        {"id": i + 1, "name": f"User {i + 1}", "email": generate_random_email()}
-        for i in range(num_users)
-    ]
+def get_tasks(num_processes, num_tasks, num_users, seed=None, as_frames=False, **distributions):
+    # Данные генерируются колонками NumPy (generator.py); distributions - параметры
+    # распределений BpmGenerator (status_weights, process_zipf, user_zipf)
+    generator = BpmGenerator(num_processes, num_tasks, num_users, seed=seed, **distributions)
+    if as_frames:
+        return {table: generator.generate(table) for table in TABLES}
 
     # Формирование структуры данных для JSON
-    bpm_data = {
-        "processes": processes,
-        "tasks": tasks,
-        "users": users
+    return {
+        table: [record for columns in generator.iter_columns(table) for record in to_records(columns)]
+        for table in TABLES
     }
-
-    return bpm_data
\ No newline at end of file
@@ -1,3 +1,23 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Создавайте свои тесты здесь
\ No newline at end of file
+from .generator import BpmGenerator
+
+class BpmGeneratorTests(SimpleTestCase):
+    def test_without_users_tasks_have_no_assignee(self):
+        tasks = BpmGenerator(3, 5, 0, seed=1).generate('tasks')
+
+        self.assertEqual(len(tasks), 5)
+        self.assertTrue(tasks['user_id'].isna().all())
+        self.assertTrue(BpmGenerator(3, 5, 0, seed=1).generate('users').empty)
+
+    def test_empty_tables(self):
+        generator = BpmGenerator(0, 0, 0, seed=1)
+
+        for table in ('processes', 'tasks', 'users'):
+            self.assertTrue(generator.generate(table).empty)
+
+    def test_tasks_require_processes(self):
+        with self.assertRaises(ValueError):
+            BpmGenerator(0, 5, 3)
+        with self.assertRaises(ValueError):
+            BpmGenerator(3, 5, -1)
@@ -0,0 +1,17 @@
+from rest_framework.exceptions import NotFound
+
+from src.core.utils.auto_api.base_handler import BaseHandler
+from src.core.utils.files.blobs import delete_file
+
+class HandlerClass(BaseHandler):
+    def process(self):
+        filename = self.params.get('filename')
+
+        # Содержимое удаляется сборкой мусора, когда на него не останется ссылок
+        if not delete_file(filename):
+            raise NotFound(f'Файл {filename} не найден')
+
+        return {
+            "message": "Файл успешно удален",
+            "file_name": filename
+        }
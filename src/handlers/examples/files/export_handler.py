@@ -0,0 +1,20 @@
+from rest_framework.exceptions import ValidationError
+
+from src.core.utils.auto_api.base_handler import BaseHandler
+from src.core.utils.database import QueryExecutor
+from src.core.utils.database.export import EXPORT_CONTENT_TYPES, StreamingExport
+from src.core.utils.models import StoredFile
+
+def get_files_query():
+    table = StoredFile._meta.db_table
+    return f"SELECT name, original_name, content_type, created_at FROM {table} ORDER BY id", ()
+
+class HandlerClass(BaseHandler):
+    def process(self):
+        export_format = self.params.get('export_format', 'json')
+        if export_format not in EXPORT_CONTENT_TYPES:
+            raise ValidationError(f'Неподдерживаемый формат выгрузки: {export_format}')
+
+        # Строки читаются из базы пачками по мере отправки ответа
+        rows = QueryExecutor.iterate(get_files_query, row_factory='record')
+        return StreamingExport(rows, fmt=export_format, filename=f'files.{export_format}')
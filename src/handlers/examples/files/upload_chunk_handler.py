@@ -0,0 +1,17 @@
+from rest_framework.exceptions import ValidationError
+
+from src.core.utils.auto_api.base_handler import BaseHandler
+from src.core.utils.files.upload import StreamedUploadedFile
+
+class HandlerClass(BaseHandler):
+    def process(self):
+        file = self.params.get('file')
+
+        # Часть уже записана в файл сессии обработчиком загрузки по мере получения
+        if not isinstance(file, StreamedUploadedFile) or file.session is None:
+            raise ValidationError('Часть файла не получена')
+
+        return {
+            "received": file.size,
+            **file.session.status()
+        }
@@ -0,0 +1,13 @@
+from src.core.utils.auto_api.base_handler import BaseHandler
+from src.core.utils.files.upload import UploadSession
+
+class HandlerClass(BaseHandler):
+    def process(self):
+        session = UploadSession.load(self.params.get('upload_id'))
+        stored = session.finalize()
+
+        return {
+            "message": "Файл успешно загружен",
+            "original_name": session.filename,
+            **stored
+        }
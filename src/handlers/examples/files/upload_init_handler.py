@@ -0,0 +1,36 @@
+from rest_framework.exceptions import ValidationError
+
+from src.core.utils.auto_api.base_handler import BaseHandler
+from src.core.utils.files.blobs import add_file, find_blob
+from src.core.utils.files.download import guess_content_type
+from src.core.utils.files.upload import UploadSession, validate_sha256
+
+class HandlerClass(BaseHandler):
+    def process(self):
+        filename = self.params.get('filename')
+        size = self.params.get('size')
+        sha256 = validate_sha256(self.params.get('sha256'))
+
+        if size < 0:
+            raise ValidationError('Размер файла не может быть отрицательным')
+
+        # Такое содержимое уже есть в хранилище: передавать байты не нужно
+        if sha256 and (blob := find_blob(sha256)) and blob.size == size:
+            try:
+                stored, _ = add_file(filename, sha256, size, content_type=guess_content_type(filename))
+            except FileNotFoundError:
+                # Блоб удален сборкой мусора между проверкой и записью
+                stored = None
+            if stored is not None:
+                return {
+                    "status": "exists",
+                    "file_name": stored.name,
+                    "sha256": sha256,
+                    "size": size
+                }
+
+        session, coalesced = UploadSession.create(filename, size, sha256)
+        return {
+            "status": "coalesced" if coalesced else "created",
+            **session.status()
+        }
@@ -0,0 +1,6 @@
+from src.core.utils.auto_api.base_handler import BaseHandler
+from src.core.utils.files.upload import UploadSession
+
+class HandlerClass(BaseHandler):
+    def process(self):
+        return UploadSession.load(self.params.get('upload_id')).status()
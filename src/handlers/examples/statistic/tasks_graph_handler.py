@@ -1,15 +1,20 @@
 from src.external.examples.bpm.scripts import get_tasks
 from src.external.examples.bi.scripts import transform_data_for_bi_graph
 
+from rest_framework.exceptions import ValidationError
+
 from src.core.utils.auto_api.base_handler import BaseHandler
 
 class HandlerClass(BaseHandler):
     def process(self):
-        tasks = get_tasks(
-            self.params.get('limit', 10),
-            self.params.get('offset', 10),
-            self.params.get('page_size', 10)
+        # Отрицательные значения дают пустые таблицы
+        num_processes, num_tasks, num_users = (
+            max(int(self.params.get(name, 10)), 0) for name in ('limit', 'offset', 'page_size')
         )
+        if num_tasks > 0 and num_processes == 0:
+            raise ValidationError('Для задач (offset > 0) нужен хотя бы один процесс (limit > 0)')
+
+        tasks = get_tasks(num_processes, num_tasks, num_users, as_frames=True)
 
         aggregation_params = [
             {
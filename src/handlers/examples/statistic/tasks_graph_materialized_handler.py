@@ -0,0 +1,10 @@
+from src.external.examples.bi.materialized import get_materialized
+
+from src.core.utils.auto_api.base_handler import BaseHandler
+
+class HandlerClass(BaseHandler):
+    def process(self):
+        # Агрегаты читаются из сохраненного состояния, а не пересчитываются по задачам
+        graph_data = get_materialized('tasks_graph')
+
+        return {"data": graph_data}
@@ -0,0 +1,39 @@
+from datetime import timezone
+
+from django.utils.timezone import is_aware, make_aware
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from src.external.examples.bi.rollups import get_time_series
+
+from src.core.utils.auto_api.base_handler import BaseHandler
+
+def parse_moment(name, value):
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValidationError(f'Неверный формат даты {name}: {value}')
+    return moment if is_aware(moment) else make_aware(moment, timezone.utc)
+
+class HandlerClass(BaseHandler):
+    def process(self):
+        start = parse_moment('start', self.params.get('start'))
+        end = parse_moment('end', self.params.get('end'))
+
+        # Точки читаются из агрегатов по интервалам и прореживаются:
+        # размер ответа не зависит от длины диапазона
+        try:
+            series = get_time_series(
+                'task_status',
+                metric=self.params.get('metric', 'count'),
+                start=start,
+                end=end,
+                points=self.params.get('points', 500),
+                method=self.params.get('method', 'lttb'),
+                bucket=self.params.get('bucket') or None,
+            )
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+        return {"data": series}
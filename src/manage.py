@@ -12,6 +12,29 @@ import sys
 
 from src.core.utils.auto_api.auto_config import get_env_deploy_type
 
+# Команды запуска сервера, для которых при старте проверяется подключение к базам данных
+DB_PROBE_COMMANDS = ('runserver', 'start_prod')
+
+SKIP_DB_PROBE_FLAG = '--skip-db-probe'
+
+def configure_db_probe(argv: list) -> None:
+    """
+    Включает проверку подключения к базам данных для команд запуска сервера.
+
+    Проверка выполняется при загрузке настроек (settings/database.py), поэтому
+    флаг --skip-db-probe обрабатывается до Django и удаляется из аргументов.
+    Значение передается через переменную окружения и наследуется дочерними
+    процессами (автоперезагрузка runserver, Daphne).
+
+    Args:
+        argv: Аргументы командной строки (изменяются на месте)
+    """
+    if SKIP_DB_PROBE_FLAG in argv:
+        argv[:] = [arg for arg in argv if arg != SKIP_DB_PROBE_FLAG]
+        os.environ['API_DB_PROBE'] = 'false'
+    elif len(argv) > 1 and argv[1] in DB_PROBE_COMMANDS:
+        os.environ.setdefault('API_DB_PROBE', 'true')
+
 def main():
     """
     Основная функция для запуска Django-приложения.
@@ -23,6 +46,7 @@ def main():
     """
     deploy_type = get_env_deploy_type()
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', deploy_type)
+    configure_db_probe(sys.argv)
 
     try:
         from django.core.management import execute_from_command_line